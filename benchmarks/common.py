@@ -0,0 +1,146 @@
+# benchmarks/common.py
+# Shared helpers for the offline benchmarks: stage timing + peak memory, run metadata, JSON reports.
+from __future__ import annotations
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABRICKS_DIR = os.path.join(REPO_ROOT, "databricks")
+REPORTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "reports")
+
+# Make databricks/crm_engine importable for every benchmark
+if DATABRICKS_DIR not in sys.path:
+    sys.path.insert(0, DATABRICKS_DIR)
+
+try:  # optional: process-tree RSS (includes the local Spark JVM)
+    import psutil
+except ImportError:  # pragma: no cover - fallback is the driver's own high-water mark
+    psutil = None
+
+
+@dataclass
+class StageMeasurement:
+    stage: str
+    seconds: float = 0.0
+    rows: Optional[int] = None          # input rows processed by the stage
+    rows_per_sec: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+    rss_source: str = ""                # "process_tree" (driver + JVM) or "driver_max"
+
+
+def _tree_rss_bytes() -> int:
+    proc = psutil.Process()
+    total = 0
+    for p in [proc] + proc.children(recursive=True):
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+def _driver_max_rss_bytes() -> int:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb if sys.platform == "darwin" else kb * 1024
+
+
+class _PeakSampler(threading.Thread):
+    def __init__(self, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _tree_rss_bytes()
+        self._stop_evt = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_evt.wait(self.interval):
+            self.peak = max(self.peak, _tree_rss_bytes())
+
+    def stop(self) -> int:
+        self._stop_evt.set()
+        self.join()
+        return max(self.peak, _tree_rss_bytes())
+
+
+@contextmanager
+def measure(stage: str, results: list) -> Iterator[StageMeasurement]:
+    """
+    Times a stage and records its peak memory; set `m.rows` inside the block for rows/sec.
+
+        with measure("silver", stages) as m:
+            run_sql_file(spark, ...)
+            m.rows = n_input_rows
+    """
+    m = StageMeasurement(stage=stage)
+    sampler = _PeakSampler() if psutil is not None else None
+    if sampler is not None:
+        sampler.start()
+    t0 = time.perf_counter()
+    try:
+        yield m
+    finally:
+        m.seconds = time.perf_counter() - t0
+        if sampler is not None:
+            m.peak_rss_mb = sampler.stop() / 2 ** 20
+            m.rss_source = "process_tree"
+        else:
+            m.peak_rss_mb = _driver_max_rss_bytes() / 2 ** 20
+            m.rss_source = "driver_max"
+        if m.rows is not None and m.seconds > 0:
+            m.rows_per_sec = m.rows / m.seconds
+        results.append(m)
+
+
+def as_dicts(stages: list) -> list[dict]:
+    return [asdict(s) for s in stages]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def environment_info(spark=None) -> dict:
+    import numpy as np
+    import pandas as pd
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "psutil": psutil is not None,
+    }
+    if spark is not None:
+        info["spark"] = spark.version
+    return info
+
+
+def write_report(report: dict, name: str, out_dir: Optional[str] = None) -> str:
+    """
+    Writes `report` as benchmarks/reports/<name>_<UTC timestamp>.json and returns the path.
+    """
+    out_dir = out_dir or REPORTS_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(out_dir, f"{name}_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
@@ -0,0 +1,102 @@
+# benchmarks/exposure_scheduler.py
+# Purpose: Throughput and memory of the campaign-calendar exposure scheduler (crm_engine/exposures.py).
+#
+# Stages (fixed-seed customers, offline):
+#   schedule  draw every exposure chunk by chunk without writing (scheduler cost only)
+#   write     the same exposures streamed to part files (what 01_generate_synth_data.py does with
+#             STREAM_EXPOSURES = True)
+# Each stage records wall time, peak memory and exposures/sec; the report adds exposures per campaign
+# and the customer-month contact histogram.
+#
+# Usage:
+#   python benchmarks/exposure_scheduler.py --customers 2000000
+#   python benchmarks/exposure_scheduler.py --customers 6000000 --calendar databricks/campaign_calendar.example.json
+# Reports: benchmarks/reports/exposure_scheduler_<UTC timestamp>.json
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+
+from common import as_dicts, environment_info, git_commit, measure, utc_now, write_report
+
+from crm_engine.exposures import DEFAULT_CHUNK_CUSTOMERS, iter_exposure_chunks, write_exposure_parts
+
+REPORT_NAME = "exposure_scheduler"
+REPORT_VERSION = 1
+
+
+def make_customers(n: int, seed: int) -> pd.DataFrame:
+    # same active / high-value split as crm_engine/synth.py
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": np.arange(1, n + 1, dtype=np.int64),
+        "is_active": (rng.random(n) < 0.50).astype(np.int32),
+        "is_high_value": (rng.random(n) < 0.30).astype(np.int32),
+    })
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Campaign-calendar exposure scheduler benchmark.")
+    ap.add_argument("--customers", type=int, default=2_000_000)
+    ap.add_argument("--calendar", default="default", help='JSON calendar path or "default"')
+    ap.add_argument("--start-date", default="2025-01-01")
+    ap.add_argument("--end-date", default="2025-12-31")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk-customers", type=int, default=DEFAULT_CHUNK_CUSTOMERS)
+    ap.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="part files of the write stage")
+    ap.add_argument("--work-dir", default=None, help="keep the part files here (default: temp folder, removed)")
+    ap.add_argument("--out-dir", default=None, help="report folder (default: benchmarks/reports)")
+    args = ap.parse_args(argv)
+
+    customers = make_customers(args.customers, args.seed)
+    dates = pd.date_range(args.start_date, args.end_date, freq="D")
+    stages: list = []
+
+    with measure("schedule", stages) as m:
+        chunks = iter_exposure_chunks(args.calendar, dates, customers["is_active"].to_numpy(),
+                                      customers["is_high_value"].to_numpy(), np.random.default_rng(args.seed),
+                                      args.chunk_customers)
+        m.rows = sum(len(ch) for ch in chunks)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="crm_exposures_")
+    try:
+        with measure("write", stages) as m:
+            stats = write_exposure_parts(args.calendar, customers, dates,
+                                         os.path.join(work_dir, f"fact_crm_exposure.{args.format}"),
+                                         seed=args.seed, fmt=args.format, chunk_customers=args.chunk_customers)
+            m.rows = stats.exposures
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    months = len(pd.period_range(args.start_date, args.end_date, freq="M"))
+    print(f"{args.customers:,} customers x {months} months -> {stats.exposures:,} exposures "
+          f"({stats.exposures / max(args.customers * months, 1):.2f} per customer-month, "
+          f"{stats.dropped_by_cap:,} over the cap)")
+    print(f"{'stage':<10}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}")
+    for s in stages:
+        print(f"{s.stage:<10}{s.seconds:>10.2f}{s.rows_per_sec or 0:>14,.0f}{s.peak_rss_mb:>10.0f}")
+
+    report = {
+        "report": REPORT_NAME,
+        "report_version": REPORT_VERSION,
+        "created_at": utc_now(),
+        "git_commit": git_commit(),
+        "environment": environment_info(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("work_dir", "out_dir")},
+        "stages": as_dicts(stages),
+        "schedule": asdict(stats),
+    }
+    print(f"\nReport: {write_report(report, REPORT_NAME, args.out_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# benchmarks/gold_service_load.py
+# Purpose: Localhost load test of the Gold data service (streamlit_app/gold_service.py).
+#
+# Starts the service in-process on a free port over an existing Gold export folder, then drives it
+# with N keep-alive client threads. Scenarios:
+#   cold         every request distinct until the cache is warm (DuckDB query + encode per request)
+#   cached_json  repeated aggregate requests, gzip JSON from the result cache
+#   cached_arrow repeated aggregate requests, Arrow IPC from the result cache
+#   not_modified repeated requests with If-None-Match (304, no body)
+#   drilldown    customer drill-down over random customer ids
+# Each scenario records requests/sec and p50/p95/p99 latency.
+#
+# Usage:
+#   python benchmarks/gold_service_load.py --folder data/gold_exports --clients 8 --seconds 5
+# Reports: benchmarks/reports/gold_service_load_<UTC timestamp>.json
+from __future__ import annotations
+
+import argparse
+import http.client
+import itertools
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+from common import REPO_ROOT, environment_info, git_commit, utc_now, write_report
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
+from gold_service import make_server  # noqa: E402
+from utils.query import dataset_source, run_query  # noqa: E402
+
+REPORT_NAME = "gold_service_load"
+REPORT_VERSION = 1
+
+BY = ["month", "segment", "active", "value", "month,segment", "month,active,value", "segment,active,value", ""]
+
+
+def aggregate_paths(months: list) -> list[str]:
+    paths = [f"/v1/aggregates?by={b}" for b in BY]
+    paths += [f"/v1/aggregates?by=segment,active,value&month={m}" for m in months]
+    return paths
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def drive(host: str, port: int, paths, headers: dict, clients: int, seconds: float,
+          max_requests: int | None = None, expect: int = 200) -> dict:
+    """
+    `clients` threads, one persistent connection each, pulling paths from a shared iterator until
+    the time budget (or max_requests) is used up.
+    """
+    lock = threading.Lock()
+    latencies: list[float] = []
+    errors = [0]
+    issued = [0]
+    it = iter(paths)
+    deadline = time.perf_counter() + seconds
+
+    def next_path():
+        with lock:
+            if max_requests is not None and issued[0] >= max_requests:
+                return None
+            p = next(it, None)
+            if p is not None:
+                issued[0] += 1
+            return p
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        own: list[float] = []
+        bad = 0
+        while time.perf_counter() < deadline:
+            path = next_path()
+            if path is None:
+                break
+            t0 = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            own.append(time.perf_counter() - t0)
+            bad += resp.status != expect
+        conn.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += bad
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    lat = sorted(latencies)
+    return {
+        "requests": len(lat),
+        "errors": errors[0],
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(lat) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(1000 * _percentile(lat, 0.50), 3),
+        "p95_ms": round(1000 * _percentile(lat, 0.95), 3),
+        "p99_ms": round(1000 * _percentile(lat, 0.99), 3),
+        "mean_ms": round(1000 * statistics.fmean(lat), 3) if lat else None,
+    }
+
+
+def fetch_etag(host: str, port: int, path: str, headers: dict) -> str:
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.request("GET", path, headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    return resp.getheader("ETag")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Localhost load test of the Gold data service.")
+    ap.add_argument("--folder", default=os.path.join(REPO_ROOT, "data", "gold_exports"))
+    ap.add_argument("--clients", type=int, default=8, help="concurrent keep-alive connections")
+    ap.add_argument("--seconds", type=float, default=5.0, help="time budget per scenario")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out-dir", default=None, help="report folder (default: benchmarks/reports)")
+    args = ap.parse_args(argv)
+
+    fact_src, version = dataset_source(args.folder, "fact_customer_month_incrementality")
+    months = run_query(f"SELECT DISTINCT month_key_yyyymm AS m FROM {fact_src} ORDER BY 1",
+                       version=version)["m"].tolist()
+    ids = run_query(f"SELECT DISTINCT customer_id AS c FROM {fact_src}", version=version)["c"].tolist()
+
+    server = make_server(args.folder, port=0)
+    host, port = server.server_address[:2]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Gold service on http://{host}:{port} ({len(months)} months, {len(ids):,} customers)")
+
+    rng = random.Random(args.seed)
+    agg = aggregate_paths(months)
+    gz = {"Accept-Encoding": "gzip"}
+    arrow = {"Accept": "application/vnd.apache.arrow.stream"}
+    scenarios = {}
+    try:
+        scenarios["cold"] = drive(host, port, agg, gz, args.clients, args.seconds * 4, max_requests=len(agg))
+        scenarios["cached_json"] = drive(host, port, itertools.cycle(agg), gz, args.clients, args.seconds)
+        drive(host, port, agg, arrow, args.clients, args.seconds * 4)      # warm the Arrow entries
+        scenarios["cached_arrow"] = drive(host, port, itertools.cycle(agg), arrow, args.clients, args.seconds)
+        path = "/v1/aggregates?by=month,segment"
+        etag = fetch_etag(host, port, path, gz)
+        scenarios["not_modified"] = drive(host, port, itertools.repeat(path), dict(gz, **{"If-None-Match": etag}),
+                                          args.clients, args.seconds, expect=304)
+        customers = (f"/v1/customers/{rng.choice(ids)}" for _ in itertools.count())
+        scenarios["drilldown"] = drive(host, port, customers, gz, args.clients, args.seconds)
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = server.RequestHandlerClass.cache.stats()
+
+    print(f"\n{'scenario':<14}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in scenarios.items():
+        print(f"{name:<14}{r['requests_per_sec']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['errors']:>8}")
+    print(f"cache: {stats}")
+
+    report = {
+        "report": REPORT_NAME,
+        "report_version": REPORT_VERSION,
+        "created_at": utc_now(),
+        "git_commit": git_commit(),
+        "environment": environment_info(),
+        "config": {"folder": args.folder, "clients": args.clients, "seconds": args.seconds,
+                   "months": len(months), "customers": len(ids)},
+        "scenarios": scenarios,
+        "cache": stats,
+    }
+    print(f"\nReport: {write_report(report, REPORT_NAME, args.out_dir)}")
+    return 1 if any(r["errors"] for r in scenarios.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# benchmarks/ground_truth_recovery.py
+# Purpose: How well does the pipeline recover the lift injected by the synthetic generator, and
+#          what does each stage cost as the data grows?
+#
+# For every size: generate (crm_engine/synth.py, which records the true injected revenue) ->
+# write CSVs -> Bronze load -> 04 Silver SQL -> 05 Gold SQL on a local Spark + Delta session.
+# Per stage: wall time, peak memory and rows/sec. Per segment (is_active x is_high_value, and per
+# month): estimated vs true incremental revenue for every estimator column present in the Gold fact.
+#
+# Usage:
+#   python benchmarks/ground_truth_recovery.py --sizes 50000,500000,5000000
+# Report: benchmarks/reports/ground_truth_recovery_<UTC timestamp>.json (schema: REPORT_VERSION)
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import as_dicts, environment_info, git_commit, measure, utc_now, write_report
+
+from crm_engine.local_spark import SQL_STAGES, get_local_spark, load_bronze_csvs, run_sql_file
+from crm_engine.synth import SynthConfig, generate, true_lift_by_segment, write_csvs
+
+REPORT_NAME = "ground_truth_recovery"
+REPORT_VERSION = 1
+DEFAULT_SIZES = [50_000, 500_000, 5_000_000]
+
+SEGMENT_KEYS = ["is_active", "is_high_value"]
+# Gold fact columns compared with the truth (missing ones are skipped)
+ESTIMATORS = [
+    "incremental_revenue",
+    "seasonal_adj_incremental_revenue",
+    "did_incremental_revenue",
+]
+
+
+def estimated_by_segment(spark, columns: list[str]) -> pd.DataFrame:
+    sums = ",\n".join(f"SUM(CAST({c} AS DOUBLE)) AS {c}" for c in columns)
+    return spark.sql(f"""
+        SELECT
+          month_key_yyyymm AS month_id,
+          is_active,
+          is_high_value,
+          COUNT(*) AS est_customer_months,
+          {sums}
+        FROM `02_gold`.fact_customer_month_incrementality
+        GROUP BY month_key_yyyymm, is_active, is_high_value
+    """).toPandas()
+
+
+def _compare(df: pd.DataFrame, keys: list[str], estimators: list[str]) -> list[dict]:
+    sum_cols = ["true_incremental_revenue", "true_incremental_revenue_all_windows", "customer_months",
+                "est_customer_months"] + estimators
+    g = df.groupby(keys, sort=True)[sum_cols].sum().reset_index() if keys else df[sum_cols].sum().to_frame().T
+    rows = []
+    for rec in g.to_dict("records"):
+        truth = float(rec["true_incremental_revenue"])
+        row = {k: int(rec[k]) for k in keys}
+        row.update({
+            "customer_months": int(rec["customer_months"]),
+            "est_customer_months": int(rec["est_customer_months"]),
+            "true_incremental_revenue": truth,
+            "true_incremental_revenue_all_windows": float(rec["true_incremental_revenue_all_windows"]),
+            "estimates": {},
+        })
+        for est in estimators:
+            value = float(rec[est])
+            row["estimates"][est] = {
+                "estimated": value,
+                "error": value - truth,
+                "relative_error": (value - truth) / abs(truth) if truth else None,
+            }
+        rows.append(row)
+    return rows
+
+
+def accuracy_report(truth: pd.DataFrame, est: pd.DataFrame, estimators: list[str]) -> dict:
+    keys = ["month_id"] + SEGMENT_KEYS
+    df = truth.merge(est, on=keys, how="outer")
+    df[df.columns.difference(keys)] = df[df.columns.difference(keys)].fillna(0)
+    return {
+        "truth_definition": (
+            "true_incremental_revenue = revenue injected by the generator inside each customer-month's "
+            "7-day anchor post window (what the pre/post estimate targets); "
+            "true_incremental_revenue_all_windows = all revenue injected by that month's exposures"
+        ),
+        "total": _compare(df, [], estimators)[0],
+        "segments": _compare(df, SEGMENT_KEYS, estimators),
+        "segment_months": _compare(df, keys, estimators),
+    }
+
+
+def run_size(spark, n_customers: int, seed: int, work_dir: str) -> dict:
+    stages: list = []
+    csv_dir = os.path.join(work_dir, f"synth_{n_customers}")
+
+    with measure("generate", stages) as m:
+        ds = generate(SynthConfig(n_customers=n_customers, seed=seed))
+        counts = ds.row_counts()
+        m.rows = counts["transactions"] + counts["exposures"]
+    with measure("write_csv", stages) as m:
+        write_csvs(ds, csv_dir, include_truth=False)
+        m.rows = counts["transactions"] + counts["exposures"]
+    truth = true_lift_by_segment(ds)
+    del ds
+
+    with measure("bronze_load", stages) as m:
+        bronze_rows = load_bronze_csvs(spark, csv_dir)
+        m.rows = sum(bronze_rows.values())
+    with measure("silver", stages) as m:
+        run_sql_file(spark, SQL_STAGES["silver"])
+        m.rows = bronze_rows["fact_transaction_bronze"] + bronze_rows["fact_crm_exposure_bronze"]
+    with measure("gold", stages) as m:
+        run_sql_file(spark, SQL_STAGES["gold"])
+        m.rows = spark.table("`01_silver`.customer_month_pre_post").count()
+
+    fact_cols = set(spark.table("`02_gold`.fact_customer_month_incrementality").columns)
+    estimators = [c for c in ESTIMATORS if c in fact_cols]
+    est = estimated_by_segment(spark, estimators)
+    for c in ["month_id"] + SEGMENT_KEYS:
+        est[c] = est[c].astype(np.int64)
+        truth[c] = truth[c].astype(np.int64)
+
+    return {
+        "n_customers": n_customers,
+        "rows": {**counts, "customer_months": int(truth["customer_months"].sum())},
+        "stages": as_dicts(stages),
+        "accuracy": accuracy_report(truth, est, estimators),
+    }
+
+
+def main(argv=None) -> str:
+    ap = argparse.ArgumentParser(description="Ground-truth recovery benchmark (local Spark + Delta).")
+    ap.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                    help="comma-separated customer counts")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--work-dir", default=None, help="CSVs + local Delta warehouse (default: temp dir)")
+    ap.add_argument("--out-dir", default=None, help="report folder (default: benchmarks/reports)")
+    ap.add_argument("--shuffle-partitions", type=int, default=8)
+    ap.add_argument("--driver-memory", default="8g")
+    ap.add_argument("--keep-data", action="store_true", help="keep generated CSVs and the warehouse")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="crm_bench_")
+    spark = get_local_spark(os.path.join(work_dir, "warehouse"),
+                            shuffle_partitions=args.shuffle_partitions, driver_memory=args.driver_memory)
+    try:
+        setup: list = []
+        with measure("ddl", setup):
+            run_sql_file(spark, SQL_STAGES["ddl"])
+
+        runs = []
+        for n in sizes:
+            print(f"=== {n:,} customers ===")
+            run = run_size(spark, n, args.seed, work_dir)
+            for s in run["stages"]:
+                rps = f"{s['rows_per_sec']:,.0f} rows/s" if s["rows_per_sec"] else ""
+                print(f"  {s['stage']:<12} {s['seconds']:8.1f}s  peak {s['peak_rss_mb']:8.0f} MB  {rps}")
+            tot = run["accuracy"]["total"]
+            for est, v in tot["estimates"].items():
+                print(f"  {est:<36} est {v['estimated']:14,.0f} vs true {tot['true_incremental_revenue']:14,.0f}")
+            runs.append(run)
+            if not args.keep_data:
+                shutil.rmtree(os.path.join(work_dir, f"synth_{n}"), ignore_errors=True)
+
+        report = {
+            "report": REPORT_NAME,
+            "report_version": REPORT_VERSION,
+            "created_at": utc_now(),
+            "git_commit": git_commit(),
+            "environment": environment_info(spark),
+            "config": {
+                "sizes": sizes,
+                "seed": args.seed,
+                "synth": {k: v for k, v in vars(SynthConfig()).items() if k not in ("n_customers", "seed")},
+                "shuffle_partitions": args.shuffle_partitions,
+                "driver_memory": args.driver_memory,
+            },
+            "setup": as_dicts(setup),
+            "runs": runs,
+        }
+        path = write_report(report, REPORT_NAME, args.out_dir)
+        print(f"\nReport: {path}")
+        return path
+    finally:
+        spark.stop()
+        if not args.keep_data and args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# benchmarks/stage_suite.py
+# Purpose: End-to-end stage benchmark with regression gate against a stored baseline.
+#
+# Stages (fixed-seed synthetic data of configurable size, all local and offline):
+#   generate -> write_csv -> bronze_load -> silver (04 SQL) -> gold (05 SQL) -> export (06 local)
+#   -> dashboard_load (cold parallel load of every Gold export through the Streamlit loaders)
+# Each stage records wall time (median over --repeat runs), peak memory and rows/sec.
+#
+# Usage:
+#   python benchmarks/stage_suite.py --customers 200000 --update-baseline   # record the baseline
+#   python benchmarks/stage_suite.py --customers 200000 --threshold 0.25    # exit 1 on regression
+# Baselines: benchmarks/baselines/stage_suite.json (one entry per dataset size).
+# Reports  : benchmarks/reports/stage_suite_<UTC timestamp>.json
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+from common import REPO_ROOT, as_dicts, environment_info, git_commit, measure, utc_now, write_report
+
+from crm_engine.local_spark import (
+    SQL_STAGES,
+    export_gold_csvs,
+    get_local_spark,
+    load_bronze_csvs,
+    run_sql_file,
+)
+from crm_engine.synth import SynthConfig, generate, write_csvs
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
+from utils.data import clear_frame_cache  # noqa: E402
+from utils.warmup import warm_gold_cache  # noqa: E402
+
+REPORT_NAME = "stage_suite"
+REPORT_VERSION = 1
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "stage_suite.json")
+STAGES = ["generate", "write_csv", "bronze_load", "silver", "gold", "export", "dashboard_load"]
+
+
+def run_once(spark, n_customers: int, seed: int, work_dir: str) -> list:
+    stages: list = []
+    csv_dir = os.path.join(work_dir, "synth")
+    export_dir = os.path.join(work_dir, "gold_exports")
+    shutil.rmtree(export_dir, ignore_errors=True)
+
+    with measure("generate", stages) as m:
+        ds = generate(SynthConfig(n_customers=n_customers, seed=seed))
+        counts = ds.row_counts()
+        m.rows = counts["transactions"] + counts["exposures"]
+    with measure("write_csv", stages) as m:
+        write_csvs(ds, csv_dir, include_truth=False)
+        m.rows = counts["transactions"] + counts["exposures"]
+    del ds
+
+    with measure("bronze_load", stages) as m:
+        bronze_rows = load_bronze_csvs(spark, csv_dir)
+        m.rows = sum(bronze_rows.values())
+    with measure("silver", stages) as m:
+        run_sql_file(spark, SQL_STAGES["silver"])
+        m.rows = bronze_rows["fact_transaction_bronze"] + bronze_rows["fact_crm_exposure_bronze"]
+    with measure("gold", stages) as m:
+        run_sql_file(spark, SQL_STAGES["gold"])
+        m.rows = spark.table("`01_silver`.customer_month_pre_post").count()
+    with measure("export", stages) as m:
+        exported = export_gold_csvs(spark, export_dir)
+        m.rows = sum(spark.table(f"`02_gold`.`{t}`").count() for t in exported)
+    with measure("dashboard_load", stages) as m:
+        clear_frame_cache()
+        results = warm_gold_cache(export_dir)
+        failed = [r for r in results if r.error not in (None, "not found")]
+        if failed:
+            raise RuntimeError(f"Dashboard load failed: {[(r.filename, r.error) for r in failed]}")
+        m.rows = sum(r.rows for r in results)
+    return stages
+
+
+def summarize(runs: list[list]) -> dict:
+    """
+    Median seconds / max peak memory per stage across repeated runs.
+    """
+    out = {}
+    for name in STAGES:
+        ms = [s for run in runs for s in run if s.stage == name]
+        if not ms:
+            continue
+        seconds = statistics.median(s.seconds for s in ms)
+        rows = ms[0].rows
+        out[name] = {
+            "seconds": seconds,
+            "seconds_all": [s.seconds for s in ms],
+            "rows": rows,
+            "rows_per_sec": rows / seconds if rows and seconds > 0 else None,
+            "peak_rss_mb": max(s.peak_rss_mb for s in ms),
+            "rss_source": ms[0].rss_source,
+        }
+    return out
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("baseline_version") != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version in {path}: {data.get('baseline_version')}")
+    return data
+
+
+def save_baseline(path: str, baseline: dict, size_key: str, entry: dict) -> None:
+    baseline = baseline or {"baseline_version": BASELINE_VERSION, "sizes": {}}
+    baseline.setdefault("sizes", {})[size_key] = entry
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def compare(current: dict, base: dict, threshold: float, min_seconds: float,
+            stage_thresholds: dict, memory_threshold: float | None) -> list[dict]:
+    """
+    A stage regresses when it is slower than baseline x (1 + threshold) AND by more than
+    `min_seconds` (absolute noise floor for short stages); optionally also on peak memory.
+    """
+    rows = []
+    for name, cur in current.items():
+        ref = base.get(name)
+        if ref is None:
+            rows.append({"stage": name, "status": "new"})
+            continue
+        limit = stage_thresholds.get(name, threshold)
+        ratio = cur["seconds"] / ref["seconds"] if ref["seconds"] > 0 else None
+        slow = ratio is not None and ratio > 1.0 + limit and cur["seconds"] - ref["seconds"] > min_seconds
+        mem_ratio = (cur["peak_rss_mb"] / ref["peak_rss_mb"]
+                     if ref.get("peak_rss_mb") and cur.get("peak_rss_mb") else None)
+        heavy = memory_threshold is not None and mem_ratio is not None and mem_ratio > 1.0 + memory_threshold
+        rows.append({
+            "stage": name,
+            "status": "regressed" if (slow or heavy) else "ok",
+            "seconds": cur["seconds"],
+            "baseline_seconds": ref["seconds"],
+            "ratio": ratio,
+            "threshold": limit,
+            "peak_rss_mb": cur["peak_rss_mb"],
+            "baseline_peak_rss_mb": ref.get("peak_rss_mb"),
+            "memory_ratio": mem_ratio,
+        })
+    return rows
+
+
+def _parse_stage_thresholds(items: list[str]) -> dict:
+    out = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        if name not in STAGES or not value:
+            raise SystemExit(f"--stage-threshold expects <stage>=<fraction> with stage in {STAGES}, got {item!r}")
+        out[name] = float(value)
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="End-to-end stage benchmark with regression thresholds.")
+    ap.add_argument("--customers", type=int, default=200_000, help="synthetic dataset size")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=1, help="runs per stage (median is compared)")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = +25%%")
+    ap.add_argument("--stage-threshold", action="append", default=[], metavar="STAGE=FRACTION",
+                    help="per-stage override, e.g. gold=0.4 (repeatable)")
+    ap.add_argument("--min-seconds", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    ap.add_argument("--memory-threshold", type=float, default=None, help="also fail on peak-memory growth")
+    ap.add_argument("--work-dir", default=None)
+    ap.add_argument("--out-dir", default=None, help="report folder (default: benchmarks/reports)")
+    ap.add_argument("--shuffle-partitions", type=int, default=8)
+    ap.add_argument("--driver-memory", default="4g")
+    args = ap.parse_args(argv)
+    stage_thresholds = _parse_stage_thresholds(args.stage_threshold)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="crm_stage_suite_")
+    spark = get_local_spark(os.path.join(work_dir, "warehouse"),
+                            shuffle_partitions=args.shuffle_partitions, driver_memory=args.driver_memory)
+    try:
+        run_sql_file(spark, SQL_STAGES["ddl"])
+        runs = []
+        for i in range(args.repeat):
+            print(f"=== run {i + 1}/{args.repeat} ({args.customers:,} customers) ===")
+            runs.append(run_once(spark, args.customers, args.seed, work_dir))
+        current = summarize(runs)
+        env = environment_info(spark)
+    finally:
+        spark.stop()
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    size_key = str(args.customers)
+    baseline = load_baseline(args.baseline)
+    base = baseline.get("sizes", {}).get(size_key)
+    comparison = compare(current, base["stages"], args.threshold, args.min_seconds, stage_thresholds,
+                         args.memory_threshold) if base else []
+
+    print(f"\n{'stage':<15}{'seconds':>10}{'baseline':>10}{'ratio':>8}{'peak MB':>10}  status")
+    by_stage = {c["stage"]: c for c in comparison}
+    for name, cur in current.items():
+        c = by_stage.get(name, {})
+        ref = c.get("baseline_seconds")
+        ratio = c.get("ratio")
+        print(f"{name:<15}{cur['seconds']:>10.2f}"
+              f"{(f'{ref:.2f}' if ref is not None else '-'):>10}"
+              f"{(f'{ratio:.2f}' if ratio is not None else '-'):>8}"
+              f"{cur['peak_rss_mb']:>10.0f}  {c.get('status', 'no baseline')}")
+
+    regressed = [c["stage"] for c in comparison if c["status"] == "regressed"]
+    report = {
+        "report": REPORT_NAME,
+        "report_version": REPORT_VERSION,
+        "created_at": utc_now(),
+        "git_commit": git_commit(),
+        "environment": env,
+        "config": {k: v for k, v in vars(args).items() if k not in ("work_dir", "out_dir")},
+        "stages": current,
+        "baseline": {"path": args.baseline, "found": base is not None,
+                     "git_commit": (base or {}).get("git_commit")},
+        "comparison": comparison,
+        "regressed": regressed,
+        "runs": [as_dicts(r) for r in runs],
+    }
+    print(f"\nReport: {write_report(report, REPORT_NAME, args.out_dir)}")
+
+    if args.update_baseline:
+        save_baseline(args.baseline, baseline, size_key, {
+            "created_at": report["created_at"],
+            "git_commit": report["git_commit"],
+            "environment": env,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "stages": current,
+        })
+        print(f"Baseline updated: {args.baseline} [{size_key} customers]")
+        return 0
+    if base is None:
+        print(f"No baseline for {size_key} customers in {args.baseline}; run with --update-baseline to record one.")
+        return 0
+    if regressed:
+        print(f"REGRESSION: {', '.join(regressed)} regressed beyond threshold vs baseline.")
+        return 1
+    print("OK: no stage regressed beyond threshold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,12 @@
 -- file: 02_databricks_ddl.sql
 -- Purpose: Create catalog, schemas (00_bronze/01_silver/02_gold), volumes, and tables.
 
--- ====== CONFIG (edit names) ======
-CREATE CATALOG IF NOT EXISTS retail_crm_analytics;
+-- ====== CONFIG ======
+-- :catalog is a named parameter (SQL task / job parameter "catalog", or spark.sql(..., args={"catalog": ...}));
+-- one catalog per market, see crm_engine/markets.py.
+CREATE CATALOG IF NOT EXISTS IDENTIFIER(:catalog);
 
-USE CATALOG retail_crm_analytics;
+USE CATALOG IDENTIFIER(:catalog);
 
 CREATE SCHEMA IF NOT EXISTS `00_bronze`;
 CREATE SCHEMA IF NOT EXISTS `01_silver`;
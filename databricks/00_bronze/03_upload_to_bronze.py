@@ -2,6 +2,9 @@
 # Purpose: Load synthetic CSVs from UC Volume into Bronze Delta tables with stable schema.
 # Fixes: DELTA_FAILED_TO_MERGE_FIELDS by enforcing explicit schemas + overwriteSchema.
 
+import os
+import sys
+
 from pyspark.sql import SparkSession
 from pyspark.sql.types import (
     StructType, StructField,
@@ -9,12 +12,18 @@ from pyspark.sql.types import (
 )
 from pyspark.sql.functions import col, to_date, to_timestamp
 
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.markets import get_catalog  # noqa: E402
+
 spark = SparkSession.builder.getOrCreate()
 
 # =======================
 # CONFIG
 # =======================
-CATALOG = "retail_crm_analytics"
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
 BRONZE_SCHEMA = "00_bronze"
 
 # UC Volume folder where CSVs are placed
@@ -126,9 +135,7 @@ def optional_drop_table(table_fqn: str):
 # EXECUTION
 # =======================
 
-spark.sql(f"USE CATALOG `{CATALOG}`")
-spark.sql(f"USE `{CATALOG}`.`{BRONZE_SCHEMA}`")
-
+# No USE CATALOG: table names are fully qualified, so markets can share one session (run_markets.py)
 for key, meta in files_and_tables.items():
     csv_path = meta["csv"]
     table_fqn = meta["table"]
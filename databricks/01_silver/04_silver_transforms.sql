@@ -1,5 +1,5 @@
 -- file: 04_silver_transforms.sql
-USE CATALOG retail_crm_analytics;
+USE CATALOG IDENTIFIER(:catalog);
 
 -- ====== SILVER: dimensions ======
 CREATE OR REPLACE TABLE `01_silver`.dim_customer AS
@@ -55,6 +55,60 @@ SELECT
 FROM `01_silver`.fact_crm_exposure e
 GROUP BY e.customer_id, e.month_id;
 
+-- ====== CONTACT PRESSURE AT ANCHOR ======
+-- Exposures received in the trailing 7 / 30 / 90 days (anchor day included), counted with
+-- RANGE window frames over each customer's exposures sorted by day: one sorted pass, no self-join.
+-- Bands: High   = 2+ exposures in 7 days or 4+ in 30 days
+--        Medium = 2+ exposures in 30 days or 3+ in 90 days
+--        Low    = otherwise
+CREATE OR REPLACE TABLE `01_silver`.customer_month_contact_pressure AS
+WITH exposure_days AS (
+  SELECT
+    customer_id,
+    month_id,
+    exposure_date,
+    DATEDIFF(exposure_date, DATE'1970-01-01') AS day_num
+  FROM `01_silver`.fact_crm_exposure
+),
+trailing_counts AS (
+  SELECT
+    customer_id,
+    month_id,
+    exposure_date,
+    COUNT(*) OVER (PARTITION BY customer_id ORDER BY day_num RANGE BETWEEN 6 PRECEDING AND CURRENT ROW)  AS exposures_7d,
+    COUNT(*) OVER (PARTITION BY customer_id ORDER BY day_num RANGE BETWEEN 29 PRECEDING AND CURRENT ROW) AS exposures_30d,
+    COUNT(*) OVER (PARTITION BY customer_id ORDER BY day_num RANGE BETWEEN 89 PRECEDING AND CURRENT ROW) AS exposures_90d
+  FROM exposure_days
+),
+at_anchor AS (
+  SELECT
+    t.customer_id,
+    t.month_id,
+    a.anchor_exposure_date,
+    MAX(t.exposures_7d)  AS exposures_7d,
+    MAX(t.exposures_30d) AS exposures_30d,
+    MAX(t.exposures_90d) AS exposures_90d
+  FROM trailing_counts t
+  JOIN `01_silver`.customer_month_exposure_anchor a
+    ON a.customer_id = t.customer_id
+   AND a.month_id = t.month_id
+   AND a.anchor_exposure_date = t.exposure_date
+  GROUP BY t.customer_id, t.month_id, a.anchor_exposure_date
+)
+SELECT
+  customer_id,
+  month_id,
+  anchor_exposure_date,
+  exposures_7d,
+  exposures_30d,
+  exposures_90d,
+  CASE
+    WHEN exposures_7d >= 2 OR exposures_30d >= 4 THEN 'High'
+    WHEN exposures_30d >= 2 OR exposures_90d >= 3 THEN 'Medium'
+    ELSE 'Low'
+  END AS contact_pressure_band
+FROM at_anchor;
+
 -- ====== PRE/POST WINDOW AGGREGATIONS ======
 -- Baseline window = 28 days before anchor exposure
 -- Post window = 7 days starting from anchor exposure
@@ -114,3 +168,221 @@ SELECT
 FROM anchors a
 LEFT JOIN pre_agg p  ON p.customer_id = a.customer_id AND p.month_id = a.month_id
 LEFT JOIN post_agg s ON s.customer_id = a.customer_id AND s.month_id = a.month_id;
+
+-- ====== MATCHED-CONTROL CANDIDATES (unexposed customer-months) ======
+-- Each customer-month without a CRM exposure gets a pseudo-anchor drawn deterministically
+-- from that month's distribution of real anchor dates (hash of customer_id, month_id picks
+-- a rank). Controls therefore have PRE/POST windows with the same timing mix as exposed rows.
+-- Used by 02_gold/08_matched_control_did.py.
+CREATE OR REPLACE TABLE `01_silver`.customer_month_control_anchor AS
+WITH ranked_anchors AS (
+  SELECT
+    month_id,
+    anchor_exposure_date,
+    ROW_NUMBER() OVER (PARTITION BY month_id ORDER BY anchor_exposure_date, customer_id) - 1 AS anchor_rank,
+    COUNT(*) OVER (PARTITION BY month_id) AS month_anchors
+  FROM `01_silver`.customer_month_exposure_anchor
+),
+months AS (
+  SELECT month_id, MAX(month_anchors) AS month_anchors
+  FROM ranked_anchors
+  GROUP BY month_id
+),
+unexposed AS (
+  SELECT c.customer_id, m.month_id, m.month_anchors
+  FROM `01_silver`.dim_customer c
+  CROSS JOIN months m
+  LEFT ANTI JOIN `01_silver`.customer_month_exposure_anchor a
+    ON a.customer_id = c.customer_id
+   AND a.month_id = m.month_id
+)
+SELECT
+  u.customer_id,
+  u.month_id,
+  r.anchor_exposure_date AS pseudo_anchor_date
+FROM unexposed u
+JOIN ranked_anchors r
+  ON r.month_id = u.month_id
+ AND r.anchor_rank = PMOD(HASH(u.customer_id, u.month_id), u.month_anchors);
+
+-- Same 28-day PRE / 7-day POST windows as customer_month_pre_post, around the pseudo-anchor.
+-- One range join over the combined PRE+POST span, split with conditional aggregation.
+CREATE OR REPLACE TABLE `01_silver`.customer_month_control_pre_post AS
+WITH anchors AS (
+  SELECT
+    customer_id,
+    month_id,
+    pseudo_anchor_date,
+    DATE_SUB(pseudo_anchor_date, 28) AS pre_start,
+    DATE_SUB(pseudo_anchor_date, 1)  AS pre_end,
+    pseudo_anchor_date               AS post_start,
+    DATE_ADD(pseudo_anchor_date, 6)  AS post_end
+  FROM `01_silver`.customer_month_control_anchor
+)
+SELECT
+  a.customer_id,
+  a.month_id,
+  a.pseudo_anchor_date,
+  a.pre_start, a.pre_end,
+  a.post_start, a.post_end,
+
+  COUNT(DISTINCT CASE WHEN t.transaction_date <= a.pre_end THEN t.transaction_id END)    AS pre_txn_cnt,
+  COALESCE(SUM(CASE WHEN t.transaction_date <= a.pre_end THEN t.revenue END), 0.0)       AS pre_revenue,
+  COUNT(DISTINCT CASE WHEN t.transaction_date <= a.pre_end THEN t.transaction_date END)  AS pre_active_days,
+
+  COUNT(DISTINCT CASE WHEN t.transaction_date >= a.post_start THEN t.transaction_id END)   AS post_txn_cnt,
+  COALESCE(SUM(CASE WHEN t.transaction_date >= a.post_start THEN t.revenue END), 0.0)      AS post_revenue,
+  COUNT(DISTINCT CASE WHEN t.transaction_date >= a.post_start THEN t.transaction_date END) AS post_active_days
+
+FROM anchors a
+LEFT JOIN `01_silver`.fact_transaction t
+  ON t.customer_id = a.customer_id
+ AND t.transaction_date BETWEEN a.pre_start AND a.post_end
+GROUP BY
+  a.customer_id, a.month_id, a.pseudo_anchor_date,
+  a.pre_start, a.pre_end, a.post_start, a.post_end;
+
+-- ====== DAILY SEASONALITY BASELINE ======
+-- Daily revenue / transactions per customer among customers NOT exposed in the trailing
+-- 7 days (the POST window length), by is_active x is_high_value segment.
+-- Exposure coverage is built as merged [exposure_date, exposure_date + 6] islands per customer;
+-- the number of covered customers per day is a running sum of +1/-1 island boundaries,
+-- so no customer x day grid is materialized.
+CREATE OR REPLACE TABLE `01_silver`.daily_seasonality_baseline AS
+WITH exposure_days AS (
+  SELECT DISTINCT customer_id, exposure_date
+  FROM `01_silver`.fact_crm_exposure
+),
+island_flags AS (
+  SELECT
+    customer_id,
+    exposure_date,
+    CASE
+      WHEN LAG(exposure_date) OVER (PARTITION BY customer_id ORDER BY exposure_date) IS NULL THEN 1
+      WHEN DATEDIFF(exposure_date, LAG(exposure_date) OVER (PARTITION BY customer_id ORDER BY exposure_date)) > 7 THEN 1
+      ELSE 0
+    END AS is_new_island
+  FROM exposure_days
+),
+islands AS (
+  SELECT
+    customer_id,
+    MIN(exposure_date)              AS covered_start,
+    DATE_ADD(MAX(exposure_date), 6) AS covered_end
+  FROM (
+    SELECT
+      customer_id,
+      exposure_date,
+      SUM(is_new_island) OVER (PARTITION BY customer_id ORDER BY exposure_date
+                               ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS island_id
+    FROM island_flags
+  ) x
+  GROUP BY customer_id, island_id
+),
+segment_size AS (
+  SELECT is_active, is_high_value, COUNT(*) AS customers
+  FROM `01_silver`.dim_customer
+  GROUP BY is_active, is_high_value
+),
+coverage_deltas AS (
+  SELECT c.is_active, c.is_high_value, i.covered_start AS date, 1 AS delta
+  FROM islands i JOIN `01_silver`.dim_customer c ON c.customer_id = i.customer_id
+  UNION ALL
+  SELECT c.is_active, c.is_high_value, DATE_ADD(i.covered_end, 1) AS date, -1 AS delta
+  FROM islands i JOIN `01_silver`.dim_customer c ON c.customer_id = i.customer_id
+),
+days_by_segment AS (
+  SELECT d.date, s.is_active, s.is_high_value, s.customers
+  FROM `01_silver`.dim_date d
+  CROSS JOIN segment_size s
+),
+covered AS (
+  SELECT
+    g.date,
+    g.is_active,
+    g.is_high_value,
+    g.customers,
+    SUM(COALESCE(cd.delta, 0)) OVER (PARTITION BY g.is_active, g.is_high_value ORDER BY g.date
+                                     ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS covered_customers
+  FROM days_by_segment g
+  LEFT JOIN (
+    SELECT is_active, is_high_value, date, SUM(delta) AS delta
+    FROM coverage_deltas
+    GROUP BY is_active, is_high_value, date
+  ) cd
+    ON cd.is_active = g.is_active
+   AND cd.is_high_value = g.is_high_value
+   AND cd.date = g.date
+),
+baseline_tx AS (
+  SELECT
+    t.transaction_date AS date,
+    c.is_active,
+    c.is_high_value,
+    COUNT(DISTINCT t.transaction_id) AS baseline_txn_cnt,
+    SUM(t.revenue)                   AS baseline_revenue
+  FROM `01_silver`.fact_transaction t
+  JOIN `01_silver`.dim_customer c
+    ON c.customer_id = t.customer_id
+  LEFT ANTI JOIN islands i
+    ON i.customer_id = t.customer_id
+   AND t.transaction_date BETWEEN i.covered_start AND i.covered_end
+  GROUP BY t.transaction_date, c.is_active, c.is_high_value
+)
+SELECT
+  v.date,
+  v.is_active,
+  v.is_high_value,
+  v.customers - v.covered_customers AS baseline_customers,
+  COALESCE(b.baseline_revenue, 0.0) AS baseline_revenue,
+  COALESCE(b.baseline_txn_cnt, 0)   AS baseline_txn_cnt
+FROM covered v
+LEFT JOIN baseline_tx b
+  ON b.date = v.date
+ AND b.is_active = v.is_active
+ AND b.is_high_value = v.is_high_value;
+
+-- ====== EXPECTED SEASONAL RATIO PER ANCHOR DATE ======
+-- For every possible anchor date (and segment): baseline per-customer daily rate in the
+-- 7-day POST window divided by the rate in the 28-day PRE window. One pass of sliding
+-- window frames over the daily table covers every (PRE, POST) window pair at once.
+-- Ratios are NULL where a window falls outside the date range (Gold then falls back to 1.0).
+CREATE OR REPLACE TABLE `01_silver`.seasonal_ratio_by_anchor AS
+WITH framed AS (
+  SELECT
+    date AS anchor_date,
+    is_active,
+    is_high_value,
+    SUM(baseline_revenue)   OVER w_pre  AS pre_revenue,
+    SUM(baseline_txn_cnt)   OVER w_pre  AS pre_txn_cnt,
+    SUM(baseline_customers) OVER w_pre  AS pre_customer_days,
+    COUNT(*)                OVER w_pre  AS pre_days_available,
+    SUM(baseline_revenue)   OVER w_post AS post_revenue,
+    SUM(baseline_txn_cnt)   OVER w_post AS post_txn_cnt,
+    SUM(baseline_customers) OVER w_post AS post_customer_days,
+    COUNT(*)                OVER w_post AS post_days_available
+  FROM `01_silver`.daily_seasonality_baseline
+  WINDOW
+    w_pre  AS (PARTITION BY is_active, is_high_value ORDER BY date ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING),
+    w_post AS (PARTITION BY is_active, is_high_value ORDER BY date ROWS BETWEEN CURRENT ROW AND 6 FOLLOWING)
+),
+rates AS (
+  SELECT
+    *,
+    CASE WHEN pre_days_available = 28 AND pre_customer_days > 0 THEN pre_revenue / pre_customer_days END   AS pre_rev_rate,
+    CASE WHEN post_days_available = 7 AND post_customer_days > 0 THEN post_revenue / post_customer_days END AS post_rev_rate,
+    CASE WHEN pre_days_available = 28 AND pre_customer_days > 0 THEN pre_txn_cnt / pre_customer_days END   AS pre_txn_rate,
+    CASE WHEN post_days_available = 7 AND post_customer_days > 0 THEN post_txn_cnt / post_customer_days END AS post_txn_rate
+  FROM framed
+)
+SELECT
+  anchor_date,
+  is_active,
+  is_high_value,
+  pre_rev_rate  AS baseline_pre_rev_per_customer_day,
+  post_rev_rate AS baseline_post_rev_per_customer_day,
+  pre_txn_rate  AS baseline_pre_txn_per_customer_day,
+  post_txn_rate AS baseline_post_txn_per_customer_day,
+  CASE WHEN pre_rev_rate > 0 THEN post_rev_rate / pre_rev_rate END AS seasonal_ratio_revenue,
+  CASE WHEN pre_txn_rate > 0 THEN post_txn_rate / pre_txn_rate END AS seasonal_ratio_transactions
+FROM rates;
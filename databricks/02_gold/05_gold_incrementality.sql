@@ -1,7 +1,7 @@
 -- file: 05_gold_incrementality.sql
 -- Purpose: Build Gold incrementality + robust RFM that tolerates month_id formats (yyyyMM or yyyyMMdd)
 
-USE CATALOG retail_crm_analytics;
+USE CATALOG IDENTIFIER(:catalog);
 
 -- =========================================================
 -- 1) FACT: customer-month incrementality (no changes needed)
@@ -26,11 +26,27 @@ WITH base AS (
     x.post_revenue,
     x.post_active_days,
 
+    /* expected POST/PRE ratio for unexposed customers in the same segment (1.0 when unavailable) */
+    COALESCE(sr.seasonal_ratio_revenue, 1.0)      AS seasonal_ratio_revenue,
+    COALESCE(sr.seasonal_ratio_transactions, 1.0) AS seasonal_ratio_transactions,
+
+    cp.exposures_7d,
+    cp.exposures_30d,
+    cp.exposures_90d,
+    cp.contact_pressure_band,
+
     28 AS pre_days,
     7  AS post_days
   FROM `01_silver`.customer_month_pre_post x
   JOIN `01_silver`.dim_customer c
     ON c.customer_id = x.customer_id
+  LEFT JOIN `01_silver`.seasonal_ratio_by_anchor sr
+    ON sr.anchor_date = x.anchor_exposure_date
+   AND sr.is_active = c.is_active
+   AND sr.is_high_value = c.is_high_value
+  LEFT JOIN `01_silver`.customer_month_contact_pressure cp
+    ON cp.customer_id = x.customer_id
+   AND cp.month_id = x.month_id
 ),
 month_norm AS (
   SELECT
@@ -78,6 +94,11 @@ SELECT
   is_active,
   is_high_value,
 
+  exposures_7d,
+  exposures_30d,
+  exposures_90d,
+  contact_pressure_band,
+
   pre_txn_cnt,
   pre_revenue,
   pre_active_days,
@@ -97,7 +118,13 @@ SELECT
   (post_rev_per_day - pre_rev_per_day) * 7 AS incremental_revenue,
   (post_txn_per_day - pre_txn_per_day) * 7 AS incremental_transactions,
   (post_freq - pre_freq) * 7              AS incremental_freq_points,
-  (post_aov - pre_aov)                    AS delta_aov
+  (post_aov - pre_aov)                    AS delta_aov,
+
+  /* de-seasonalized lift: POST vs the PRE rate scaled by the segment's expected seasonal ratio */
+  seasonal_ratio_revenue,
+  seasonal_ratio_transactions,
+  (post_rev_per_day - pre_rev_per_day * seasonal_ratio_revenue) * 7      AS seasonal_adj_incremental_revenue,
+  (post_txn_per_day - pre_txn_per_day * seasonal_ratio_transactions) * 7 AS seasonal_adj_incremental_transactions
 FROM kpis;
 
 -- =========================================================
@@ -202,7 +229,9 @@ SELECT
   COUNT(DISTINCT customer_id) AS exposed_customer_months,
   SUM(incremental_revenue) AS incremental_revenue,
   SUM(incremental_transactions) AS incremental_transactions,
-  AVG(delta_aov) AS avg_delta_aov
+  AVG(delta_aov) AS avg_delta_aov,
+  SUM(seasonal_adj_incremental_revenue) AS seasonal_adj_incremental_revenue,
+  SUM(seasonal_adj_incremental_transactions) AS seasonal_adj_incremental_transactions
 FROM `02_gold`.fact_customer_month_incrementality
 GROUP BY month_key_yyyymm;
 
@@ -213,7 +242,9 @@ SELECT
   COUNT(DISTINCT f.customer_id) AS customers,
   SUM(f.incremental_revenue) AS incremental_revenue,
   SUM(f.incremental_transactions) AS incremental_transactions,
-  AVG(f.delta_aov) AS avg_delta_aov
+  AVG(f.delta_aov) AS avg_delta_aov,
+  SUM(f.seasonal_adj_incremental_revenue) AS seasonal_adj_incremental_revenue,
+  SUM(f.seasonal_adj_incremental_transactions) AS seasonal_adj_incremental_transactions
 FROM `02_gold`.fact_customer_month_incrementality f
 LEFT JOIN `02_gold`.dim_customer_month_rfm r
   ON r.customer_id = f.customer_id
@@ -228,6 +259,88 @@ SELECT
   COUNT(DISTINCT customer_id) AS customers,
   SUM(incremental_revenue) AS incremental_revenue,
   SUM(incremental_transactions) AS incremental_transactions,
-  AVG(delta_aov) AS avg_delta_aov
+  AVG(delta_aov) AS avg_delta_aov,
+  SUM(seasonal_adj_incremental_revenue) AS seasonal_adj_incremental_revenue,
+  SUM(seasonal_adj_incremental_transactions) AS seasonal_adj_incremental_transactions
 FROM `02_gold`.fact_customer_month_incrementality
 GROUP BY month_key_yyyymm, is_active, is_high_value;
+
+CREATE OR REPLACE TABLE `02_gold`.agg_incrementality_contact_pressure AS
+SELECT
+  month_key_yyyymm AS month_id,
+  contact_pressure_band,
+  COUNT(DISTINCT customer_id) AS customers,
+  AVG(exposures_30d) AS avg_exposures_30d,
+  SUM(incremental_revenue) AS incremental_revenue,
+  SUM(incremental_transactions) AS incremental_transactions,
+  AVG(delta_aov) AS avg_delta_aov,
+  SUM(seasonal_adj_incremental_revenue) AS seasonal_adj_incremental_revenue
+FROM `02_gold`.fact_customer_month_incrementality
+GROUP BY month_key_yyyymm, contact_pressure_band;
+
+-- =========================================================
+-- 4) RESPONSE DECAY: revenue / transactions by day offset from the anchor (-28 .. +28)
+--    One range join + one aggregation keyed by DATEDIFF(transaction_date, anchor);
+--    baseline = sum of each customer's own PRE daily rate (flat across offsets).
+-- =========================================================
+
+CREATE OR REPLACE TABLE `02_gold`.agg_response_decay AS
+WITH anchors AS (
+  SELECT
+    customer_id,
+    month_key_yyyymm,
+    anchor_exposure_date,
+    is_active,
+    is_high_value,
+    pre_rev_per_day,
+    pre_txn_per_day
+  FROM `02_gold`.fact_customer_month_incrementality
+),
+group_baseline AS (
+  SELECT
+    month_key_yyyymm,
+    is_active,
+    is_high_value,
+    COUNT(*)             AS customer_months,
+    SUM(pre_rev_per_day) AS baseline_revenue,
+    SUM(pre_txn_per_day) AS baseline_transactions
+  FROM anchors
+  GROUP BY month_key_yyyymm, is_active, is_high_value
+),
+by_offset AS (
+  SELECT
+    a.month_key_yyyymm,
+    a.is_active,
+    a.is_high_value,
+    DATEDIFF(t.transaction_date, a.anchor_exposure_date) AS day_offset,
+    SUM(t.revenue)             AS revenue,
+    COUNT(t.transaction_id)    AS transactions
+  FROM anchors a
+  JOIN `01_silver`.fact_transaction t
+    ON t.customer_id = a.customer_id
+   AND t.transaction_date BETWEEN DATE_SUB(a.anchor_exposure_date, 28) AND DATE_ADD(a.anchor_exposure_date, 28)
+  GROUP BY a.month_key_yyyymm, a.is_active, a.is_high_value,
+           DATEDIFF(t.transaction_date, a.anchor_exposure_date)
+),
+offsets AS (
+  SELECT EXPLODE(SEQUENCE(-28, 28)) AS day_offset
+)
+SELECT
+  b.month_key_yyyymm AS month_id,
+  b.is_active,
+  b.is_high_value,
+  o.day_offset,
+  b.customer_months,
+  COALESCE(d.revenue, 0.0) AS revenue,
+  COALESCE(d.transactions, 0) AS transactions,
+  b.baseline_revenue,
+  b.baseline_transactions,
+  COALESCE(d.revenue, 0.0) - b.baseline_revenue AS excess_revenue,
+  COALESCE(d.transactions, 0) - b.baseline_transactions AS excess_transactions
+FROM group_baseline b
+CROSS JOIN offsets o
+LEFT JOIN by_offset d
+  ON d.month_key_yyyymm <=> b.month_key_yyyymm
+ AND d.is_active = b.is_active
+ AND d.is_high_value = b.is_high_value
+ AND d.day_offset = o.day_offset;
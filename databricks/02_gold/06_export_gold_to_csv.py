@@ -1,18 +1,34 @@
 # file: 06_export_gold_to_csv.py
 # Purpose: Export Gold tables to SINGLE CSV FILES (not folders) in a Databricks UC Volume path.
 # Strategy: write temp folder with coalesce(1) -> rename part file -> cleanup temp.
+# EXPORT_MODE = "star" exports only the Power BI star schema (12_gold_star_schema.sql).
+# Only the baseline TABLES are required; tables of optional stages (OPTIONAL_TABLES, star schema in
+# "all" mode) are exported when they exist and skipped with a notice otherwise.
+# EXPORT_MODE = "all" also writes executive_snapshot.json (crm_engine/snapshot.py): the KPI cards,
+# chart series and narrative inputs of Streamlit pages 1-3 for every month, so they render without the CSVs.
 
-from pyspark.sql import SparkSession
+import os
 import re
+import sys
+
+from pyspark.sql import SparkSession
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.markets import get_catalog  # noqa: E402
+from crm_engine.snapshot import write_snapshot  # noqa: E402
 
 spark = SparkSession.builder.getOrCreate()
 
-CATALOG = "retail_crm_analytics"
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
 GOLD_SCHEMA = f"{CATALOG}.02_gold"
 
 # UC Volume export directory (must exist + you must have write perms)
 EXPORT_DIR = f"/Volumes/{CATALOG}/02_gold/vol_export"
 
+# Baseline exports: the export fails if one is missing
 TABLES = [
     "fact_customer_month_incrementality",
     "dim_customer_month_rfm",
@@ -21,6 +37,25 @@ TABLES = [
     "agg_incrementality_active_value",
 ]
 
+# Exports of optional / later stages -> script that creates them; skipped with a notice when absent
+OPTIONAL_TABLES = {
+    "agg_incrementality_campaign_channel": "02_gold/09_exposure_attribution.py",
+    "agg_incrementality_contact_pressure": "02_gold/05_gold_incrementality.sql",
+    "agg_response_decay": "02_gold/05_gold_incrementality.sql",
+    "customer_uplift_scores": "02_gold/13_uplift_scoring.py",
+}
+
+# Aggregated star schema for the Power BI model (month x segment x active x value, integer keys);
+# required in "star" mode, optional in "all" mode
+STAR_SCHEMA_TABLES = [
+    "dim_month",
+    "dim_segment",
+    "fact_incrementality_agg",
+]
+STAR_SCHEMA_SCRIPT = "02_gold/12_gold_star_schema.sql"
+
+EXPORT_MODE = "all"   # "all" = TABLES + existing optional tables + star schema, "star" = star schema only
+
 def rm_if_exists(path: str):
     try:
         dbutils.fs.rm(path, True)
@@ -65,14 +100,36 @@ def export_table_as_single_csv(table_fqn: str, export_dir: str, out_filename: st
 
 print(f"Export directory: {EXPORT_DIR}")
 
+if EXPORT_MODE not in ("all", "star"):
+    raise ValueError(f"EXPORT_MODE must be 'all' or 'star', got {EXPORT_MODE!r}")
+# (table, script that creates it when optional / None when required)
+if EXPORT_MODE == "star":
+    export_tables = [(t, None) for t in STAR_SCHEMA_TABLES]
+else:
+    export_tables = ([(t, None) for t in TABLES] + list(OPTIONAL_TABLES.items())
+                     + [(t, STAR_SCHEMA_SCRIPT) for t in STAR_SCHEMA_TABLES])
+
 exported = []
-for t in TABLES:
+skipped = []
+for t, producer in export_tables:
     table_fqn = f"{GOLD_SCHEMA}.{t}"
+    if producer is not None and not spark.catalog.tableExists(table_fqn):
+        skipped.append(t)
+        print(f"SKIP: {table_fqn} does not exist (created by {producer})")
+        continue
     out_name = f"{t}.csv"
     final_file = export_table_as_single_csv(table_fqn, EXPORT_DIR, out_name)
     exported.append(final_file)
     print(f"OK: {table_fqn} -> {final_file}")
 
+# UC Volumes are mounted on the driver's local filesystem, so the snapshot reads the CSVs just exported
+if EXPORT_MODE == "all":
+    snapshot_file = write_snapshot(EXPORT_DIR)
+    exported.append(snapshot_file)
+    print(f"OK: executive snapshot -> {snapshot_file}")
+
 print("\nDone. Exported files:")
 for p in exported:
     print(" -", p)
+if skipped:
+    print(f"Skipped (optional stage not run): {', '.join(skipped)}")
@@ -0,0 +1,162 @@
+# file: 07_bootstrap_confidence_intervals.py
+# Purpose: Add Poisson-bootstrap confidence intervals to the Gold incrementality aggregates.
+# Input : 02_gold.fact_customer_month_incrementality (+ dim_customer_month_rfm for segments)
+# Output: CI columns appended to agg_incrementality_month / _rfm / _active_value (exported by 06)
+# Run after 05_gold_incrementality.sql and before 06_export_gold_to_csv.py.
+#
+# The fact rows are staged as Parquet and streamed to the process pool in fixed-size chunks, so the
+# driver never holds the customer-grain fact (only the fine group key table and the replicate sums).
+
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+from pyspark.sql import SparkSession
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.bootstrap import (  # noqa: E402
+    encode_groups,
+    group_codes,
+    poisson_bootstrap_chunks,
+    rollup_replicates,
+    percentile_ci,
+)
+from crm_engine.markets import get_catalog, get_workers  # noqa: E402
+from crm_engine.uplift import iter_feature_batches  # noqa: E402
+
+spark = SparkSession.builder.getOrCreate()
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+GOLD_SCHEMA = "02_gold"
+WORK_DIR = f"/Volumes/{CATALOG}/02_gold/vol_export/_bootstrap"   # staged fact rows (driver-local file API)
+
+N_REPLICATES = 1000
+ALPHA = 0.05               # 95% intervals
+SEED = 42
+CHUNK_ROWS = 50_000        # rows per bootstrap task (bounds worker memory)
+WORKERS = get_workers()    # job parameter "workers" (run_markets.py: per-market share); None = driver cores - 1
+
+# metric columns fed to the bootstrap (the trailing "rows" column gives the weighted row count)
+METRICS = ["incremental_revenue", "incremental_transactions", "delta_aov"]
+
+# aggregate table -> grouping keys (must match 05_gold_incrementality.sql)
+AGGREGATES = {
+    "agg_incrementality_month": ["month_id"],
+    "agg_incrementality_rfm": ["month_id", "rfm_segment"],
+    "agg_incrementality_active_value": ["month_id", "is_active", "is_high_value"],
+}
+FINE_KEYS = ["month_id", "rfm_segment", "is_active", "is_high_value"]
+
+CI_COLUMNS = [
+    "incremental_revenue_ci_low", "incremental_revenue_ci_high",
+    "incremental_transactions_ci_low", "incremental_transactions_ci_high",
+    "avg_delta_aov_ci_low", "avg_delta_aov_ci_high",
+    "incremental_revenue_ci_excludes_zero",
+    "bootstrap_replicates",
+]
+
+
+def tbl(name: str) -> str:
+    return f"`{CATALOG}`.`{GOLD_SCHEMA}`.`{name}`"
+
+
+# =======================
+# STAGE (only the columns the bootstrap needs, deterministic order so chunk seeds are stable)
+# =======================
+fact_sdf = spark.sql(f"""
+    SELECT
+      f.month_key_yyyymm AS month_id,
+      r.rfm_segment,
+      f.is_active,
+      f.is_high_value,
+      CAST(f.incremental_revenue AS DOUBLE)      AS incremental_revenue,
+      CAST(f.incremental_transactions AS DOUBLE) AS incremental_transactions,
+      CAST(f.delta_aov AS DOUBLE)                AS delta_aov
+    FROM {tbl('fact_customer_month_incrementality')} f
+    LEFT JOIN {tbl('dim_customer_month_rfm')} r
+      ON r.customer_id = f.customer_id
+     AND r.month_id = f.month_id
+    ORDER BY f.month_key_yyyymm, f.customer_id
+""")
+input_dir = os.path.join(WORK_DIR, "fact")
+shutil.rmtree(WORK_DIR, ignore_errors=True)
+fact_sdf.write.mode("overwrite").parquet(input_dir)
+
+# fine group key table (small): same codes as encoding the full fact at once
+_, fine_keys = encode_groups(spark.read.parquet(input_dir).select(*FINE_KEYS).distinct().toPandas(), FINE_KEYS)
+
+
+def bootstrap_chunks():
+    for batch in iter_feature_batches(input_dir, CHUNK_ROWS):
+        pdf = batch.to_pandas()
+        X = np.column_stack([pdf[c].fillna(0.0).to_numpy(dtype=np.float64) for c in METRICS]
+                            + [np.ones(len(pdf))])
+        yield group_codes(pdf, fine_keys, FINE_KEYS), X
+
+
+# =======================
+# BOOTSTRAP at the finest grain, then roll up per aggregate
+# =======================
+replicates = poisson_bootstrap_chunks(
+    bootstrap_chunks(), n_groups=len(fine_keys), n_metrics=len(METRICS) + 1,
+    n_replicates=N_REPLICATES, seed=SEED, workers=WORKERS,
+)
+shutil.rmtree(WORK_DIR, ignore_errors=True)
+print(f"Bootstrap done: {len(fine_keys):,} fine groups x {N_REPLICATES} replicates")
+
+
+def ci_frame(keys: list[str]) -> pd.DataFrame:
+    key_df, reps = rollup_replicates(fine_keys, replicates, keys)
+    rev, txn, aov_sum, n_rows = reps[:, 0, :], reps[:, 1, :], reps[:, 2, :], reps[:, 3, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        aov_mean = np.where(n_rows > 0, aov_sum / n_rows, np.nan)
+
+    out = key_df.copy()
+    out["incremental_revenue_ci_low"], out["incremental_revenue_ci_high"] = percentile_ci(rev, ALPHA)
+    out["incremental_transactions_ci_low"], out["incremental_transactions_ci_high"] = percentile_ci(txn, ALPHA)
+    out["avg_delta_aov_ci_low"], out["avg_delta_aov_ci_high"] = percentile_ci(aov_mean, ALPHA)
+    out["incremental_revenue_ci_excludes_zero"] = (
+        (out["incremental_revenue_ci_low"] > 0) | (out["incremental_revenue_ci_high"] < 0)
+    )
+    out["bootstrap_replicates"] = N_REPLICATES
+    # pandas NaN -> None so Spark keeps NULL segment keys as NULL
+    return out.astype(object).where(out.notna(), None)
+
+
+# =======================
+# WRITE: append CI columns to each aggregate (re-runnable: old CI columns are dropped first)
+# =======================
+for agg_name, keys in AGGREGATES.items():
+    ci_pdf = ci_frame(keys)
+    agg = spark.table(tbl(agg_name))
+    agg = agg.drop(*[c for c in CI_COLUMNS if c in agg.columns])
+
+    ci = spark.createDataFrame(ci_pdf)
+    for k in keys:
+        ci = ci.withColumn(k, ci[k].cast(agg.schema[k].dataType))
+    ci = ci.select(*[ci[k].alias(f"_ci_{k}") for k in keys], *CI_COLUMNS)
+
+    cond = [agg[k].eqNullSafe(ci[f"_ci_{k}"]) for k in keys]
+    joined = agg.join(ci, cond, "left").drop(*[f"_ci_{k}" for k in keys])
+
+    # Materialize before overwriting the table we read from
+    joined = joined.localCheckpoint(eager=True)
+    (
+        joined.write
+        .format("delta")
+        .mode("overwrite")
+        .option("overwriteSchema", "true")
+        .saveAsTable(tbl(agg_name))
+    )
+    print(f"OK: {agg_name} <- {len(ci_pdf):,} CI rows")
+
+print("\nBootstrap confidence intervals written.")
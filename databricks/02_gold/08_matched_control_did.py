@@ -0,0 +1,152 @@
+# file: 08_matched_control_did.py
+# Purpose: Matched-control difference-in-differences (DiD) baseline for every exposed customer-month.
+# Input : 02_gold.fact_customer_month_incrementality (exposed rows)
+#         01_silver.customer_month_control_pre_post (unexposed customer-months, pseudo-anchored)
+#         01_silver.dim_customer (value_score, activity_score, is_active, is_high_value)
+# Output: DiD + match diagnostic columns appended to 02_gold.fact_customer_month_incrementality
+# Run after 05_gold_incrementality.sql and before 06_export_gold_to_csv.py.
+#
+# Pre/post lift (incremental_revenue) attributes any seasonal or trend movement to the campaign.
+# Here each exposed customer-month is paired with its k nearest unexposed customers in the same
+# month / active / high-value / anchor-week stratum (closest in PRE behaviour + scores), and the
+# controls' own post-minus-pre change is subtracted.
+
+import os
+import sys
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.matching import (  # noqa: E402
+    DEFAULT_CHUNK_ROWS,
+    DID_COLUMNS,
+    DID_SCHEMA,
+    STRATA,
+    did_for_stratum,
+    feature_stats,
+)
+from crm_engine.markets import get_catalog  # noqa: E402
+
+spark = SparkSession.builder.getOrCreate()
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+SILVER_SCHEMA = "01_silver"
+GOLD_SCHEMA = "02_gold"
+
+K_CONTROLS = 5
+BIN_WIDTH = 0.75           # feature bucket width in standard deviations (smaller = stricter buckets)
+PRE_DAYS = 28
+POST_DAYS = 7
+CHUNK_ROWS = DEFAULT_CHUNK_ROWS   # exposed rows per re-ranking chunk inside a stratum task
+
+FACT_TABLE = "fact_customer_month_incrementality"
+
+
+def tbl(schema: str, name: str) -> str:
+    return f"`{CATALOG}`.`{schema}`.`{name}`"
+
+
+# =======================
+# LOAD (only the columns matching needs; exposed and control rows in one frame, never collected)
+# =======================
+rows = spark.sql(f"""
+    WITH candidates AS (
+      SELECT
+        f.customer_id, f.month_id, f.anchor_exposure_date AS anchor_date, 1 AS is_exposed,
+        CAST(f.is_active AS INT) AS is_active, CAST(f.is_high_value AS INT) AS is_high_value,
+        CAST(c.value_score AS DOUBLE)     AS value_score,
+        CAST(c.activity_score AS DOUBLE)  AS activity_score,
+        CAST(f.pre_revenue AS DOUBLE)     AS pre_revenue,
+        CAST(f.post_revenue AS DOUBLE)    AS post_revenue,
+        CAST(f.pre_txn_cnt AS DOUBLE)     AS pre_txn_cnt,
+        CAST(f.post_txn_cnt AS DOUBLE)    AS post_txn_cnt
+      FROM {tbl(GOLD_SCHEMA, FACT_TABLE)} f
+      JOIN {tbl(SILVER_SCHEMA, 'dim_customer')} c
+        ON c.customer_id = f.customer_id
+      UNION ALL
+      SELECT
+        x.customer_id, x.month_id, x.pseudo_anchor_date AS anchor_date, 0 AS is_exposed,
+        CAST(c.is_active AS INT) AS is_active, CAST(c.is_high_value AS INT) AS is_high_value,
+        CAST(c.value_score AS DOUBLE)     AS value_score,
+        CAST(c.activity_score AS DOUBLE)  AS activity_score,
+        CAST(x.pre_revenue AS DOUBLE)     AS pre_revenue,
+        CAST(x.post_revenue AS DOUBLE)    AS post_revenue,
+        CAST(x.pre_txn_cnt AS DOUBLE)     AS pre_txn_cnt,
+        CAST(x.post_txn_cnt AS DOUBLE)    AS post_txn_cnt
+      FROM {tbl(SILVER_SCHEMA, 'customer_month_control_pre_post')} x
+      JOIN {tbl(SILVER_SCHEMA, 'dim_customer')} c
+        ON c.customer_id = x.customer_id
+    )
+    SELECT
+      *,
+      pre_revenue / {PRE_DAYS}  AS pre_rev_per_day,
+      pre_txn_cnt / {PRE_DAYS}  AS pre_txn_per_day,
+      CAST(FLOOR((DAY(anchor_date) - 1) / 7) AS INT) AS anchor_week
+    FROM candidates
+""")
+
+# =======================
+# MATCH + DiD (one applyInPandas task per stratum; z-scores use the mean/std of all rows)
+# =======================
+stats = feature_stats(rows)
+
+
+def match_stratum(pdf):
+    return did_for_stratum(pdf, stats, k=K_CONTROLS, bin_width=BIN_WIDTH,
+                           pre_days=PRE_DAYS, post_days=POST_DAYS, chunk_rows=CHUNK_ROWS)
+
+
+did = rows.groupBy(*STRATA).applyInPandas(match_stratum, schema=DID_SCHEMA)
+# NaN (rows without controls) -> NULL
+did = did.select("customer_id", "month_id", "matched_controls",
+                 *[F.nanvl(F.col(c), F.lit(None).cast("double")).alias(c) for c in DID_COLUMNS[1:]])
+did = did.localCheckpoint(eager=True)
+
+summary = did.agg(
+    F.count("*").alias("rows"),
+    F.sum(F.when(F.col("matched_controls") == 0, 1).otherwise(0)).alias("unmatched"),
+    F.sum("did_incremental_revenue").alias("did_rev"),
+).first()
+pre_post_rev = rows.where("is_exposed = 1").agg(
+    F.sum((F.col("post_revenue") / POST_DAYS - F.col("pre_revenue") / PRE_DAYS) * POST_DAYS).alias("rev")
+).first()["rev"]
+print(f"Matched {summary['rows'] - summary['unmatched']:,} exposed rows ({summary['unmatched']:,} without any control)")
+print(f"Sum pre/post incremental_revenue: {pre_post_rev or 0.0:,.2f}")
+print(f"Sum DiD incremental_revenue     : {summary['did_rev'] or 0.0:,.2f}")
+
+# =======================
+# WRITE: append DiD columns to the fact (re-runnable: old DiD columns are dropped first)
+# =======================
+fact = spark.table(tbl(GOLD_SCHEMA, FACT_TABLE))
+fact = fact.drop(*[c for c in DID_COLUMNS if c in fact.columns])
+
+did = did.select(
+    did["customer_id"].cast(fact.schema["customer_id"].dataType).alias("_did_customer_id"),
+    did["month_id"].cast(fact.schema["month_id"].dataType).alias("_did_month_id"),
+    did["matched_controls"].cast("int").alias("matched_controls"),
+    *[did[c].cast("double").alias(c) for c in DID_COLUMNS[1:]],
+)
+
+cond = [fact["customer_id"] == did["_did_customer_id"], fact["month_id"].eqNullSafe(did["_did_month_id"])]
+joined = fact.join(did, cond, "left").drop("_did_customer_id", "_did_month_id")
+
+# Materialize before overwriting the table we read from
+joined = joined.localCheckpoint(eager=True)
+(
+    joined.write
+    .format("delta")
+    .mode("overwrite")
+    .option("overwriteSchema", "true")
+    .saveAsTable(tbl(GOLD_SCHEMA, FACT_TABLE))
+)
+print(f"OK: {FACT_TABLE} <- {summary['rows']:,} DiD rows")
+
+print("\nMatched-control DiD baseline written.")
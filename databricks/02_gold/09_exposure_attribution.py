@@ -0,0 +1,164 @@
+# file: 09_exposure_attribution.py
+# Purpose: Per-exposure pre/post attribution and campaign x channel incrementality.
+# Input : 01_silver.fact_crm_exposure (every exposure, incl. campaign_name / message_channel)
+#         01_silver.fact_transaction, 01_silver.dim_customer
+# Output: 02_gold.fact_exposure_attribution        (one row per exposure)
+#         02_gold.agg_incrementality_campaign_channel (month x campaign x channel)
+# Run after 05_gold_incrementality.sql and before 06_export_gold_to_csv.py.
+#
+# customer_month_exposure_anchor keeps only the first exposure per customer-month. Here every
+# exposure gets its own 28-day PRE / 7-day POST window; POST days shared by several exposures of the
+# same customer are split equally between them (see crm_engine/attribution.py), so campaign and
+# channel totals add up without double counting.
+
+import os
+import sys
+
+import pandas as pd
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.attribution import attribute_exposures  # noqa: E402
+from crm_engine.markets import get_catalog  # noqa: E402
+
+spark = SparkSession.builder.getOrCreate()
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+SILVER_SCHEMA = "01_silver"
+GOLD_SCHEMA = "02_gold"
+
+PRE_DAYS = 28
+POST_DAYS = 7
+N_BUCKETS = 64             # customer-hash partitions; each runs the sweep on its own customers
+
+ATTRIBUTION_SCHEMA = """
+    exposure_id BIGINT,
+    customer_id BIGINT,
+    exposure_date DATE,
+    concurrent_exposures INT,
+    effective_post_days DOUBLE,
+    pre_revenue DOUBLE,
+    pre_txn_cnt DOUBLE,
+    attributed_post_revenue DOUBLE,
+    attributed_post_txn_cnt DOUBLE,
+    incremental_revenue DOUBLE,
+    incremental_transactions DOUBLE
+"""
+
+
+def tbl(schema: str, name: str) -> str:
+    return f"`{CATALOG}`.`{schema}`.`{name}`"
+
+
+# =======================
+# INPUTS (bucketed by customer so a bucket holds all rows of its customers)
+# =======================
+exposures = spark.sql(f"""
+    SELECT
+      CAST(exposure_id AS BIGINT) AS exposure_id,
+      CAST(customer_id AS BIGINT) AS customer_id,
+      exposure_date
+    FROM {tbl(SILVER_SCHEMA, 'fact_crm_exposure')}
+""").withColumn("bucket", F.pmod(F.hash("customer_id"), F.lit(N_BUCKETS)))
+
+# Daily transactions, limited to days that can fall in some exposure's PRE/POST span
+daily_tx = spark.sql(f"""
+    WITH span AS (
+      SELECT
+        DATE_SUB(MIN(exposure_date), {PRE_DAYS})     AS span_start,
+        DATE_ADD(MAX(exposure_date), {POST_DAYS - 1}) AS span_end
+      FROM {tbl(SILVER_SCHEMA, 'fact_crm_exposure')}
+    )
+    SELECT
+      CAST(t.customer_id AS BIGINT)    AS customer_id,
+      t.transaction_date,
+      SUM(t.revenue)                   AS revenue,
+      COUNT(DISTINCT t.transaction_id) AS txn_cnt
+    FROM {tbl(SILVER_SCHEMA, 'fact_transaction')} t
+    CROSS JOIN span s
+    WHERE t.transaction_date BETWEEN s.span_start AND s.span_end
+    GROUP BY t.customer_id, t.transaction_date
+""").withColumn("bucket", F.pmod(F.hash("customer_id"), F.lit(N_BUCKETS)))
+
+
+def _attribute_bucket(exp_pdf: pd.DataFrame, tx_pdf: pd.DataFrame) -> pd.DataFrame:
+    return attribute_exposures(exp_pdf, tx_pdf, pre_days=PRE_DAYS, post_days=POST_DAYS)
+
+
+attributed = (
+    exposures.groupBy("bucket")
+    .cogroup(daily_tx.groupBy("bucket"))
+    .applyInPandas(_attribute_bucket, schema=ATTRIBUTION_SCHEMA)
+)
+attributed.createOrReplaceTempView("exposure_attribution_raw")
+
+# =======================
+# FACT: one row per exposure (+ campaign, channel, month, customer segment)
+# =======================
+spark.sql(f"""
+    CREATE OR REPLACE TABLE {tbl(GOLD_SCHEMA, 'fact_exposure_attribution')} AS
+    SELECT
+      a.exposure_id,
+      a.customer_id,
+      e.month_id,
+      CASE
+        WHEN e.month_id IS NULL THEN NULL
+        WHEN CAST(e.month_id AS STRING) RLIKE '^[0-9]{{6}}$' THEN CAST(e.month_id AS INT)
+        WHEN CAST(e.month_id AS STRING) RLIKE '^[0-9]{{8}}$' THEN CAST(SUBSTR(CAST(e.month_id AS STRING),1,6) AS INT)
+        ELSE NULL
+      END AS month_key_yyyymm,
+      a.exposure_date,
+      e.campaign_name,
+      e.message_channel,
+      c.is_active,
+      c.is_high_value,
+      a.concurrent_exposures,
+      a.effective_post_days,
+      a.pre_revenue,
+      a.pre_txn_cnt,
+      a.attributed_post_revenue,
+      a.attributed_post_txn_cnt,
+      a.incremental_revenue,
+      a.incremental_transactions
+    FROM exposure_attribution_raw a
+    JOIN {tbl(SILVER_SCHEMA, 'fact_crm_exposure')} e
+      ON CAST(e.exposure_id AS BIGINT) = a.exposure_id
+    LEFT JOIN {tbl(SILVER_SCHEMA, 'dim_customer')} c
+      ON c.customer_id = e.customer_id
+""")
+
+# =======================
+# AGGREGATE: month x campaign x channel
+# =======================
+spark.sql(f"""
+    CREATE OR REPLACE TABLE {tbl(GOLD_SCHEMA, 'agg_incrementality_campaign_channel')} AS
+    SELECT
+      month_key_yyyymm AS month_id,
+      campaign_name,
+      message_channel,
+      COUNT(*)                      AS exposures,
+      COUNT(DISTINCT customer_id)   AS customers,
+      SUM(effective_post_days)      AS effective_post_days,
+      SUM(attributed_post_revenue)  AS attributed_post_revenue,
+      SUM(incremental_revenue)      AS incremental_revenue,
+      SUM(incremental_transactions) AS incremental_transactions,
+      SUM(incremental_revenue) / COUNT(*) AS incremental_revenue_per_exposure,
+      AVG(CASE WHEN concurrent_exposures > 1 THEN 1.0 ELSE 0.0 END) AS share_overlapping
+    FROM {tbl(GOLD_SCHEMA, 'fact_exposure_attribution')}
+    GROUP BY month_key_yyyymm, campaign_name, message_channel
+""")
+
+n_exp = spark.table(tbl(GOLD_SCHEMA, "fact_exposure_attribution")).count()
+n_agg = spark.table(tbl(GOLD_SCHEMA, "agg_incrementality_campaign_channel")).count()
+print(f"OK: fact_exposure_attribution <- {n_exp:,} exposures")
+print(f"OK: agg_incrementality_campaign_channel <- {n_agg:,} rows")
+
+print("\nExposure attribution written.")
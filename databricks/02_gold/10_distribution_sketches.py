@@ -0,0 +1,141 @@
+# file: 10_distribution_sketches.py
+# Purpose: Attach mergeable quantile sketches of customer-level lift and mergeable customer sets
+#          to the Gold aggregates.
+# Input : 02_gold.fact_customer_month_incrementality (+ dim_customer_month_rfm for segments)
+# Output: *_sketch + customer_set columns appended to agg_incrementality_month / _rfm / _active_value (exported by 06)
+# Run after 05_gold_incrementality.sql and before 06_export_gold_to_csv.py.
+#
+# Each aggregate row carries a serialized sketch of incremental_revenue and delta_aov over its
+# customer-months. The dashboard merges sketches to get medians, p10/p90 and histograms for any
+# rollup (several months, several segments) without loading customer-level rows.
+# customer_set holds the row's customer ids (exact up to EXACT_MAX_IDS, a HyperLogLog sketch above),
+# so distinct customers across months/segments are a set union instead of a (double-counting) sum
+# of COUNT(DISTINCT) columns, and row size stays bounded for large segments.
+# Both are built per aggregate row on the executors (groupBy(keys).applyInPandas); the driver never
+# collects customer-level rows. A task holds the rows of one aggregate row (at most one month).
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.types import StringType, StructField, StructType
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.sketches import DEFAULT_ALPHA, grouped_sketches  # noqa: E402
+from crm_engine.customer_sets import EXACT_MAX_IDS, SET_COLUMN, grouped_customer_sets  # noqa: E402
+from crm_engine.markets import get_catalog  # noqa: E402
+
+spark = SparkSession.builder.getOrCreate()
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+GOLD_SCHEMA = "02_gold"
+
+ALPHA = DEFAULT_ALPHA      # relative accuracy of every quantile read from a sketch
+
+# fact column -> sketch column on the aggregates
+SKETCHED = {
+    "incremental_revenue": "incremental_revenue_sketch",
+    "delta_aov": "delta_aov_sketch",
+}
+
+# aggregate table -> grouping keys (must match 05_gold_incrementality.sql)
+AGGREGATES = {
+    "agg_incrementality_month": ["month_id"],
+    "agg_incrementality_rfm": ["month_id", "rfm_segment"],
+    "agg_incrementality_active_value": ["month_id", "is_active", "is_high_value"],
+}
+
+SKETCH_COLUMNS = list(SKETCHED.values()) + [SET_COLUMN]
+
+
+def tbl(name: str) -> str:
+    return f"`{CATALOG}`.`{GOLD_SCHEMA}`.`{name}`"
+
+
+def sketch_group(keys: list[str]):
+    """
+    applyInPandas body: the customer-month rows of one aggregate row -> its sketches + customer set.
+    """
+    def build(key: tuple, pdf: pd.DataFrame) -> pd.DataFrame:
+        codes = np.zeros(len(pdf), dtype=np.int64)
+        row = dict(zip(keys, key))
+        for src, dst in SKETCHED.items():
+            row[dst] = grouped_sketches(codes, pdf[src].to_numpy(dtype=np.float64), 1, alpha=ALPHA)[0]
+        row[SET_COLUMN] = grouped_customer_sets(codes, pdf["customer_id"].to_numpy(dtype=np.int64), 1)[0]
+        return pd.DataFrame([row], columns=[*keys, *SKETCH_COLUMNS])
+
+    return build
+
+
+# =======================
+# LOAD (only the columns the sketches need; stays on the executors)
+# =======================
+fact = spark.sql(f"""
+    SELECT
+      f.month_key_yyyymm AS month_id,
+      CAST(f.customer_id AS BIGINT) AS customer_id,
+      r.rfm_segment,
+      f.is_active,
+      f.is_high_value,
+      CAST(f.incremental_revenue AS DOUBLE) AS incremental_revenue,
+      CAST(f.delta_aov AS DOUBLE)           AS delta_aov
+    FROM {tbl('fact_customer_month_incrementality')} f
+    LEFT JOIN {tbl('dim_customer_month_rfm')} r
+      ON r.customer_id = f.customer_id
+     AND r.month_id = f.month_id
+""").localCheckpoint(eager=True)   # scanned once per aggregate below
+
+print(f"Fact rows for sketches: {fact.count():,}")
+
+# =======================
+# BUILD + WRITE (re-runnable: old sketch columns are dropped first)
+# =======================
+for agg_name, keys in AGGREGATES.items():
+    # one pandas task per aggregate row: sketches and sets are built on the executors, the driver
+    # only sees the (small) aggregate
+    schema = StructType([fact.schema[k] for k in keys] + [StructField(c, StringType()) for c in SKETCH_COLUMNS])
+    sk = (
+        fact.select(*keys, "customer_id", *SKETCHED)
+        .groupBy(*keys)
+        .applyInPandas(sketch_group(keys), schema=schema)
+    )
+
+    agg = spark.table(tbl(agg_name))
+    agg = agg.drop(*[c for c in SKETCH_COLUMNS if c in agg.columns])
+
+    for k in keys:
+        sk = sk.withColumn(k, sk[k].cast(agg.schema[k].dataType))
+    sk = sk.select(*[sk[k].alias(f"_sk_{k}") for k in keys], *SKETCH_COLUMNS)
+
+    cond = [agg[k].eqNullSafe(sk[f"_sk_{k}"]) for k in keys]
+    joined = agg.join(sk, cond, "left").drop(*[f"_sk_{k}" for k in keys])
+
+    # Materialize before overwriting the table we read from
+    joined = joined.localCheckpoint(eager=True)
+    (
+        joined.write
+        .format("delta")
+        .mode("overwrite")
+        .option("overwriteSchema", "true")
+        .saveAsTable(tbl(agg_name))
+    )
+    stats = joined.agg(
+        F.count(SKETCH_COLUMNS[0]).alias("rows"),
+        F.avg(F.length(SKETCH_COLUMNS[0])).alias("sketch_len"),
+        F.avg(F.length(SET_COLUMN)).alias("set_len"),
+        F.sum((F.col("customers") > EXACT_MAX_IDS).cast("int")).alias("hll_rows"),
+    ).first()
+    print(f"OK: {agg_name} <- {stats['rows'] or 0:,} rows (avg {stats['sketch_len'] or 0:,.0f} chars per sketch, "
+          f"{stats['set_len'] or 0:,.0f} per customer set, {stats['hll_rows'] or 0:,} HLL sets)")
+
+print("\nDistribution sketches and customer sets written.")
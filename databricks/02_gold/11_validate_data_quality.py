@@ -0,0 +1,58 @@
+# file: 11_validate_data_quality.py
+# Purpose: Data-quality gate over Silver/Gold (docs/validation_checklist.md, sections A-E).
+# Input : 01_silver.customer_month_exposure_anchor / customer_month_pre_post / fact_crm_exposure /
+#         fact_transaction / dim_customer, 02_gold.fact_customer_month_incrementality + aggregates
+# Output: data_quality_report.json in the export volume (read by the Diagnostics page)
+# Run after 10_distribution_sketches.py and before 06_export_gold_to_csv.py: a failed check raises,
+# so the job stops before the CSV exports are refreshed.
+#
+# One combined-aggregate scan per table (see crm_engine/quality.py). Warnings (zero-revenue shares,
+# minor segment sign flips across the sensitivity grid) are reported but do not stop the job.
+
+import os
+import sys
+
+from pyspark.sql import SparkSession
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.quality import (  # noqa: E402
+    DEFAULT_THRESHOLDS,
+    FAIL,
+    REPORT_FILE,
+    failed_checks,
+    format_report,
+    run_validation,
+    write_report,
+)
+from crm_engine.markets import get_catalog  # noqa: E402
+
+spark = SparkSession.builder.getOrCreate()
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+EXPORT_DIR = f"/Volumes/{CATALOG}/02_gold/vol_export"
+
+THRESHOLDS = dict(DEFAULT_THRESHOLDS)
+FAIL_ON_ERROR = True       # raise (fail the job task) when any check fails
+
+
+def tbl(schema: str, name: str) -> str:
+    return f"`{CATALOG}`.`{schema}`.`{name}`"
+
+
+# =======================
+# VALIDATE
+# =======================
+report = run_validation(spark, tbl, THRESHOLDS)
+print(format_report(report))
+
+path = write_report(report, os.path.join(EXPORT_DIR, REPORT_FILE))
+print(f"\nReport: {path}")
+
+if FAIL_ON_ERROR and report["status"] == FAIL:
+    raise RuntimeError(f"Data-quality gate failed: {', '.join(failed_checks(report))}")
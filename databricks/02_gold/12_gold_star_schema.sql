@@ -0,0 +1,111 @@
+-- file: 12_gold_star_schema.sql
+-- Purpose: Star schema for the Power BI aggregation model: compact month/segment dimensions with integer
+--          surrogate keys and an additive fact at month x rfm_segment x is_active x is_high_value.
+-- Input : 02_gold.fact_customer_month_incrementality, 02_gold.dim_customer_month_rfm
+-- Output: 02_gold.dim_month, 02_gold.dim_segment, 02_gold.fact_incrementality_agg
+-- Run after 05_gold_incrementality.sql and before 06_export_gold_to_csv.py.
+--
+-- Keys are computed, not numbered, so they stay stable across refreshes:
+--   month_key   = year * 12 + month - 1 (consecutive months are consecutive keys)
+--   segment_key = segment_rank * 4 + is_active * 2 + is_high_value + 1
+-- The fact only holds sums and counts; averages are ratios of sums in the measures
+-- (powerbi/tabular_editor/16E_MapMeasuresToAggregation.csx), e.g. Average Delta AOV = delta_aov_sum / delta_aov_count.
+
+USE CATALOG IDENTIFIER(:catalog);
+
+-- =========================================================
+-- 1) DIM MONTH
+-- =========================================================
+
+CREATE OR REPLACE TABLE `02_gold`.dim_month AS
+WITH months AS (
+  SELECT DISTINCT month_key_yyyymm
+  FROM `02_gold`.fact_customer_month_incrementality
+  WHERE month_key_yyyymm IS NOT NULL
+)
+SELECT
+  CAST(DIV(month_key_yyyymm, 100) * 12 + MOD(month_key_yyyymm, 100) - 1 AS INT) AS month_key,
+  month_key_yyyymm AS month_id,
+  TO_DATE(CONCAT(CAST(month_key_yyyymm AS STRING), '01'), 'yyyyMMdd') AS month_start,
+  CAST(DIV(month_key_yyyymm, 100) AS INT) AS year,
+  CAST(MOD(month_key_yyyymm, 100) AS INT) AS month_of_year,
+  DATE_FORMAT(TO_DATE(CONCAT(CAST(month_key_yyyymm AS STRING), '01'), 'yyyyMMdd'), 'MMM yyyy') AS month_label
+FROM months;
+
+-- =========================================================
+-- 2) DIM SEGMENT (RFM segment x active flag x value flag, one row per combination)
+-- =========================================================
+
+CREATE OR REPLACE TABLE `02_gold`.dim_segment AS
+WITH segments AS (
+  SELECT rfm_segment, segment_rank
+  FROM VALUES
+    ('Unknown', 0),
+    ('Champions', 1),
+    ('Loyal', 2),
+    ('Potential Loyalists', 3),
+    ('At Risk', 4),
+    ('Lost', 5),
+    ('Others', 6)
+  AS s(rfm_segment, segment_rank)
+),
+flags AS (
+  SELECT is_active, is_high_value
+  FROM VALUES (0, 0), (0, 1), (1, 0), (1, 1) AS f(is_active, is_high_value)
+)
+SELECT
+  CAST(s.segment_rank * 4 + f.is_active * 2 + f.is_high_value + 1 AS INT) AS segment_key,
+  s.rfm_segment,
+  s.segment_rank,
+  f.is_active,
+  f.is_high_value,
+  CASE WHEN f.is_active = 1 THEN 'Active' ELSE 'Inactive' END AS active_label,
+  CASE WHEN f.is_high_value = 1 THEN 'High value' ELSE 'Standard value' END AS value_label
+FROM segments s
+CROSS JOIN flags f;
+
+-- =========================================================
+-- 3) AGGREGATED FACT (additive columns only)
+-- =========================================================
+
+CREATE OR REPLACE TABLE `02_gold`.fact_incrementality_agg AS
+WITH fact_rfm AS (
+  SELECT
+    f.*,
+    COALESCE(r.rfm_segment, 'Unknown') AS rfm_segment
+  FROM `02_gold`.fact_customer_month_incrementality f
+  LEFT JOIN `02_gold`.dim_customer_month_rfm r
+    ON r.customer_id = f.customer_id
+   AND r.month_id = f.month_id
+)
+SELECT
+  m.month_key,
+  s.segment_key,
+
+  COUNT(*)                                    AS customer_months,
+  SUM(f.incremental_revenue)                  AS incremental_revenue,
+  SUM(f.incremental_transactions)             AS incremental_transactions,
+  SUM(f.incremental_freq_points)              AS incremental_freq_points,
+  SUM(f.seasonal_adj_incremental_revenue)     AS seasonal_adj_incremental_revenue,
+  SUM(f.seasonal_adj_incremental_transactions) AS seasonal_adj_incremental_transactions,
+
+  SUM(f.pre_revenue)                          AS pre_revenue,
+  SUM(f.post_revenue)                         AS post_revenue,
+  SUM(f.pre_txn_cnt)                          AS pre_txn_cnt,
+  SUM(f.post_txn_cnt)                         AS post_txn_cnt,
+
+  /* numerator + denominator pairs for the averages (AVERAGE skips NULLs, so count non-NULL rows) */
+  SUM(f.delta_aov)                            AS delta_aov_sum,
+  COUNT(f.delta_aov)                          AS delta_aov_count,
+  SUM(f.pre_rev_per_day)                      AS pre_rev_per_day_sum,
+  COUNT(f.pre_rev_per_day)                    AS pre_rev_per_day_count,
+  SUM(f.post_rev_per_day)                     AS post_rev_per_day_sum,
+  COUNT(f.post_rev_per_day)                   AS post_rev_per_day_count
+FROM fact_rfm f
+JOIN `02_gold`.dim_month m
+  ON m.month_id = f.month_key_yyyymm
+JOIN `02_gold`.dim_segment s
+  ON s.rfm_segment = f.rfm_segment
+ AND s.is_active = f.is_active
+ AND s.is_high_value = f.is_high_value
+GROUP BY m.month_key, s.segment_key;
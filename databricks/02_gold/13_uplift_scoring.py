@@ -0,0 +1,128 @@
+# file: 13_uplift_scoring.py
+# Purpose: Customer-level uplift model trained on the Gold fact, batch-scored for every customer for the
+#          month after the last fact month (whom to target next).
+# Input : 02_gold.fact_customer_month_incrementality, 02_gold.dim_customer_month_rfm,
+#         01_silver.fact_transaction, 01_silver.dim_customer
+# Output: 02_gold.customer_uplift_scores (one row per customer; joins on customer_id)
+#         uplift_model_report.json in the export volume (coefficients, holdout deciles, scoring throughput)
+# Run after 08_matched_control_did.py (the DiD lift is the preferred target) and before 06_export_gold_to_csv.py.
+#
+# Model, features and the chunked process-pool scorer: crm_engine/uplift.py. The last fact month is held
+# out to check the ranking (observed lift by predicted decile); the stored model is refit on all months.
+
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, os.path.dirname(_HERE))
+
+from crm_engine.uplift import (  # noqa: E402
+    DEFAULT_ALPHA,
+    DEFAULT_CHUNK_ROWS,
+    REPORT_FILE,
+    evaluate_uplift,
+    fit_uplift,
+    iter_feature_batches,
+    next_month_sql,
+    score_batches,
+    scoring_features_sql,
+    target_expression,
+    training_sql,
+    write_report,
+)
+from crm_engine.markets import get_catalog, get_workers  # noqa: E402
+
+spark = SparkSession.builder.getOrCreate()
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+GOLD_SCHEMA = "02_gold"
+EXPORT_DIR = f"/Volumes/{CATALOG}/02_gold/vol_export"
+WORK_DIR = f"/Volumes/{CATALOG}/02_gold/vol_export/_uplift"   # feature + score Parquet (driver-local file API)
+
+TARGET_TABLE = "customer_uplift_scores"
+ALPHA = DEFAULT_ALPHA
+CHUNK_ROWS = DEFAULT_CHUNK_ROWS    # customers per scoring chunk
+WORKERS = get_workers()            # scoring processes, job parameter "workers" (None = driver cores - 1)
+N_DECILES = 10
+
+
+def tbl(schema: str, name: str) -> str:
+    return f"`{CATALOG}`.`{schema}`.`{name}`"
+
+
+# =======================
+# TRAIN (holdout = last fact month, then refit on everything)
+# =======================
+fact_columns = spark.table(tbl(GOLD_SCHEMA, "fact_customer_month_incrementality")).columns
+target_expr, target_name = target_expression(fact_columns)
+train_pdf = spark.sql(training_sql(tbl, target_expr)).toPandas()
+print(f"Training rows: {len(train_pdf):,} | target: {target_name}")
+
+last_month = int(train_pdf["month_id"].max())
+history, holdout = train_pdf[train_pdf["month_id"] < last_month], train_pdf[train_pdf["month_id"] == last_month]
+holdout_eval = {"month_id": last_month, "rows": 0}
+if len(history):
+    holdout_eval.update(evaluate_uplift(fit_uplift(history, ALPHA, target_name), holdout, N_DECILES))
+    print(f"Holdout {last_month}: R^2 {holdout_eval.get('r2')}, "
+          f"top-decile observed lift {holdout_eval.get('top_decile_mean_observed')} "
+          f"vs mean {holdout_eval.get('mean_observed')}")
+
+model = fit_uplift(train_pdf, ALPHA, target_name)
+del train_pdf, history, holdout
+
+# =======================
+# SCORE (features -> Parquet -> fixed-size chunks on a process pool -> Parquet parts)
+# =======================
+score_month_id = int(spark.sql(next_month_sql(tbl)).first()["m"])
+features_dir = os.path.join(WORK_DIR, "features")
+scores_dir = os.path.join(WORK_DIR, "scores")
+shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+spark.sql(scoring_features_sql(tbl, score_month_id)).write.mode("overwrite").parquet(features_dir)
+print(f"Scoring month {score_month_id} in chunks of {CHUNK_ROWS:,} customers")
+stats = score_batches(model, iter_feature_batches(features_dir, CHUNK_ROWS), scores_dir,
+                      workers=WORKERS, chunk_rows=CHUNK_ROWS)
+print(f"Scored {stats.rows:,} customers in {stats.seconds:,.1f}s ({stats.rows_per_sec:,.0f} rows/s, "
+      f"{stats.workers} workers, chunk p95 {stats.chunk_p95_seconds:.2f}s)")
+
+# =======================
+# WRITE: scores + decile (1 = highest predicted uplift; edges from approximate quantiles)
+# =======================
+scores = spark.read.parquet(scores_dir)
+edges = scores.approxQuantile("predicted_uplift", [i / N_DECILES for i in range(1, N_DECILES)], 0.001)
+above = sum((F.col("predicted_uplift") > e).cast("int") for e in edges)
+scored_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+(
+    scores
+    .withColumn("uplift_decile", (F.lit(N_DECILES) - above).cast("int"))
+    .withColumn("model_target", F.lit(target_name))
+    .withColumn("scored_at", F.lit(scored_at))
+    .write
+    .format("delta")
+    .mode("overwrite")
+    .option("overwriteSchema", "true")
+    .saveAsTable(tbl(GOLD_SCHEMA, TARGET_TABLE))
+)
+print(f"OK: {TARGET_TABLE} <- {stats.rows:,} rows")
+
+report = {
+    "report": "uplift_model",
+    "created_at": scored_at,
+    "score_month_id": score_month_id,
+    "model": model.to_dict(),
+    "holdout": holdout_eval,
+    "scoring": vars(stats),
+    "decile_edges": edges,
+}
+print(f"Report: {write_report(report, os.path.join(EXPORT_DIR, REPORT_FILE))}")
+shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,174 @@
+# file: crm_engine/customer_sets.py
+# Purpose: Mergeable customer-id sets per Gold aggregate row (for correct distinct rollups).
+#
+# COUNT(DISTINCT customer_id) per row cannot be summed across months or segments. Each row instead
+# carries a set that merges with any other row's (union_count, used by crm_engine/snapshot.py and the
+# Streamlit pages through streamlit_app/utils/customer_sets.py):
+#   - up to EXACT_MAX_IDS customers: the exact sorted ids, delta-encoded and zlib-compressed
+#     (small segments keep exact distinct counts)
+#   - above that: a HyperLogLog sketch with 2^HLL_PRECISION registers (~16 KB raw, ~0.8% standard
+#     error), so a row's size no longer grows with the number of customers it covers
+# Unions of exact sets are exact; once any HLL row is involved, exact rows are hashed into registers
+# and the union is an HLL estimate.
+#
+# Serialized formats, base64-encoded for Delta/CSV string columns:
+#   v1 exact: zlib( struct "<BBQ" version, delta width in bytes (4 or 8), n  +  n little-endian deltas )
+#             the first delta is the first id itself.
+#   v2 HLL  : zlib( struct "<BBQ" version, precision p, n ids inserted  +  2^p uint8 registers )
+#             hash = splitmix64(customer_id); register = top p bits; rank = leading zeros of the
+#             remaining 64 - p bits + 1.
+
+from __future__ import annotations
+
+import base64
+import struct
+import zlib
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+SET_VERSION = 1
+HLL_VERSION = 2
+SUPPORTED_VERSIONS = {SET_VERSION, HLL_VERSION}
+SET_COLUMN = "customer_set"
+EXACT_MAX_IDS = 10_000     # exact ids up to here (~same encoded size as one HLL sketch)
+HLL_PRECISION = 14
+_HEADER = struct.Struct("<BBQ")
+
+
+def hash64(ids: np.ndarray) -> np.ndarray:
+    """
+    splitmix64 finalizer of the customer ids (uint64, wrapping arithmetic).
+    """
+    x = np.asarray(ids, dtype=np.int64).astype(np.uint64)
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    n = np.zeros(len(x), dtype=np.int64)
+    x = x.copy()
+    for s in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(s))
+        n += big * s
+        x = np.where(big, x >> np.uint64(s), x)
+    return n + (x > 0)
+
+
+def hll_registers(ids: np.ndarray, precision: int = HLL_PRECISION) -> np.ndarray:
+    h = hash64(ids)
+    rest_bits = 64 - precision
+    idx = (h >> np.uint64(rest_bits)).astype(np.int64)
+    rest = h & np.uint64((1 << rest_bits) - 1)
+    rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    np.maximum.at(registers, idx, rank)
+    return registers
+
+
+def encode_customer_set(sorted_ids: np.ndarray, exact_max: int = EXACT_MAX_IDS) -> str:
+    ids = np.asarray(sorted_ids, dtype=np.int64)
+    if len(ids) > exact_max:
+        raw = _HEADER.pack(HLL_VERSION, HLL_PRECISION, len(ids)) + hll_registers(ids).tobytes()
+        return base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+    deltas = np.diff(ids, prepend=0) if len(ids) else ids
+    if len(deltas) and (deltas.min() < 0):
+        raise ValueError("customer ids must be non-negative and sorted")
+    width = 4 if (not len(deltas) or deltas.max() < 2 ** 32) else 8
+    body = deltas.astype("<u4" if width == 4 else "<u8").tobytes()
+    raw = _HEADER.pack(SET_VERSION, width, len(ids)) + body
+    return base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+
+
+def grouped_customer_sets(codes: np.ndarray, customer_ids: np.ndarray, n_groups: int,
+                          exact_max: int = EXACT_MAX_IDS) -> list[str]:
+    """
+    One serialized customer set per group code in [0, n_groups) (exact or HLL, see encode_customer_set).
+    One sort of (code, customer_id) pairs; only the per-group packing loops.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    ids = np.asarray(customer_ids, dtype=np.int64)
+    order = np.lexsort((ids, codes))
+    codes, ids = codes[order], ids[order]
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (ids[1:] != ids[:-1])
+    codes, ids = codes[first], ids[first]
+    bounds = np.searchsorted(codes, np.arange(n_groups + 1))
+    return [encode_customer_set(ids[bounds[g]:bounds[g + 1]], exact_max) for g in range(n_groups)]
+
+
+# =======================
+# Reading
+# =======================
+@lru_cache(maxsize=4096)
+def decode_customer_set(encoded: str) -> tuple[int, np.ndarray]:
+    """
+    (version, payload) of one aggregate row, cached per encoded string (read-only array):
+    sorted customer ids for v1, HLL registers for v2.
+    """
+    raw = zlib.decompress(base64.b64decode(encoded))
+    version, width, n = _HEADER.unpack_from(raw, 0)
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported customer set version: {version}")
+    if version == HLL_VERSION:
+        out = np.frombuffer(raw, dtype=np.uint8, count=1 << width, offset=_HEADER.size)
+    else:
+        deltas = np.frombuffer(raw, dtype="<u4" if width == 4 else "<u8", count=n, offset=_HEADER.size)
+        out = np.cumsum(deltas, dtype=np.int64)
+        out.setflags(write=False)
+    return version, out
+
+
+def hll_estimate(registers: np.ndarray) -> int:
+    m = len(registers)
+    alpha = 0.7213 / (1.0 + 1.079 / m)
+    estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)   # small-range (linear counting) correction
+    return int(round(estimate))
+
+
+def union_count(encoded: Iterable) -> int:
+    """
+    Number of distinct customers across the given sets (NaN / empty entries skipped).
+    Exact when every set is exact; an HLL estimate once a large (HLL) row is involved.
+    """
+    parts = [decode_customer_set(e) for e in encoded if isinstance(e, str) and e]
+    if not parts:
+        return 0
+    exact = [p for v, p in parts if v == SET_VERSION]
+    sketches = [p for v, p in parts if v == HLL_VERSION]
+    ids = exact[0] if len(exact) == 1 else (np.unique(np.concatenate(exact)) if exact else None)
+    if not sketches:
+        return int(len(ids))
+    registers = np.maximum.reduce(sketches)
+    if ids is not None and len(ids):
+        registers = np.maximum(registers, hll_registers(ids, int(np.log2(len(registers)))))
+    return hll_estimate(registers)
+
+
+def any_hll(encoded: Iterable) -> bool:
+    """
+    True when any of the sets is an HLL sketch, i.e. a union over them is an estimate, not exact.
+    """
+    return any(decode_customer_set(e)[0] == HLL_VERSION for e in encoded if isinstance(e, str) and e)
+
+
+def has_customer_sets(df: pd.DataFrame) -> bool:
+    return SET_COLUMN in df.columns and df[SET_COLUMN].notna().any()
+
+
+def distinct_customers_by(df: pd.DataFrame, keys: list[str], fallback_col: str = "customers") -> pd.Series:
+    """
+    Distinct customers per group of `keys` (aligned with df.groupby(keys, sort=True)).
+    Uses set unions when the export carries customer sets (exact, or HLL estimates for large rows);
+    otherwise sums `fallback_col` (which over-counts customers appearing in several rows).
+    """
+    if has_customer_sets(df):
+        return df.groupby(keys, sort=True)[SET_COLUMN].agg(union_count)
+    return df.groupby(keys, sort=True)[fallback_col].sum()
@@ -0,0 +1,229 @@
+# file: crm_engine/dag.py
+# Purpose: Small content-hash cached DAG runner (declared stages, concurrent execution, skip-if-unchanged).
+#
+# A stage declares the resources it reads and writes ("table:01_silver.x", "file:/path/x.csv"),
+# its parameters and its code (SQL text or function source). Dependencies follow from outputs:
+# a stage depends on whichever stage produces one of its inputs. Independent stages run
+# concurrently on a thread pool.
+#
+# Before a stage runs, its key = sha256(code, params, fingerprint of every input) is compared with
+# the key stored after its last successful run. The stage is skipped when the key matches and its
+# outputs still carry the fingerprints recorded then (so a dropped or externally rewritten output
+# reruns it). Fingerprints are supplied by the caller (e.g. Delta table version, file sha256).
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+STATE_VERSION = 1
+
+# stage statuses
+RAN = "ran"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"      # an upstream stage failed
+PLANNED = "would run"    # dry run
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], None]
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    code: str = ""
+    group: str = ""          # display only (bronze / silver / gold / export)
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str
+    seconds: float = 0.0
+    key: Optional[str] = None
+    error: Optional[str] = None
+
+
+class Dag:
+    def __init__(self):
+        self.stages: dict[str, Stage] = {}
+        self._producer: dict[str, str] = {}
+
+    def add(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        for out in stage.outputs:
+            if out in self._producer:
+                raise ValueError(f"{out} is produced by both {self._producer[out]} and {stage.name}")
+            self._producer[out] = stage.name
+        self.stages[stage.name] = stage
+        return stage
+
+    def deps(self, name: str) -> set[str]:
+        st = self.stages[name]
+        return {self._producer[i] for i in st.inputs if i in self._producer and self._producer[i] != name}
+
+    def topological(self) -> list[str]:
+        order, state = [], {}
+
+        def visit(n: str, path: tuple) -> None:
+            if state.get(n) == "done":
+                return
+            if state.get(n) == "visiting":
+                raise ValueError(f"Cycle in stage graph: {' -> '.join(path + (n,))}")
+            state[n] = "visiting"
+            for d in sorted(self.deps(n)):
+                visit(d, path + (n,))
+            state[n] = "done"
+            order.append(n)
+
+        for n in self.stages:
+            visit(n, ())
+        return order
+
+    def upstream_closure(self, names: list[str]) -> set[str]:
+        out, todo = set(), list(names)
+        while todo:
+            n = todo.pop()
+            if n not in out:
+                out.add(n)
+                todo.extend(self.deps(n))
+        return out
+
+
+def file_sha256(path: str, chunk: int = 8 * 2 ** 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+class DagRunner:
+    """
+    Runs a Dag with up to `max_workers` concurrent stages.
+    `fingerprint(resource) -> str | None` identifies the current content of an input/output
+    (None = missing). State (keys + output fingerprints) persists in `state_path` as JSON.
+    """
+
+    def __init__(self, dag: Dag, fingerprint: Callable[[str], Optional[str]], state_path: str,
+                 max_workers: int = 4, force: bool = False, log: Optional[Callable[[str], None]] = print):
+        self.dag = dag
+        self.fingerprint = fingerprint
+        self.state_path = state_path
+        self.max_workers = max(1, max_workers)
+        self.force = force
+        self.log = log or (lambda _msg: None)
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("state_version") == STATE_VERSION:
+                return data
+        return {"state_version": STATE_VERSION, "stages": {}}
+
+    def _save_state(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def stage_key(self, st: Stage) -> str:
+        payload = {
+            "code": st.code,
+            "params": st.params,
+            "inputs": {i: self.fingerprint(i) for i in sorted(st.inputs)},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def is_fresh(self, st: Stage, key: str) -> bool:
+        prev = self.state["stages"].get(st.name)
+        if self.force or prev is None or prev.get("key") != key:
+            return False
+        prev_outputs = prev.get("outputs", {})
+        for o in st.outputs:
+            current = self.fingerprint(o)
+            if current is None or current != prev_outputs.get(o):
+                return False
+        return True
+
+    def _execute(self, st: Stage, dry_run: bool) -> StageResult:
+        key = self.stage_key(st)
+        if self.is_fresh(st, key):
+            return StageResult(st.name, SKIPPED, key=key)
+        if dry_run:
+            return StageResult(st.name, PLANNED, key=key)
+        t0 = time.perf_counter()
+        try:
+            st.run()
+        except Exception as e:
+            return StageResult(st.name, FAILED, time.perf_counter() - t0, key, f"{type(e).__name__}: {e}")
+        sec = time.perf_counter() - t0
+        outputs = {o: self.fingerprint(o) for o in st.outputs}
+        with self._lock:
+            self.state["stages"][st.name] = {
+                "key": key,
+                "outputs": outputs,
+                "seconds": sec,
+                "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            self._save_state()
+        return StageResult(st.name, RAN, sec, key)
+
+    def run(self, targets: Optional[list[str]] = None, dry_run: bool = False) -> list[StageResult]:
+        """
+        Runs `targets` (default: every stage) plus everything upstream of them.
+        In a dry run, stages downstream of a "would run" stage are also reported as "would run".
+        """
+        order = self.dag.topological()
+        wanted = self.dag.upstream_closure(targets) if targets else set(order)
+        pending = {n: self.dag.deps(n) & wanted for n in order if n in wanted}
+        results: dict[str, StageResult] = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag") as pool:
+            while pending or running:
+                for n in [n for n, d in pending.items() if all(x in results for x in d)]:
+                    deps = pending.pop(n)
+                    bad = [d for d in deps if results[d].status in (FAILED, BLOCKED)]
+                    if bad:
+                        results[n] = StageResult(n, BLOCKED, error=f"upstream failed: {', '.join(sorted(bad))}")
+                        self.log(f"  [blocked] {n}")
+                        continue
+                    if dry_run and any(results[d].status == PLANNED for d in deps):
+                        results[n] = StageResult(n, PLANNED)
+                        continue
+                    running[pool.submit(self._execute, self.dag.stages[n], dry_run)] = n
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    n = running.pop(fut)
+                    res = fut.result()
+                    results[n] = res
+                    extra = f" {res.seconds:.1f}s" if res.status == RAN else (f" {res.error}" if res.error else "")
+                    self.log(f"  [{res.status}] {n}{extra}")
+        return [results[n] for n in order if n in results]
+
+
+def summarize(results: list[StageResult]) -> dict:
+    out: dict = {}
+    for r in results:
+        out[r.status] = out.get(r.status, 0) + 1
+    return out
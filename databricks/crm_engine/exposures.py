@@ -0,0 +1,383 @@
+# file: crm_engine/exposures.py
+# Purpose: Vectorized CRM exposure scheduler driven by a campaign calendar (synthetic data).
+#
+# A calendar is a list of campaigns, each with a send cadence:
+#   blast    fixed send dates ("dates": ["2025-11-28", "12-24"]; MM-DD repeats every year)
+#   weekly   one send day per week ("weekday": 0 = Monday ... 6 = Sunday, "every_weeks": n)
+#   monthly  fixed days of the month ("days_of_month": [1, 15])
+#   daily    every day (always-on / triggered programs; use a small rate)
+# optionally limited to [start, end]. On every send date each customer is in the audience with probability
+#   rate * (1 + (bias_active - 1) * is_active) * (1 + (bias_hv - 1) * is_high_value)
+# (the targeting formula of SynthConfig.exposure_*), so a customer gets any number of exposures per
+# month from one or several campaigns. max_per_customer_month keeps only a customer-month's first N.
+#
+# Drawing is output-sensitive: per campaign, the send-day x customer grid is skip-sampled with geometric
+# gaps at the campaign's highest audience probability and thinned to each customer's own probability,
+# so the cost follows the number of exposures, not sends x customers. Customers are processed in chunks
+# (bounded memory); write_exposure_parts streams the chunks to CSV/Parquet parts, which is how hundreds
+# of millions of exposures are produced.
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+CADENCES = ("blast", "weekly", "monthly", "daily")
+DEFAULT_CHANNELS = {"email": 0.55, "sms": 0.25, "push": 0.20}   # synth.MESSAGE_CHANNELS mix
+
+# customers per scheduling chunk (~50 exposures per customer-year -> ~5M exposures, ~600 MB peak)
+DEFAULT_CHUNK_CUSTOMERS = 100_000
+# exposures per customer-month above this are counted together in the contact histogram
+HISTOGRAM_MAX = 31
+
+# Realistic default: weekly newsletter, two monthly promos, seasonal blasts, a reactivation wave
+# aimed at inactive customers and an always-on cross-sell trigger (~4 exposures per customer-month).
+DEFAULT_CALENDAR = {
+    "max_per_customer_month": 12,
+    "campaigns": [
+        {"name": "Newsletter", "cadence": "weekly", "weekday": 3, "rate": 0.45, "bias_active": 1.4,
+         "send_hours": [9, 11], "channels": {"email": 1.0}},
+        {"name": "Promo_A", "cadence": "monthly", "days_of_month": [1, 15], "rate": 0.35,
+         "bias_hv": 1.4, "send_hours": [10, 12]},
+        {"name": "Promo_B", "cadence": "blast", "dates": ["03-14", "06-21", "09-12", "11-28", "12-15"],
+         "rate": 0.60, "bias_active": 1.6, "bias_hv": 1.2, "send_hours": [8, 10]},
+        {"name": "Reactivation", "cadence": "monthly", "days_of_month": [20], "rate": 0.40,
+         "bias_active": 0.25, "send_hours": [17, 20], "channels": {"email": 0.6, "sms": 0.4}},
+        {"name": "CrossSell", "cadence": "daily", "rate": 0.012, "bias_hv": 1.5,
+         "send_hours": [8, 22], "channels": {"push": 0.6, "email": 0.4}},
+    ],
+}
+
+
+@dataclass
+class Campaign:
+    name: str
+    cadence: str = "weekly"
+    rate: float = 0.10                      # audience probability per send
+    bias_active: float = 1.0
+    bias_hv: float = 1.0
+    dates: list = field(default_factory=list)          # blast
+    weekday: int = 0                                    # weekly
+    every_weeks: int = 1                                # weekly
+    days_of_month: list = field(default_factory=lambda: [1])   # monthly
+    start: Optional[str] = None
+    end: Optional[str] = None
+    send_hours: tuple = (8, 20)             # send time in [start hour, end hour)
+    channels: dict = field(default_factory=lambda: dict(DEFAULT_CHANNELS))
+
+    def validate(self) -> None:
+        if self.cadence not in CADENCES:
+            raise ValueError(f"Campaign {self.name!r}: cadence must be one of {CADENCES}, got {self.cadence!r}")
+        if not 0.0 <= self.rate <= 1.0:
+            raise ValueError(f"Campaign {self.name!r}: rate must be in [0, 1], got {self.rate}")
+        if self.bias_active < 0 or self.bias_hv < 0:
+            raise ValueError(f"Campaign {self.name!r}: biases must be >= 0")
+        if not 0 <= self.weekday <= 6 or self.every_weeks < 1:
+            raise ValueError(f"Campaign {self.name!r}: weekday must be 0-6 and every_weeks >= 1")
+        h0, h1 = self.send_hours
+        if not 0 <= h0 < h1 <= 24:
+            raise ValueError(f"Campaign {self.name!r}: send_hours must satisfy 0 <= start < end <= 24")
+        if not self.channels or min(self.channels.values()) < 0 or sum(self.channels.values()) <= 0:
+            raise ValueError(f"Campaign {self.name!r}: channels need non-negative weights with a positive sum")
+
+    def send_days(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Indexes into `dates` (a daily range) of the campaign's send dates.
+        """
+        window = np.ones(len(dates), dtype=bool)
+        if self.start:
+            window &= dates >= pd.Timestamp(self.start)
+        if self.end:
+            window &= dates <= pd.Timestamp(self.end)
+        if self.cadence == "daily":
+            return np.flatnonzero(window)
+        if self.cadence == "monthly":
+            return np.flatnonzero(window & np.isin(dates.day, list(self.days_of_month)))
+        if self.cadence == "weekly":
+            return np.flatnonzero(window & (dates.weekday == self.weekday))[::self.every_weeks]
+        full = {d for d in self.dates if len(d) == 10}
+        yearly = {d for d in self.dates if len(d) == 5}
+        hit = np.isin(dates.strftime("%Y-%m-%d"), list(full)) | np.isin(dates.strftime("%m-%d"), list(yearly))
+        return np.flatnonzero(window & hit)
+
+    def audience_p(self) -> np.ndarray:
+        """
+        Audience probability per send by is_active * 2 + is_high_value.
+        """
+        a = np.array([0, 0, 1, 1])
+        hv = np.array([0, 1, 0, 1])
+        p = self.rate * (1.0 + (self.bias_active - 1.0) * a) * (1.0 + (self.bias_hv - 1.0) * hv)
+        return np.clip(p, 0.0, 1.0)
+
+
+@dataclass
+class CampaignCalendar:
+    campaigns: list
+    max_per_customer_month: Optional[int] = None
+
+    @property
+    def campaign_names(self) -> list[str]:
+        return [c.name for c in self.campaigns]
+
+    @property
+    def channel_names(self) -> list[str]:
+        names = list(DEFAULT_CHANNELS)
+        names += sorted({ch for c in self.campaigns for ch in c.channels} - set(names))
+        return names
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CampaignCalendar":
+        campaigns = []
+        for c in d.get("campaigns", []):
+            c = dict(c)
+            if "send_hours" in c:
+                c["send_hours"] = tuple(c["send_hours"])
+            campaigns.append(Campaign(**c))
+        cal = cls(campaigns, d.get("max_per_customer_month"))
+        cal.validate()
+        return cal
+
+    def validate(self) -> None:
+        if not self.campaigns:
+            raise ValueError("Campaign calendar has no campaigns")
+        names = self.campaign_names
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate campaign names in calendar: {names}")
+        if self.max_per_customer_month is not None and self.max_per_customer_month < 1:
+            raise ValueError("max_per_customer_month must be >= 1")
+        for c in self.campaigns:
+            c.validate()
+
+
+def load_calendar(source) -> CampaignCalendar:
+    """
+    Calendar from a CampaignCalendar, a dict, a JSON file path or "default" (DEFAULT_CALENDAR).
+    """
+    if isinstance(source, CampaignCalendar):
+        return source
+    if isinstance(source, dict):
+        return CampaignCalendar.from_dict(source)
+    if source == "default":
+        return CampaignCalendar.from_dict(DEFAULT_CALENDAR)
+    with open(source, encoding="utf-8") as f:
+        return CampaignCalendar.from_dict(json.load(f))
+
+
+@dataclass
+class ExposureChunk:
+    """
+    Exposures of one customer range, ordered by customer, day and time. `customer` is the 0-based
+    customer index; campaign / channel are codes into calendar.campaign_names / channel_names.
+    """
+    customer: np.ndarray   # int64
+    day: np.ndarray        # int32 index into dates
+    second: np.ndarray     # int32 seconds after midnight
+    campaign: np.ndarray   # int16
+    channel: np.ndarray    # int8
+    dropped_by_cap: int = 0
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+
+def bernoulli_positions(rng: np.random.Generator, n_cells: int, p: float) -> np.ndarray:
+    """
+    Sorted positions in [0, n_cells), each present independently with probability p.
+    Geometric gaps between successes: O(n_cells * p) work instead of one draw per cell.
+    """
+    if n_cells <= 0 or p <= 0.0:
+        return np.empty(0, dtype=np.int64)
+    if p >= 1.0:
+        return np.arange(n_cells, dtype=np.int64)
+    parts = []
+    last = -1
+    while True:
+        expected = (n_cells - 1 - last) * p
+        size = int(expected + 4.0 * np.sqrt(expected) + 16)
+        pos = last + np.cumsum(rng.geometric(p, size=size))
+        parts.append(pos[pos < n_cells])
+        if pos[-1] >= n_cells:
+            return np.concatenate(parts)
+        last = int(pos[-1])
+
+
+def _chunk_exposures(calendar: CampaignCalendar, plans: list, month_idx: np.ndarray, n_months: int,
+                     segment: np.ndarray, c0: int, rng: np.random.Generator) -> ExposureChunk:
+    n = len(segment)
+    cust, day, sec, camp, chan = [], [], [], [], []
+    for code, (c, send_days, p_seg, ch_codes, ch_p) in enumerate(plans):
+        p_max = float(p_seg.max())
+        if len(send_days) == 0 or p_max <= 0.0:
+            continue
+        # one cell per (send, customer); candidates at p_max, thinned to the customer's own p
+        pos = bernoulli_positions(rng, len(send_days) * n, p_max)
+        local = pos % n
+        keep = rng.random(len(pos)) * p_max < p_seg[segment[local]]
+        pos, local = pos[keep], local[keep]
+        k = len(pos)
+        h0, h1 = c.send_hours
+        cust.append(local)
+        day.append(send_days[pos // n])
+        sec.append(rng.integers(h0 * 3600, h1 * 3600, size=k, dtype=np.int32))
+        camp.append(np.full(k, code, dtype=np.int16))
+        chan.append(ch_codes[rng.choice(len(ch_codes), size=k, p=ch_p)] if len(ch_codes) > 1
+                    else np.full(k, ch_codes[0], dtype=np.int8))
+    if not cust:
+        empty = np.empty(0, dtype=np.int64)
+        return ExposureChunk(empty, empty.astype(np.int32), empty.astype(np.int32),
+                             empty.astype(np.int16), empty.astype(np.int8))
+
+    cust, day, sec = np.concatenate(cust), np.concatenate(day), np.concatenate(sec)
+    camp, chan = np.concatenate(camp), np.concatenate(chan)
+    # one int64 key orders by customer, day, time (max ~ chunk * days * 86400, far below 2**63)
+    order = np.argsort((cust * len(month_idx) + day) * 86400 + sec, kind="stable")
+    dropped = 0
+    cap = calendar.max_per_customer_month
+    if cap is not None:
+        cm = cust[order] * n_months + month_idx[day[order]]
+        first = np.r_[True, cm[1:] != cm[:-1]]
+        idx = np.arange(len(cm))
+        rank = idx - np.maximum.accumulate(np.where(first, idx, 0))
+        dropped = int((rank >= cap).sum())
+        order = order[rank < cap]
+    return ExposureChunk(cust[order] + c0, day[order].astype(np.int32), sec[order],
+                         camp[order], chan[order], dropped)
+
+
+def iter_exposure_chunks(calendar, dates: pd.DatetimeIndex, is_active: np.ndarray, is_high_value: np.ndarray,
+                         rng: np.random.Generator,
+                         chunk_customers: int = DEFAULT_CHUNK_CUSTOMERS) -> Iterator[ExposureChunk]:
+    """
+    Exposures of customers [0, n) a chunk of customers at a time (deterministic for a given rng state
+    and chunk size).
+    """
+    calendar = load_calendar(calendar)
+    dates = pd.DatetimeIndex(dates)
+    _, month_idx = np.unique(dates.year * 100 + dates.month, return_inverse=True)
+    n_months = int(month_idx.max()) + 1 if len(month_idx) else 0
+    channel_code = {name: i for i, name in enumerate(calendar.channel_names)}
+    plans = []
+    for c in calendar.campaigns:
+        weights = np.array(list(c.channels.values()), dtype=np.float64)
+        plans.append((c, c.send_days(dates).astype(np.int32), c.audience_p(),
+                      np.array([channel_code[ch] for ch in c.channels], dtype=np.int8), weights / weights.sum()))
+
+    segment = (np.asarray(is_active, dtype=np.int8) * 2 + np.asarray(is_high_value, dtype=np.int8)).astype(np.int8)
+    for c0 in range(0, len(segment), chunk_customers):
+        yield _chunk_exposures(calendar, plans, month_idx, n_months, segment[c0:c0 + chunk_customers], c0, rng)
+
+
+def schedule_exposures(calendar, dates: pd.DatetimeIndex, is_active: np.ndarray, is_high_value: np.ndarray,
+                       rng: np.random.Generator, chunk_customers: int = DEFAULT_CHUNK_CUSTOMERS) -> ExposureChunk:
+    """
+    All exposures in memory (one ExposureChunk); for very large runs use write_exposure_parts.
+    """
+    chunks = list(iter_exposure_chunks(calendar, dates, is_active, is_high_value, rng, chunk_customers))
+    if len(chunks) == 1:
+        return chunks[0]
+    return ExposureChunk(
+        *(np.concatenate([getattr(ch, f) for ch in chunks])
+          for f in ("customer", "day", "second", "campaign", "channel")),
+        dropped_by_cap=sum(ch.dropped_by_cap for ch in chunks),
+    )
+
+
+@dataclass
+class ScheduleStats:
+    customers: int = 0
+    exposures: int = 0
+    dropped_by_cap: int = 0
+    parts: int = 0
+    seconds: float = 0.0
+    exposures_per_sec: float = 0.0
+    by_campaign: dict = field(default_factory=dict)
+    # exposures per customer-month -> customer-months (exposed customer-months only; last bucket is "or more")
+    customer_months_by_exposures: dict = field(default_factory=dict)
+
+
+def contact_histogram(chunk: ExposureChunk, month_idx: np.ndarray, n_months: int) -> np.ndarray:
+    """
+    Customer-months by number of exposures (index 0..HISTOGRAM_MAX) for a customer-ordered chunk.
+    """
+    hist = np.zeros(HISTOGRAM_MAX + 1, dtype=np.int64)
+    if len(chunk):
+        cm = chunk.customer * n_months + month_idx[chunk.day]
+        starts = np.flatnonzero(np.r_[True, cm[1:] != cm[:-1]])
+        sizes = np.diff(np.r_[starts, len(cm)])
+        hist += np.bincount(np.minimum(sizes, HISTOGRAM_MAX), minlength=HISTOGRAM_MAX + 1)
+    return hist
+
+
+def write_exposure_parts(calendar, customers: pd.DataFrame, dates: pd.DatetimeIndex, out_dir: str,
+                         seed: int = 42, responder_rate: float = 0.35, fmt: str = "csv",
+                         chunk_customers: int = DEFAULT_CHUNK_CUSTOMERS) -> ScheduleStats:
+    """
+    Streams fact_crm_exposure (Bronze columns) as one part file per customer chunk into `out_dir`,
+    e.g. <csv dir>/fact_crm_exposure.csv/part-00000.csv, which Spark reads like the single CSV.
+    `customers` needs customer_id, is_active, is_high_value. No lift is injected into transactions here
+    (synth.generate does that for in-memory sizes); is_responder is drawn with responder_rate.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"fmt must be 'csv' or 'parquet', got {fmt!r}")
+    calendar = load_calendar(calendar)
+    dates = pd.DatetimeIndex(dates)
+    rng = np.random.default_rng(seed)
+    day_ts = dates.values.astype("datetime64[s]")
+    date_ids = dates.strftime("%Y%m%d").astype(int).to_numpy()
+    month_ids = (dates.year * 100 + dates.month).to_numpy()
+    _, month_idx = np.unique(month_ids, return_inverse=True)
+    n_months = int(month_idx.max()) + 1
+    customer_id = customers["customer_id"].to_numpy()
+    campaigns = pa.array(calendar.campaign_names)
+    channels = pa.array(calendar.channel_names)
+
+    if os.path.isfile(out_dir):   # a single CSV written by synth.write_csvs
+        os.remove(out_dir)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    stats = ScheduleStats(customers=len(customers))
+    by_campaign = np.zeros(len(calendar.campaigns), dtype=np.int64)
+    hist = np.zeros(HISTOGRAM_MAX + 1, dtype=np.int64)
+    t0 = time.perf_counter()
+    chunks = iter_exposure_chunks(calendar, dates, customers["is_active"].to_numpy(),
+                                  customers["is_high_value"].to_numpy(), rng, chunk_customers)
+    for part, ch in enumerate(chunks):
+        k = len(ch)
+        table = pa.table({
+            "exposure_id": np.arange(stats.exposures + 1, stats.exposures + k + 1, dtype=np.int64),
+            "customer_id": customer_id[ch.customer],
+            "exposure_ts": day_ts[ch.day] + ch.second.astype("timedelta64[s]"),
+            "message_channel": pa.DictionaryArray.from_arrays(ch.channel, channels),
+            "campaign_name": pa.DictionaryArray.from_arrays(ch.campaign, campaigns),
+            "is_responder": (rng.random(k) < responder_rate).astype(np.int32),
+            "exposure_date": day_ts[ch.day].astype("datetime64[D]"),
+            "date_id": date_ids[ch.day],
+            "month_id": month_ids[ch.day],
+        })
+        path = os.path.join(out_dir, f"part-{part:05d}.{fmt}")
+        if fmt == "csv":
+            pa_csv.write_csv(table, path)
+        else:
+            pq.write_table(table, path)
+        stats.exposures += k
+        stats.dropped_by_cap += ch.dropped_by_cap
+        stats.parts += 1
+        by_campaign += np.bincount(ch.campaign, minlength=len(by_campaign))
+        hist += contact_histogram(ch, month_idx, n_months)
+
+    stats.seconds = round(time.perf_counter() - t0, 3)
+    stats.exposures_per_sec = round(stats.exposures / stats.seconds, 1) if stats.seconds > 0 else 0.0
+    stats.by_campaign = dict(zip(calendar.campaign_names, by_campaign.tolist()))
+    stats.customer_months_by_exposures = {int(i): int(v) for i, v in enumerate(hist) if i > 0 and v}
+    return stats
@@ -0,0 +1,246 @@
+# file: crm_engine/local_spark.py
+# Purpose: Run the Bronze -> Silver -> Gold SQL stages on a local SparkSession (benchmarks, offline runs).
+#
+# The Databricks scripts use Unity Catalog (USE CATALOG, volumes). Locally there is a single
+# spark_catalog backed by a Delta warehouse directory, so catalog/volume statements are skipped
+# and the schema-qualified names (`01_silver`.x, `02_gold`.x) resolve as local databases.
+# Requires pyspark + delta-spark (pip install pyspark delta-spark) and a Java runtime.
+
+from __future__ import annotations
+
+import glob
+import os
+import re
+import shutil
+import time
+from typing import Callable, Optional
+
+DATABRICKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQL_STAGES = {
+    "ddl": os.path.join(DATABRICKS_DIR, "00_bronze", "02_databricks_ddl.sql"),
+    "silver": os.path.join(DATABRICKS_DIR, "01_silver", "04_silver_transforms.sql"),
+    "gold": os.path.join(DATABRICKS_DIR, "02_gold", "05_gold_incrementality.sql"),
+    "star": os.path.join(DATABRICKS_DIR, "02_gold", "12_gold_star_schema.sql"),
+}
+
+DELTA_JARS_ENV = "CRM_DELTA_JARS"
+
+BRONZE_SCHEMA = "00_bronze"
+GOLD_SCHEMA = "02_gold"
+
+# CSV name -> Bronze table (as in 00_bronze/03_upload_to_bronze.py)
+BRONZE_TABLES = {
+    "dim_customer": "dim_customer_bronze",
+    "dim_date": "dim_date_bronze",
+    "fact_transaction": "fact_transaction_bronze",
+    "fact_crm_exposure": "fact_crm_exposure_bronze",
+}
+
+# Gold tables exported by 02_gold/06_export_gold_to_csv.py; tables built by the Python
+# stages (07-10) are exported only when they exist.
+GOLD_EXPORT_TABLES = [
+    "fact_customer_month_incrementality",
+    "dim_customer_month_rfm",
+    "agg_incrementality_month",
+    "agg_incrementality_rfm",
+    "agg_incrementality_active_value",
+    "agg_incrementality_campaign_channel",
+    "agg_incrementality_contact_pressure",
+    "agg_response_decay",
+    "customer_uplift_scores",
+    "dim_month",
+    "dim_segment",
+    "fact_incrementality_agg",
+]
+
+# Unity Catalog statements with no local equivalent
+_SKIP_LOCAL = re.compile(r"^(USE\s+CATALOG|CREATE\s+CATALOG|CREATE\s+VOLUME)\b", re.IGNORECASE)
+_SOURCE = re.compile(r"`(\d\d_\w+)`\.`?(\w+)`?")
+_TARGET = re.compile(r"^CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([`\w.]+)", re.IGNORECASE)
+
+
+def get_local_spark(
+    warehouse_dir: str,
+    app_name: str = "crm-incrementality-local",
+    shuffle_partitions: int = 8,
+    driver_memory: str = "4g",
+    extra_conf: Optional[dict] = None,
+    delta_jars: Optional[str] = None,
+):
+    """
+    Local SparkSession with Delta Lake enabled and its warehouse under `warehouse_dir`.
+
+    Delta jars are resolved by delta-spark through the local Ivy cache (network on the very first
+    run only). For fully offline machines pass `delta_jars` (or set CRM_DELTA_JARS) to a
+    comma-separated list of local jar paths (delta-spark_*.jar, delta-storage-*.jar).
+    """
+    try:
+        from pyspark.sql import SparkSession
+        from delta import configure_spark_with_delta_pip
+    except ImportError as e:
+        raise RuntimeError("Local runs need pyspark and delta-spark: pip install pyspark delta-spark") from e
+    delta_jars = delta_jars or os.environ.get(DELTA_JARS_ENV)
+
+    warehouse_dir = os.path.abspath(warehouse_dir)
+    builder = (
+        SparkSession.builder
+        .master("local[*]")
+        .appName(app_name)
+        .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension")
+        .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog")
+        .config("spark.sql.warehouse.dir", warehouse_dir)
+        .config("spark.driver.extraJavaOptions", f"-Dderby.system.home={warehouse_dir}")
+        .config("spark.sql.shuffle.partitions", str(shuffle_partitions))
+        .config("spark.driver.memory", driver_memory)
+        .config("spark.ui.enabled", "false")
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+    )
+    for k, v in (extra_conf or {}).items():
+        builder = builder.config(k, v)
+    if delta_jars:
+        return builder.config("spark.jars", delta_jars).getOrCreate()
+    return configure_spark_with_delta_pip(builder).getOrCreate()
+
+
+def split_sql_statements(text: str) -> list[str]:
+    """
+    Splits a SQL script on `;` outside quotes, backticks and comments. Comment-only chunks are dropped.
+    """
+    statements, buf = [], []
+    i, n = 0, len(text)
+    quote: Optional[str] = None
+    while i < n:
+        ch = text[i]
+        if quote:
+            buf.append(ch)
+            if ch == quote:
+                quote = None
+            i += 1
+        elif ch in ("'", '"', "`"):
+            quote = ch
+            buf.append(ch)
+            i += 1
+        elif text.startswith("--", i):
+            j = text.find("\n", i)
+            j = n if j < 0 else j
+            buf.append(text[i:j])
+            i = j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            buf.append(text[i:j])
+            i = j
+        elif ch == ";":
+            statements.append("".join(buf))
+            buf = []
+            i += 1
+        else:
+            buf.append(ch)
+            i += 1
+    statements.append("".join(buf))
+    return [s.strip() for s in statements if strip_sql_comments(s).strip()]
+
+
+def strip_sql_comments(stmt: str) -> str:
+    stmt = re.sub(r"/\*.*?\*/", " ", stmt, flags=re.DOTALL)
+    return re.sub(r"--[^\n]*", " ", stmt)
+
+
+def statement_target(stmt: str) -> Optional[str]:
+    """
+    Table created by a statement (`01_silver`.dim_customer -> 01_silver.dim_customer), else None.
+    """
+    m = _TARGET.match(strip_sql_comments(stmt).strip())
+    return m.group(1).replace("`", "") if m else None
+
+
+def statement_sources(stmt: str) -> list[str]:
+    """
+    Layer tables a statement reads (`00_bronze`/`01_silver`/`02_gold`), excluding its own target.
+    """
+    target = statement_target(stmt)
+    found = dict.fromkeys(f"{schema}.{name}" for schema, name in _SOURCE.findall(strip_sql_comments(stmt)))
+    return [t for t in found if t != target]
+
+
+def local_statements(path: str) -> list[str]:
+    """
+    Statements of a SQL stage file, minus the Unity Catalog ones that have no local equivalent.
+    """
+    with open(path, encoding="utf-8") as f:
+        stmts = split_sql_statements(f.read())
+    return [s for s in stmts if not _SKIP_LOCAL.match(strip_sql_comments(s).strip())]
+
+
+def run_sql_file(spark, path: str, on_statement: Optional[Callable[[int, str, float], None]] = None) -> list[dict]:
+    """
+    Runs a SQL stage statement by statement; returns [{"index", "target", "seconds"}].
+    `on_statement(index, stmt, seconds)` is called after each statement.
+    """
+    out = []
+    for idx, stmt in enumerate(local_statements(path)):
+        t0 = time.perf_counter()
+        spark.sql(stmt)
+        sec = time.perf_counter() - t0
+        out.append({"index": idx, "target": statement_target(stmt), "seconds": sec})
+        if on_statement is not None:
+            on_statement(idx, stmt, sec)
+    return out
+
+
+def load_bronze_table(spark, csv_path: str, table: str) -> int:
+    """
+    Loads one synthetic CSV into its Bronze Delta table (schema from the DDL stage, which must
+    run first). Returns the row count.
+    """
+    fqn = f"`{BRONZE_SCHEMA}`.`{table}`"
+    df = (
+        spark.read
+        .option("header", "true")
+        .option("mode", "FAILFAST")
+        .option("dateFormat", "yyyy-MM-dd")
+        .option("timestampFormat", "yyyy-MM-dd HH:mm:ss")
+        .schema(spark.table(fqn).schema)
+        .csv(csv_path)
+    )
+    df.write.format("delta").mode("overwrite").option("overwriteSchema", "true").saveAsTable(fqn)
+    return spark.table(fqn).count()
+
+
+def load_bronze_csvs(spark, csv_dir: str) -> dict:
+    """
+    Loads every synthetic CSV into Bronze. Returns {table: row count}.
+    """
+    return {
+        table: load_bronze_table(spark, os.path.join(csv_dir, f"{name}.csv"), table)
+        for name, table in BRONZE_TABLES.items()
+    }
+
+
+def export_gold_table(spark, table: str, out_dir: str) -> str:
+    """
+    Local counterpart of 06_export_gold_to_csv.py for one table: a single CSV file named <table>.csv.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_dir = os.path.join(out_dir, f"__tmp_{table}")
+    final_path = os.path.join(out_dir, f"{table}.csv")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    spark.table(f"`{GOLD_SCHEMA}`.`{table}`").coalesce(1).write.mode("overwrite").option("header", "true").csv(tmp_dir)
+    parts = glob.glob(os.path.join(tmp_dir, "part-*.csv"))
+    if len(parts) != 1:
+        raise RuntimeError(f"Expected exactly 1 part CSV in {tmp_dir}, found {len(parts)}: {parts}")
+    os.replace(parts[0], final_path)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return final_path
+
+
+def export_gold_csvs(spark, out_dir: str, tables: Optional[list[str]] = None) -> dict:
+    """
+    One CSV file per existing Gold table. Returns {table: path}.
+    """
+    return {
+        t: export_gold_table(spark, t, out_dir)
+        for t in tables or GOLD_EXPORT_TABLES
+        if spark.catalog.tableExists(f"`{GOLD_SCHEMA}`.`{t}`")
+    }
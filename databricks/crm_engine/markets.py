@@ -0,0 +1,137 @@
+# file: crm_engine/markets.py
+# Purpose: Catalog / market parameters shared by every stage script, plus the market list for run_markets.py.
+#
+# A stage resolves its catalog with get_catalog(), first match wins:
+#   1) market_params(...) overrides of the current thread (set by run_markets.py per market)
+#   2) --catalog / --market in sys.argv (Databricks Python job task parameters)
+#   3) notebook widgets "catalog" / "market" (Databricks notebook job parameters)
+#   4) CRM_CATALOG / CRM_MARKET environment variables
+#   5) DEFAULT_CATALOG
+# A market without an explicit catalog maps to CATALOG_TEMPLATE (one Unity Catalog per market).
+# The "workers" parameter (get_workers(), same lookup order) caps the driver processes of the
+# multi-core Python stages (07 bootstrap, 13 uplift); run_markets.py sets it to the market's share.
+# SQL files take the catalog as a named parameter (USE CATALOG IDENTIFIER(:catalog)); sql_args()
+# returns the args for spark.sql when a statement uses it.
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+DEFAULT_CATALOG = "retail_crm_analytics"
+CATALOG_TEMPLATE = "retail_crm_analytics_{market}"
+CATALOG_PARAM = "catalog"
+MARKET_PARAM = "market"
+WORKERS_PARAM = "workers"
+
+_MARKET_NAME = re.compile(r"^[a-z0-9_]+$")
+_OVERRIDES: ContextVar[dict] = ContextVar("crm_market_overrides", default={})
+
+
+@contextmanager
+def market_params(**params: str) -> Iterator[None]:
+    """
+    Parameters seen by job_param() in the current thread (and code it calls) until the block exits.
+    """
+    token = _OVERRIDES.set({**_OVERRIDES.get(), **{k: v for k, v in params.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _OVERRIDES.reset(token)
+
+
+def _argv_param(name: str) -> Optional[str]:
+    flag = f"--{name}"
+    args = sys.argv[1:]
+    for i, a in enumerate(args):
+        if a == flag and i + 1 < len(args):
+            return args[i + 1]
+        if a.startswith(flag + "="):
+            return a.split("=", 1)[1]
+    return None
+
+
+def _widget_param(name: str) -> Optional[str]:
+    try:  # only on a Databricks cluster
+        from pyspark.dbutils import DBUtils
+        from pyspark.sql import SparkSession
+
+        value = DBUtils(SparkSession.builder.getOrCreate()).widgets.get(name)
+        return value or None
+    except Exception:
+        return None
+
+
+def job_param(name: str, default: Optional[str] = None) -> Optional[str]:
+    overrides = _OVERRIDES.get()
+    if name in overrides:
+        return overrides[name]
+    for lookup in (_argv_param, _widget_param):
+        value = lookup(name)
+        if value:
+            return value
+    return os.environ.get(f"CRM_{name.upper()}") or default
+
+
+def catalog_for_market(market: str, template: str = CATALOG_TEMPLATE) -> str:
+    market = market.strip().lower()
+    if not _MARKET_NAME.match(market):
+        raise ValueError(f"Market names are lowercase letters, digits and '_': {market!r}")
+    return template.format(market=market)
+
+
+def get_catalog() -> str:
+    catalog = job_param(CATALOG_PARAM)
+    if catalog:
+        return catalog
+    market = job_param(MARKET_PARAM)
+    return catalog_for_market(market) if market else DEFAULT_CATALOG
+
+
+def get_workers() -> Optional[int]:
+    """
+    Driver worker processes for a multi-core stage (None = the stage's default, driver cores - 1).
+    """
+    value = job_param(WORKERS_PARAM)
+    return max(1, int(value)) if value else None
+
+
+def sql_args(stmt: str, catalog: str) -> Optional[dict]:
+    """
+    Named-parameter args for spark.sql(stmt, args=...) (None when the statement has no :catalog marker).
+    """
+    return {CATALOG_PARAM: catalog} if f":{CATALOG_PARAM}" in stmt else None
+
+
+@dataclass
+class Market:
+    name: str
+    catalog: str
+
+
+def load_markets(names: Optional[list[str]] = None, config_path: Optional[str] = None,
+                 template: str = CATALOG_TEMPLATE) -> list[Market]:
+    """
+    Markets from a JSON config ([{"market": "de", "catalog": "..."}, ...]; catalog optional) and/or
+    a list of names; duplicates keep the first definition.
+    """
+    entries: list[dict] = []
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            entries.extend(json.load(f))
+    entries.extend({"market": n} for n in names or [])
+
+    markets: dict[str, Market] = {}
+    for e in entries:
+        name = str(e["market"]).strip().lower()
+        if name not in markets:
+            markets[name] = Market(name, e.get("catalog") or catalog_for_market(name, template))
+    if not markets:
+        raise ValueError("No markets given (--markets or --config)")
+    return list(markets.values())
@@ -0,0 +1,269 @@
+# file: crm_engine/matching.py
+# Purpose: Bucketed approximate nearest-neighbour matching of exposed customer-months to
+#          unexposed controls, plus a difference-in-differences (DiD) lift.
+#
+# Index design (no per-row Python loops):
+#   1) Exact strata: month, is_active, is_high_value, anchor week-of-month.
+#   2) Coarse buckets: standardized features quantized to `bin_width` standard deviations.
+#      strata + buckets -> one int64 bucket key.
+#   3) Within a bucket, controls are sorted by the primary feature (PRE revenue/day rank), so
+#      candidate lookup is one vectorized searchsorted over (bucket key + rank in [0, 1)).
+#   4) The 2k neighbours around the insertion point are re-ranked by full Euclidean distance
+#      and the k closest kept (matching with replacement).
+#   Exposed rows whose bucket has no controls are retried on strata only (coarse fallback).
+# Cost is O((n_exposed + n_controls) log n_controls) time and O(n_exposed * k) memory; the candidate
+# re-ranking runs over `chunk_rows` exposed rows at a time (O(chunk_rows * k * n_features) scratch).
+#
+# Matching never crosses a stratum, so on Spark every stratum is matched independently
+# (groupBy(STRATA).applyInPandas(did_for_stratum)); the z-score mean/std are computed once over all
+# rows (feature_stats) so buckets are the same as matching everything at once.
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+STRATA = ["month_id", "is_active", "is_high_value", "anchor_week"]
+FEATURES = ["value_score", "activity_score", "pre_rev_per_day", "pre_txn_per_day"]
+PRIMARY_FEATURE = "pre_rev_per_day"
+
+DEFAULT_K = 5
+DEFAULT_BIN_WIDTH = 0.75   # in standard deviations
+MAX_BINS_PER_FEATURE = 64
+DEFAULT_CHUNK_ROWS = 200_000   # exposed rows per re-ranking chunk
+
+DID_COLUMNS = [
+    "matched_controls",
+    "match_distance",
+    "control_pre_rev_per_day",
+    "control_post_rev_per_day",
+    "control_pre_txn_per_day",
+    "control_post_txn_per_day",
+    "did_incremental_revenue",
+    "did_incremental_transactions",
+]
+# applyInPandas output of did_for_stratum
+DID_SCHEMA = ("customer_id long, month_id long, matched_controls int, match_distance double, "
+              "control_pre_rev_per_day double, control_post_rev_per_day double, "
+              "control_pre_txn_per_day double, control_post_txn_per_day double, "
+              "did_incremental_revenue double, did_incremental_transactions double")
+
+
+def add_per_day_kpis(df: pd.DataFrame, anchor_col: str,
+                     pre_days: int = 28, post_days: int = 7) -> pd.DataFrame:
+    """
+    Per-day KPIs (same definitions as 05_gold_incrementality.sql) and the anchor week-of-month stratum.
+    """
+    out = df.copy()
+    out["pre_rev_per_day"] = out["pre_revenue"].astype(float) / pre_days
+    out["post_rev_per_day"] = out["post_revenue"].astype(float) / post_days
+    out["pre_txn_per_day"] = out["pre_txn_cnt"].astype(float) / pre_days
+    out["post_txn_per_day"] = out["post_txn_cnt"].astype(float) / post_days
+    out["anchor_week"] = (pd.to_datetime(out[anchor_col]).dt.day.to_numpy() - 1) // 7
+    return out
+
+
+def _features(df: pd.DataFrame) -> np.ndarray:
+    # revenue-like features are log1p-compressed before standardizing
+    cols = []
+    for f in FEATURES:
+        v = df[f].astype(float).fillna(0.0).to_numpy()
+        if f.startswith("pre_"):
+            v = np.log1p(np.clip(v, 0.0, None))
+        cols.append(v)
+    return np.column_stack(cols)
+
+
+def _standardize(exposed: pd.DataFrame, controls: pd.DataFrame,
+                 stats: Optional[tuple[np.ndarray, np.ndarray]] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    z-scores using the pooled mean/std of both frames, or the given (mean, std) from feature_stats.
+    """
+    fe, fc = _features(exposed), _features(controls)
+    if stats is None:
+        pooled = np.vstack([fe, fc])
+        mu, sd = pooled.mean(axis=0), pooled.std(axis=0)
+    else:
+        mu, sd = (np.asarray(s, dtype=np.float64).copy() for s in stats)
+    sd[sd == 0] = 1.0
+    return (fe - mu) / sd, (fc - mu) / sd
+
+
+def feature_stats(sdf) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pooled (mean, population std) of the transformed FEATURES over a Spark DataFrame of exposed
+    and control rows (per-day KPI columns already added), computed in one Spark aggregation.
+    """
+    from pyspark.sql import functions as F
+
+    aggs = []
+    for f in FEATURES:
+        v = F.coalesce(F.col(f).cast("double"), F.lit(0.0))
+        if f.startswith("pre_"):
+            v = F.log1p(F.greatest(v, F.lit(0.0)))
+        aggs += [F.avg(v).alias(f"mu_{f}"), F.stddev_pop(v).alias(f"sd_{f}")]
+    row = sdf.agg(*aggs).first()
+    mu = np.array([row[f"mu_{f}"] or 0.0 for f in FEATURES], dtype=np.float64)
+    sd = np.array([row[f"sd_{f}"] or 0.0 for f in FEATURES], dtype=np.float64)
+    return mu, sd
+
+
+def _strata_codes(exposed: pd.DataFrame, controls: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, int]:
+    both = pd.concat([exposed[STRATA], controls[STRATA]], ignore_index=True)
+    codes = both.groupby(STRATA, dropna=False, sort=False).ngroup().to_numpy(dtype=np.int64)
+    return codes[:len(exposed)], codes[len(exposed):], int(codes.max()) + 1 if len(codes) else 1
+
+
+def _bucket_keys(strata: np.ndarray, z: np.ndarray, bin_width: Optional[float]) -> np.ndarray:
+    """
+    strata code combined with quantized feature bins (bin_width=None -> strata only).
+    """
+    key = strata.astype(np.int64)
+    if bin_width is None:
+        return key
+    for j in range(z.shape[1]):
+        b = np.clip(np.floor(z[:, j] / bin_width).astype(np.int64) + MAX_BINS_PER_FEATURE // 2,
+                    0, MAX_BINS_PER_FEATURE - 1)
+        key = key * MAX_BINS_PER_FEATURE + b
+    return key
+
+
+def _knn_in_buckets(key_e: np.ndarray, key_c: np.ndarray,
+                    z_e: np.ndarray, z_c: np.ndarray,
+                    primary_idx: int, k: int,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For each exposed row: indices (into controls) of up to k nearest controls in the same bucket.
+    Returns (idx (n_e, k) with -1 for no match, dist (n_e, k) with inf for no match).
+    """
+    n_e = len(key_e)
+    idx_out = np.full((n_e, k), -1, dtype=np.int64)
+    dist_out = np.full((n_e, k), np.inf)
+    if n_e == 0 or len(key_c) == 0:
+        return idx_out, dist_out
+
+    # rank-normalize the primary feature to [0, 1) so bucket key + rank is a sortable composite
+    pooled = np.concatenate([z_e[:, primary_idx], z_c[:, primary_idx]])
+    ranks = pooled.argsort(kind="stable").argsort(kind="stable") / (len(pooled) + 1.0)
+    r_e, r_c = ranks[:n_e], ranks[n_e:]
+
+    # re-base keys to dense ints so key + rank stays exact in float64
+    uniq, inv = np.unique(np.concatenate([key_e, key_c]), return_inverse=True)
+    dk_e, dk_c = inv[:n_e].astype(np.float64), inv[n_e:].astype(np.float64)
+
+    order = np.argsort(dk_c + r_c, kind="stable")
+    comp_c = (dk_c + r_c)[order]
+    dk_c_sorted = dk_c[order]
+
+    offsets = np.arange(-k, k)
+    for c0 in range(0, n_e, chunk_rows):
+        c1 = min(c0 + chunk_rows, n_e)
+        seg_lo = np.searchsorted(dk_c_sorted, dk_e[c0:c1], side="left")
+        seg_hi = np.searchsorted(dk_c_sorted, dk_e[c0:c1], side="right")
+        pos = np.searchsorted(comp_c, dk_e[c0:c1] + r_e[c0:c1])
+
+        cand = pos[:, None] + offsets[None, :]                   # (chunk, 2k) sorted positions
+        valid = (cand >= seg_lo[:, None]) & (cand < seg_hi[:, None])
+        cand = np.clip(cand, 0, len(comp_c) - 1)
+        cand_ctrl = order[cand]                                  # indices into controls
+
+        diff = z_c[cand_ctrl] - z_e[c0:c1, None, :]
+        dist = np.sqrt((diff ** 2).sum(axis=2))
+        dist[~valid] = np.inf
+
+        keep = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        best_dist = np.take_along_axis(dist, keep, axis=1)
+        best_idx = np.take_along_axis(cand_ctrl, keep, axis=1)
+        best_idx[~np.isfinite(best_dist)] = -1
+        idx_out[c0:c1], dist_out[c0:c1] = best_idx, best_dist
+    return idx_out, dist_out
+
+
+def match_controls(exposed: pd.DataFrame, controls: pd.DataFrame,
+                   k: int = DEFAULT_K, bin_width: float = DEFAULT_BIN_WIDTH,
+                   stats: Optional[tuple[np.ndarray, np.ndarray]] = None,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    k-NN controls for every exposed row (bucketed pass, then strata-only fallback for rows left unmatched).
+    Both frames need STRATA + FEATURES columns (see add_per_day_kpis). `stats` = (mean, std) from
+    feature_stats when the frames are one stratum of a larger population.
+    """
+    z_e, z_c = _standardize(exposed, controls, stats)
+    s_e, s_c, _ = _strata_codes(exposed, controls)
+    primary_idx = FEATURES.index(PRIMARY_FEATURE)
+
+    idx, dist = _knn_in_buckets(_bucket_keys(s_e, z_e, bin_width), _bucket_keys(s_c, z_c, bin_width),
+                                z_e, z_c, primary_idx, k, chunk_rows)
+
+    unmatched = np.flatnonzero(idx[:, 0] < 0)
+    if len(unmatched):
+        idx2, dist2 = _knn_in_buckets(s_e[unmatched], s_c, z_e[unmatched], z_c, primary_idx, k, chunk_rows)
+        idx[unmatched], dist[unmatched] = idx2, dist2
+    return idx, dist
+
+
+def did_lift(exposed: pd.DataFrame, controls: pd.DataFrame,
+             idx: np.ndarray, dist: np.ndarray, post_days: int = 7) -> pd.DataFrame:
+    """
+    Difference-in-differences per exposed row:
+        did = [(post - pre)_exposed - mean_k (post - pre)_controls] * post_days
+    Returns one row per exposed row (aligned with `exposed`) with match diagnostics.
+    """
+    has = idx >= 0
+    n_matched = has.sum(axis=1)
+    safe_idx = np.where(has, idx, 0)
+
+    def control_mean(col: str) -> np.ndarray:
+        if controls.empty:   # a stratum without any control candidate
+            return np.full(len(idx), np.nan)
+        vals = controls[col].astype(float).to_numpy()[safe_idx]
+        vals = np.where(has, vals, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n_matched > 0, vals.sum(axis=1) / n_matched, np.nan)
+
+    c_pre_rev, c_post_rev = control_mean("pre_rev_per_day"), control_mean("post_rev_per_day")
+    c_pre_txn, c_post_txn = control_mean("pre_txn_per_day"), control_mean("post_txn_per_day")
+
+    e_delta_rev = exposed["post_rev_per_day"].to_numpy(float) - exposed["pre_rev_per_day"].to_numpy(float)
+    e_delta_txn = exposed["post_txn_per_day"].to_numpy(float) - exposed["pre_txn_per_day"].to_numpy(float)
+
+    finite = np.where(np.isfinite(dist), dist, np.nan)
+    with np.errstate(invalid="ignore"):
+        mean_dist = np.where(n_matched > 0, np.nansum(finite, axis=1) / np.maximum(n_matched, 1), np.nan)
+
+    return pd.DataFrame({
+        "matched_controls": n_matched.astype(np.int32),
+        "match_distance": mean_dist,
+        "control_pre_rev_per_day": c_pre_rev,
+        "control_post_rev_per_day": c_post_rev,
+        "control_pre_txn_per_day": c_pre_txn,
+        "control_post_txn_per_day": c_post_txn,
+        "did_incremental_revenue": (e_delta_rev - (c_post_rev - c_pre_rev)) * post_days,
+        "did_incremental_transactions": (e_delta_txn - (c_post_txn - c_pre_txn)) * post_days,
+    }, index=exposed.index)
+
+
+def did_for_stratum(pdf: pd.DataFrame, stats: tuple[np.ndarray, np.ndarray],
+                    k: int = DEFAULT_K, bin_width: float = DEFAULT_BIN_WIDTH,
+                    pre_days: int = 28, post_days: int = 7,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    applyInPandas body: one stratum of exposed + control rows (is_exposed flag, anchor_date, STRATA,
+    scores and PRE/POST columns) -> DID_SCHEMA rows for the exposed ones.
+    Rows are sorted first so tie-breaking does not depend on Spark's row order.
+    """
+    pdf = add_per_day_kpis(pdf.sort_values(["is_exposed", "customer_id"], ascending=[False, True],
+                                           kind="stable", ignore_index=True),
+                           "anchor_date", pre_days, post_days)
+    is_exposed = pdf["is_exposed"].astype(bool).to_numpy()
+    exposed, controls = pdf[is_exposed], pdf[~is_exposed]
+    if exposed.empty:
+        return pd.DataFrame(columns=["customer_id", "month_id"] + DID_COLUMNS)
+
+    idx, dist = match_controls(exposed, controls, k=k, bin_width=bin_width, stats=stats, chunk_rows=chunk_rows)
+    out = did_lift(exposed, controls, idx, dist, post_days=post_days)
+    out.insert(0, "customer_id", exposed["customer_id"].to_numpy())
+    out.insert(1, "month_id", exposed["month_id"].to_numpy())
+    return out.reset_index(drop=True)
@@ -0,0 +1,525 @@
+# file: crm_engine/quality.py
+# Purpose: Data-quality validation of the Silver/Gold tables (docs/validation_checklist.md) as a
+#          machine-readable pass / warn / fail report.
+#
+# Every table is scanned once: all metrics for a table are conditional aggregates of the same
+# SELECT (row counts, distinct keys, NULL/NaN counts, window lengths, zero shares). The Gold fact
+# is grouped by month so the per-month partials also serve the rollup checks against the Gold
+# aggregates. The sensitivity grid (PRE 14/28/56 x POST 3/7/14 days) is one range join of the
+# anchors to the transactions over the widest span (56 days before to 13 days after the anchor),
+# split into all nine windows with conditional sums. Column types come from the table schemas.
+#
+# A check fails (gates the pipeline) when a number cannot be trusted, and warns when it needs a
+# human review (zero shares, segment sign flips). The report status is the worst check status.
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Optional
+
+REPORT_VERSION = 1
+REPORT_FILE = "data_quality_report.json"
+
+PASS = "pass"
+WARN = "warn"
+FAIL = "fail"
+_RANK = {PASS: 0, WARN: 1, FAIL: 2}
+
+PRE_DAYS = 28
+POST_DAYS = 7
+SENSITIVITY_PRE = (14, 28, 56)
+SENSITIVITY_POST = (3, 7, 14)
+
+DEFAULT_THRESHOLDS = {
+    "zero_pre_share_warn": 0.75,     # share of customer-months with no PRE revenue
+    "zero_post_share_warn": 0.95,    # share of customer-months with no POST revenue
+    "zero_both_share_warn": 0.70,    # neither PRE nor POST revenue
+    "major_segment_share": 0.10,     # segments below this share of customer-months may flip sign
+    "rollup_rel_tol": 1e-6,          # aggregate vs fact sums (relative to max(|a|, |b|, 1))
+}
+
+# scan key -> (schema, table)
+TABLES = {
+    "fact": ("02_gold", "fact_customer_month_incrementality"),
+    "pre_post": ("01_silver", "customer_month_pre_post"),
+    "anchor": ("01_silver", "customer_month_exposure_anchor"),
+    "exposure": ("01_silver", "fact_crm_exposure"),
+    "dim_customer": ("01_silver", "dim_customer"),
+    "transaction": ("01_silver", "fact_transaction"),
+}
+
+# Gold aggregate -> its customer-month count column (all are grouped by month_id)
+AGG_ROLLUPS = {
+    "agg_incrementality_month": "exposed_customer_months",
+    "agg_incrementality_rfm": "customers",
+    "agg_incrementality_active_value": "customers",
+    "agg_incrementality_contact_pressure": "customers",
+}
+
+# columns that must be numeric (and, on the fact, never NULL/NaN) where present
+FACT_NUMERIC = [
+    "pre_txn_cnt", "pre_revenue", "pre_active_days",
+    "post_txn_cnt", "post_revenue", "post_active_days",
+    "pre_rev_per_day", "post_rev_per_day", "pre_aov", "post_aov",
+    "incremental_revenue", "incremental_transactions", "incremental_freq_points", "delta_aov",
+    "seasonal_adj_incremental_revenue", "seasonal_adj_incremental_transactions",
+]
+PRE_POST_NUMERIC = [
+    "pre_txn_cnt", "pre_revenue", "pre_active_days",
+    "post_txn_cnt", "post_revenue", "post_active_days",
+]
+AGG_NUMERIC = ["customers", "exposed_customer_months", "incremental_revenue", "incremental_transactions",
+               "avg_delta_aov", "seasonal_adj_incremental_revenue", "seasonal_adj_incremental_transactions"]
+
+_NUMERIC_TYPES = {"tinyint", "smallint", "int", "bigint", "float", "double"}
+
+SECTIONS = {
+    "A": "Data integrity",
+    "B": "Window sanity",
+    "C": "Sensitivity testing",
+    "D": "Zero revenue diagnostics",
+    "E": "Segment consistency",
+}
+
+
+# =======================
+# SQL (one statement per table)
+# =======================
+def fact_scan_sql(tbl: Callable[[str, str], str], numeric_cols: list[str]) -> str:
+    exprs = [
+        "month_key_yyyymm AS month_id",
+        "COUNT(*) AS row_count",
+        "COUNT(DISTINCT customer_id, month_id) AS customer_months",
+        "SUM(CASE WHEN pre_revenue = 0 THEN 1 ELSE 0 END) AS zero_pre",
+        "SUM(CASE WHEN post_revenue = 0 THEN 1 ELSE 0 END) AS zero_post",
+        "SUM(CASE WHEN pre_revenue = 0 AND post_revenue = 0 THEN 1 ELSE 0 END) AS zero_both",
+        "SUM(incremental_revenue) AS incremental_revenue",
+        "SUM(CASE WHEN incremental_revenue > 0 THEN incremental_revenue ELSE 0.0 END) AS positive_revenue",
+        "SUM(CASE WHEN incremental_revenue < 0 THEN incremental_revenue ELSE 0.0 END) AS negative_revenue",
+        "MAX(incremental_revenue) AS max_incremental_revenue",
+        "MIN(incremental_revenue) AS min_incremental_revenue",
+    ] + [
+        f"SUM(CASE WHEN {c} IS NULL OR isnan(CAST({c} AS DOUBLE)) THEN 1 ELSE 0 END) AS null_{c}"
+        for c in numeric_cols
+    ]
+    select = ",\n  ".join(exprs)
+    return f"""
+SELECT
+  {select}
+FROM {tbl(*TABLES["fact"])}
+GROUP BY month_key_yyyymm"""
+
+
+def pre_post_scan_sql(tbl: Callable[[str, str], str]) -> str:
+    return f"""
+SELECT
+  COUNT(*) AS row_count,
+  COUNT(DISTINCT customer_id, month_id) AS customer_months,
+  SUM(CASE WHEN DATEDIFF(pre_end, pre_start) + 1 <> {PRE_DAYS} OR pre_start IS NULL THEN 1 ELSE 0 END) AS bad_pre_window,
+  SUM(CASE WHEN DATEDIFF(post_end, post_start) + 1 <> {POST_DAYS} OR post_start IS NULL THEN 1 ELSE 0 END) AS bad_post_window,
+  SUM(CASE WHEN post_start <> anchor_exposure_date OR DATEDIFF(post_start, pre_end) <> 1 THEN 1 ELSE 0 END) AS bad_adjacency
+FROM {tbl(*TABLES["pre_post"])}"""
+
+
+def anchor_scan_sql(tbl: Callable[[str, str], str]) -> str:
+    return f"""
+SELECT
+  COUNT(*) AS row_count,
+  COUNT(DISTINCT customer_id, month_id) AS customer_months,
+  SUM(CASE
+        WHEN anchor_exposure_date IS NULL THEN 1
+        WHEN CAST(DATE_FORMAT(anchor_exposure_date, 'yyyyMM') AS INT)
+             <> CAST(SUBSTR(CAST(month_id AS STRING), 1, 6) AS INT) THEN 1
+        ELSE 0
+      END) AS outside_month
+FROM {tbl(*TABLES["anchor"])}"""
+
+
+def exposure_scan_sql(tbl: Callable[[str, str], str]) -> str:
+    # one pass over the exposures, each row carrying its customer-month anchor
+    return f"""
+SELECT
+  COUNT(*) AS row_count,
+  COUNT(DISTINCT e.exposure_id) AS distinct_ids,
+  COUNT(DISTINCT e.customer_id, e.exposure_ts, e.campaign_name, e.message_channel) AS distinct_events,
+  SUM(CASE WHEN a.anchor_exposure_date IS NULL THEN 1 ELSE 0 END) AS without_anchor,
+  SUM(CASE WHEN e.exposure_date < a.anchor_exposure_date THEN 1 ELSE 0 END) AS before_anchor,
+  SUM(CASE WHEN e.exposure_date = a.anchor_exposure_date THEN 1 ELSE 0 END) AS on_anchor,
+  COUNT(DISTINCT CASE WHEN e.exposure_date = a.anchor_exposure_date
+                      THEN CONCAT_WS('|', e.customer_id, e.month_id, e.campaign_name, e.message_channel) END)
+    AS distinct_on_anchor
+FROM {tbl(*TABLES["exposure"])} e
+LEFT JOIN {tbl(*TABLES["anchor"])} a
+  ON a.customer_id = e.customer_id
+ AND a.month_id = e.month_id"""
+
+
+def agg_scan_sql(tbl: Callable[[str, str], str], table: str, count_col: str) -> str:
+    return f"""
+SELECT
+  month_id,
+  COUNT(*) AS row_count,
+  SUM({count_col}) AS customer_months,
+  SUM(incremental_revenue) AS incremental_revenue
+FROM {tbl("02_gold", table)}
+GROUP BY month_id"""
+
+
+def sensitivity_scan_sql(tbl: Callable[[str, str], str]) -> str:
+    lo, hi = max(SENSITIVITY_PRE), max(SENSITIVITY_POST) - 1
+    sums = ",\n  ".join([
+        f"COALESCE(SUM(CASE WHEN day_offset BETWEEN -{d} AND -1 THEN revenue END), 0.0) AS pre_{d}"
+        for d in SENSITIVITY_PRE
+    ] + [
+        f"COALESCE(SUM(CASE WHEN day_offset BETWEEN 0 AND {d - 1} THEN revenue END), 0.0) AS post_{d}"
+        for d in SENSITIVITY_POST
+    ])
+    return f"""
+WITH anchors AS (
+  SELECT a.customer_id, a.month_id, a.anchor_exposure_date, c.is_active, c.is_high_value
+  FROM {tbl(*TABLES["anchor"])} a
+  JOIN {tbl(*TABLES["dim_customer"])} c
+    ON c.customer_id = a.customer_id
+),
+windowed AS (
+  SELECT
+    a.customer_id,
+    a.month_id,
+    a.is_active,
+    a.is_high_value,
+    DATEDIFF(t.transaction_date, a.anchor_exposure_date) AS day_offset,
+    t.revenue
+  FROM anchors a
+  LEFT JOIN {tbl(*TABLES["transaction"])} t
+    ON t.customer_id = a.customer_id
+   AND t.transaction_date BETWEEN DATE_SUB(a.anchor_exposure_date, {lo}) AND DATE_ADD(a.anchor_exposure_date, {hi})
+)
+SELECT
+  is_active,
+  is_high_value,
+  COUNT(DISTINCT customer_id, month_id) AS customer_months,
+  {sums}
+FROM windowed
+GROUP BY is_active, is_high_value"""
+
+
+# =======================
+# Evaluation (pure Python over the scan results)
+# =======================
+def is_numeric_type(dtype: str) -> bool:
+    return dtype in _NUMERIC_TYPES or dtype.startswith("decimal")
+
+
+def _num(x) -> float:
+    return 0.0 if x is None else float(x)
+
+
+def _close(a: float, b: float, rel_tol: float) -> bool:
+    return abs(a - b) <= rel_tol * max(abs(a), abs(b), 1.0)
+
+
+def _sign(x: float) -> int:
+    return (x > 0) - (x < 0)
+
+
+def _check(checks: list, check_id: str, section: str, table: str, description: str, ok: bool,
+           severity: str = FAIL, value=None, threshold=None, details=None) -> None:
+    checks.append({
+        "check_id": check_id,
+        "section": section,
+        "section_name": SECTIONS[section],
+        "table": table,
+        "description": description,
+        "severity": severity,
+        "status": PASS if ok else severity,
+        "value": value,
+        "threshold": threshold,
+        "details": details,
+    })
+
+
+def variant_lift(row: dict, pre_days: int, post_days: int) -> float:
+    """
+    Incremental revenue of a (PRE, POST) window pair from the summed window revenues:
+    sum over rows of (post / P - pre / Q) * P = post_P - pre_Q * P / Q.
+    """
+    return _num(row[f"post_{post_days}"]) - _num(row[f"pre_{pre_days}"]) * post_days / pre_days
+
+
+def _numeric_type_checks(checks: list, dtypes: dict) -> None:
+    for key, cols in (("fact", FACT_NUMERIC), ("pre_post", PRE_POST_NUMERIC)):
+        if dtypes.get(key) is not None:
+            bad = {c: t for c, t in dtypes[key] if c in cols and not is_numeric_type(t)}
+            _check(checks, f"numeric_types.{key}", "A", TABLES[key][1],
+                   "KPI columns are numeric (no text sums)", not bad, value=len(bad), threshold=0, details=bad or None)
+    for table in AGG_ROLLUPS:
+        if dtypes.get(f"agg:{table}") is not None:
+            bad = {c: t for c, t in dtypes[f"agg:{table}"] if c in AGG_NUMERIC and not is_numeric_type(t)}
+            _check(checks, f"numeric_types.{table}", "A", table,
+                   "KPI columns are numeric (no text sums)", not bad, value=len(bad), threshold=0, details=bad or None)
+
+
+def evaluate(scans: dict, dtypes: dict, thresholds: Optional[dict] = None) -> dict:
+    """
+    Builds the report from the scan rows ({"fact": [row, ...], "agg:<table>": [...], ...}, rows as
+    dicts) and the table schemas ({key: [(column, type), ...]} or None when the table is missing).
+    """
+    th = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    checks: list = []
+
+    for key, (schema, name) in TABLES.items():
+        if dtypes.get(key) is None:
+            _check(checks, f"table_present.{key}", "A", name, f"{schema}.{name} exists", False)
+    _numeric_type_checks(checks, dtypes)
+
+    # ---- Gold fact (per-month partials) ----
+    months: list = []
+    fact_by_month: dict = {}
+    total = {}
+    if scans.get("fact") is not None:
+        rows = scans["fact"]
+        total = {k: sum(_num(r[k]) for r in rows)
+                 for k in ("row_count", "customer_months", "zero_pre", "zero_post", "zero_both",
+                           "incremental_revenue", "positive_revenue", "negative_revenue")}
+        n = total["row_count"]
+        fact_by_month = {r["month_id"]: r for r in rows if r["month_id"] is not None}
+
+        dup = int(n - total["customer_months"])
+        _check(checks, "unique_customer_month.fact", "A", TABLES["fact"][1],
+               "One row per customer-month", dup == 0, value=dup, threshold=0)
+
+        missing_month = int(sum(_num(r["row_count"]) for r in rows if r["month_id"] is None))
+        _check(checks, "month_key_present.fact", "A", TABLES["fact"][1],
+               "month_key_yyyymm parsed for every row (month scoping)", missing_month == 0,
+               value=missing_month, threshold=0)
+
+        null_cols = {k[len("null_"):]: int(sum(_num(r[k]) for r in rows))
+                     for k in (rows[0] if rows else {}) if k.startswith("null_")}
+        null_cols = {c: v for c, v in null_cols.items() if v}
+        _check(checks, "numeric_not_null.fact", "A", TABLES["fact"][1],
+               "No NULL/NaN in KPI columns", not null_cols, value=sum(null_cols.values()), threshold=0,
+               details=null_cols or None)
+
+        for col, label in (("zero_pre", "PRE"), ("zero_post", "POST"), ("zero_both", "both PRE and POST")):
+            share = total[col] / n if n else 0.0
+            limit = th[f"{col}_share_warn"]
+            _check(checks, f"{col}_share", "D", TABLES["fact"][1],
+                   f"Share of customer-months with zero {label} revenue", share <= limit,
+                   severity=WARN, value=round(share, 6), threshold=limit)
+
+        for r in sorted(fact_by_month.values(), key=lambda r: r["month_id"]):
+            rc = _num(r["row_count"])
+            months.append({
+                "month_id": r["month_id"],
+                "customer_months": int(_num(r["customer_months"])),
+                "incremental_revenue": _num(r["incremental_revenue"]),
+                "positive_revenue": _num(r["positive_revenue"]),
+                "negative_revenue": _num(r["negative_revenue"]),
+                "max_incremental_revenue": _num(r["max_incremental_revenue"]),
+                "min_incremental_revenue": _num(r["min_incremental_revenue"]),
+                "zero_pre_share": _num(r["zero_pre"]) / rc if rc else 0.0,
+                "zero_post_share": _num(r["zero_post"]) / rc if rc else 0.0,
+            })
+
+    # ---- Gold aggregates vs fact (same month scope as the totals) ----
+    for table in AGG_ROLLUPS:
+        rows = scans.get(f"agg:{table}")
+        if rows is None:
+            _check(checks, f"rollup.{table}", "E", table, "Aggregate present", False, severity=WARN)
+            continue
+        if not fact_by_month:
+            continue
+        agg = {r["month_id"]: r for r in rows}
+        bad = {}
+        for m in sorted(set(agg) | set(fact_by_month), key=str):
+            a, f = agg.get(m), fact_by_month.get(m)
+            if a is None or f is None:
+                bad[str(m)] = "month missing in " + ("aggregate" if a is None else "fact")
+                continue
+            if not _close(_num(a["incremental_revenue"]), _num(f["incremental_revenue"]), th["rollup_rel_tol"]):
+                bad[str(m)] = f"incremental_revenue {_num(a['incremental_revenue']):.2f} vs fact " \
+                              f"{_num(f['incremental_revenue']):.2f}"
+            elif int(_num(a["customer_months"])) != int(_num(f["customer_months"])):
+                bad[str(m)] = f"customer-months {int(_num(a['customer_months']))} vs fact " \
+                              f"{int(_num(f['customer_months']))}"
+        _check(checks, f"rollup.{table}", "E", table,
+               "Per-month totals match the fact (segments and totals share one scope)", not bad,
+               value=len(bad), threshold=0, details=bad or None)
+
+    # ---- Silver windows and anchors ----
+    if scans.get("pre_post") is not None:
+        r = scans["pre_post"][0]
+        name = TABLES["pre_post"][1]
+        dup = int(_num(r["row_count"]) - _num(r["customer_months"]))
+        _check(checks, "unique_customer_month.pre_post", "A", name, "One row per customer-month", dup == 0,
+               value=dup, threshold=0)
+        _check(checks, "pre_window_days", "B", name, f"PRE window = {PRE_DAYS} days",
+               not _num(r["bad_pre_window"]), value=int(_num(r["bad_pre_window"])), threshold=0)
+        _check(checks, "post_window_days", "B", name, f"POST window = {POST_DAYS} days",
+               not _num(r["bad_post_window"]), value=int(_num(r["bad_post_window"])), threshold=0)
+        _check(checks, "windows_adjacent", "B", name, "POST starts on the anchor, PRE ends the day before",
+               not _num(r["bad_adjacency"]), value=int(_num(r["bad_adjacency"])), threshold=0)
+
+    if scans.get("anchor") is not None:
+        r = scans["anchor"][0]
+        name = TABLES["anchor"][1]
+        dup = int(_num(r["row_count"]) - _num(r["customer_months"]))
+        _check(checks, "unique_customer_month.anchor", "A", name, "One anchor per customer-month", dup == 0,
+               value=dup, threshold=0)
+        _check(checks, "anchor_in_month", "B", name, "Anchor date falls in its month",
+               not _num(r["outside_month"]), value=int(_num(r["outside_month"])), threshold=0)
+        if scans.get("pre_post") is not None:
+            gap = int(_num(r["row_count"]) - _num(scans["pre_post"][0]["row_count"]))
+            _check(checks, "pre_post_covers_anchors", "B", TABLES["pre_post"][1],
+                   "Every anchor has PRE/POST windows", gap == 0, value=gap, threshold=0)
+
+    if scans.get("exposure") is not None:
+        r = scans["exposure"][0]
+        name = TABLES["exposure"][1]
+        dup_ids = int(_num(r["row_count"]) - _num(r["distinct_ids"]))
+        dup_events = int(_num(r["row_count"]) - _num(r["distinct_events"]))
+        dup_anchor = int(_num(r["on_anchor"]) - _num(r["distinct_on_anchor"]))
+        _check(checks, "unique_exposure_id", "A", name, "exposure_id is unique", dup_ids == 0,
+               value=dup_ids, threshold=0)
+        _check(checks, "duplicate_exposure_events", "A", name,
+               "No repeated exposure (customer, timestamp, campaign, channel)", dup_events == 0,
+               value=dup_events, threshold=0)
+        _check(checks, "duplicate_anchor_exposures", "A", name,
+               "No duplicate exposures per customer per anchor (same campaign and channel on the anchor day)",
+               dup_anchor == 0, value=dup_anchor, threshold=0)
+        bad_anchor = int(_num(r["without_anchor"]) + _num(r["before_anchor"]))
+        _check(checks, "anchor_is_first_exposure", "B", name,
+               "Anchor = first exposure of the customer-month", bad_anchor == 0, value=bad_anchor, threshold=0)
+
+    # ---- Sensitivity grid ----
+    sensitivity = None
+    if scans.get("sensitivity") is not None:
+        rows = scans["sensitivity"]
+        all_cm = sum(_num(r["customer_months"]) for r in rows) or 1.0
+        grid = []
+        for q in SENSITIVITY_PRE:
+            for p in SENSITIVITY_POST:
+                grid.append({"pre_days": q, "post_days": p,
+                             "incremental_revenue": sum(variant_lift(r, q, p) for r in rows)})
+        default = next(g for g in grid if g["pre_days"] == PRE_DAYS and g["post_days"] == POST_DAYS)
+        base_sign = _sign(default["incremental_revenue"])
+        flipped = [f"PRE {g['pre_days']} / POST {g['post_days']}" for g in grid
+                   if _sign(g["incremental_revenue"]) != base_sign]
+        _check(checks, "sensitivity_direction", "C", TABLES["anchor"][1],
+               "Direction of total lift is stable across PRE 14/28/56 x POST 3/7/14",
+               base_sign != 0 and not flipped, value=len(flipped), threshold=0, details=flipped or None)
+
+        segments, seg_flips = [], {}
+        for r in sorted(rows, key=lambda r: (str(r["is_active"]), str(r["is_high_value"]))):
+            label = f"active={r['is_active']} high_value={r['is_high_value']}"
+            share = _num(r["customer_months"]) / all_cm
+            lifts = {f"{q}/{p}": variant_lift(r, q, p) for q in SENSITIVITY_PRE for p in SENSITIVITY_POST}
+            signs = {_sign(v) for v in lifts.values()}
+            segments.append({"segment": label, "is_active": r["is_active"], "is_high_value": r["is_high_value"],
+                             "share": share, "incremental_revenue": lifts})
+            if share >= th["major_segment_share"] and len(signs) > 1:
+                seg_flips[label] = sorted(k for k, v in lifts.items()
+                                          if _sign(v) != _sign(lifts[f"{PRE_DAYS}/{POST_DAYS}"]))
+        _check(checks, "sensitivity_segment_signs", "C", TABLES["anchor"][1],
+               "Major segments keep their sign across the sensitivity grid", not seg_flips,
+               severity=WARN, value=len(seg_flips), threshold=0, details=seg_flips or None)
+
+        if total:
+            fact_rev = total["incremental_revenue"]
+            _check(checks, "sensitivity_baseline_matches_fact", "C", TABLES["fact"][1],
+                   f"PRE {PRE_DAYS} / POST {POST_DAYS} recomputed from transactions equals the fact total",
+                   _close(default["incremental_revenue"], fact_rev, th["rollup_rel_tol"]),
+                   value=round(default["incremental_revenue"], 4), threshold=round(fact_rev, 4))
+        sensitivity = {"grid": grid, "segments": segments}
+
+    counts = {s: sum(1 for c in checks if c["status"] == s) for s in (PASS, WARN, FAIL)}
+    status = max((c["status"] for c in checks), key=_RANK.get, default=PASS)
+    return {
+        "report": "data_quality",
+        "report_version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "status": status,
+        "summary": counts,
+        "thresholds": th,
+        "totals": total,
+        "checks": checks,
+        "months": months,
+        "sensitivity": sensitivity,
+    }
+
+
+# =======================
+# Spark runner + output
+# =======================
+def _collect(spark, sql: str) -> list[dict]:
+    return [r.asDict() for r in spark.sql(sql).collect()]
+
+
+def run_validation(spark, tbl: Callable[[str, str], str], thresholds: Optional[dict] = None,
+                   log: Optional[Callable[[str], None]] = print) -> dict:
+    """
+    Scans the Silver/Gold tables (one statement per table) and returns the report.
+    `tbl(schema, name)` returns the fully qualified table name (with or without catalog).
+    """
+    log = log or (lambda _msg: None)
+    keys = dict(TABLES, **{f"agg:{t}": ("02_gold", t) for t in AGG_ROLLUPS})
+    dtypes = {}
+    for key, (schema, name) in keys.items():
+        fqn = tbl(schema, name)
+        dtypes[key] = spark.table(fqn).dtypes if spark.catalog.tableExists(fqn) else None
+
+    queries = {}
+    if dtypes["fact"] is not None:
+        fact_cols = {c for c, _ in dtypes["fact"]}
+        queries["fact"] = fact_scan_sql(tbl, [c for c in FACT_NUMERIC if c in fact_cols])
+    if dtypes["pre_post"] is not None:
+        queries["pre_post"] = pre_post_scan_sql(tbl)
+    if dtypes["anchor"] is not None:
+        queries["anchor"] = anchor_scan_sql(tbl)
+        if dtypes["exposure"] is not None:
+            queries["exposure"] = exposure_scan_sql(tbl)
+        if dtypes["dim_customer"] is not None and dtypes["transaction"] is not None:
+            queries["sensitivity"] = sensitivity_scan_sql(tbl)
+    for t, count_col in AGG_ROLLUPS.items():
+        if dtypes[f"agg:{t}"] is not None:
+            queries[f"agg:{t}"] = agg_scan_sql(tbl, t, count_col)
+
+    scans = {}
+    for key, sql in queries.items():
+        log(f"  scan {key}")
+        scans[key] = _collect(spark, sql)
+    return evaluate(scans, dtypes, thresholds)
+
+
+def _json_default(x):
+    if hasattr(x, "isoformat"):
+        return x.isoformat()
+    if isinstance(x, Decimal):
+        return float(x)
+    return str(x)
+
+
+def write_report(report: dict, path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=_json_default)
+    os.replace(tmp, path)
+    return path
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Data quality: {report['status'].upper()} "
+             f"({report['summary'][PASS]} pass, {report['summary'][WARN]} warn, {report['summary'][FAIL]} fail)"]
+    for c in report["checks"]:
+        if c["status"] != PASS:
+            lines.append(f"  [{c['status']}] {c['section']} {c['check_id']}: {c['description']} "
+                         f"(value={c['value']}, threshold={c['threshold']})")
+    return "\n".join(lines)
+
+
+def failed_checks(report: dict) -> list[str]:
+    return [c["check_id"] for c in report["checks"] if c["status"] == FAIL]
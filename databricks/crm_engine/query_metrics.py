@@ -0,0 +1,309 @@
+# file: crm_engine/query_metrics.py
+# Purpose: Per-statement Spark metrics for the Silver/Gold SQL files (which statement got slower?).
+#
+# Every statement runs in its own Spark job group. Afterwards the jobs of that group are looked up
+# in Spark's status store (filled by the scheduler listener) through the monitoring REST API
+# (/api/v1 on the driver UI), and their stages are summed: tasks, input rows/bytes, shuffle
+# read/write bytes, memory/disk spill, executor run time. Output rows come from the Delta commit
+# of the statement's target table (DESCRIBE HISTORY operationMetrics.numOutputRows).
+# Without the UI (spark.ui.enabled=false), or when it does not answer, only wall time and task
+# counts (statusTracker) are kept.
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import pandas as pd
+
+from crm_engine.local_spark import local_statements, split_sql_statements, statement_target, strip_sql_comments
+from crm_engine.markets import sql_args
+
+METRIC_COLUMNS = [
+    "run_id", "run_started_at", "sql_file", "statement_index", "target", "ctes", "status", "error",
+    "wall_seconds", "jobs", "stages", "tasks", "input_rows", "input_bytes", "output_rows",
+    "shuffle_read_bytes", "shuffle_write_bytes", "memory_spilled_bytes", "disk_spilled_bytes",
+    "executor_run_ms", "spark_version",
+]
+
+# REST stage field -> metric column (summed over all stages/attempts of the statement)
+_STAGE_FIELDS = {
+    "numTasks": "tasks",
+    "inputRecords": "input_rows",
+    "inputBytes": "input_bytes",
+    "shuffleReadBytes": "shuffle_read_bytes",
+    "shuffleWriteBytes": "shuffle_write_bytes",
+    "memoryBytesSpilled": "memory_spilled_bytes",
+    "diskBytesSpilled": "disk_spilled_bytes",
+    "executorRunTime": "executor_run_ms",
+}
+
+# named sub-queries of a statement (WITH a AS (...), b AS (...)) for readable reports
+_CTE = re.compile(r"(?:\bWITH|,)\s+([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+
+def statement_ctes(stmt: str) -> str:
+    return ",".join(dict.fromkeys(_CTE.findall(strip_sql_comments(stmt))))
+
+
+class StatusStore:
+    """
+    Reads job/stage metrics for a job group from the driver's monitoring REST API.
+    """
+
+    def __init__(self, spark, timeout: float = 10.0):
+        self.sc = spark.sparkContext
+        self.base = f"{self.sc.uiWebUrl.rstrip('/')}/api/v1/applications/{self.sc.applicationId}" \
+            if self.sc.uiWebUrl else None
+        self.timeout = timeout
+
+    @property
+    def available(self) -> bool:
+        return self.base is not None
+
+    def _get(self, path: str):
+        with urllib.request.urlopen(f"{self.base}/{path}", timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def _job(self, job_id: int) -> Optional[dict]:
+        try:
+            return self._get(f"jobs/{job_id}")
+        except urllib.error.HTTPError as e:
+            if e.code == 404:  # not in the store yet (listener bus lag)
+                return None
+            raise
+
+    def _settled_jobs(self, job_ids: list[int], settle_seconds: float) -> list[dict]:
+        # the listener bus is asynchronous: wait until the store has every job of the group finished;
+        # only the group's own jobs are looked up, finished ones are not fetched again
+        jobs: dict[int, dict] = {}
+        deadline = time.monotonic() + settle_seconds
+        while True:
+            for jid in job_ids:
+                if jid not in jobs or jobs[jid].get("status") == "RUNNING":
+                    job = self._job(jid)
+                    if job is not None:
+                        jobs[jid] = job
+            if len(jobs) == len(job_ids) and all(j.get("status") != "RUNNING" for j in jobs.values()):
+                break
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+        return list(jobs.values())
+
+    def _tracker_metrics(self, tracker, job_ids: list[int], out: dict) -> dict:
+        stage_ids = {sid for j in job_ids if (info := tracker.getJobInfo(j)) for sid in info.stageIds}
+        out["stages"] = len(stage_ids)
+        out["tasks"] = sum(s.numTasks for sid in stage_ids if (s := tracker.getStageInfo(sid)))
+        for k in _STAGE_FIELDS.values():
+            if k != "tasks":
+                out[k] = None
+        return out
+
+    def group_metrics(self, group: str, settle_seconds: float = 5.0) -> dict:
+        out = {v: 0 for v in _STAGE_FIELDS.values()}
+        tracker = self.sc.statusTracker()
+        job_ids = list(tracker.getJobIdsForGroup(group))
+        out["jobs"] = len(job_ids)
+        if not self.available:
+            return self._tracker_metrics(tracker, job_ids, out)
+
+        try:
+            jobs = self._settled_jobs(job_ids, settle_seconds)
+        except OSError:  # UI unreachable / timed out: keep the statement, report what the tracker knows
+            return self._tracker_metrics(tracker, job_ids, out)
+        stage_ids = sorted({sid for j in jobs for sid in j.get("stageIds", [])})
+        out["stages"] = 0
+        for sid in stage_ids:
+            try:
+                attempts = self._get(f"stages/{sid}")
+            except OSError:
+                continue
+            for att in attempts:
+                if att.get("status") == "SKIPPED":
+                    continue
+                out["stages"] += 1
+                for field, col in _STAGE_FIELDS.items():
+                    out[col] += int(att.get(field, 0) or 0)
+        return out
+
+
+def delta_output_rows(spark, target: Optional[str]) -> Optional[int]:
+    """
+    Rows written by the latest commit of a Delta target table (None if unknown).
+    """
+    if not target:
+        return None
+    fqn = ".".join(f"`{p}`" for p in target.split("."))
+    try:
+        row = spark.sql(f"DESCRIBE HISTORY {fqn} LIMIT 1").collect()[0]
+    except Exception:  # not a Delta table / no history access: leave unknown
+        return None
+    metrics = row["operationMetrics"] or {}
+    value = metrics.get("numOutputRows")
+    return int(value) if value is not None else None
+
+
+def run_sql_file_with_metrics(spark, path: str, run_id: Optional[str] = None,
+                              run_started_at: Optional[str] = None, stop_on_error: bool = True,
+                              local: bool = True, log=print, catalog: Optional[str] = None) -> list[dict]:
+    """
+    Runs a SQL file statement by statement and returns one metrics record per statement.
+    `local=False` keeps the Unity Catalog statements (USE CATALOG) for Databricks runs; `catalog`
+    fills their :catalog parameter.
+    """
+    run_id = run_id or new_run_id()
+    run_started_at = run_started_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+    store = StatusStore(spark)
+    sc = spark.sparkContext
+    if local:
+        statements = local_statements(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            statements = split_sql_statements(f.read())
+    records = []
+    for idx, stmt in enumerate(statements):
+        target = statement_target(stmt)
+        group = f"crm-metrics-{run_id}-{idx}"
+        sql_file = os.path.basename(path)
+        sc.setJobGroup(group, f"{sql_file} #{idx} {target or ''}".strip())
+        rec = {
+            "run_id": run_id,
+            "run_started_at": run_started_at,
+            "sql_file": sql_file,
+            "statement_index": idx,
+            "target": target,
+            "ctes": statement_ctes(stmt),
+            "status": "ok",
+            "error": None,
+            "spark_version": spark.version,
+        }
+        t0 = time.perf_counter()
+        try:
+            spark.sql(stmt, args=sql_args(stmt, catalog) if catalog else None)
+        except Exception as e:
+            rec["status"] = "failed"
+            rec["error"] = str(e)[:2000]
+        rec["wall_seconds"] = time.perf_counter() - t0
+        sc.setLocalProperty("spark.jobGroup.id", None)
+
+        rec.update(store.group_metrics(group))
+        rec["output_rows"] = delta_output_rows(spark, target) if rec["status"] == "ok" else None
+        records.append(rec)
+        if log is not None:
+            log(f"  #{idx:<2} {target or '(statement)':<50} {rec['wall_seconds']:8.2f}s  tasks={rec['tasks']}"
+                f"  shuffle_w={_mb(rec['shuffle_write_bytes'])}  spill={_mb(rec['disk_spilled_bytes'])}"
+                f"  {rec['status']}")
+        if rec["status"] == "failed" and stop_on_error:
+            break
+    return records
+
+
+def new_run_id() -> str:
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+def _mb(value: Optional[int]) -> str:
+    return "n/a" if value is None else f"{value / 2 ** 20:,.1f}MB"
+
+
+def records_to_pandas(records: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(records)
+    for c in METRIC_COLUMNS:
+        if c not in df.columns:
+            df[c] = None
+    return df[METRIC_COLUMNS]
+
+
+def append_metrics_table(spark, records: list[dict], table_fqn: str) -> None:
+    """
+    Appends metrics records to a Delta table (created on first append).
+    """
+    from pyspark.sql.types import (
+        StructType, StructField, StringType, IntegerType, LongType, DoubleType
+    )
+    longs = {"jobs", "stages", "tasks", "input_rows", "input_bytes", "output_rows", "shuffle_read_bytes",
+             "shuffle_write_bytes", "memory_spilled_bytes", "disk_spilled_bytes", "executor_run_ms"}
+    schema = StructType([
+        StructField(c, LongType() if c in longs else DoubleType() if c == "wall_seconds"
+                    else IntegerType() if c == "statement_index" else StringType(), True)
+        for c in METRIC_COLUMNS
+    ])
+    rows = [tuple(r.get(c) for c in METRIC_COLUMNS) for r in records]
+    spark.createDataFrame(rows, schema).write.format("delta").mode("append").saveAsTable(table_fqn)
+
+
+def append_metrics_parquet(records: list[dict], path: str) -> str:
+    """
+    Local mode: one Parquet file per run under `path` (a folder readable as a single dataset).
+    """
+    os.makedirs(path, exist_ok=True)
+    df = records_to_pandas(records)
+    out = os.path.join(path, f"run_{df['run_id'].iloc[0]}.parquet")
+    df.to_parquet(out, index=False)
+    return out
+
+
+def compare_runs(metrics: pd.DataFrame, run_id: Optional[str] = None,
+                 baseline_run_id: Optional[str] = None, min_seconds: float = 0.5) -> pd.DataFrame:
+    """
+    Statement-level comparison of one run against a baseline run (defaults: latest vs previous).
+    Rows are keyed by (sql_file, target, statement_index) and sorted by wall-time increase.
+    """
+    runs = (metrics[["run_id", "run_started_at"]].drop_duplicates("run_id")
+            .sort_values(["run_started_at", "run_id"])["run_id"].tolist())
+    if not runs:
+        raise ValueError("No metrics runs recorded yet.")
+    run_id = run_id or runs[-1]
+    if baseline_run_id is None:
+        earlier = runs[:runs.index(run_id)] if run_id in runs else []
+        if not earlier:
+            raise ValueError(f"No earlier run to compare {run_id} with.")
+        baseline_run_id = earlier[-1]
+
+    keys = ["sql_file", "statement_index", "target"]
+    cols = ["wall_seconds", "tasks", "input_rows", "output_rows", "shuffle_read_bytes", "shuffle_write_bytes",
+            "disk_spilled_bytes"]
+    cur = metrics[metrics["run_id"] == run_id][keys + cols]
+    base = metrics[metrics["run_id"] == baseline_run_id][keys + cols]
+    df = cur.merge(base, on=keys, how="outer", suffixes=("", "_baseline"))
+    for c in cols:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+        df[f"{c}_baseline"] = pd.to_numeric(df[f"{c}_baseline"], errors="coerce")
+    df["wall_delta_seconds"] = df["wall_seconds"] - df["wall_seconds_baseline"]
+    df["wall_ratio"] = df["wall_seconds"] / df["wall_seconds_baseline"].where(df["wall_seconds_baseline"] > 0)
+    df["shuffle_write_ratio"] = (df["shuffle_write_bytes"]
+                                 / df["shuffle_write_bytes_baseline"].where(df["shuffle_write_bytes_baseline"] > 0))
+    df["flag"] = ""
+    slower = (df["wall_delta_seconds"] > min_seconds) & (df["wall_ratio"] > 1.2)
+    df.loc[slower, "flag"] = "slower"
+    df.loc[(df["disk_spilled_bytes"].fillna(0) > 0) & (df["disk_spilled_bytes_baseline"].fillna(0) == 0), "flag"] += \
+        " new-spill"
+    df["flag"] = df["flag"].str.strip()
+    df.insert(0, "run_id", run_id)
+    df.insert(1, "baseline_run_id", baseline_run_id)
+    return df.sort_values("wall_delta_seconds", ascending=False, na_position="last").reset_index(drop=True)
+
+
+def format_comparison(df: pd.DataFrame, top: int = 30) -> str:
+    if df.empty:
+        return "No statements to compare."
+    lines = [f"Run {df['run_id'].iloc[0]} vs baseline {df['baseline_run_id'].iloc[0]}",
+             f"{'file':<28}{'#':>3}  {'target':<48}{'now s':>9}{'base s':>9}{'ratio':>7}"
+             f"{'shuffle_w MB':>14}{'spill MB':>10}  flag"]
+    for r in df.head(top).itertuples():
+        ratio = f"{r.wall_ratio:.2f}" if pd.notna(r.wall_ratio) else "-"
+        sw = f"{r.shuffle_write_bytes / 2 ** 20:,.1f}" if pd.notna(r.shuffle_write_bytes) else "-"
+        sp = f"{r.disk_spilled_bytes / 2 ** 20:,.1f}" if pd.notna(r.disk_spilled_bytes) else "-"
+        now = f"{r.wall_seconds:.2f}" if pd.notna(r.wall_seconds) else "-"
+        base = f"{r.wall_seconds_baseline:.2f}" if pd.notna(r.wall_seconds_baseline) else "-"
+        lines.append(f"{str(r.sql_file):<28}{int(r.statement_index):>3}  {str(r.target):<48}{now:>9}{base:>9}"
+                     f"{ratio:>7}{sw:>14}{sp:>10}  {r.flag}")
+    return "\n".join(lines)
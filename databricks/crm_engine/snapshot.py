@@ -0,0 +1,339 @@
+# file: crm_engine/snapshot.py
+# Purpose: Executive snapshot - everything the Streamlit pages 1-3 display (KPI cards, chart series,
+#          top / bottom segments and narrative inputs for every month), built once from the three
+#          aggregate exports and written next to them as executive_snapshot.json.
+#
+# Written by the export stage (02_gold/06_export_gold_to_csv.py, run_pipeline.py stage
+# export.executive_snapshot). The app (streamlit_app/utils/snapshot.py) renders from the file and,
+# when it is missing, from an older format or out of date with the CSVs (sha256 per source file,
+# snapshot_is_current), builds it in-process with the same build_snapshot.
+# Pandas only (no Spark / Streamlit): UC Volumes are read through the driver's local file API.
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from crm_engine.customer_sets import distinct_customers_by, has_customer_sets, union_count
+
+SNAPSHOT_FILE = "executive_snapshot.json"
+SNAPSHOT_VERSION = 1
+
+MONTH_FILE = "agg_incrementality_month.csv"
+RFM_FILE = "agg_incrementality_rfm.csv"
+ACTIVE_VALUE_FILE = "agg_incrementality_active_value.csv"
+SOURCE_FILES = [MONTH_FILE, RFM_FILE, ACTIVE_VALUE_FILE]
+
+
+def _num(x) -> Optional[float]:
+    """
+    JSON-safe float (NaN / inf -> None).
+    """
+    if x is None:
+        return None
+    v = float(x)
+    return None if math.isnan(v) or math.isinf(v) else v
+
+
+def _nums(values) -> list:
+    return [_num(v) for v in values]
+
+
+def file_sha256(path: Path | str) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _month_fields(df: pd.DataFrame, month_col: str) -> pd.DataFrame:
+    # month_id_norm (string month key) + month_label (falls back to it), as the app pages derive them
+    if df.empty:
+        return pd.DataFrame(columns=[*df.columns, *(c for c in ["month_id_norm", "month_label"] if c not in df)])
+    out = df.copy()
+    if month_col not in out.columns:
+        out["month_id_norm"] = "Unknown"
+        out["month_label"] = "Unknown"
+        return out
+    out["month_id_norm"] = out[month_col].astype(str).fillna("Unknown")
+    if "month_label" not in out.columns:
+        out["month_label"] = out["month_id_norm"]
+    else:
+        out["month_label"] = out["month_label"].astype(str).fillna(out["month_id_norm"])
+    return out
+
+
+def _sort_month(df: pd.DataFrame) -> pd.DataFrame:
+    # 'YYYYMM' and 'YYYY-MM' month keys sort together
+    if df.empty or "month_id_norm" not in df.columns:
+        return df
+    def _key(x) -> str:
+        s = str(x)
+        return s.replace("-", "") if len(s) == 7 and s[4] == "-" else s
+
+    return df.assign(_sort_key=df["month_id_norm"].map(_key)).sort_values("_sort_key").drop(columns=["_sort_key"])
+
+
+# =======================
+# Page 1: Summary
+# =======================
+def _summary_section(agg_month: pd.DataFrame, agg_rfm: pd.DataFrame) -> dict:
+    agg_month = _sort_month(_month_fields(agg_month, "month_id"))
+    agg_rfm = _sort_month(_month_fields(agg_rfm, "month_id"))
+
+    kpis = {
+        "total_inc_rev": _num(agg_month["incremental_revenue"].sum()) if len(agg_month) else 0.0,
+        "total_inc_txn": _num(agg_month["incremental_transactions"].sum()) if len(agg_month) else 0.0,
+        "avg_delta_aov": _num(agg_month["avg_delta_aov"].mean()) if len(agg_month) else 0.0,
+    }
+
+    # Bootstrap CIs are present when 07_bootstrap_confidence_intervals.py ran before the export
+    trend = {
+        "month_label": agg_month["month_label"].tolist(),
+        "incremental_revenue": _nums(agg_month["incremental_revenue"]),
+    }
+    has_ci = {"incremental_revenue_ci_low", "incremental_revenue_ci_high"}.issubset(agg_month.columns)
+    noisy = None
+    if has_ci:
+        trend["error_plus"] = _nums(agg_month["incremental_revenue_ci_high"] - agg_month["incremental_revenue"])
+        trend["error_minus"] = _nums(agg_month["incremental_revenue"] - agg_month["incremental_revenue_ci_low"])
+        if "incremental_revenue_ci_excludes_zero" in agg_month.columns:
+            excludes = agg_month["incremental_revenue_ci_excludes_zero"].astype(bool)
+            noisy = [str(x) for x in agg_month.loc[~excludes, "month_label"]]
+
+    months = sorted(m for m in agg_rfm["month_id_norm"].unique().tolist() if m != "Unknown")
+    by_month = {}
+    for month, rfm_m in agg_rfm.groupby("month_id_norm", sort=False):
+        if month == "Unknown":
+            continue
+        rfm_m = rfm_m.fillna({"rfm_segment": "Unknown"}).sort_values("incremental_revenue", ascending=False)
+        segments = rfm_m["rfm_segment"].astype(str).tolist()
+        revenue = _nums(rfm_m["incremental_revenue"])
+        by_month[month] = {
+            "label": str(rfm_m["month_label"].iloc[0]),
+            "segments": {"rfm_segment": segments, "incremental_revenue": revenue},
+            "top_segment": {"rfm_segment": segments[0], "incremental_revenue": revenue[0]},
+            "bottom_segment": {"rfm_segment": segments[-1], "incremental_revenue": revenue[-1]},
+            # narrative_summary(**narrative)
+            "narrative": {**kpis, "top_segment": segments[0]},
+        }
+
+    return {
+        "rows": {"agg_month": len(agg_month), "agg_rfm": len(agg_rfm)},
+        "kpis": kpis,
+        "trend": trend,
+        "has_ci": has_ci,
+        "noisy_months": noisy,
+        "months": months,
+        "by_month": by_month,
+    }
+
+
+# =======================
+# Page 2: Customer Value
+# =======================
+def _cell(row: pd.Series) -> dict:
+    return {"active_group": row["active_group"], "value_group": row["value_group"],
+            "incremental_revenue": _num(row["incremental_revenue"])}
+
+
+def _value_section(df: pd.DataFrame) -> dict:
+    df = _sort_month(_month_fields(df, "month_id"))
+    df["is_active"] = df["is_active"].astype(int)
+    df["is_high_value"] = df["is_high_value"].astype(int)
+    df["value_group"] = df["is_high_value"].map({0: "Low Value", 1: "High Value"})
+    df["active_group"] = df["is_active"].map({0: "Non-Active", 1: "Active"})
+
+    months = sorted(m for m in df["month_id_norm"].unique().tolist() if m != "Unknown")
+    by_month = {}
+    for month, m in df.groupby("month_id_norm", sort=False):
+        if month == "Unknown":
+            continue
+        kpis = {
+            "inc_all": _num(m["incremental_revenue"].sum()),
+            "inc_hv": _num(m.loc[m["is_high_value"] == 1, "incremental_revenue"].sum()),
+            "inc_lv": _num(m.loc[m["is_high_value"] == 0, "incremental_revenue"].sum()),
+        }
+        v = m.groupby("value_group", as_index=False)["incremental_revenue"].sum()
+        pivot = m.groupby(["active_group", "value_group"], as_index=False).agg(
+            incremental_revenue=("incremental_revenue", "sum"),
+            incremental_transactions=("incremental_transactions", "sum"),
+            avg_delta_aov=("avg_delta_aov", "mean"),
+            customers=("customers", "sum"),
+        )
+        # distinct customers from set unions when the export carries customer sets (summing COUNT DISTINCT over-counts)
+        pivot["customers"] = distinct_customers_by(m, ["active_group", "value_group"]).to_numpy()
+        ranked = pivot.sort_values("incremental_revenue", ascending=False)
+        by_month[month] = {
+            "rows": len(m),
+            "kpis": kpis,
+            # narrative_value_split(**narrative)
+            "narrative": kpis,
+            "by_value": {"value_group": v["value_group"].tolist(), "incremental_revenue": _nums(v["incremental_revenue"])},
+            "split": [
+                {
+                    "active_group": r.active_group,
+                    "value_group": r.value_group,
+                    "incremental_revenue": _num(r.incremental_revenue),
+                    "incremental_transactions": _num(r.incremental_transactions),
+                    "avg_delta_aov": _num(r.avg_delta_aov),
+                    "customers": int(r.customers),
+                }
+                for r in pivot.sort_values(["active_group", "value_group"]).itertuples(index=False)
+            ],
+            "top_segment": _cell(ranked.iloc[0]),
+            "bottom_segment": _cell(ranked.iloc[-1]),
+        }
+    return {"rows": len(df), "months": months, "by_month": by_month}
+
+
+# =======================
+# Page 3: Active vs Non-Active
+# =======================
+def _active_section(df: pd.DataFrame) -> dict:
+    if "is_active" not in df.columns:
+        return {"error": f"Column 'is_active' not found in {ACTIVE_VALUE_FILE}"}
+    for col in ["incremental_revenue", "incremental_transactions", "avg_delta_aov", "customers", "is_active"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    df = _sort_month(_month_fields(df, "month_id"))
+    df["is_active"] = df["is_active"].astype(int)
+
+    keys = ["month_id_norm", "month_label", "is_active"]
+    by_month_active = df.groupby(keys, as_index=False).agg(
+        customers=("customers", "sum"),
+        incremental_revenue=("incremental_revenue", "sum"),
+        incremental_transactions=("incremental_transactions", "sum"),
+        avg_delta_aov=("avg_delta_aov", "mean"),
+    )
+    by_month_active["customers"] = distinct_customers_by(df, keys).to_numpy()
+    by_month_active["active_group"] = by_month_active["is_active"].map({0: "Non-Active", 1: "Active"})
+
+    months = sorted(m for m in by_month_active["month_id_norm"].unique().tolist() if m != "Unknown")
+    if not months:
+        return {"error": "No valid months found in data. Check 'month_id' values in the CSV."}
+
+    rows = [
+        {
+            "month_id_norm": r.month_id_norm,
+            "month_label": r.month_label,
+            "is_active": int(r.is_active),
+            "active_group": r.active_group,
+            "customers": int(r.customers),
+            "incremental_revenue": _num(r.incremental_revenue),
+            "incremental_transactions": _num(r.incremental_transactions),
+            "avg_delta_aov": _num(r.avg_delta_aov),
+        }
+        for r in by_month_active.itertuples(index=False)
+    ]
+    trend = {}
+    for group, g in by_month_active.groupby("active_group", sort=False):
+        trend[group] = {
+            "month_label": g["month_label"].tolist(),
+            "incremental_revenue": _nums(g["incremental_revenue"]),
+            "incremental_transactions": _nums(g["incremental_transactions"]),
+        }
+
+    by_month = {}
+    for month, m in by_month_active.groupby("month_id_norm", sort=False):
+        active, nonactive = m[m["is_active"] == 1], m[m["is_active"] == 0]
+        kpis = {
+            "active_rev": _num(active["incremental_revenue"].sum()),
+            "nonactive_rev": _num(nonactive["incremental_revenue"].sum()),
+            "active_txn": _num(active["incremental_transactions"].sum()),
+            "nonactive_txn": _num(nonactive["incremental_transactions"].sum()),
+        }
+        ranked = m.sort_values("incremental_revenue", ascending=False)
+        by_month[month] = {
+            "label": str(m["month_label"].iloc[0]),
+            "kpis": kpis,
+            # narrative_active_vs_nonactive(**narrative)
+            "narrative": kpis,
+            "bars": {"active_group": m["active_group"].tolist(),
+                     "incremental_transactions": _nums(m["incremental_transactions"])},
+            "top_segment": str(ranked["active_group"].iloc[0]),
+            "bottom_segment": str(ranked["active_group"].iloc[-1]),
+        }
+
+    distinct = None
+    if has_customer_sets(df):
+        distinct = {
+            "active": union_count(df.loc[df["is_active"] == 1, "customer_set"]),
+            "nonactive": union_count(df.loc[df["is_active"] == 0, "customer_set"]),
+        }
+
+    return {
+        "rows": len(df),
+        "months": months,
+        "by_month": by_month,
+        "trend": trend,
+        "detail": rows,   # by_month_active, sorted by month and is_active
+        "distinct_customers": distinct,
+    }
+
+
+# =======================
+# Build / write
+# =======================
+def export_paths(folder: str) -> dict[str, Optional[Path]]:
+    """
+    Source file -> path in `folder` (None when the export is missing).
+    """
+    paths = {name: Path(folder) / name for name in SOURCE_FILES}
+    return {name: p if p.is_file() else None for name, p in paths.items()}
+
+
+def build_snapshot(folder: str, paths: Optional[dict] = None,
+                   missing_message: Optional[Callable[[str], str]] = None) -> dict:
+    """
+    Snapshot of the exports in `folder` (or of the resolved `paths`, source file -> path or None).
+    A section whose source is missing or empty carries {"error": missing_message(file)} instead.
+    """
+    paths = export_paths(folder) if paths is None else paths
+    missing_message = missing_message or (lambda name: f"Missing required file: '{name}' in {folder}")
+    frames = {name: pd.read_csv(p) if p is not None else pd.DataFrame() for name, p in paths.items()}
+
+    def missing(*names):
+        gone = [n for n in names if frames[n].empty]
+        return {"error": missing_message(gone[0])} if gone else None
+
+    return {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sources": {
+            name: {"bytes": Path(p).stat().st_size, "sha256": file_sha256(p)}
+            for name, p in paths.items() if p is not None
+        },
+        "summary": missing(MONTH_FILE, RFM_FILE) or _summary_section(frames[MONTH_FILE], frames[RFM_FILE]),
+        "value": missing(ACTIVE_VALUE_FILE) or _value_section(frames[ACTIVE_VALUE_FILE].copy()),
+        "active": missing(ACTIVE_VALUE_FILE) or _active_section(frames[ACTIVE_VALUE_FILE].copy()),
+    }
+
+
+def write_snapshot(folder: str, out_path: Optional[str] = None) -> str:
+    """
+    Builds the snapshot of `folder` and writes it (compact JSON, atomic replace). Returns the path.
+    """
+    out_path = out_path or os.path.join(folder, SNAPSHOT_FILE)
+    snapshot = build_snapshot(folder)
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"), allow_nan=False)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def snapshot_is_current(snapshot: dict, paths: dict, sha256: Callable[[Path], str] = file_sha256) -> bool:
+    """
+    True when `snapshot` has the current format and was built from exactly these source files.
+    """
+    if snapshot.get("snapshot_version") != SNAPSHOT_VERSION:
+        return False
+    recorded = snapshot.get("sources", {})
+    if set(recorded) != {n for n, p in paths.items() if p is not None}:
+        return False
+    return all(recorded[n]["sha256"] == sha256(p) for n, p in paths.items() if p is not None)
@@ -0,0 +1,438 @@
+# file: crm_engine/streaming.py
+# Purpose: Streaming pre/post: per-customer event-time state that emits a finalized customer-month
+#          incrementality row as soon as the anchor's 7-day POST window closes on the watermark.
+#
+# Exposures and transactions are one event stream keyed by customer_id. Per customer the state
+# holds daily revenue / transaction buckets and the open anchors (first exposure per customer-month):
+#   - a transaction adds to its day bucket
+#   - an exposure opens the month's anchor (or moves it earlier while the window is still open)
+#   - once watermark day > anchor + 6 the POST window can no longer change: the row is emitted with
+#     the same PRE 28 / POST 7 KPIs as 02_gold.fact_customer_month_incrementality, and the month is
+#     remembered as closed (later exposures in it are ignored) until the month itself is behind the
+#     watermark
+#   - buckets older than 28 days before min(watermark, oldest open anchor) are evicted, so a
+#     customer's state never spans more than PRE + POST days + the watermark delay
+# Events older than the watermark that can no longer affect an open window are dropped and counted.
+#
+# The state machine (advance) is plain Python; on Spark it runs inside
+# groupBy(customer_id).applyInPandasWithState with an event-time timeout, so windows also close for
+# customers that receive no further events. replay() runs the same code over ordered micro-batches
+# without Spark (local tests, and the reference for the streaming job).
+# Seasonal adjustment and RFM are left to the monthly batch; streaming rows are the early read.
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+PRE_DAYS = 28
+POST_DAYS = 7
+
+EXPOSURE = "exposure"
+TRANSACTION = "transaction"
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_MS_PER_DAY = 86_400_000
+
+# landing-file schemas (column order of the Bronze DDL / synthetic CSVs)
+TRANSACTION_SCHEMA = (
+    "transaction_id BIGINT, customer_id BIGINT, transaction_ts TIMESTAMP, channel STRING, revenue DOUBLE, "
+    "items INT, transaction_date DATE, date_id INT, month_id INT"
+)
+EXPOSURE_SCHEMA = (
+    "exposure_id BIGINT, customer_id BIGINT, exposure_ts TIMESTAMP, message_channel STRING, "
+    "campaign_name STRING, is_responder INT, exposure_date DATE, date_id INT, month_id INT"
+)
+
+OUTPUT_COLUMNS = [
+    "customer_id", "month_id", "month_key_yyyymm", "anchor_exposure_date",
+    "pre_txn_cnt", "pre_revenue", "pre_active_days",
+    "post_txn_cnt", "post_revenue", "post_active_days",
+    "pre_rev_per_day", "post_rev_per_day", "pre_txn_per_day", "post_txn_per_day",
+    "pre_freq", "post_freq", "pre_aov", "post_aov",
+    "incremental_revenue", "incremental_transactions", "incremental_freq_points", "delta_aov",
+    "finalized_at_watermark",
+]
+OUTPUT_SCHEMA = (
+    "customer_id BIGINT, month_id INT, month_key_yyyymm INT, anchor_exposure_date DATE, "
+    "pre_txn_cnt BIGINT, pre_revenue DOUBLE, pre_active_days BIGINT, "
+    "post_txn_cnt BIGINT, post_revenue DOUBLE, post_active_days BIGINT, "
+    "pre_rev_per_day DOUBLE, post_rev_per_day DOUBLE, pre_txn_per_day DOUBLE, post_txn_per_day DOUBLE, "
+    "pre_freq DOUBLE, post_freq DOUBLE, pre_aov DOUBLE, post_aov DOUBLE, "
+    "incremental_revenue DOUBLE, incremental_transactions DOUBLE, incremental_freq_points DOUBLE, "
+    "delta_aov DOUBLE, finalized_at_watermark DATE"
+)
+STATE_SCHEMA = "payload STRING"
+
+
+def day_of(x) -> int:
+    """Day ordinal of a date / datetime / pandas Timestamp."""
+    if isinstance(x, datetime):
+        return x.date().toordinal()
+    return x.toordinal()
+
+
+def ms_to_day(ms: int) -> int:
+    return _EPOCH_ORDINAL + int(ms) // _MS_PER_DAY
+
+
+def day_to_ms(day: int) -> int:
+    return (day - _EPOCH_ORDINAL) * _MS_PER_DAY
+
+
+def _month_end_day(month_id: int) -> int:
+    m = int(str(month_id)[:6])
+    y, mo = divmod(m, 100)
+    nxt = date(y + (mo == 12), 1 if mo == 12 else mo + 1, 1)
+    return nxt.toordinal() - 1
+
+
+@dataclass
+class CustomerState:
+    days: dict = field(default_factory=dict)      # day ordinal -> [revenue, txn_cnt]
+    anchors: dict = field(default_factory=dict)   # month_id -> anchor day ordinal (POST window open)
+    closed: dict = field(default_factory=dict)    # month_id -> month end ordinal (row already emitted)
+
+    def is_empty(self) -> bool:
+        return not (self.days or self.anchors or self.closed)
+
+    def to_json(self) -> str:
+        return json.dumps({"d": self.days, "a": self.anchors, "c": self.closed}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "CustomerState":
+        raw = json.loads(payload)
+        # JSON object keys are strings
+        return cls(
+            days={int(k): v for k, v in raw["d"].items()},
+            anchors={int(k): v for k, v in raw["a"].items()},
+            closed={int(k): v for k, v in raw["c"].items()},
+        )
+
+
+@dataclass
+class AdvanceStats:
+    emitted: int = 0
+    late_dropped: int = 0
+    evicted_days: int = 0
+
+
+def keep_from(st: CustomerState, watermark_day: int) -> int:
+    """First day bucket that an open or future anchor can still read (its PRE window start)."""
+    return min([watermark_day] + list(st.anchors.values())) - PRE_DAYS
+
+
+def _window(st: CustomerState, start: int, days: int) -> tuple[float, int, int]:
+    rev, txn, active = 0.0, 0, 0
+    for d in range(start, start + days):
+        b = st.days.get(d)
+        if b is not None:
+            rev += b[0]
+            txn += b[1]
+            active += 1 if b[1] > 0 else 0
+    return rev, txn, active
+
+
+def pre_post_row(st: CustomerState, customer_id: int, month_id: int, anchor_day: int, watermark_day: int) -> dict:
+    """
+    KPIs of one finalized customer-month, as in 05_gold_incrementality.sql (PRE 28 / POST 7 days).
+    """
+    pre_rev, pre_txn, pre_active = _window(st, anchor_day - PRE_DAYS, PRE_DAYS)
+    post_rev, post_txn, post_active = _window(st, anchor_day, POST_DAYS)
+    pre_rev_pd, post_rev_pd = pre_rev / PRE_DAYS, post_rev / POST_DAYS
+    pre_txn_pd, post_txn_pd = pre_txn / PRE_DAYS, post_txn / POST_DAYS
+    pre_freq, post_freq = pre_active / PRE_DAYS, post_active / POST_DAYS
+    pre_aov = pre_rev_pd / pre_txn_pd if pre_txn_pd > 0 else 0.0
+    post_aov = post_rev_pd / post_txn_pd if post_txn_pd > 0 else 0.0
+    return {
+        "customer_id": customer_id,
+        "month_id": month_id,
+        "month_key_yyyymm": int(str(month_id)[:6]),
+        "anchor_exposure_date": date.fromordinal(anchor_day),
+        "pre_txn_cnt": pre_txn,
+        "pre_revenue": pre_rev,
+        "pre_active_days": pre_active,
+        "post_txn_cnt": post_txn,
+        "post_revenue": post_rev,
+        "post_active_days": post_active,
+        "pre_rev_per_day": pre_rev_pd,
+        "post_rev_per_day": post_rev_pd,
+        "pre_txn_per_day": pre_txn_pd,
+        "post_txn_per_day": post_txn_pd,
+        "pre_freq": pre_freq,
+        "post_freq": post_freq,
+        "pre_aov": pre_aov,
+        "post_aov": post_aov,
+        "incremental_revenue": (post_rev_pd - pre_rev_pd) * POST_DAYS,
+        "incremental_transactions": (post_txn_pd - pre_txn_pd) * POST_DAYS,
+        "incremental_freq_points": (post_freq - pre_freq) * POST_DAYS,
+        "delta_aov": post_aov - pre_aov,
+        "finalized_at_watermark": date.fromordinal(watermark_day),
+    }
+
+
+def advance(st: CustomerState, customer_id: int, events: Iterable[tuple], watermark_day: int,
+            stats: Optional[AdvanceStats] = None) -> tuple[list[dict], Optional[int]]:
+    """
+    Applies `events` ((kind, day, month_id, revenue) tuples) to one customer's state, emits the
+    customer-months whose POST window closed (anchor + POST_DAYS <= watermark_day) and evicts what
+    no window can read any more. Returns (rows, next timeout day or None).
+    """
+    stats = stats if stats is not None else AdvanceStats()
+    for kind, day, month_id, revenue in events:
+        if kind == TRANSACTION:
+            if day < keep_from(st, watermark_day):
+                stats.late_dropped += 1
+                continue
+            b = st.days.setdefault(day, [0.0, 0])
+            b[0] += float(revenue)
+            b[1] += 1
+        else:
+            if month_id in st.closed:
+                continue  # the month's row is out; later exposures do not move its anchor
+            if day < watermark_day:
+                stats.late_dropped += 1  # its PRE days may already be evicted
+                continue
+            prev = st.anchors.get(month_id)
+            if prev is None or day < prev:
+                st.anchors[month_id] = day
+
+    rows = []
+    for month_id, anchor_day in sorted(st.anchors.items()):
+        if anchor_day + POST_DAYS <= watermark_day:
+            rows.append(pre_post_row(st, customer_id, month_id, anchor_day, watermark_day))
+            st.closed[month_id] = _month_end_day(month_id)
+            del st.anchors[month_id]
+    stats.emitted += len(rows)
+
+    for month_id in [m for m, end in st.closed.items() if end < watermark_day]:
+        del st.closed[month_id]
+    lo = keep_from(st, watermark_day)
+    stale = [d for d in st.days if d < lo]
+    for d in stale:
+        del st.days[d]
+    stats.evicted_days += len(stale)
+
+    # next day on which a window closes or something becomes evictable (buckets held by an open
+    # anchor are covered by that anchor's close)
+    wake = [a + POST_DAYS for a in st.anchors.values()]
+    wake += [end + 1 for end in st.closed.values()]
+    if st.days:
+        wake.append(min(st.days) + PRE_DAYS + 1)
+    wake = [w for w in wake if w > watermark_day]
+    return rows, (min(wake) if wake else None)
+
+
+# =======================
+# Local replay (no Spark)
+# =======================
+def events_from_frames(transactions: pd.DataFrame, exposures: pd.DataFrame) -> pd.DataFrame:
+    """
+    One event frame (customer_id, kind, event_ts, day, month_id, revenue) from landing-file rows.
+    """
+    tx = pd.DataFrame({
+        "customer_id": transactions["customer_id"].to_numpy(np.int64),
+        "kind": TRANSACTION,
+        "event_ts": pd.to_datetime(transactions["transaction_ts"]),
+        "day": pd.to_datetime(transactions["transaction_date"]).map(day_of),
+        "month_id": transactions["month_id"].astype(int),
+        "revenue": transactions["revenue"].astype(float),
+    })
+    ex = pd.DataFrame({
+        "customer_id": exposures["customer_id"].to_numpy(np.int64),
+        "kind": EXPOSURE,
+        "event_ts": pd.to_datetime(exposures["exposure_ts"]),
+        "day": pd.to_datetime(exposures["exposure_date"]).map(day_of),
+        "month_id": exposures["month_id"].astype(int),
+        "revenue": 0.0,
+    })
+    return pd.concat([tx, ex], ignore_index=True)
+
+
+def replay(batches: Iterable[pd.DataFrame], watermark_delay: timedelta = timedelta(days=1),
+           flush: bool = False) -> tuple[pd.DataFrame, dict]:
+    """
+    Runs the state machine over event micro-batches in arrival order, with Spark's semantics: a batch
+    is processed with the watermark from the end of the previous batch (max event_ts - delay), and
+    customers with no events are woken by their timeout. `flush` advances the watermark past every
+    open window at the end (compare with the monthly batch). Returns (rows, stats).
+    """
+    states: dict[int, CustomerState] = {}
+    timeouts: dict[int, int] = {}
+    stats = AdvanceStats()
+    rows: list[dict] = []
+    max_ts = None
+    watermark_day = 0
+    peak_state_days = 0
+
+    def step(cid: int, evs: list, wm: int) -> None:
+        st = states.get(cid) or CustomerState()
+        out, wake = advance(st, cid, evs, wm, stats)
+        rows.extend(out)
+        if st.is_empty():
+            states.pop(cid, None)
+            timeouts.pop(cid, None)
+        else:
+            states[cid] = st
+            if wake is None:
+                timeouts.pop(cid, None)
+            else:
+                timeouts[cid] = wake
+
+    for batch in batches:
+        if len(batch):
+            grouped = batch.groupby("customer_id", sort=False)
+            for cid, g in grouped:
+                evs = list(zip(g["kind"], g["day"], g["month_id"], g["revenue"]))
+                step(int(cid), evs, watermark_day)
+            touched = set(grouped.groups)
+        else:
+            touched = set()
+        for cid in [c for c, wake in timeouts.items() if wake <= watermark_day and c not in touched]:
+            step(cid, [], watermark_day)
+        peak_state_days = max(peak_state_days, sum(len(s.days) for s in states.values()))
+        if len(batch):
+            bmax = batch["event_ts"].max()
+            max_ts = bmax if max_ts is None else max(max_ts, bmax)
+            watermark_day = max(watermark_day, day_of((max_ts - watermark_delay).to_pydatetime()))
+
+    if flush and max_ts is not None:
+        # two months past the last event: every window and month is closed
+        end = day_of(max_ts.to_pydatetime()) + 62
+        for cid in list(states):
+            step(cid, [], end)
+
+    out = pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+    return out, {
+        "emitted": stats.emitted,
+        "late_dropped": stats.late_dropped,
+        "evicted_days": stats.evicted_days,
+        "open_customers": len(states),
+        "peak_state_days": peak_state_days,
+    }
+
+
+def iter_landing_files(transactions: pd.DataFrame, exposures: pd.DataFrame, landing_dir: str,
+                       days_per_file: int = 1) -> Iterator[tuple[str, str]]:
+    """
+    File-source stand-in for the live feed: writes the synthetic CSV rows as one file per
+    `days_per_file` days under <landing_dir>/fact_transaction and <landing_dir>/fact_crm_exposure,
+    in event-time order, yielding (transaction file, exposure file) after each slot. Files are
+    written under a "_" name first (ignored by Spark file sources) and renamed when complete.
+    """
+    tx_day = pd.to_datetime(transactions["transaction_date"])
+    ex_day = pd.to_datetime(exposures["exposure_date"])
+    start = min(tx_day.min(), ex_day.min())
+    tx_slot = ((tx_day - start).dt.days // days_per_file).to_numpy()
+    ex_slot = ((ex_day - start).dt.days // days_per_file).to_numpy()
+    for sub in ("fact_transaction", "fact_crm_exposure"):
+        os.makedirs(os.path.join(landing_dir, sub), exist_ok=True)
+    for slot in range(int(max(tx_slot.max(), ex_slot.max())) + 1):
+        label = (start + pd.Timedelta(days=slot * days_per_file)).strftime("%Y%m%d")
+        pair = []
+        for sub, df, mask in (("fact_transaction", transactions, tx_slot == slot),
+                              ("fact_crm_exposure", exposures, ex_slot == slot)):
+            path = os.path.join(landing_dir, sub, f"{sub}_{label}.csv")
+            tmp = os.path.join(landing_dir, sub, f"_{sub}_{label}.csv.tmp")
+            df[mask].to_csv(tmp, index=False)
+            os.replace(tmp, path)
+            pair.append(path)
+        yield tuple(pair)
+
+
+# =======================
+# Spark Structured Streaming
+# =======================
+def _frame_events(pdf: pd.DataFrame) -> list[tuple]:
+    days = pd.to_datetime(pdf["event_date"]).map(day_of)
+    return list(zip(pdf["event_type"], days, pdf["month_id"].astype(int), pdf["revenue"].fillna(0.0)))
+
+
+def update_customer_state(key, pdfs: Iterator[pd.DataFrame], state) -> Iterator[pd.DataFrame]:
+    """
+    applyInPandasWithState function (key = (customer_id,)). State is the JSON of CustomerState;
+    the event-time timeout fires at the next window close or eviction day.
+    """
+    customer_id = int(key[0])
+    st = CustomerState.from_json(state.get[0]) if state.exists else CustomerState()
+    watermark_day = ms_to_day(state.getCurrentWatermarkMs())
+    events = []
+    if not state.hasTimedOut:
+        for pdf in pdfs:
+            events.extend(_frame_events(pdf))
+    rows, wake = advance(st, customer_id, events, watermark_day)
+    if st.is_empty():
+        state.remove()
+    else:
+        state.update((st.to_json(),))
+        if wake is not None:
+            state.setTimeoutTimestamp(day_to_ms(wake))
+    if rows:
+        yield pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+
+def read_landing_events(spark, landing_dir: str, watermark_delay: str = "1 day", fmt: str = "csv",
+                        max_files_per_trigger: Optional[int] = None):
+    """
+    Streaming union of <landing_dir>/fact_transaction and <landing_dir>/fact_crm_exposure as
+    (customer_id, event_type, event_ts, event_date, month_id, revenue), each watermarked on its timestamp.
+    Re-delivered transactions are dropped within the watermark.
+    """
+    from pyspark.sql import functions as F
+
+    def source(sub: str, schema: str):
+        reader = spark.readStream.format(fmt).schema(schema)
+        if fmt == "csv":
+            reader = reader.option("header", "true")
+        if max_files_per_trigger:
+            reader = reader.option("maxFilesPerTrigger", max_files_per_trigger)
+        return reader.load(os.path.join(landing_dir, sub))
+
+    tx = (
+        source("fact_transaction", TRANSACTION_SCHEMA)
+        .withWatermark("transaction_ts", watermark_delay)
+        .dropDuplicates(["transaction_id", "transaction_ts"])
+        .select(
+            "customer_id",
+            F.lit(TRANSACTION).alias("event_type"),
+            F.col("transaction_ts").alias("event_ts"),
+            F.col("transaction_date").alias("event_date"),
+            "month_id",
+            "revenue",
+        )
+    )
+    ex = (
+        source("fact_crm_exposure", EXPOSURE_SCHEMA)
+        .withWatermark("exposure_ts", watermark_delay)
+        .select(
+            "customer_id",
+            F.lit(EXPOSURE).alias("event_type"),
+            F.col("exposure_ts").alias("event_ts"),
+            F.col("exposure_date").alias("event_date"),
+            "month_id",
+            F.lit(None).cast("double").alias("revenue"),
+        )
+    )
+    # the query watermark is the minimum of the two sources
+    return tx.unionByName(ex)
+
+
+def pre_post_stream(events):
+    """
+    Finalized customer-month rows (OUTPUT_SCHEMA), append mode.
+    """
+    from pyspark.sql.streaming.state import GroupStateTimeout
+
+    return events.groupBy("customer_id").applyInPandasWithState(
+        update_customer_state,
+        outputStructType=OUTPUT_SCHEMA,
+        stateStructType=STATE_SCHEMA,
+        outputMode="append",
+        timeoutConf=GroupStateTimeout.EventTimeTimeout,
+    )
@@ -0,0 +1,326 @@
+# file: crm_engine/synth.py
+# Purpose: Vectorized synthetic CRM + transactions generator with recorded ground-truth lift.
+#
+# Same behavioral model as 00_bronze/01_generate_synth_data.py (which is a thin wrapper around
+# this module), but built with array operations so 5M+ customers finish in minutes:
+#   - transactions: one Bernoulli draw per customer-day, generated a block of days at a time
+#   - exposures   : one Bernoulli draw per customer-month, or a campaign calendar
+#                   (crm_engine/exposures.py: cadences, several exposures per customer-month)
+#   - uplift      : every responder exposure multiplies revenue of the customer's transactions
+#                   in its 7-day post window by (1 + lift); overlapping windows compound.
+# Because the injected lift is known, the generator also returns the truth the pipeline tries to
+# recover: injected revenue per exposure (overlaps split in proportion to log(1 + lift)) and per
+# customer-month anchor window (what 05_gold_incrementality.sql estimates).
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from crm_engine.exposures import load_calendar, schedule_exposures
+
+CHANNELS = ["offline", "online"]
+CHANNEL_P = [0.72, 0.28]
+MESSAGE_CHANNELS = ["email", "sms", "push"]
+MESSAGE_CHANNEL_P = [0.55, 0.25, 0.20]
+CAMPAIGNS = ["Promo_A", "Promo_B", "Reactivation", "CrossSell"]
+CAMPAIGN_P = [0.35, 0.25, 0.20, 0.20]
+
+# customer-day cells drawn per block (bounds memory of the transaction draw)
+BLOCK_CELLS = 8_000_000
+
+
+@dataclass
+class SynthConfig:
+    n_customers: int = 50000
+    start_date: str = "2025-01-01"
+    end_date: str = "2025-12-31"
+    seed: int = 42
+
+    # Exposure behavior
+    exposure_base_rate: float = 0.18   # average monthly probability of exposure per customer
+    exposure_bias_active: float = 1.6  # active customers more likely targeted
+    exposure_bias_hv: float = 1.4      # high-value customers more likely targeted
+
+    # Impact modeling
+    impact_window_days: int = 7
+    lift_mean: float = 0.06            # average uplift in revenue/day for responders
+    lift_std: float = 0.05
+    lift_max: float = 0.25
+    responder_rate: float = 0.35       # fraction of exposed customers that truly respond
+
+    # JSON calendar path, dict or "default" (crm_engine/exposures.py); None = one uniform-day draw
+    # per customer-month with the exposure_* rates above
+    campaign_calendar: object = None
+
+    # Purchase behavior
+    base_p: float = 0.015              # base daily purchase probability
+    second_txn_rate: float = 0.08
+
+
+@dataclass
+class SynthDataset:
+    config: SynthConfig
+    dim_customer: pd.DataFrame
+    dim_date: pd.DataFrame
+    fact_transaction: pd.DataFrame
+    fact_crm_exposure: pd.DataFrame
+    # per exposure: injected lift and the revenue it added (synthetic truth only)
+    truth_exposure: pd.DataFrame
+    # per customer-month anchor: injected revenue inside the anchor's post window
+    truth_anchor: pd.DataFrame
+
+    def row_counts(self) -> dict:
+        return {
+            "customers": len(self.dim_customer),
+            "dates": len(self.dim_date),
+            "transactions": len(self.fact_transaction),
+            "exposures": len(self.fact_crm_exposure),
+        }
+
+
+def _day_keys(customer_id: np.ndarray, day: np.ndarray, n_days: int) -> np.ndarray:
+    return customer_id.astype(np.int64) * n_days + day.astype(np.int64)
+
+
+def _lookup(sorted_keys: np.ndarray, values: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    values[i] where sorted_keys[i] == key, else 0.
+    """
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=np.float64)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[pos] == keys, values[pos], 0.0)
+
+
+def generate(config: SynthConfig | None = None) -> SynthDataset:
+    cfg = config or SynthConfig()
+    rng = np.random.default_rng(cfg.seed)
+    n = int(cfg.n_customers)
+
+    dates = pd.date_range(cfg.start_date, cfg.end_date, freq="D")
+    n_dates = len(dates)
+    date_df = pd.DataFrame({"date": dates})
+    date_df["date_id"] = date_df["date"].dt.strftime("%Y%m%d").astype(int)
+    date_df["month_id"] = date_df["date"].dt.strftime("%Y%m").astype(int)
+    date_ids = date_df["date_id"].to_numpy()
+    month_ids = date_df["month_id"].to_numpy()
+
+    # ---- Customers ----
+    customer_id = np.arange(1, n + 1, dtype=np.int64)
+    signup = dates[0] + pd.to_timedelta(rng.integers(0, 180, size=n), unit="D")
+    value_score = np.clip(rng.normal(0.0, 1.0, size=n), -2.5, 2.5)
+    activity_score = np.clip(rng.normal(0.0, 1.0, size=n), -2.5, 2.5)
+    is_high_value = (value_score >= np.quantile(value_score, 0.70)).astype(np.int32)
+    is_active = (activity_score >= np.quantile(activity_score, 0.50)).astype(np.int32)
+    cust = pd.DataFrame({
+        "customer_id": customer_id,
+        "signup_date": signup,
+        "is_active": is_active,
+        "is_high_value": is_high_value,
+        "value_score": value_score,
+        "activity_score": activity_score,
+    })
+
+    # ---- Transactions (a block of days per draw) ----
+    seasonality = (np.sin(np.linspace(0, 6 * np.pi, n_dates)) + 1.0) / 2.0
+    act_factor = np.exp(0.45 * activity_score)
+    days_per_block = max(1, BLOCK_CELLS // max(n, 1))
+    tx_day, tx_cust = [], []
+    for d0 in range(0, n_dates, days_per_block):
+        seas = seasonality[d0:d0 + days_per_block]
+        p = np.clip(cfg.base_p * (1.0 + 0.9 * seas)[:, None] * act_factor[None, :], 0.0005, 0.12)
+        d_idx, c_idx = np.nonzero(rng.random(p.shape) < p)
+        tx_day.append((d_idx + d0).astype(np.int32))
+        tx_cust.append(c_idx.astype(np.int32))
+    tx_day = np.concatenate(tx_day)
+    tx_cust = np.concatenate(tx_cust)
+
+    # mostly 1 transaction per buying customer-day, sometimes 2 (kept adjacent, like the loop version)
+    n_tx = 1 + (rng.random(len(tx_day)) < cfg.second_txn_rate)
+    tx_day = np.repeat(tx_day, n_tx)
+    tx_cust = np.repeat(tx_cust, n_tx)
+    m = len(tx_day)
+    if m == 0:
+        raise RuntimeError("No transactions generated. Adjust probabilities.")
+
+    revenue = np.round(rng.lognormal(mean=3.3 + 0.35 * value_score[tx_cust], sigma=0.55), 2)
+    channel = pd.Categorical.from_codes(rng.choice(len(CHANNELS), size=m, p=CHANNEL_P).astype(np.int8), CHANNELS)
+    items = np.clip(rng.poisson(lam=3.2, size=m), 1, 25).astype(np.int32)
+    tx_ts = dates.values[tx_day] + rng.integers(0, 86400, size=m).astype("timedelta64[s]")
+
+    # ---- CRM Exposures ----
+    if cfg.campaign_calendar is None:
+        # one draw per customer-month, uniform day
+        prob = np.clip(
+            cfg.exposure_base_rate
+            * (1.0 + (cfg.exposure_bias_active - 1.0) * is_active)
+            * (1.0 + (cfg.exposure_bias_hv - 1.0) * is_high_value),
+            0.02, 0.75,
+        )
+        month_bounds = np.flatnonzero(np.r_[True, month_ids[1:] != month_ids[:-1], True])
+        ex_day, ex_cust = [], []
+        for m0, m1 in zip(month_bounds[:-1], month_bounds[1:]):
+            targets = np.flatnonzero(rng.random(n) < prob).astype(np.int32)
+            ex_cust.append(targets)
+            ex_day.append(rng.integers(m0, m1, size=len(targets)).astype(np.int32))
+        ex_day = np.concatenate(ex_day)
+        ex_cust = np.concatenate(ex_cust)
+        k = len(ex_day)
+        ex_ts = dates.values[ex_day] + rng.integers(8 * 3600, 20 * 3600, size=k).astype("timedelta64[s]")
+        is_responder = (rng.random(k) < cfg.responder_rate).astype(np.int32)
+        msg_channel = rng.choice(len(MESSAGE_CHANNELS), size=k, p=MESSAGE_CHANNEL_P).astype(np.int8)
+        campaign = rng.choice(len(CAMPAIGNS), size=k, p=CAMPAIGN_P).astype(np.int8)
+        channel_names, campaign_names = MESSAGE_CHANNELS, CAMPAIGNS
+    else:
+        # campaign calendar: send dates x audience draws, several exposures per customer-month
+        calendar = load_calendar(cfg.campaign_calendar)
+        sched = schedule_exposures(calendar, dates, is_active, is_high_value, rng)
+        ex_day = sched.day
+        ex_cust = sched.customer.astype(np.int32)
+        k = len(ex_day)
+        ex_ts = dates.values[ex_day] + sched.second.astype("timedelta64[s]")
+        is_responder = (rng.random(k) < cfg.responder_rate).astype(np.int32)
+        msg_channel, campaign = sched.channel, sched.campaign
+        channel_names, campaign_names = calendar.channel_names, calendar.campaign_names
+        del sched
+    lift = np.where(
+        is_responder == 1,
+        np.clip(rng.normal(cfg.lift_mean, cfg.lift_std, size=k), 0.0, cfg.lift_max),
+        0.0,
+    )
+
+    # ---- Inject uplift (synthetic effect) ----
+    # Expand each responder exposure to its post-window customer-days and sum log(1 + lift) per
+    # customer-day; every transaction on that day gets revenue * exp(sum).
+    w = cfg.impact_window_days
+    n_days_ext = n_dates + w
+    resp = np.flatnonzero(lift > 0)
+    resp_keys = _day_keys(np.repeat(ex_cust[resp], w), (ex_day[resp][:, None] + np.arange(w)).ravel(), n_days_ext)
+    resp_log = np.repeat(np.log1p(lift[resp]), w)
+    uniq_keys, inv = np.unique(resp_keys, return_inverse=True)
+    log_by_key = np.bincount(inv, weights=resp_log, minlength=len(uniq_keys))
+
+    tx_keys = _day_keys(tx_cust, tx_day, n_days_ext)
+    tx_log = _lookup(uniq_keys, log_by_key, tx_keys)
+    lifted = np.flatnonzero(tx_log > 0)
+    base_lifted = revenue[lifted]
+    revenue[lifted] = np.round(base_lifted * np.exp(tx_log[lifted]), 2)
+
+    # injected revenue per lifted customer-day
+    added_keys, added_inv = np.unique(tx_keys[lifted], return_inverse=True)
+    added_by_key = np.bincount(added_inv, weights=revenue[lifted] - base_lifted, minlength=len(added_keys))
+    del tx_keys, tx_log, lifted, base_lifted, added_inv
+
+    # per exposure: its log-share of each covered customer-day's injected revenue
+    share = resp_log / log_by_key[inv]
+    exposure_added = np.zeros(k, dtype=np.float64)
+    np.add.at(exposure_added, np.repeat(resp, w), share * _lookup(added_keys, added_by_key, resp_keys))
+    del resp_keys, resp_log, uniq_keys, inv, log_by_key, share
+
+    # ---- Frames ----
+    tx = pd.DataFrame({
+        "transaction_id": np.arange(1, m + 1, dtype=np.int64),
+        "customer_id": customer_id[tx_cust],
+        "transaction_ts": tx_ts,
+        "channel": channel,
+        "revenue": revenue,
+        "items": items,
+        "transaction_date": dates.values[tx_day],
+        "date_id": date_ids[tx_day],
+        "month_id": month_ids[tx_day],
+    })
+    del tx_day, tx_cust, tx_ts, channel, revenue, items
+
+    exp_order = np.lexsort((ex_ts, ex_day))
+    exp = pd.DataFrame({
+        "exposure_id": np.arange(1, k + 1, dtype=np.int64),
+        "customer_id": customer_id[ex_cust[exp_order]],
+        "exposure_ts": ex_ts[exp_order],
+        "message_channel": pd.Categorical.from_codes(msg_channel[exp_order], channel_names),
+        "campaign_name": pd.Categorical.from_codes(campaign[exp_order], campaign_names),
+        "is_responder": is_responder[exp_order],  # latent for synthetic truth; NOT used in real life
+        "exposure_date": dates.values[ex_day[exp_order]],
+        "date_id": date_ids[ex_day[exp_order]],
+        "month_id": month_ids[ex_day[exp_order]],
+    })
+
+    truth_exposure = pd.DataFrame({
+        "exposure_id": exp["exposure_id"].to_numpy(),
+        "customer_id": exp["customer_id"].to_numpy(),
+        "month_id": exp["month_id"].to_numpy(),
+        "exposure_date": exp["exposure_date"].to_numpy(),
+        "is_active": is_active[ex_cust[exp_order]],
+        "is_high_value": is_high_value[ex_cust[exp_order]],
+        "is_responder": exp["is_responder"].to_numpy(),
+        "true_lift": lift[exp_order],
+        "true_incremental_revenue": exposure_added[exp_order],
+    })
+
+    # customer-month anchors (first exposure day), as in 01_silver.customer_month_exposure_anchor
+    anchor_key = ex_cust.astype(np.int64) * 1_000_000 + month_ids[ex_day]
+    a_order = np.lexsort((ex_day, anchor_key))
+    a_first = np.r_[True, anchor_key[a_order][1:] != anchor_key[a_order][:-1]]
+    a_idx = a_order[a_first]
+    a_cust, a_day = ex_cust[a_idx], ex_day[a_idx]
+    a_keys = _day_keys(np.repeat(a_cust, w), (a_day[:, None] + np.arange(w)).ravel(), n_days_ext)
+    a_added = _lookup(added_keys, added_by_key, a_keys).reshape(-1, w).sum(axis=1)
+    truth_anchor = pd.DataFrame({
+        "customer_id": customer_id[a_cust],
+        "month_id": month_ids[a_day],
+        "anchor_exposure_date": dates.values[a_day],
+        "is_active": is_active[a_cust],
+        "is_high_value": is_high_value[a_cust],
+        "true_incremental_revenue": a_added,
+    })
+
+    return SynthDataset(cfg, cust, date_df, tx, exp, truth_exposure, truth_anchor)
+
+
+def write_csvs(ds: SynthDataset, out_dir: str, include_truth: bool = True) -> dict:
+    """
+    Writes the Bronze input CSVs (same names/columns as 01_generate_synth_data.py).
+    Truth files are side outputs; 03_upload_to_bronze.py does not load them. Frames set to None
+    are skipped (e.g. exposures streamed by exposures.write_exposure_parts).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    frames = {
+        "dim_customer": ds.dim_customer,
+        "dim_date": ds.dim_date,
+        "fact_transaction": ds.fact_transaction,
+        "fact_crm_exposure": ds.fact_crm_exposure,
+    }
+    if include_truth:
+        frames["truth_exposure_lift"] = ds.truth_exposure
+        frames["truth_anchor_lift"] = ds.truth_anchor
+    paths = {}
+    for name, df in frames.items():
+        if df is None:
+            continue
+        path = os.path.join(out_dir, f"{name}.csv")
+        df.to_csv(path, index=False, chunksize=1_000_000)
+        paths[name] = path
+    return paths
+
+
+def true_lift_by_segment(ds: SynthDataset, keys: list[str] | None = None) -> pd.DataFrame:
+    """
+    Injected revenue per segment: by exposure month (all responder windows) and by anchor window
+    (the quantity the pre/post estimator targets).
+    """
+    keys = keys or ["month_id", "is_active", "is_high_value"]
+    by_exposure = (
+        ds.truth_exposure.groupby(keys, sort=True)
+        .agg(exposures=("exposure_id", "size"),
+             responders=("is_responder", "sum"),
+             true_incremental_revenue_all_windows=("true_incremental_revenue", "sum"))
+    )
+    by_anchor = (
+        ds.truth_anchor.groupby(keys, sort=True)
+        .agg(customer_months=("customer_id", "size"),
+             true_incremental_revenue=("true_incremental_revenue", "sum"))
+    )
+    return by_anchor.join(by_exposure, how="outer").fillna(0).reset_index()
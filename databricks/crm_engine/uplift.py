@@ -0,0 +1,377 @@
+# file: crm_engine/uplift.py
+# Purpose: Customer-level uplift model: ridge regression of each exposed customer-month's own lift on
+#          its PRE-window KPIs, RFM scores and segment flags, then chunked batch scoring of every
+#          customer for the next month across a process pool.
+#
+# Target (per exposed customer-month): did_incremental_revenue when 08_matched_control_did.py has run,
+# else seasonal_adj_incremental_revenue, else incremental_revenue - i.e. the pre/post lift with the
+# best available baseline. The prediction is the expected 7-day incremental revenue if the customer
+# were exposed on the first day of the scored month.
+#
+# Features are built in SQL so training rows (the Gold fact) and scoring rows (every customer,
+# PRE = the 28 days before the scored month) share one definition:
+#   pre_txn_cnt, pre_revenue, pre_active_days, pre_aov  (revenue-like columns log1p-compressed)
+#   r/f/m scores of the previous month (0 = no RFM row), is_active, is_high_value, rfm_segment one-hot
+#
+# Scoring reads the feature Parquet in fixed-size record batches; at most `max_in_flight` chunks are
+# queued to the pool, each worker writes its own Parquet part, so driver memory is bounded by
+# chunk_rows x max_in_flight regardless of the customer count.
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+MODEL_VERSION = 1
+REPORT_FILE = "uplift_model_report.json"
+
+PRE_DAYS = 28
+POST_DAYS = 7
+
+NUMERIC_FEATURES = ["pre_txn_cnt", "pre_revenue", "pre_active_days", "pre_aov", "r_score", "f_score", "m_score"]
+LOG_FEATURES = {"pre_revenue", "pre_aov"}
+FLAG_FEATURES = ["is_active", "is_high_value"]
+SEGMENTS = ["Champions", "Loyal", "Potential Loyalists", "At Risk", "Lost", "Others", "Unknown"]
+TARGETS = ["did_incremental_revenue", "seasonal_adj_incremental_revenue", "incremental_revenue"]
+
+DEFAULT_ALPHA = 10.0            # ridge penalty on standardized features
+DEFAULT_CHUNK_ROWS = 250_000
+SCORE_COLUMNS = ["customer_id", "score_month_id", "predicted_uplift", "is_active", "is_high_value", "rfm_segment"]
+
+
+# =======================
+# SQL (tbl(schema, name) -> fully qualified table name)
+# =======================
+def _month_key_sql(col: str) -> str:
+    # yyyyMM or yyyyMMdd -> yyyyMM, as month_key_yyyymm in 05_gold_incrementality.sql
+    return (f"CASE WHEN CAST({col} AS STRING) RLIKE '^[0-9]{{6}}$' THEN CAST({col} AS INT) "
+            f"WHEN CAST({col} AS STRING) RLIKE '^[0-9]{{8}}$' THEN CAST(SUBSTR(CAST({col} AS STRING), 1, 6) AS INT) END")
+
+
+def _next_month_sql(key: str) -> str:
+    return (f"CAST(DATE_FORMAT(ADD_MONTHS(TO_DATE(CONCAT(CAST({key} AS STRING), '01'), 'yyyyMMdd'), 1), "
+            f"'yyyyMM') AS INT)")
+
+
+def _rfm_by_month_sql(tbl: Callable[[str, str], str]) -> str:
+    # RFM keyed by the month it is used for (the month after it was measured)
+    return (
+        f"SELECT customer_id, {_next_month_sql(_month_key_sql('month_id'))} AS used_for_month, "
+        f"r_score, f_score, m_score, rfm_segment "
+        f"FROM {tbl('02_gold', 'dim_customer_month_rfm')} WHERE customer_id IS NOT NULL"
+    )
+
+
+def training_sql(tbl: Callable[[str, str], str], target_expr: str) -> str:
+    """
+    One row per exposed customer-month: features + target. `target_expr` is a COALESCE over the
+    TARGETS columns present in the fact (see target_expression).
+    """
+    return f"""
+        SELECT
+          f.customer_id,
+          f.month_key_yyyymm AS month_id,
+          CAST(f.pre_txn_cnt AS DOUBLE)      AS pre_txn_cnt,
+          CAST(f.pre_revenue AS DOUBLE)      AS pre_revenue,
+          CAST(f.pre_active_days AS DOUBLE)  AS pre_active_days,
+          CAST(f.pre_aov AS DOUBLE)          AS pre_aov,
+          CAST(COALESCE(r.r_score, 0) AS DOUBLE) AS r_score,
+          CAST(COALESCE(r.f_score, 0) AS DOUBLE) AS f_score,
+          CAST(COALESCE(r.m_score, 0) AS DOUBLE) AS m_score,
+          CAST(f.is_active AS INT)           AS is_active,
+          CAST(f.is_high_value AS INT)       AS is_high_value,
+          COALESCE(r.rfm_segment, 'Unknown') AS rfm_segment,
+          CAST({target_expr} AS DOUBLE)      AS target
+        FROM {tbl('02_gold', 'fact_customer_month_incrementality')} f
+        LEFT JOIN ({_rfm_by_month_sql(tbl)}) r
+          ON r.customer_id = f.customer_id
+         AND r.used_for_month = f.month_key_yyyymm
+        WHERE f.month_key_yyyymm IS NOT NULL
+    """
+
+
+def next_month_sql(tbl: Callable[[str, str], str]) -> str:
+    return (f"SELECT {_next_month_sql('MAX(month_key_yyyymm)')} AS m "
+            f"FROM {tbl('02_gold', 'fact_customer_month_incrementality')}")
+
+
+def scoring_features_sql(tbl: Callable[[str, str], str], score_month_id: int) -> str:
+    """
+    Every customer in dim_customer, with PRE KPIs over the 28 days before the first day of
+    `score_month_id` (yyyyMM) and the previous month's RFM - the same columns as training_sql.
+    """
+    start = f"TO_DATE('{int(score_month_id)}01', 'yyyyMMdd')"
+    return f"""
+        WITH pre AS (
+          SELECT
+            customer_id,
+            COUNT(DISTINCT transaction_id)          AS pre_txn_cnt,
+            SUM(revenue)                            AS pre_revenue,
+            COUNT(DISTINCT transaction_date)        AS pre_active_days
+          FROM {tbl('01_silver', 'fact_transaction')}
+          WHERE transaction_date BETWEEN DATE_SUB({start}, {PRE_DAYS}) AND DATE_SUB({start}, 1)
+          GROUP BY customer_id
+        )
+        SELECT
+          c.customer_id,
+          {int(score_month_id)} AS score_month_id,
+          CAST(COALESCE(p.pre_txn_cnt, 0) AS DOUBLE)      AS pre_txn_cnt,
+          CAST(COALESCE(p.pre_revenue, 0.0) AS DOUBLE)    AS pre_revenue,
+          CAST(COALESCE(p.pre_active_days, 0) AS DOUBLE)  AS pre_active_days,
+          CAST(CASE WHEN p.pre_txn_cnt > 0 THEN p.pre_revenue / p.pre_txn_cnt ELSE 0.0 END AS DOUBLE) AS pre_aov,
+          CAST(COALESCE(r.r_score, 0) AS DOUBLE) AS r_score,
+          CAST(COALESCE(r.f_score, 0) AS DOUBLE) AS f_score,
+          CAST(COALESCE(r.m_score, 0) AS DOUBLE) AS m_score,
+          CAST(c.is_active AS INT)               AS is_active,
+          CAST(c.is_high_value AS INT)           AS is_high_value,
+          COALESCE(r.rfm_segment, 'Unknown')     AS rfm_segment
+        FROM {tbl('01_silver', 'dim_customer')} c
+        LEFT JOIN pre p
+          ON p.customer_id = c.customer_id
+        LEFT JOIN ({_rfm_by_month_sql(tbl)}) r
+          ON r.customer_id = c.customer_id
+         AND r.used_for_month = {int(score_month_id)}
+    """
+
+
+def target_expression(fact_columns: list[str]) -> tuple[str, str]:
+    """
+    (SQL expression, description) for the training target given the fact's columns.
+    """
+    present = [c for c in TARGETS if c in fact_columns]
+    if not present:
+        raise ValueError(f"The fact has none of the target columns {TARGETS}")
+    cols = [f"f.{c}" for c in present]
+    expr = cols[0] if len(cols) == 1 else f"COALESCE({', '.join(cols)})"
+    return expr, " > ".join(present)
+
+
+# =======================
+# Model
+# =======================
+def design_matrix(df: pd.DataFrame) -> np.ndarray:
+    """
+    Unstandardized feature matrix (float64): numeric (log1p where revenue-like), flags, segment one-hot.
+    """
+    cols = []
+    for f in NUMERIC_FEATURES:
+        v = df[f].to_numpy(dtype=np.float64, na_value=0.0)
+        cols.append(np.log1p(np.clip(v, 0.0, None)) if f in LOG_FEATURES else v)
+    for f in FLAG_FEATURES:
+        cols.append(df[f].to_numpy(dtype=np.float64, na_value=0.0))
+    seg = df["rfm_segment"].to_numpy(dtype=object)
+    for s in SEGMENTS:
+        cols.append((seg == s).astype(np.float64))
+    return np.column_stack(cols)
+
+
+def feature_names() -> list[str]:
+    return NUMERIC_FEATURES + FLAG_FEATURES + [f"segment={s}" for s in SEGMENTS]
+
+
+@dataclass
+class UpliftModel:
+    mean: list[float]
+    std: list[float]
+    coef: list[float]
+    intercept: float
+    alpha: float
+    target: str
+    trained_rows: int
+    features: list[str] = field(default_factory=feature_names)
+    model_version: int = MODEL_VERSION
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        x = design_matrix(df)
+        return (x - np.asarray(self.mean)) / np.asarray(self.std) @ np.asarray(self.coef) + self.intercept
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "UpliftModel":
+        return cls(**d)
+
+
+def fit_uplift(df: pd.DataFrame, alpha: float = DEFAULT_ALPHA, target_name: str = "target") -> UpliftModel:
+    """
+    Closed-form ridge of df["target"] on standardized features (intercept unpenalized); rows with a
+    NULL target are dropped. `target_name` only labels the model (see target_expression).
+    """
+    df = df[df["target"].notna()]
+    if df.empty:
+        raise ValueError("No training rows with a non-NULL target")
+    x = design_matrix(df)
+    y = df["target"].to_numpy(dtype=np.float64)
+    mean = x.mean(axis=0)
+    std = x.std(axis=0)
+    std[std == 0] = 1.0
+    z = (x - mean) / std
+    y_mean = float(y.mean())
+    gram = z.T @ z + alpha * np.eye(z.shape[1])
+    coef = np.linalg.solve(gram, z.T @ (y - y_mean))
+    return UpliftModel(mean=mean.tolist(), std=std.tolist(), coef=coef.tolist(), intercept=y_mean,
+                       alpha=float(alpha), target=target_name, trained_rows=int(len(df)))
+
+
+def evaluate_uplift(model: UpliftModel, df: pd.DataFrame, n_bins: int = 10) -> dict:
+    """
+    Holdout diagnostics: R^2, and observed lift by predicted-uplift decile (decile 1 = highest predicted).
+    A useful model has observed lift falling from decile 1 to n_bins; `top_decile_ratio` compares
+    decile 1 with the average row.
+    """
+    df = df[df["target"].notna()]
+    if df.empty:
+        return {"rows": 0}
+    y = df["target"].to_numpy(dtype=np.float64)
+    p = model.predict(df)
+    ss_res = float(((y - p) ** 2).sum())
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    order = np.argsort(-p, kind="stable")
+    bins = np.empty(len(p), dtype=np.int64)
+    bins[order] = np.arange(len(p)) * n_bins // len(p) + 1
+    deciles = (
+        pd.DataFrame({"decile": bins, "predicted": p, "observed": y})
+        .groupby("decile").agg(rows=("observed", "size"), mean_predicted=("predicted", "mean"),
+                               mean_observed=("observed", "mean"))
+        .reset_index()
+    )
+    top = float(deciles["mean_observed"].iloc[0])
+    overall = float(y.mean())
+    return {
+        "rows": int(len(df)),
+        "r2": 1.0 - ss_res / ss_tot if ss_tot > 0 else None,
+        "mean_observed": overall,
+        "top_decile_mean_observed": top,
+        "top_decile_ratio": top / overall if overall else None,
+        "deciles": deciles.to_dict(orient="records"),
+    }
+
+
+# =======================
+# Chunked scoring (process pool)
+# =======================
+_WORKER_MODEL: Optional[UpliftModel] = None
+
+
+def _init_worker(model_dict: dict) -> None:
+    global _WORKER_MODEL
+    _WORKER_MODEL = UpliftModel.from_dict(model_dict)
+
+
+def _score_chunk(chunk_id: int, batch, out_dir: str) -> tuple[int, int, float]:
+    """
+    Worker: score one Arrow record batch and write it as part-<chunk_id>.parquet.
+    Returns (chunk_id, rows, seconds).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    t0 = time.perf_counter()
+    df = batch.to_pandas()
+    out = df[[c for c in SCORE_COLUMNS if c != "predicted_uplift"]].copy()
+    out["predicted_uplift"] = _WORKER_MODEL.predict(df)
+    out = out[SCORE_COLUMNS]
+    tmp = os.path.join(out_dir, f"_part-{chunk_id:05d}.parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(out, preserve_index=False), tmp)
+    os.replace(tmp, os.path.join(out_dir, f"part-{chunk_id:05d}.parquet"))
+    return chunk_id, len(out), time.perf_counter() - t0
+
+
+@dataclass
+class ScoringStats:
+    rows: int = 0
+    chunks: int = 0
+    workers: int = 0
+    chunk_rows: int = 0
+    max_in_flight: int = 0
+    seconds: float = 0.0
+    rows_per_sec: float = 0.0
+    chunk_p50_seconds: float = 0.0
+    chunk_p95_seconds: float = 0.0
+
+
+def iter_feature_batches(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator:
+    """
+    Fixed-size record batches from a Parquet file or folder (only one batch is materialized at a time).
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    # scanner batches stop at row-group boundaries; regroup them into chunks of exactly chunk_rows
+    buffered, n = [], 0
+    for batch in ds.dataset(path, format="parquet").to_batches(batch_size=chunk_rows):
+        buffered.append(batch)
+        n += batch.num_rows
+        while n >= chunk_rows:
+            table = pa.Table.from_batches(buffered).combine_chunks()
+            yield table.slice(0, chunk_rows).to_batches()[0]
+            rest = table.slice(chunk_rows)
+            buffered, n = rest.to_batches(), rest.num_rows
+    if n:
+        yield pa.Table.from_batches(buffered).combine_chunks().to_batches()[0]
+
+
+def score_batches(model: UpliftModel, batches, out_dir: str, workers: Optional[int] = None,
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS, max_in_flight: Optional[int] = None,
+                  log: Callable[[str], None] = print) -> ScoringStats:
+    """
+    Scores record batches on a process pool; each chunk becomes one Parquet part in `out_dir`
+    (existing parts are removed first). At most `max_in_flight` chunks (default 2 x workers) are
+    queued, which bounds driver memory.
+    """
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    max_in_flight = max_in_flight or 2 * workers
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.endswith(".parquet") or name.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, name))
+
+    stats = ScoringStats(workers=workers, chunk_rows=chunk_rows, max_in_flight=max_in_flight)
+    chunk_seconds: list[float] = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model.to_dict(),)) as pool:
+        pending = set()
+
+        def drain(block_until: int) -> None:
+            nonlocal pending
+            while len(pending) > block_until:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    _, rows, secs = fut.result()
+                    stats.rows += rows
+                    stats.chunks += 1
+                    chunk_seconds.append(secs)
+                    if stats.chunks % 20 == 0:
+                        elapsed = time.perf_counter() - t0
+                        log(f"  scored {stats.rows:,} rows in {stats.chunks} chunks "
+                            f"({stats.rows / elapsed:,.0f} rows/s)")
+
+        for chunk_id, batch in enumerate(batches):
+            drain(max_in_flight - 1)
+            pending.add(pool.submit(_score_chunk, chunk_id, batch, out_dir))
+        drain(0)
+
+    stats.seconds = time.perf_counter() - t0
+    stats.rows_per_sec = stats.rows / stats.seconds if stats.seconds else 0.0
+    if chunk_seconds:
+        stats.chunk_p50_seconds = float(np.percentile(chunk_seconds, 50))
+        stats.chunk_p95_seconds = float(np.percentile(chunk_seconds, 95))
+    return stats
+
+
+def write_report(report: dict, path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=float)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,321 @@
+# file: run_markets.py
+# Purpose: Run the pipeline for many markets concurrently (one Unity Catalog per market) with a
+#          parallelism cap, fair sharing of the cluster and one progress report for all markets.
+#
+# Databricks (one driver, shared cluster): each market runs in its own thread, at most
+# --max-parallel at a time; the stages of a market run in order (STAGES). Every market thread
+# submits its Spark jobs to its own FAIR scheduler pool, so a large market cannot starve the others
+# (the cluster needs spark.scheduler.mode FAIR, which Databricks sets by default).
+#   SQL stages    -> statement by statement on a per-market session (own current catalog),
+#                    with the :catalog parameter bound
+#   Python stages -> the stage script, with the market's catalog as its "catalog" parameter and a
+#                    "workers" budget (driver cores // --max-parallel unless --workers-per-market), so
+#                    the multi-process stages (07 bootstrap, 13 uplift) of concurrent markets share the
+#                    driver instead of each taking every core; dbutils (export stage) comes from the
+#                    notebook or pyspark.dbutils.DBUtils and is required up front when 06 is selected
+# Local: one run_pipeline.py process per market, each with its own warehouse, CSV and export folder
+# under data/markets/<market>/.
+#
+# Progress (state, current stage, per-stage seconds) is printed as a board every --progress-seconds
+# and rewritten to one JSON report after every stage.
+#
+# Usage (Databricks job / notebook, task parameters):
+#   --markets de,fr,uk,it --max-parallel 4
+#   --config /Workspace/.../markets.json --stages 04_silver 05_gold 06_export
+#   --report-dir /Volumes/<catalog>/02_gold/vol_export/market_runs
+# Usage (local):
+#   python databricks/run_markets.py --local --markets de,fr,uk --generate-customers 20000 --max-parallel 2
+
+import argparse
+import json
+import os
+import runpy
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, _HERE)
+
+from crm_engine.local_spark import split_sql_statements  # noqa: E402
+from crm_engine.markets import (  # noqa: E402
+    CATALOG_TEMPLATE,
+    DEFAULT_CATALOG,
+    Market,
+    load_markets,
+    market_params,
+    sql_args,
+)
+
+# =======================
+# CONFIG
+# =======================
+# (name, script) in run order (README "Databricks run order")
+STAGES = [
+    ("02_ddl", "00_bronze/02_databricks_ddl.sql"),
+    ("03_bronze", "00_bronze/03_upload_to_bronze.py"),
+    ("04_silver", "01_silver/04_silver_transforms.sql"),
+    ("05_gold", "02_gold/05_gold_incrementality.sql"),
+    ("07_bootstrap", "02_gold/07_bootstrap_confidence_intervals.py"),
+    ("08_did", "02_gold/08_matched_control_did.py"),
+    ("09_attribution", "02_gold/09_exposure_attribution.py"),
+    ("10_sketches", "02_gold/10_distribution_sketches.py"),
+    ("13_uplift", "02_gold/13_uplift_scoring.py"),
+    ("12_star_schema", "02_gold/12_gold_star_schema.sql"),
+    ("11_quality_gate", "02_gold/11_validate_data_quality.py"),
+    ("06_export", "02_gold/06_export_gold_to_csv.py"),
+]
+MAX_PARALLEL = 4
+PROGRESS_SECONDS = 30
+REPORT_DIR = f"/Volumes/{DEFAULT_CATALOG}/02_gold/vol_export/market_runs"   # default of --report-dir
+DBUTILS_STAGES = {"06_export"}
+
+LOCAL_MARKETS_DIR = os.path.join(os.path.dirname(_HERE), "data", "markets")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class MarketProgress:
+    market: str
+    catalog: str
+    state: str = QUEUED
+    stage: Optional[str] = None
+    stages_done: int = 0
+    stages_total: int = 0
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    seconds: Optional[float] = None
+    stage_seconds: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    log: Optional[str] = None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class ProgressBoard:
+    """
+    Shared, thread-safe progress of all markets; every update rewrites the JSON report.
+    """
+
+    def __init__(self, run_id: str, markets: list[Market], stages: list[str], report_path: str, max_parallel: int):
+        self.run_id = run_id
+        self.report_path = report_path
+        self.max_parallel = max_parallel
+        self.started = time.perf_counter()
+        self.started_at = _now()
+        self.markets = {m.name: MarketProgress(m.name, m.catalog, stages_total=len(stages)) for m in markets}
+        self._lock = threading.Lock()
+
+    def update(self, market: str, **changes) -> None:
+        with self._lock:
+            p = self.markets[market]
+            for k, v in changes.items():
+                setattr(p, k, v)
+            self._write()
+
+    def stage_done(self, market: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            p = self.markets[market]
+            p.stage_seconds[stage] = round(seconds, 2)
+            p.stages_done += 1
+            self._write()
+
+    def snapshot(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.perf_counter() - self.started, 1),
+            "max_parallel": self.max_parallel,
+            "markets": [asdict(p) for p in self.markets.values()],
+        }
+
+    def _write(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        tmp = f"{self.report_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, self.report_path)
+
+    def format(self) -> str:
+        with self._lock:
+            rows = list(self.markets.values())
+            elapsed = time.perf_counter() - self.started
+        lines = [f"[{elapsed:7.0f}s] " + ", ".join(
+            f"{s}: {sum(p.state == s for p in rows)}" for s in (QUEUED, RUNNING, DONE, FAILED))]
+        for p in rows:
+            took = f"{p.seconds:.0f}s" if p.seconds is not None else ""
+            lines.append(f"  {p.market:<10} {p.state:<8} {p.stages_done:>2}/{p.stages_total:<2} "
+                         f"{p.stage or '':<16} {took}")
+        return "\n".join(lines)
+
+
+def run_market(board: ProgressBoard, market: Market, work) -> None:
+    board.update(market.name, state=RUNNING, started_at=_now())
+    t0 = time.perf_counter()
+    try:
+        work(board, market)
+        board.update(market.name, state=DONE, stage=None)
+    except Exception as e:  # one market failing must not stop the others
+        board.update(market.name, state=FAILED, error=f"{type(e).__name__}: {e}"[:2000])
+    finally:
+        board.update(market.name, finished_at=_now(), seconds=round(time.perf_counter() - t0, 1))
+
+
+# =======================
+# Databricks: threads on the shared SparkSession
+# =======================
+def get_dbutils(spark):
+    """
+    dbutils for the stage scripts: the notebook's global, else pyspark.dbutils.DBUtils (a Python
+    script task has no dbutils global). Raises RuntimeError outside a Databricks runtime.
+    """
+    if "dbutils" in globals():
+        return globals()["dbutils"]
+    try:
+        from pyspark.dbutils import DBUtils
+    except ImportError as e:
+        raise RuntimeError("dbutils is unavailable (pyspark.dbutils needs a Databricks runtime)") from e
+    return DBUtils(spark)
+
+
+def databricks_work(spark, stages: list[tuple[str, str]], script_globals: dict, workers: int):
+    sc = spark.sparkContext
+
+    def work(board: ProgressBoard, market: Market) -> None:
+        # thread-local (PySpark pinned thread mode): jobs of this thread go to the market's FAIR pool / job group
+        sc.setLocalProperty("spark.scheduler.pool", f"market_{market.name}")
+        sc.setJobGroup(f"market-{market.name}-{board.run_id}", f"run_markets {market.name}")
+        session = spark.newSession()   # own current catalog for USE CATALOG in the SQL stages
+        try:
+            for name, script in stages:
+                board.update(market.name, stage=name)
+                t0 = time.perf_counter()
+                path = os.path.join(_HERE, script)
+                if path.endswith(".sql"):
+                    with open(path, encoding="utf-8") as f:
+                        for stmt in split_sql_statements(f.read()):
+                            session.sql(stmt, args=sql_args(stmt, market.catalog))
+                else:
+                    with market_params(catalog=market.catalog, market=market.name, workers=str(workers)):
+                        runpy.run_path(path, init_globals=dict(script_globals), run_name="__main__")
+                board.stage_done(market.name, name, time.perf_counter() - t0)
+        finally:
+            sc.setLocalProperty("spark.scheduler.pool", None)
+            sc.setLocalProperty("spark.jobGroup.id", None)
+
+    return work
+
+
+# =======================
+# Local: one run_pipeline.py process per market
+# =======================
+def local_work(args):
+    def work(board: ProgressBoard, market: Market) -> None:
+        root = os.path.join(args.local_dir, market.name)
+        os.makedirs(root, exist_ok=True)
+        cmd = [
+            sys.executable, os.path.join(_HERE, "run_pipeline.py"),
+            "--csv-dir", os.path.join(root, "synth"),
+            "--warehouse", os.path.join(root, "warehouse"),
+            "--export-dir", os.path.join(root, "gold_exports"),
+            "--workers", str(args.local_stage_workers),
+        ]
+        if args.generate_customers:
+            # distinct, reproducible data per market
+            seed = args.seed + sum(ord(c) for c in market.name)
+            cmd += ["--generate-customers", str(args.generate_customers), "--seed", str(seed)]
+        log_path = os.path.join(root, "run.log")
+        board.update(market.name, stage="run_pipeline", log=log_path)
+        t0 = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log:
+            code = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT)
+        if code != 0:
+            raise RuntimeError(f"run_pipeline.py exited with {code} (see {log_path})")
+        board.stage_done(market.name, "run_pipeline", time.perf_counter() - t0)
+
+    return work
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Run the pipeline for many markets concurrently.")
+    ap.add_argument("--markets", default=None, help="comma-separated market names")
+    ap.add_argument("--config", default=None, help='JSON list of {"market": ..., "catalog": ...}')
+    ap.add_argument("--catalog-template", default=CATALOG_TEMPLATE, help="catalog for markets without one")
+    ap.add_argument("--max-parallel", type=int, default=MAX_PARALLEL, help="markets running at the same time")
+    ap.add_argument("--stages", nargs="+", default=None, help=f"subset of {[s for s, _ in STAGES]}")
+    ap.add_argument("--progress-seconds", type=float, default=PROGRESS_SECONDS)
+    ap.add_argument("--report", default=None, help="progress JSON (default: one file per run in --report-dir)")
+    ap.add_argument("--report-dir", default=None,
+                    help=f"folder of the per-run progress JSON (default: {REPORT_DIR}; local: <local-dir>/_runs)")
+    ap.add_argument("--workers-per-market", type=int, default=None,
+                    help="driver processes of the 07/13 stages per market (default: driver cores // max-parallel)")
+    ap.add_argument("--local", action="store_true", help="local Spark: one run_pipeline.py process per market")
+    ap.add_argument("--local-dir", default=LOCAL_MARKETS_DIR)
+    ap.add_argument("--local-stage-workers", type=int, default=2, help="local: concurrent stages per market")
+    ap.add_argument("--generate-customers", type=int, default=None, help="local: synthetic customers per market")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    markets = load_markets(args.markets.split(",") if args.markets else None, args.config, args.catalog_template)
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report_dir = args.report_dir or (os.path.join(args.local_dir, "_runs") if args.local else REPORT_DIR)
+    report_path = args.report or os.path.join(report_dir, f"market_run_{run_id}.json")
+
+    if args.local:
+        stage_names = ["run_pipeline"]
+        work = local_work(args)
+    else:
+        stages = STAGES
+        if args.stages:
+            unknown = set(args.stages) - {s for s, _ in STAGES}
+            if unknown:
+                raise SystemExit(f"Unknown stages {sorted(unknown)}")
+            stages = [s for s in STAGES if s[0] in args.stages]
+        stage_names = [s for s, _ in stages]
+
+        from pyspark.sql import SparkSession
+        spark = SparkSession.builder.getOrCreate()
+        if spark.sparkContext.getConf().get("spark.scheduler.mode", "FIFO").upper() != "FAIR":
+            print("Warning: spark.scheduler.mode is not FAIR; markets will queue behind each other's jobs")
+        script_globals = {"spark": spark}
+        if DBUTILS_STAGES & set(stage_names):   # fail now, not after the other stages of every market ran
+            script_globals["dbutils"] = get_dbutils(spark)
+        workers = args.workers_per_market or max(1, (os.cpu_count() or 1) // args.max_parallel)
+        print(f"Driver workers per market (07/13): {workers}")
+        work = databricks_work(spark, stages, script_globals, workers)
+
+    board = ProgressBoard(run_id, markets, stage_names, report_path, args.max_parallel)
+    print(f"Run {run_id}: {len(markets)} markets, max {args.max_parallel} in parallel, stages {stage_names}")
+    print(f"Progress report: {report_path}")
+
+    stop = threading.Event()
+
+    def ticker() -> None:
+        while not stop.wait(args.progress_seconds):
+            print(board.format(), flush=True)
+
+    threading.Thread(target=ticker, daemon=True).start()
+    # markets start in the given order; a freed slot goes to the next queued market
+    with ThreadPoolExecutor(max_workers=args.max_parallel, thread_name_prefix="market") as pool:
+        for m in markets:
+            pool.submit(run_market, board, m, work)
+    stop.set()
+
+    print(board.format())
+    failed = [p for p in board.markets.values() if p.state == FAILED]
+    for p in failed:
+        print(f"  FAILED {p.market} at {p.stage}: {p.error}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# file: run_pipeline.py
+# Purpose: Run the Bronze -> Silver -> Gold -> export pipeline locally as a cached DAG.
+#
+# Stages (declared below, dependencies derived from the tables each stage reads/writes):
+#   generate (optional)  synthetic CSVs (crm_engine/synth.py)
+#   bronze.<table>       4 CSV loads into 00_bronze (run concurrently)
+#   01_silver.<table>    one stage per CREATE TABLE statement of 04_silver_transforms.sql
+#   02_gold.<table>      one stage per CREATE TABLE statement of 05_gold_incrementality.sql and
+#                        12_gold_star_schema.sql (the Gold aggregates run concurrently once the fact is built)
+#   validate             data-quality gate (crm_engine/quality.py); writes data_quality_report.json
+#                        to the export folder and fails on a failed check, which blocks the exports
+#   export.<table>       one CSV per Gold table (local 06)
+#   export.executive_snapshot  executive_snapshot.json from the page 1-3 aggregates
+#                        (crm_engine/snapshot.py)
+# A stage is skipped when the hash of its code, parameters and input fingerprints (file sha256,
+# Delta table id + version) matches its last successful run and its outputs are unchanged.
+#
+# Usage:
+#   python databricks/run_pipeline.py --generate-customers 50000      # first run: everything
+#   python databricks/run_pipeline.py                                 # rerun: only what changed
+#   python databricks/run_pipeline.py --dry-run                       # show what would run
+#   python databricks/run_pipeline.py --targets export.agg_incrementality_rfm --force
+#   python databricks/run_pipeline.py --no-quality-gate                # export even if a check fails
+#   python databricks/run_pipeline.py --generate-customers 50000 --campaign-calendar default
+
+import argparse
+import inspect
+import json
+import os
+import sys
+
+# Make databricks/crm_engine importable
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, _HERE)
+
+from crm_engine import customer_sets, exposures, quality, snapshot, synth  # noqa: E402
+from crm_engine.dag import Dag, DagRunner, Stage, file_sha256, summarize, FAILED, BLOCKED  # noqa: E402
+from crm_engine.local_spark import (  # noqa: E402
+    BRONZE_SCHEMA,
+    BRONZE_TABLES,
+    GOLD_SCHEMA,
+    SQL_STAGES,
+    export_gold_table,
+    get_local_spark,
+    load_bronze_table,
+    local_statements,
+    run_sql_file,
+    statement_sources,
+    statement_target,
+)
+
+# =======================
+# CONFIG
+# =======================
+REPO_ROOT = os.path.dirname(_HERE)
+DEFAULT_CSV_DIR = os.path.join(REPO_ROOT, "data", "data_synth")
+DEFAULT_WAREHOUSE = os.path.join(REPO_ROOT, "data", "local_warehouse")
+DEFAULT_EXPORT_DIR = os.path.join(REPO_ROOT, "data", "gold_exports")
+
+
+class Fingerprints:
+    """
+    Current identity of a resource: "file:<path>" -> sha256 (memoized on size + mtime),
+    "table:<schema>.<name>" -> Delta table id + latest version. None when missing.
+    """
+
+    def __init__(self, spark, cache_path: str):
+        self.spark = spark
+        self.cache_path = cache_path
+        self.files = {}
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                self.files = json.load(f)
+
+    def save(self) -> None:
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump(self.files, f, indent=2, sort_keys=True)
+
+    def _file(self, path: str):
+        if not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+        hit = self.files.get(path)
+        if hit and hit["size"] == st.st_size and hit["mtime_ns"] == st.st_mtime_ns:
+            return hit["sha256"]
+        digest = file_sha256(path)
+        self.files[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def _table(self, name: str):
+        schema, table = name.split(".", 1)
+        fqn = f"`{schema}`.`{table}`"
+        if not self.spark.catalog.tableExists(fqn):
+            return None
+        detail = self.spark.sql(f"DESCRIBE DETAIL {fqn}").select("id").collect()[0]["id"]
+        version = self.spark.sql(f"DESCRIBE HISTORY {fqn} LIMIT 1").select("version").collect()[0]["version"]
+        return f"{detail}@{version}"
+
+    def __call__(self, resource: str):
+        kind, _, name = resource.partition(":")
+        if kind == "file":
+            return self._file(name)
+        if kind == "table":
+            return self._table(name)
+        raise ValueError(f"Unknown resource kind: {resource}")
+
+
+def _local_tbl(schema: str, name: str) -> str:
+    return f"`{schema}`.`{name}`"
+
+
+def validate(spark, report_path: str, gate: bool) -> None:
+    report = quality.run_validation(spark, _local_tbl)
+    quality.write_report(report, report_path)
+    print(quality.format_report(report))
+    if gate and report["status"] == quality.FAIL:
+        raise RuntimeError(f"data-quality checks failed: {', '.join(quality.failed_checks(report))}")
+
+
+def build_dag(spark, csv_dir: str, export_dir: str, generate_customers=None, seed: int = 42,
+              quality_gate: bool = True, campaign_calendar=None) -> Dag:
+    dag = Dag()
+    csv_paths = {name: os.path.abspath(os.path.join(csv_dir, f"{name}.csv")) for name in BRONZE_TABLES}
+
+    if generate_customers:
+        cfg = synth.SynthConfig(n_customers=generate_customers, seed=seed, campaign_calendar=campaign_calendar)
+        calendar_file = campaign_calendar not in (None, "default")
+        dag.add(Stage(
+            "generate",
+            run=lambda: synth.write_csvs(synth.generate(cfg), csv_dir),
+            inputs=[f"file:{os.path.abspath(campaign_calendar)}"] if calendar_file else [],
+            outputs=[f"file:{p}" for p in csv_paths.values()],
+            params={k: v for k, v in vars(cfg).items()},
+            code=inspect.getsource(synth) + inspect.getsource(exposures),
+            group="bronze",
+        ))
+
+    load_code = inspect.getsource(load_bronze_table)
+    for name, table in BRONZE_TABLES.items():
+        dag.add(Stage(
+            f"bronze.{table}",
+            run=lambda p=csv_paths[name], t=table: load_bronze_table(spark, p, t),
+            inputs=[f"file:{csv_paths[name]}"],
+            outputs=[f"table:{BRONZE_SCHEMA}.{table}"],
+            code=load_code,
+            group="bronze",
+        ))
+
+    gold_tables = []
+    for layer in ("silver", "gold", "star"):
+        for stmt in local_statements(SQL_STAGES[layer]):
+            target = statement_target(stmt)
+            if target is None:
+                raise ValueError(f"Only CREATE TABLE statements can be DAG stages:\n{stmt[:200]}")
+            dag.add(Stage(
+                target,
+                run=lambda s=stmt: spark.sql(s),
+                inputs=[f"table:{t}" for t in statement_sources(stmt)],
+                outputs=[f"table:{target}"],
+                code=stmt,
+                group="gold" if layer == "star" else layer,
+            ))
+            if target.startswith(f"{GOLD_SCHEMA}."):
+                gold_tables.append(target.split(".", 1)[1])
+
+    # the gate reads every table it checks; exports wait for its report
+    report_path = os.path.abspath(os.path.join(export_dir, quality.REPORT_FILE))
+    checked = [f"{schema}.{name}" for schema, name in quality.TABLES.values()]
+    checked += [f"{GOLD_SCHEMA}.{t}" for t in quality.AGG_ROLLUPS if t in gold_tables]
+    dag.add(Stage(
+        "validate",
+        run=lambda: validate(spark, report_path, quality_gate),
+        inputs=[f"table:{t}" for t in checked],
+        outputs=[f"file:{report_path}"],
+        params={"thresholds": quality.DEFAULT_THRESHOLDS, "gate": quality_gate},
+        code=inspect.getsource(quality),
+        group="gold",
+    ))
+
+    export_code = inspect.getsource(export_gold_table)
+    for t in gold_tables:
+        dag.add(Stage(
+            f"export.{t}",
+            run=lambda t=t: export_gold_table(spark, t, export_dir),
+            inputs=[f"table:{GOLD_SCHEMA}.{t}", f"file:{report_path}"],
+            outputs=[f"file:{os.path.abspath(os.path.join(export_dir, f'{t}.csv'))}"],
+            params={"export_dir": os.path.abspath(export_dir)},
+            code=export_code,
+            group="export",
+        ))
+
+    # summary pages render from this instead of the CSVs; rebuilt whenever one of its sources changes
+    if all(os.path.splitext(f)[0] in gold_tables for f in snapshot.SOURCE_FILES):
+        dag.add(Stage(
+            "export.executive_snapshot",
+            run=lambda: snapshot.write_snapshot(export_dir),
+            inputs=[f"file:{os.path.abspath(os.path.join(export_dir, f))}" for f in snapshot.SOURCE_FILES],
+            outputs=[f"file:{os.path.abspath(os.path.join(export_dir, snapshot.SNAPSHOT_FILE))}"],
+            params={"export_dir": os.path.abspath(export_dir), "snapshot_version": snapshot.SNAPSHOT_VERSION},
+            code=inspect.getsource(snapshot) + inspect.getsource(customer_sets),
+            group="export",
+        ))
+    return dag
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Cached local DAG runner for Bronze -> Gold -> export.")
+    ap.add_argument("--csv-dir", default=DEFAULT_CSV_DIR, help="synthetic CSVs (Bronze inputs)")
+    ap.add_argument("--warehouse", default=DEFAULT_WAREHOUSE, help="local Delta warehouse + DAG state")
+    ap.add_argument("--export-dir", default=DEFAULT_EXPORT_DIR, help="Gold CSV exports (Streamlit folder)")
+    ap.add_argument("--generate-customers", type=int, default=None,
+                    help="add a generate stage producing the CSVs with this many customers")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--campaign-calendar", default=None,
+                    help='generate: exposures from a campaign calendar (JSON path or "default")')
+    ap.add_argument("--workers", type=int, default=4, help="max concurrent stages")
+    ap.add_argument("--targets", nargs="+", default=None, help="stage names to build (plus their upstream)")
+    ap.add_argument("--force", action="store_true", help="ignore cached state and rerun every selected stage")
+    ap.add_argument("--dry-run", action="store_true", help="only report which stages would run")
+    ap.add_argument("--no-quality-gate", action="store_true",
+                    help="still write the data-quality report, but export even when a check fails")
+    args = ap.parse_args(argv)
+
+    spark = get_local_spark(args.warehouse, extra_conf={"spark.scheduler.mode": "FAIR"})
+    try:
+        run_sql_file(spark, SQL_STAGES["ddl"])  # idempotent CREATE ... IF NOT EXISTS
+        dag = build_dag(spark, args.csv_dir, args.export_dir, args.generate_customers, args.seed,
+                        quality_gate=not args.no_quality_gate, campaign_calendar=args.campaign_calendar)
+        unknown = [t for t in args.targets or [] if t not in dag.stages]
+        if unknown:
+            raise SystemExit(f"Unknown targets {unknown}. Stages: {list(dag.stages)}")
+
+        fingerprints = Fingerprints(spark, os.path.join(args.warehouse, "_file_hashes.json"))
+        runner = DagRunner(dag, fingerprints, os.path.join(args.warehouse, "_pipeline_state.json"),
+                           max_workers=args.workers, force=args.force)
+        results = runner.run(targets=args.targets, dry_run=args.dry_run)
+        fingerprints.save()
+    finally:
+        spark.stop()
+
+    print("\nStage summary:", summarize(results))
+    for r in results:
+        if r.status in (FAILED, BLOCKED):
+            print(f"  {r.status}: {r.name} - {r.error}")
+    return 1 if any(r.status in (FAILED, BLOCKED) for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
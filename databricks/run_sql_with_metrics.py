@@ -0,0 +1,131 @@
+# file: run_sql_with_metrics.py
+# Purpose: Run 04_silver_transforms.sql / 05_gold_incrementality.sql statement by statement and record
+#          per-statement Spark metrics (wall time, input/output rows, shuffle, spill, tasks).
+# Output: Databricks -> appended to the Delta table METRICS_TABLE
+#         local      -> one Parquet file per run under --metrics-parquet
+#
+# Usage (Databricks job / notebook): run as is (replaces running 04 and 05 directly).
+# Usage (local):
+#   python databricks/run_sql_with_metrics.py run --local --bronze-csv-dir data_synth
+#   python databricks/run_sql_with_metrics.py report --local            # latest run vs previous
+#   python databricks/run_sql_with_metrics.py report --local --run-id <id> --baseline-run-id <id>
+
+import argparse
+import os
+import sys
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, _HERE)
+
+import pandas as pd  # noqa: E402
+
+from crm_engine.local_spark import SQL_STAGES, get_local_spark, load_bronze_csvs, run_sql_file  # noqa: E402
+from crm_engine.query_metrics import (  # noqa: E402
+    append_metrics_parquet,
+    append_metrics_table,
+    compare_runs,
+    format_comparison,
+    new_run_id,
+    run_sql_file_with_metrics,
+)
+from crm_engine.markets import get_catalog  # noqa: E402
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+METRICS_TABLE = "pipeline_query_metrics"   # in <catalog>.02_gold
+LOCAL_METRICS_DIR = os.path.join(os.path.dirname(_HERE), "data", "metrics", "query_metrics")
+LOCAL_WAREHOUSE = os.path.join(os.path.dirname(_HERE), "data", "local_warehouse")
+
+DEFAULT_FILES = ["silver", "gold"]
+
+
+def _resolve(name: str) -> str:
+    return SQL_STAGES.get(name, name)
+
+
+def metrics_table(catalog: str) -> str:
+    return f"`{catalog}`.`02_gold`.`{METRICS_TABLE}`"
+
+
+def cmd_run(args) -> None:
+    if args.local:
+        spark = get_local_spark(args.warehouse, extra_conf={"spark.ui.enabled": "true"})
+        run_sql_file(spark, SQL_STAGES["ddl"])
+        if args.bronze_csv_dir:
+            print("Bronze rows:", load_bronze_csvs(spark, args.bronze_csv_dir))
+    else:
+        from pyspark.sql import SparkSession
+        spark = SparkSession.builder.getOrCreate()
+
+    run_id = new_run_id()
+    records = []
+    for name in args.files:
+        path = _resolve(name)
+        print(f"\n=== {os.path.basename(path)} (run {run_id}) ===")
+        recs = run_sql_file_with_metrics(spark, path, run_id=run_id, local=args.local, catalog=args.catalog)
+        records.extend(recs)
+        if any(r["status"] == "failed" for r in recs):
+            break
+
+    if args.local:
+        print(f"\nMetrics: {append_metrics_parquet(records, args.metrics_parquet)}")
+    else:
+        append_metrics_table(spark, records, metrics_table(args.catalog))
+        print(f"\nMetrics appended to {metrics_table(args.catalog)}")
+
+    failed = [r for r in records if r["status"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Statement {failed[0]['statement_index']} of {failed[0]['sql_file']} failed: "
+                           f"{failed[0]['error']}")
+
+
+def load_metrics(args) -> pd.DataFrame:
+    if args.local:
+        return pd.read_parquet(args.metrics_parquet)
+    from pyspark.sql import SparkSession
+    spark = SparkSession.builder.getOrCreate()
+    return spark.table(metrics_table(args.catalog)).toPandas()
+
+
+def cmd_report(args) -> None:
+    comparison = compare_runs(load_metrics(args), run_id=args.run_id, baseline_run_id=args.baseline_run_id,
+                              min_seconds=args.min_seconds)
+    print(format_comparison(comparison, top=args.top))
+    if args.csv:
+        comparison.to_csv(args.csv, index=False)
+        print(f"\nComparison written to {args.csv}")
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Per-statement Spark metrics for the Silver/Gold SQL.")
+    sub = ap.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="execute SQL files and record metrics (default)")
+    run.add_argument("--files", nargs="+", default=DEFAULT_FILES, help="silver / gold or SQL file paths")
+    report = sub.add_parser("report", help="compare two recorded runs statement by statement")
+    report.add_argument("--run-id", default=None, help="default: latest run")
+    report.add_argument("--baseline-run-id", default=None, help="default: the run before --run-id")
+    report.add_argument("--min-seconds", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    report.add_argument("--top", type=int, default=30)
+    report.add_argument("--csv", default=None, help="also write the comparison to this CSV")
+    for p in (run, report):
+        p.add_argument("--local", action="store_true", help="local Spark + Delta, Parquet metrics")
+        p.add_argument("--metrics-parquet", default=LOCAL_METRICS_DIR)
+        p.add_argument("--warehouse", default=LOCAL_WAREHOUSE)
+        p.add_argument("--catalog", default=CATALOG, help="Unity Catalog of the market (Databricks)")
+        p.add_argument("--market", default=None, help="market name (catalog from crm_engine/markets.py)")
+    run.add_argument("--bronze-csv-dir", default=None, help="local: load these synthetic CSVs into Bronze first")
+
+    # Databricks job tasks / notebooks run without arguments: default to `run`
+    args = ap.parse_args(argv if argv is not None else (sys.argv[1:] or ["run"]))
+    if args.command == "report":
+        cmd_report(args)
+    else:
+        cmd_run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# file: stream_pre_post.py
+# Purpose: Streaming mode of the pre/post computation: consumes new fact_crm_exposure and
+#          fact_transaction rows as they land and appends a finalized customer-month incrementality
+#          row as soon as its 7-day POST window closes on the event-time watermark.
+# Input : CSV files landing in LANDING_DIR/fact_transaction and LANDING_DIR/fact_crm_exposure
+#         (Bronze column order), 01_silver.dim_customer for the segment columns
+# Output: 02_gold.stream_customer_month_incrementality (Delta, append)
+#
+# State per customer, eviction and late-data rules: crm_engine/streaming.py. The monthly batch
+# (05_gold_incrementality.sql) stays the system of record; streaming rows are the early read.
+#
+# Usage (Databricks job): run as is (continuous, one micro-batch per TRIGGER_SECONDS).
+# Usage (local, file-source stand-in for the live feed):
+#   python databricks/stream_pre_post.py feed --csv-dir data/data_synth --interval-seconds 2 &
+#   python databricks/stream_pre_post.py run --local                     # continuous
+#   python databricks/stream_pre_post.py run --local --available-now     # drain what landed, then stop
+
+import argparse
+import os
+import sys
+import time
+
+# Make databricks/crm_engine importable (works as a job script and as a Repos notebook)
+_HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+sys.path.insert(0, _HERE)
+
+import pandas as pd  # noqa: E402
+
+from crm_engine.local_spark import SQL_STAGES, get_local_spark, run_sql_file  # noqa: E402
+from crm_engine.streaming import iter_landing_files, pre_post_stream, read_landing_events  # noqa: E402
+from crm_engine.markets import get_catalog  # noqa: E402
+
+# =======================
+# CONFIG
+# =======================
+CATALOG = get_catalog()   # job parameter "catalog" or "market" (crm_engine/markets.py)
+LANDING_DIR = "/Volumes/{catalog}/00_bronze/vol_input/stream"
+CHECKPOINT_DIR = "/Volumes/{catalog}/00_bronze/vol_input/_checkpoints/stream_pre_post"
+TARGET_TABLE = "stream_customer_month_incrementality"
+
+WATERMARK_DELAY = "1 day"     # how late an event may arrive and still count
+TRIGGER_SECONDS = 60
+
+LOCAL_STREAM_DIR = os.path.join(os.path.dirname(_HERE), "data", "stream")
+LOCAL_WAREHOUSE = os.path.join(os.path.dirname(_HERE), "data", "local_warehouse")
+
+
+def cmd_feed(args) -> None:
+    tx = pd.read_csv(os.path.join(args.csv_dir, "fact_transaction.csv"))
+    ex = pd.read_csv(os.path.join(args.csv_dir, "fact_crm_exposure.csv"))
+    for i, (tx_path, _) in enumerate(iter_landing_files(tx, ex, args.landing_dir, args.days_per_file)):
+        print(f"landed {os.path.basename(tx_path)[len('fact_transaction_'):-len('.csv')]}")
+        if args.limit and i + 1 >= args.limit:
+            break
+        if args.interval_seconds:
+            time.sleep(args.interval_seconds)
+
+
+def cmd_run(args) -> None:
+    if args.local:
+        spark = get_local_spark(args.warehouse, app_name="crm-stream-pre-post")
+        run_sql_file(spark, SQL_STAGES["ddl"])  # schemas
+        prefix = ""
+        landing, checkpoint = args.landing_dir, args.checkpoint
+    else:
+        from pyspark.sql import SparkSession
+        spark = SparkSession.builder.getOrCreate()
+        prefix = f"`{args.catalog}`."
+        landing = LANDING_DIR.format(catalog=args.catalog)
+        checkpoint = CHECKPOINT_DIR.format(catalog=args.catalog)
+    target = f"{prefix}`02_gold`.`{TARGET_TABLE}`"
+    dim_customer = f"{prefix}`01_silver`.`dim_customer`"
+
+    events = read_landing_events(spark, landing, watermark_delay=args.watermark_delay,
+                                 max_files_per_trigger=args.max_files_per_trigger)
+    rows = pre_post_stream(events)
+    if spark.catalog.tableExists(dim_customer):
+        # stream-static join: segment columns as in the Gold fact
+        rows = rows.join(spark.table(dim_customer).select("customer_id", "is_active", "is_high_value"),
+                         "customer_id", "left")
+
+    writer = (
+        rows.writeStream
+        .format("delta")
+        .outputMode("append")
+        .option("checkpointLocation", checkpoint)
+        .queryName("stream_pre_post")
+    )
+    writer = writer.trigger(availableNow=True) if args.available_now else \
+        writer.trigger(processingTime=f"{args.trigger_seconds} seconds")
+    query = writer.toTable(target)
+    print(f"Streaming {landing} -> {target} (checkpoint {checkpoint})")
+    try:
+        query.awaitTermination()
+    finally:
+        for p in query.recentProgress:
+            state = sum(op.get("numRowsTotal", 0) for op in p.get("stateOperators", []))
+            print(f"  batch {p['batchId']}: {p['numInputRows']} events, watermark "
+                  f"{p.get('eventTime', {}).get('watermark', '-')}, state rows {state}")
+        if args.local:
+            spark.stop()
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Streaming pre/post with event-time watermarks.")
+    sub = ap.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="start the streaming query (default)")
+    run.add_argument("--local", action="store_true", help="local Spark + Delta, local landing folder")
+    run.add_argument("--landing-dir", default=os.path.join(LOCAL_STREAM_DIR, "landing"))
+    run.add_argument("--checkpoint", default=os.path.join(LOCAL_STREAM_DIR, "_checkpoint"))
+    run.add_argument("--warehouse", default=LOCAL_WAREHOUSE)
+    run.add_argument("--catalog", default=CATALOG, help="Unity Catalog of the market (Databricks)")
+    run.add_argument("--market", default=None, help="market name (catalog from crm_engine/markets.py)")
+    run.add_argument("--watermark-delay", default=WATERMARK_DELAY)
+    run.add_argument("--trigger-seconds", type=int, default=TRIGGER_SECONDS)
+    run.add_argument("--available-now", action="store_true", help="process everything landed so far, then stop")
+    run.add_argument("--max-files-per-trigger", type=int, default=None,
+                     help="files per source per micro-batch (1 = replay day by day)")
+
+    feed = sub.add_parser("feed", help="local stand-in for the live feed: land synthetic CSVs day by day")
+    feed.add_argument("--csv-dir", required=True, help="synthetic CSVs (01_generate_synth_data.py output)")
+    feed.add_argument("--landing-dir", default=os.path.join(LOCAL_STREAM_DIR, "landing"))
+    feed.add_argument("--days-per-file", type=int, default=1)
+    feed.add_argument("--interval-seconds", type=float, default=0.0, help="pause between landed files")
+    feed.add_argument("--limit", type=int, default=None, help="stop after this many files")
+
+    # Databricks job tasks / notebooks run without arguments: default to `run`
+    args = ap.parse_args(argv if argv is not None else (sys.argv[1:] or ["run"]))
+    if args.command == "feed":
+        cmd_feed(args)
+    else:
+        cmd_run(args)
+
+
+if __name__ == "__main__":
+    main()
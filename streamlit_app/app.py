@@ -1,6 +1,29 @@
 import streamlit as st
 
+from utils.data import get_default_export_folder
+from utils.warmup import is_cache_ready, warm_gold_cache
+
 st.set_page_config(page_title="CRM Incrementality (No Control)", layout="wide")
 st.title("CRM Behavioral Pre/Post Incrementality (No Control Group)")
 st.caption("Dummy data only | Directional incrementality | 7-day impact window")
 st.write("Use the left sidebar to navigate pages.")
+
+# Warm the shared cache once per container: the small aggregate exports (data.WARMUP_FILES) load in
+# parallel, so the first page visit pays at most the slowest single load. The customer-grain fact is
+# never parsed here; the pages scan it with DuckDB (or load it themselves without DuckDB).
+folder = get_default_export_folder()
+if not is_cache_ready(folder):
+    progress = st.progress(0.0, text="Loading Gold aggregates ...")
+
+    def _on_progress(done: int, total: int, res) -> None:
+        status = "missing" if res.error == "not found" else (res.error or f"{res.rows:,} rows in {res.seconds:.2f}s")
+        progress.progress(done / total, text=f"Loaded {done}/{total}: {res.filename} ({status})")
+
+    results = warm_gold_cache(folder, on_progress=_on_progress)
+    progress.empty()
+    failed = [r for r in results if r.error not in (None, "not found")]
+    for r in failed:
+        st.warning(f"Could not load {r.filename}: {r.error}")
+
+st.session_state["gold_cache_ready"] = is_cache_ready(folder)
+st.caption(f"Gold exports: {folder} | cache ready: {st.session_state['gold_cache_ready']}")
@@ -0,0 +1,389 @@
+# streamlit_app/gold_service.py
+# Local HTTP service over the Gold exports, so the Streamlit app, Power BI (Web connector) and
+# notebooks share one implementation of the filters and aggregations.
+#
+# Endpoints (GET):
+#   /health
+#   /v1/months                                   distinct months in the fact
+#   /v1/aggregates?by=month,segment&month=202501&is_active=1&rfm_segment=Champions
+#                                                customer-month KPIs grouped by any of
+#                                                month / segment (rfm_segment) / active / value
+#   /v1/customers/<customer_id>                  customer-month history (drill-down)
+#   /v1/stats                                    result-cache counters
+# Responses are Arrow IPC streams (Accept: application/vnd.apache.arrow.stream or ?format=arrow)
+# or JSON records, gzip-compressed when the client accepts it.
+#
+# Encoded responses are kept in an LRU keyed by the normalized request + the export version
+# (path, mtime, size), so a rewritten export is never served stale. Each response carries an ETag;
+# If-None-Match answers 304 without a body. Aggregations run in-process on DuckDB over the
+# export files (utils/query.py), drill-down uses the customer index (utils/customer_index.py).
+#
+# Usage:
+#   python streamlit_app/gold_service.py --folder data/gold_exports --port 8765
+#   curl -H "Accept-Encoding: gzip" --compressed "http://127.0.0.1:8765/v1/aggregates?by=month"
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.customer_index import customer_history, get_customer_index  # noqa: E402
+from utils.data import get_default_export_folder  # noqa: E402
+from utils.query import (  # noqa: E402
+    describe_source,
+    duckdb_available,
+    fact_with_rfm_source,
+    quote_ident,
+    run_query,
+)
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+JSON = "application/json"
+
+# query-string name -> fact column
+DIMENSIONS = {
+    "month": "month_id",
+    "segment": "rfm_segment",
+    "active": "is_active",
+    "value": "is_high_value",
+}
+FILTERS = {
+    "month": "month_id",
+    "month_id": "month_id",
+    "segment": "rfm_segment",
+    "rfm_segment": "rfm_segment",
+    "active": "is_active",
+    "is_active": "is_active",
+    "value": "is_high_value",
+    "is_high_value": "is_high_value",
+}
+_INT_COLUMNS = {"month_id", "is_active", "is_high_value"}
+
+# output column -> SQL (a metric is skipped when its source column is not in the export)
+METRICS = {
+    "customer_months": ("*", "COUNT(*)"),
+    "customers": ("customer_id", "COUNT(DISTINCT customer_id)"),
+    "incremental_revenue": ("incremental_revenue", "SUM(incremental_revenue)"),
+    "incremental_transactions": ("incremental_transactions", "SUM(incremental_transactions)"),
+    "avg_delta_aov": ("delta_aov", "AVG(delta_aov)"),
+    "seasonal_adj_incremental_revenue": ("seasonal_adj_incremental_revenue",
+                                         "SUM(seasonal_adj_incremental_revenue)"),
+    "pre_revenue": ("pre_revenue", "SUM(pre_revenue)"),
+    "post_revenue": ("post_revenue", "SUM(post_revenue)"),
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class NotFound(LookupError):
+    pass
+
+
+@dataclass
+class Encoded:
+    body: bytes
+    content_type: str
+    content_encoding: Optional[str]
+    etag: str
+    rows: int
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of encoded responses, bounded by entry count and total body bytes.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 256 * 2 ** 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[tuple, Encoded] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[Encoded]:
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return hit
+
+    def put(self, key: tuple, value: Encoded) -> None:
+        if len(value.body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._items[key] = value
+            self._bytes += len(value.body)
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted.body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+# =======================
+# Queries (return pandas; the handler encodes)
+# =======================
+def _parse_values(column: str, raw: list[str]) -> list:
+    values = [v for item in raw for v in item.split(",") if v != ""]
+    if column in _INT_COLUMNS:
+        try:
+            return [int(v) for v in values]
+        except ValueError:
+            raise BadRequest(f"{column} values must be integers: {values}")
+    return values
+
+
+def _month_expr(columns: set) -> str:
+    # aggregates use the normalized yyyyMM key; raw month_id may be yyyyMMdd
+    return "month_key_yyyymm" if "month_key_yyyymm" in columns else "month_id"
+
+
+def aggregates(folder: str, params: dict[str, list[str]]) -> tuple[pd.DataFrame, str]:
+    """
+    KPIs grouped by the `by` dimensions (none = one total row), filtered by month / segment /
+    active / value. Returns (frame, export version).
+    """
+    src, version = fact_with_rfm_source(folder)
+    columns = set(describe_source(src, version=version)["column_name"])
+
+    by = [b for item in params.get("by", []) for b in item.split(",") if b]
+    unknown = [b for b in by if b not in DIMENSIONS]
+    if unknown:
+        raise BadRequest(f"Unknown dimension(s) {unknown}; use {sorted(DIMENSIONS)}")
+    group_cols = list(dict.fromkeys(DIMENSIONS[b] for b in by))
+
+    def expr(col: str) -> str:
+        return _month_expr(columns) if col == "month_id" else quote_ident(col)
+
+    select = [f"{expr(c)} AS {quote_ident(c)}" for c in group_cols]
+    select += [f"{sql} AS {quote_ident(name)}" for name, (col, sql) in METRICS.items()
+               if col == "*" or col in columns]
+
+    where, args = [], []
+    for key, raw in params.items():
+        if key in ("by", "format"):
+            continue
+        if key not in FILTERS:
+            raise BadRequest(f"Unknown parameter '{key}'")
+        col = FILTERS[key]
+        values = _parse_values(col, raw)
+        if values:
+            where.append(f"{expr(col)} IN ({', '.join('?' for _ in values)})")
+            args.extend(values)
+
+    sql = f"SELECT {', '.join(select)} FROM {src}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group_cols:
+        positions = ", ".join(str(i + 1) for i in range(len(group_cols)))
+        sql += f" GROUP BY {positions} ORDER BY {positions}"
+    return run_query(sql, args, version=version), version
+
+
+def months(folder: str) -> tuple[pd.DataFrame, str]:
+    src, version = fact_with_rfm_source(folder)
+    columns = set(describe_source(src, version=version)["column_name"])
+    sql = f"SELECT DISTINCT {_month_expr(columns)} AS month_id FROM {src} ORDER BY 1"
+    return run_query(sql, version=version), version
+
+
+def customer(folder: str, customer_id: str) -> tuple[pd.DataFrame, str]:
+    if not customer_id.isdigit():
+        raise BadRequest("customer_id must be an integer")
+    idx = get_customer_index(folder)
+    if idx is None:
+        raise NotFound("No fact export found")
+    df = customer_history(idx, int(customer_id))
+    if df.empty:
+        raise NotFound(f"Customer {customer_id} has no customer-month rows")
+    return df, idx.source_version
+
+
+# =======================
+# Encoding
+# =======================
+def encode(df: pd.DataFrame, fmt: str, gzip_ok: bool) -> Encoded:
+    if fmt == "arrow":
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        body, ctype, cenc = sink.getvalue().to_pybytes(), ARROW_STREAM, None
+    else:
+        body = df.to_json(orient="records", date_format="iso").encode("utf-8")
+        ctype, cenc = JSON, None
+        if gzip_ok:
+            body, cenc = gzip.compress(body, compresslevel=5), "gzip"
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return Encoded(body, ctype, cenc, etag, len(df))
+
+
+def _wants_arrow(params: dict, accept: str) -> bool:
+    fmt = (params.get("format") or [""])[0].lower()
+    if fmt:
+        if fmt not in ("arrow", "json"):
+            raise BadRequest("format must be arrow or json")
+        return fmt == "arrow"
+    return ARROW_STREAM in accept
+
+
+class GoldHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    server_version = "GoldService/1"
+
+    # set by make_server
+    folder: str = ""
+    cache: ResultCache = None
+    verbose: bool = False
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = JSON, headers: Optional[dict] = None):
+        self.send_response(status)
+        if body or status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        self._send(status, json.dumps(payload, default=str).encode("utf-8"))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query, keep_blank_values=False)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if parts == ["health"]:
+                return self._send_json(HTTPStatus.OK, {"status": "ok", "folder": self.folder})
+            if parts == ["v1", "stats"]:
+                return self._send_json(HTTPStatus.OK, self.cache.stats())
+
+            if parts == ["v1", "aggregates"]:
+                compute = lambda: aggregates(self.folder, params)  # noqa: E731
+            elif parts == ["v1", "months"]:
+                compute = lambda: months(self.folder)  # noqa: E731
+            elif len(parts) == 3 and parts[:2] == ["v1", "customers"]:
+                compute = lambda: customer(self.folder, parts[2])  # noqa: E731
+            else:
+                raise NotFound(f"No route for {url.path}")
+
+            arrow = _wants_arrow(params, self.headers.get("Accept", ""))
+            gzip_ok = not arrow and "gzip" in self.headers.get("Accept-Encoding", "")
+            norm = tuple(sorted((k, tuple(v)) for k, v in params.items() if k != "format"))
+            self._respond_cached(("/".join(parts), norm, arrow, gzip_ok), compute, arrow, gzip_ok)
+        except BadRequest as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except (NotFound, FileNotFoundError) as e:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": str(e)})
+        except Exception as e:  # keep serving; report the failure to the client
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"})
+
+    do_HEAD = do_GET
+
+    def _respond_cached(self, request_key: tuple, compute, arrow: bool, gzip_ok: bool) -> None:
+        # the export version comes from stat calls only, so a rewritten export misses the cache
+        version = current_version(self.folder, request_key[0])
+        hit = self.cache.get(request_key + (version,)) if version is not None else None
+        if hit is None:
+            df, version = compute()
+            hit = encode(df, "arrow" if arrow else "json", gzip_ok)
+            self.cache.put(request_key + (version,), hit)
+
+        headers = {"ETag": hit.etag, "Cache-Control": "no-cache", "X-Row-Count": str(hit.rows),
+                   "Vary": "Accept, Accept-Encoding"}
+        if hit.content_encoding:
+            headers["Content-Encoding"] = hit.content_encoding
+        if hit.etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            return self._send(HTTPStatus.NOT_MODIFIED, headers=headers)
+        self._send(HTTPStatus.OK, hit.body, hit.content_type, headers)
+
+
+def current_version(folder: str, route: str) -> Optional[str]:
+    """
+    Version of the exports a route reads (stat calls only).
+    """
+    try:
+        if route.startswith("v1/customers/"):
+            idx = get_customer_index(folder, build_if_missing=False)
+            return idx.source_version if idx is not None else None
+        return fact_with_rfm_source(folder)[1]
+    except FileNotFoundError:
+        return None
+
+
+def make_server(folder: str, host: str = "127.0.0.1", port: int = 8765, cache_entries: int = 1024,
+                cache_mb: int = 256, verbose: bool = False) -> ThreadingHTTPServer:
+    """
+    Server bound to host:port (port 0 = any free port; see server.server_address). Call
+    serve_forever() (e.g. in a thread for tests) and shutdown() to stop.
+    """
+    if not duckdb_available():
+        raise RuntimeError("The Gold service needs DuckDB: pip install duckdb")
+    handler = type("BoundGoldHandler", (GoldHandler,), {
+        "folder": folder,
+        "cache": ResultCache(cache_entries, cache_mb * 2 ** 20),
+        "verbose": verbose,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Local HTTP service over the Gold exports.")
+    ap.add_argument("--folder", default=get_default_export_folder(), help="Gold export folder")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--cache-entries", type=int, default=1024)
+    ap.add_argument("--cache-mb", type=int, default=256)
+    ap.add_argument("--verbose", action="store_true", help="log every request")
+    args = ap.parse_args(argv)
+
+    server = make_server(args.folder, args.host, args.port, args.cache_entries, args.cache_mb, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Gold service on http://{host}:{port} (exports: {args.folder})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
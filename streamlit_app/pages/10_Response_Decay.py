@@ -0,0 +1,133 @@
+import streamlit as st
+import plotly.graph_objects as go
+import pandas as pd
+
+from utils.data import (
+    get_default_export_folder,
+    load_csv_folder,
+    ensure_month_fields,
+    sort_month
+)
+from utils.downloads import render_download
+from utils.warmup import start_background_warmup, is_cache_ready
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
+
+POST_DAYS = 7
+
+SEGMENTS = {
+    "All customers": None,
+    "Active": ("is_active", 1),
+    "Non-Active": ("is_active", 0),
+    "High Value": ("is_high_value", 1),
+    "Low Value": ("is_high_value", 0),
+}
+
+st.title("Response Decay")
+st.caption(
+    "Revenue per exposed customer-month by day offset from the anchor exposure (day 0), "
+    "against each customer's own PRE-window daily rate. The standard POST window covers days 0-6."
+)
+
+prof = get_page_profiler("10_Response_Decay")
+
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
+start_background_warmup(folder)
+
+with prof.stage("load agg_response_decay.csv", kind=KIND_IO) as s:
+    # the cached frame is shared across sessions; columns are normalized in place below
+    df = load_csv_folder(folder, "agg_response_decay.csv", required=False).copy()
+    s.rows = len(df)
+
+if df.empty:
+    st.error(
+        "Missing data file: agg_response_decay.csv\n\n"
+        "To fix:\n"
+        "- Re-run 05_gold_incrementality.sql and re-export Gold CSVs, or\n"
+        "- Set the sidebar 'Gold export folder' to the folder that contains the CSV."
+    )
+    st.stop()
+
+for col in ["day_offset", "customer_months", "revenue", "transactions", "baseline_revenue",
+            "baseline_transactions", "excess_revenue", "excess_transactions", "is_active", "is_high_value"]:
+    if col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+df = ensure_month_fields(df, "month_id")
+df = sort_month(df)
+
+months = sorted([m for m in df["month_id_norm"].unique().tolist() if m != "Unknown"])
+if not months:
+    st.error("No valid months found in data. Check 'month_id' values in the CSV.")
+    st.stop()
+
+c_sel1, c_sel2, c_sel3 = st.columns(3)
+sel_month = c_sel1.selectbox("Month", ["All months"] + months, index=0)
+sel_segment = c_sel2.selectbox("Segment", list(SEGMENTS.keys()), index=0)
+metric = c_sel3.radio("Metric", ["Revenue", "Transactions"], horizontal=True)
+
+with prof.stage("curve for selection") as s:
+    sub = df if sel_month == "All months" else df[df["month_id_norm"] == sel_month]
+    seg = SEGMENTS[sel_segment]
+    if seg is not None:
+        sub = sub[sub[seg[0]] == seg[1]]
+
+    actual_col, base_col = ("revenue", "baseline_revenue") if metric == "Revenue" else ("transactions", "baseline_transactions")
+    curve = sub.groupby("day_offset", as_index=False).agg(
+        actual=(actual_col, "sum"),
+        baseline=(base_col, "sum"),
+        customer_months=("customer_months", "sum"),
+    )
+    # customer_months is repeated on every offset row of a group, so its per-offset sum is the selection's count
+    denom = curve["customer_months"].where(curve["customer_months"] > 0)
+    curve["actual_per_cm"] = curve["actual"] / denom
+    curve["baseline_per_cm"] = curve["baseline"] / denom
+    curve["excess_per_cm"] = curve["actual_per_cm"] - curve["baseline_per_cm"]
+    curve = curve.sort_values("day_offset")
+    curve["cumulative_excess_from_day0"] = curve["excess_per_cm"].where(curve["day_offset"] >= 0, 0.0).cumsum()
+    s.rows = len(curve)
+
+if curve.empty:
+    st.warning("No rows for this selection.")
+    st.stop()
+
+post = curve[(curve["day_offset"] >= 0) & (curve["day_offset"] < POST_DAYS)]
+tail = curve[curve["day_offset"] >= POST_DAYS]
+peak = curve.loc[curve["day_offset"] >= 0].nlargest(1, "excess_per_cm")
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Peak excess day", f"+{int(peak['day_offset'].iloc[0])}" if len(peak) else "N/A")
+c2.metric(f"Excess in POST window (days 0-{POST_DAYS - 1})", f"{post['excess_per_cm'].sum():,.3f}")
+c3.metric(f"Excess after day {POST_DAYS - 1}", f"{tail['excess_per_cm'].sum():,.3f}",
+          help="Positive = lift persists beyond the 7-day POST window; negative = pull-forward / payback.")
+
+st.subheader(f"Daily {metric.lower()} per customer-month vs own PRE baseline")
+with prof.stage("fig: decay curve", kind=KIND_FIGURE):
+    fig1 = go.Figure()
+    fig1.add_trace(go.Scatter(x=curve["day_offset"], y=curve["actual_per_cm"], mode="lines+markers", name="Actual"))
+    fig1.add_trace(go.Scatter(x=curve["day_offset"], y=curve["baseline_per_cm"], mode="lines", name="PRE baseline",
+                              line=dict(dash="dash")))
+    fig1.add_vrect(x0=-0.5, x1=POST_DAYS - 0.5, opacity=0.1, line_width=0, annotation_text="POST window")
+    fig1.update_layout(xaxis_title="Days since anchor exposure", yaxis_title=f"{metric} per customer-month")
+prof.plotly_chart(fig1, "decay curve", use_container_width=True)
+
+st.subheader("Excess over baseline and cumulative lift from day 0")
+with prof.stage("fig: excess + cumulative", kind=KIND_FIGURE):
+    fig2 = go.Figure()
+    fig2.add_trace(go.Bar(x=curve["day_offset"], y=curve["excess_per_cm"], name="Daily excess"))
+    fig2.add_trace(go.Scatter(x=curve["day_offset"], y=curve["cumulative_excess_from_day0"],
+                              mode="lines", name="Cumulative from day 0"))
+    fig2.update_layout(xaxis_title="Days since anchor exposure", yaxis_title=f"{metric} per customer-month")
+prof.plotly_chart(fig2, "excess + cumulative", use_container_width=True)
+
+st.subheader("Detail Table")
+st.dataframe(curve)
+
+st.subheader("Download data")
+render_download("agg_response_decay.csv", folder, prof=prof)
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Gold cache ready:", is_cache_ready(folder))
+    st.write("Rows in df:", len(df))
+    st.write("Rows in selection:", len(sub))
+    render_profile(prof)
@@ -0,0 +1,143 @@
+import streamlit as st
+import plotly.graph_objects as go
+import pandas as pd
+
+from utils.data import (
+    get_default_export_folder,
+    load_csv_folder,
+    ensure_month_fields,
+    sort_month
+)
+from utils.sketches import merge_encoded
+from utils.warmup import start_background_warmup, is_cache_ready
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE, KIND_TRANSFORM
+
+# rollup source -> (file, segment label builder)
+SOURCES = {
+    "RFM segment": (
+        "agg_incrementality_rfm.csv",
+        lambda d: d["rfm_segment"].fillna("Unknown").astype(str),
+    ),
+    "Active x Value": (
+        "agg_incrementality_active_value.csv",
+        lambda d: (d["is_active"].map({1: "Active", 0: "Non-Active"}).fillna("Unknown") + " / "
+                   + d["is_high_value"].map({1: "High Value", 0: "Low Value"}).fillna("Unknown")),
+    ),
+}
+METRICS = {
+    "Incremental revenue": "incremental_revenue_sketch",
+    "ΔAOV": "delta_aov_sketch",
+}
+QS = [0.1, 0.5, 0.9]
+
+st.title("Lift Distribution")
+st.caption(
+    "Medians, p10/p90 and histograms of customer-level lift for any month x segment rollup, "
+    "merged from the quantile sketches stored on each Gold aggregate row (no customer-level rows are loaded)."
+)
+
+prof = get_page_profiler("11_Lift_Distribution")
+
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
+start_background_warmup(folder)
+
+c_src, c_met = st.columns(2)
+source = c_src.selectbox("Rollup by", list(SOURCES.keys()))
+metric = c_met.selectbox("Metric", list(METRICS.keys()))
+filename, seg_label = SOURCES[source]
+sketch_col = METRICS[metric]
+
+with prof.stage(f"load {filename}", kind=KIND_IO) as s:
+    # the cached frame is shared across sessions; columns are normalized in place below
+    df = load_csv_folder(folder, filename, required=False).copy()
+    s.rows = len(df)
+
+if df.empty:
+    st.error(f"Missing data file: {filename}")
+    st.stop()
+if sketch_col not in df.columns:
+    st.info(
+        f"`{sketch_col}` not found in {filename}. Run databricks/02_gold/10_distribution_sketches.py "
+        "before 06_export_gold_to_csv.py to add distribution sketches to the aggregates."
+    )
+    st.stop()
+
+for col in ["is_active", "is_high_value"]:
+    if col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+df = ensure_month_fields(df, "month_id")
+df = sort_month(df)
+df["segment"] = seg_label(df)
+
+months = sorted([m for m in df["month_id_norm"].unique().tolist() if m != "Unknown"])
+segments = sorted(df["segment"].unique().tolist())
+
+sel_months = st.multiselect("Months", months, default=months)
+sel_segments = st.multiselect("Segments", segments, default=segments)
+
+sel = df[df["month_id_norm"].isin(sel_months) & df["segment"].isin(sel_segments)]
+
+with prof.stage("merge sketches", kind=KIND_TRANSFORM) as s:
+    merged = merge_encoded(sel[sketch_col])
+    s.rows = len(sel)
+
+if merged is None or merged.count == 0:
+    st.warning("No sketches for this selection.")
+    st.stop()
+
+p10, p50, p90 = merged.quantiles(QS)
+c1, c2, c3, c4, c5 = st.columns(5)
+c1.metric("Customer-months", f"{merged.count:,}")
+c2.metric("p10", f"{p10:,.2f}")
+c3.metric("Median", f"{p50:,.2f}")
+c4.metric("p90", f"{p90:,.2f}")
+c5.metric("Mean", f"{merged.mean:,.2f}")
+st.caption(f"Quantiles are within {merged.alpha:.0%} relative error of the exact values.")
+
+st.subheader(f"{metric}: distribution (p1-p99)")
+with prof.stage("fig: histogram", kind=KIND_FIGURE):
+    lo, hi = merged.quantiles([0.01, 0.99])
+    edges, counts = merged.histogram(n_bins=60, value_range=(lo, hi))
+    fig1 = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=(edges[1] - edges[0])))
+    for q, v in zip(["p10", "median", "p90"], [p10, p50, p90]):
+        fig1.add_vline(x=v, line_dash="dash", annotation_text=q)
+    fig1.update_layout(xaxis_title=metric, yaxis_title="Customer-months", bargap=0)
+prof.plotly_chart(fig1, "histogram", use_container_width=True)
+
+with prof.stage("per-month + per-segment quantiles", kind=KIND_TRANSFORM) as s:
+    def quantile_rows(group_col: str) -> pd.DataFrame:
+        rows = []
+        for key, g in sel.groupby(group_col, sort=True):
+            sk = merge_encoded(g[sketch_col])
+            if sk is None:
+                continue
+            q10, q50, q90 = sk.quantiles(QS)
+            rows.append({group_col: key, "customer_months": sk.count, "p10": q10, "median": q50, "p90": q90,
+                         "mean": sk.mean})
+        return pd.DataFrame(rows)
+
+    by_month = quantile_rows("month_label")
+    by_segment = quantile_rows("segment")
+    s.rows = len(by_month) + len(by_segment)
+
+st.subheader("p10 / median / p90 by month")
+with prof.stage("fig: quantile band", kind=KIND_FIGURE):
+    fig2 = go.Figure()
+    fig2.add_trace(go.Scatter(x=by_month["month_label"], y=by_month["p90"], mode="lines", name="p90",
+                              line=dict(width=0)))
+    fig2.add_trace(go.Scatter(x=by_month["month_label"], y=by_month["p10"], mode="lines", name="p10 - p90",
+                              fill="tonexty", line=dict(width=0)))
+    fig2.add_trace(go.Scatter(x=by_month["month_label"], y=by_month["median"], mode="lines+markers", name="Median"))
+    fig2.update_xaxes(type="category", title="Month")
+    fig2.update_layout(yaxis_title=metric)
+prof.plotly_chart(fig2, "quantile band", use_container_width=True)
+
+st.subheader("Quantiles by segment (selected months merged)")
+st.dataframe(by_segment)
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Gold cache ready:", is_cache_ready(folder))
+    st.write("Aggregate rows selected:", len(sel))
+    st.write("Sketch accuracy (alpha):", merged.alpha)
+    render_profile(prof)
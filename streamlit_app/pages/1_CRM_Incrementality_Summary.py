@@ -1,84 +1,81 @@
 import streamlit as st
-import plotly.express as px
+import plotly.graph_objects as go
 
-from utils.data import (
-    get_default_export_folder,
-    load_csv_folder,
-    ensure_month_fields,
-    sort_month
-)
+from utils.data import get_default_export_folder
+from utils.downloads import render_download
+from utils.snapshot import get_snapshot, fmt_kpi
 from utils.narrative import render_narrative, narrative_summary
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
 
 st.title("CRM Incrementality Summary")
 
-folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
-
-agg_month = load_csv_folder(folder, "agg_incrementality_month.csv")
-agg_rfm = load_csv_folder(folder, "agg_incrementality_rfm.csv")
+prof = get_page_profiler("1_CRM_Incrementality_Summary")
 
-agg_month = ensure_month_fields(agg_month, "month_id")
-agg_rfm = ensure_month_fields(agg_rfm, "month_id")
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
 
-agg_month = sort_month(agg_month)
-agg_rfm = sort_month(agg_rfm)
+# KPIs, chart series and narrative inputs are precomputed at export time (databricks/crm_engine/snapshot.py)
+with prof.stage("load executive snapshot", kind=KIND_IO):
+    snapshot, snapshot_source = get_snapshot(folder)
+summary = snapshot["summary"]
+if "error" in summary:
+    st.error(summary["error"])
+    st.stop()
 
 # KPIs
-total_inc_rev = float(agg_month["incremental_revenue"].sum()) if len(agg_month) else 0.0
-total_inc_txn = float(agg_month["incremental_transactions"].sum()) if len(agg_month) else 0.0
-avg_delta_aov = float(agg_month["avg_delta_aov"].mean()) if len(agg_month) else 0.0
-
+kpis = summary["kpis"]
 c1, c2, c3 = st.columns(3)
-c1.metric("Incremental Revenue", f"{total_inc_rev:,.0f}")
-c2.metric("Incremental Transactions", f"{total_inc_txn:,.0f}")
-c3.metric("Avg ΔAOV", f"{avg_delta_aov:,.2f}")
+c1.metric("Incremental Revenue", fmt_kpi(kpis["total_inc_rev"]))
+c2.metric("Incremental Transactions", fmt_kpi(kpis["total_inc_txn"]))
+c3.metric("Avg ΔAOV", fmt_kpi(kpis["avg_delta_aov"], 2))
 
 # Trend
-fig = px.line(
-    agg_month,
-    x="month_label",
-    y="incremental_revenue",
-    title="Incremental Revenue by Month"
-)
-fig.update_xaxes(type="category", title="Month")
-st.plotly_chart(fig, use_container_width=True)
+# Bootstrap CIs are present when 07_bootstrap_confidence_intervals.py ran before the export
+trend = summary["trend"]
+has_ci = summary["has_ci"]
+with prof.stage("fig: revenue by month", kind=KIND_FIGURE):
+    fig = go.Figure(go.Scatter(
+        x=trend["month_label"],
+        y=trend["incremental_revenue"],
+        mode="lines",
+        error_y=dict(type="data", symmetric=False, array=trend["error_plus"], arrayminus=trend["error_minus"])
+        if has_ci else None,
+    ))
+    fig.update_layout(title="Incremental Revenue by Month" + (" (95% bootstrap CI)" if has_ci else ""),
+                      yaxis_title="incremental_revenue")
+    fig.update_xaxes(type="category", title="Month")
+prof.plotly_chart(fig, "revenue by month", use_container_width=True)
+if summary["noisy_months"]:
+    st.caption("Months whose 95% CI includes zero (lift not distinguishable from noise): "
+               + ", ".join(summary["noisy_months"]))
 
 # Segment bar (selected month)
-months = [m for m in agg_rfm["month_id_norm"].unique().tolist() if m != "Unknown"]
-months = sorted(months)
+months = summary["months"]
 sel_month = st.selectbox("Select month", months, index=len(months)-1 if len(months) else 0)
+month = summary["by_month"].get(sel_month)
 
-rfm_m = agg_rfm[agg_rfm["month_id_norm"] == sel_month].copy()
-rfm_m = rfm_m.fillna({"rfm_segment": "Unknown"}).sort_values("incremental_revenue", ascending=False)
-
-fig2 = px.bar(
-    rfm_m,
-    x="rfm_segment",
-    y="incremental_revenue",
-    title=f"Incremental Revenue by RFM Segment ({rfm_m['month_label'].iloc[0] if len(rfm_m) else sel_month})"
-)
-fig2.update_xaxes(type="category", title="RFM Segment")
-st.plotly_chart(fig2, use_container_width=True)
-
-top_seg = str(rfm_m.iloc[0]["rfm_segment"]) if len(rfm_m) else "N/A"
+if month is not None:
+    with prof.stage("fig: revenue by RFM segment", kind=KIND_FIGURE):
+        fig2 = go.Figure(go.Bar(x=month["segments"]["rfm_segment"], y=month["segments"]["incremental_revenue"]))
+        fig2.update_layout(title=f"Incremental Revenue by RFM Segment ({month['label']})",
+                           yaxis_title="incremental_revenue")
+        fig2.update_xaxes(type="category", title="RFM Segment")
+    prof.plotly_chart(fig2, "revenue by RFM segment", use_container_width=True)
+    top, bottom = month["top_segment"], month["bottom_segment"]
+    st.caption(f"Top segment: {top['rfm_segment']} ({fmt_kpi(top['incremental_revenue'])}); "
+               f"weakest: {bottom['rfm_segment']} ({fmt_kpi(bottom['incremental_revenue'])}).")
 
 # Auto narrative
-n = narrative_summary(
-    total_inc_rev=total_inc_rev,
-    total_inc_txn=total_inc_txn,
-    avg_delta_aov=avg_delta_aov,
-    top_segment=top_seg
-)
+n = narrative_summary(**(month["narrative"] if month is not None else {**kpis, "top_segment": "N/A"}))
 render_narrative(n, expanded=True)
 
 # Downloads
 st.subheader("Download data")
-st.download_button(
-    "Download agg_incrementality_month.csv",
-    data=agg_month.to_csv(index=False),
-    file_name="agg_incrementality_month.csv"
-)
-st.download_button(
-    "Download agg_incrementality_rfm.csv",
-    data=agg_rfm.to_csv(index=False),
-    file_name="agg_incrementality_rfm.csv"
-)
+render_download("agg_incrementality_month.csv", folder, prof=prof)
+render_download("agg_incrementality_rfm.csv", folder, prof=prof)
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Snapshot:", snapshot_source, snapshot["created_at"])
+    st.write("Rows in agg_month:", summary["rows"]["agg_month"])
+    st.write("Rows in agg_rfm:", summary["rows"]["agg_rfm"])
+    render_profile(prof)
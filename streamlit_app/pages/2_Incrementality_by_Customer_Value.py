@@ -1,91 +1,77 @@
 import streamlit as st
-import plotly.express as px
+import plotly.graph_objects as go
 
-from utils.data import (
-    get_default_export_folder,
-    load_csv_folder,
-    ensure_month_fields,
-    sort_month
-)
+from utils.data import get_default_export_folder
+from utils.downloads import render_download
+from utils.snapshot import get_snapshot, fmt_kpi
 from utils.narrative import render_narrative, narrative_value_split
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
 
 st.title("Incrementality by Customer Value")
 
-folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
+prof = get_page_profiler("2_Incrementality_by_Customer_Value")
 
-df = load_csv_folder(folder, "agg_incrementality_active_value.csv")
-df = ensure_month_fields(df, "month_id")
-df = sort_month(df)
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
 
-# Normalize flags
-df["is_active"] = df["is_active"].astype(int)
-df["is_high_value"] = df["is_high_value"].astype(int)
+# KPIs, chart series and narrative inputs are precomputed at export time (databricks/crm_engine/snapshot.py)
+with prof.stage("load executive snapshot", kind=KIND_IO):
+    snapshot, snapshot_source = get_snapshot(folder)
+value = snapshot["value"]
+if "error" in value:
+    st.error(value["error"])
+    st.stop()
 
-months = [m for m in df["month_id_norm"].unique().tolist() if m != "Unknown"]
-months = sorted(months)
+months = value["months"]
 sel_month = st.selectbox("Select month", months, index=len(months)-1 if len(months) else 0)
-
-m = df[df["month_id_norm"] == sel_month].copy()
-m["value_group"] = m["is_high_value"].map({0: "Low Value", 1: "High Value"})
-m["active_group"] = m["is_active"].map({0: "Non-Active", 1: "Active"})
+m = value["by_month"].get(sel_month)
+if m is None:
+    st.info("No data for the selected month.")
+    st.stop()
 
 # KPIs
-total_inc_rev = float(m["incremental_revenue"].sum()) if len(m) else 0.0
-hv_inc_rev = float(m[m["is_high_value"] == 1]["incremental_revenue"].sum()) if len(m) else 0.0
-lv_inc_rev = float(m[m["is_high_value"] == 0]["incremental_revenue"].sum()) if len(m) else 0.0
-
+kpis = m["kpis"]
 c1, c2, c3 = st.columns(3)
-c1.metric("Incremental Revenue (All)", f"{total_inc_rev:,.0f}")
-c2.metric("Incremental Revenue (High Value)", f"{hv_inc_rev:,.0f}")
-c3.metric("Incremental Revenue (Low Value)", f"{lv_inc_rev:,.0f}")
+c1.metric("Incremental Revenue (All)", fmt_kpi(kpis["inc_all"]))
+c2.metric("Incremental Revenue (High Value)", fmt_kpi(kpis["inc_hv"]))
+c3.metric("Incremental Revenue (Low Value)", fmt_kpi(kpis["inc_lv"]))
 
 # Auto narrative
-n = narrative_value_split(
-    inc_all=total_inc_rev,
-    inc_hv=hv_inc_rev,
-    inc_lv=lv_inc_rev,
-    hv_label="High Value",
-    lv_label="Low Value"
-)
+n = narrative_value_split(**m["narrative"], hv_label="High Value", lv_label="Low Value")
 render_narrative(n, expanded=True)
 
 st.subheader("Incremental Revenue by Customer Value (Selected Month)")
-v = m.groupby("value_group", as_index=False)["incremental_revenue"].sum()
-
-fig1 = px.bar(
-    v,
-    x="value_group",
-    y="incremental_revenue",
-    title="Incremental Revenue by Customer Value"
-)
-fig1.update_xaxes(type="category", title="Value Group")
-st.plotly_chart(fig1, use_container_width=True)
+with prof.stage("fig: revenue by value group", kind=KIND_FIGURE):
+    fig1 = go.Figure(go.Bar(x=m["by_value"]["value_group"], y=m["by_value"]["incremental_revenue"]))
+    fig1.update_layout(title="Incremental Revenue by Customer Value", yaxis_title="incremental_revenue")
+    fig1.update_xaxes(type="category", title="Value Group")
+prof.plotly_chart(fig1, "revenue by value group", use_container_width=True)
 
 st.subheader("Incremental Revenue Split: Active vs Value (Selected Month)")
-pivot = m.groupby(["active_group", "value_group"], as_index=False).agg(
-    incremental_revenue=("incremental_revenue", "sum"),
-    incremental_transactions=("incremental_transactions", "sum"),
-    avg_delta_aov=("avg_delta_aov", "mean"),
-    customers=("customers", "sum")
-)
-
-fig2 = px.bar(
-    pivot,
-    x="active_group",
-    y="incremental_revenue",
-    color="value_group",
-    barmode="group",
-    title="Incremental Revenue Split: Active vs Value"
-)
-fig2.update_xaxes(type="category", title="Active Group")
-st.plotly_chart(fig2, use_container_width=True)
+split = m["split"]
+with prof.stage("fig: active vs value split", kind=KIND_FIGURE):
+    fig2 = go.Figure()
+    for group in sorted({r["value_group"] for r in split}):
+        rows = [r for r in split if r["value_group"] == group]
+        fig2.add_trace(go.Bar(x=[r["active_group"] for r in rows], y=[r["incremental_revenue"] for r in rows],
+                              name=group))
+    fig2.update_layout(title="Incremental Revenue Split: Active vs Value", barmode="group",
+                       yaxis_title="incremental_revenue", legend_title_text="value_group")
+    fig2.update_xaxes(type="category", title="Active Group")
+prof.plotly_chart(fig2, "active vs value split", use_container_width=True)
+top, bottom = m["top_segment"], m["bottom_segment"]
+st.caption(f"Top segment: {top['active_group']} / {top['value_group']} ({fmt_kpi(top['incremental_revenue'])}); "
+           f"weakest: {bottom['active_group']} / {bottom['value_group']} ({fmt_kpi(bottom['incremental_revenue'])}).")
 
 st.subheader("Detail Table")
-st.dataframe(pivot.sort_values(["active_group", "value_group"]))
+if st.checkbox("Show detail table", value=False, key="detail_value_split"):
+    st.dataframe(split)
 
 st.subheader("Download data")
-st.download_button(
-    "Download agg_incrementality_active_value.csv",
-    data=df.to_csv(index=False),
-    file_name="agg_incrementality_active_value.csv"
-)
+render_download("agg_incrementality_active_value.csv", folder, prof=prof)
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Snapshot:", snapshot_source, snapshot["created_at"])
+    st.write("Rows in df:", value["rows"])
+    st.write("Rows in selected month:", m["rows"])
+    render_profile(prof)
@@ -8,21 +8,31 @@ from utils.data import (
     ensure_month_fields,
     sort_month
 )
+from utils.downloads import render_download
+from utils.customer_sets import EXACT_MAX_IDS, SET_COLUMN, any_hll, distinct_customers_by, has_customer_sets
+from utils.warmup import is_cache_ready
 from utils.narrative import render_narrative, narrative_rfm
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
 
 st.title("RFM Deep Dive")
 
+prof = get_page_profiler("4_RFM_Deep_Dive")
+
 folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
 
-rfm = load_csv_folder(folder, "agg_incrementality_rfm.csv")
-rfm = ensure_month_fields(rfm, "month_id")
-rfm = sort_month(rfm)
-rfm = rfm.fillna({"rfm_segment": "Unknown"})
+with prof.stage("load agg_incrementality_rfm.csv", kind=KIND_IO) as s:
+    rfm = load_csv_folder(folder, "agg_incrementality_rfm.csv")
+    s.rows = len(rfm)
+
+with prof.stage("month fields + sort + numeric"):
+    rfm = ensure_month_fields(rfm, "month_id")
+    rfm = sort_month(rfm)
+    rfm = rfm.fillna({"rfm_segment": "Unknown"})
 
-# ---- Ensure numeric types (robust) ----
-for col in ["incremental_revenue", "customers", "incremental_transactions", "avg_delta_aov"]:
-    if col in rfm.columns:
-        rfm[col] = pd.to_numeric(rfm[col], errors="coerce").fillna(0.0)
+    # ---- Ensure numeric types (robust) ----
+    for col in ["incremental_revenue", "customers", "incremental_transactions", "avg_delta_aov"]:
+        if col in rfm.columns:
+            rfm[col] = pd.to_numeric(rfm[col], errors="coerce").fillna(0.0)
 
 # ---- Month selector ----
 months = [m for m in rfm["month_id_norm"].unique().tolist() if m != "Unknown"]
@@ -33,11 +43,23 @@ sel_month = st.selectbox("Select month", months, index=(len(months) - 1) if len(
 rfm_month = rfm[rfm["month_id_norm"] == sel_month].copy()
 
 # ---- Aggregate to one row per segment per month ----
-m = rfm_month.groupby(["month_id_norm", "month_label", "rfm_segment"], as_index=False).agg(
-    incremental_revenue=("incremental_revenue", "sum"),
-    customers=("customers", "sum"),
-    incremental_transactions=("incremental_transactions", "sum"),
-    avg_delta_aov=("avg_delta_aov", "mean"),
+with prof.stage("groupby segment (selected month)") as s:
+    m = rfm_month.groupby(["month_id_norm", "month_label", "rfm_segment"], as_index=False).agg(
+        incremental_revenue=("incremental_revenue", "sum"),
+        customers=("customers", "sum"),
+        incremental_transactions=("incremental_transactions", "sum"),
+        avg_delta_aov=("avg_delta_aov", "mean"),
+    )
+    # distinct customers from set unions when the export carries customer sets (summing COUNT DISTINCT over-counts)
+    m["customers"] = distinct_customers_by(rfm_month, ["month_id_norm", "month_label", "rfm_segment"]).to_numpy()
+    s.rows = len(m)
+
+# segments above EXACT_MAX_IDS customers carry HyperLogLog sketches: their counts are estimates
+customers_approx = has_customer_sets(rfm_month) and any_hll(rfm_month[SET_COLUMN])
+customers_label = "customers (approx.)" if customers_approx else "customers"
+customers_note = (
+    f"customers (approx.): exact for segments up to {EXACT_MAX_IDS:,} customers, a HyperLogLog estimate "
+    "(about 1% standard error) above that."
 )
 
 # ---- Sort for top/bottom ----
@@ -97,14 +119,15 @@ render_narrative(n, expanded=True)
 st.subheader("Incremental Revenue by RFM Segment (Selected Month)")
 title_month = m["month_label"].iloc[0] if len(m) else sel_month
 
-fig1 = px.bar(
-    m,
-    x="rfm_segment",
-    y="incremental_revenue",
-    title=f"Incremental Revenue by RFM Segment ({title_month})"
-)
-fig1.update_xaxes(type="category", title="RFM Segment")
-st.plotly_chart(fig1, use_container_width=True)
+with prof.stage("fig: revenue by RFM segment", kind=KIND_FIGURE):
+    fig1 = px.bar(
+        m,
+        x="rfm_segment",
+        y="incremental_revenue",
+        title=f"Incremental Revenue by RFM Segment ({title_month})"
+    )
+    fig1.update_xaxes(type="category", title="RFM Segment")
+prof.plotly_chart(fig1, "revenue by RFM segment", use_container_width=True)
 
 # ---- Optional: show positive vs negative split table ----
 st.subheader("Positive vs Negative Contribution (Selected Month)")
@@ -113,62 +136,69 @@ m2["contribution_sign"] = m2["incremental_revenue"].apply(lambda x: "Positive" i
 st.dataframe(
     m2.sort_values(["contribution_sign", "incremental_revenue"], ascending=[True, False])
       [["rfm_segment", "contribution_sign", "incremental_revenue", "customers", "incremental_transactions", "avg_delta_aov"]]
+      .rename(columns={"customers": customers_label})
 )
+if customers_approx:
+    st.caption(customers_note)
 
 # ---- Chart 2: Matrix Month × Segment ----
 st.subheader("Matrix: Month × Segment (Incremental Revenue)")
-rfm_agg = rfm.groupby(["rfm_segment", "month_label"], as_index=False).agg(
-    incremental_revenue=("incremental_revenue", "sum")
-)
+with prof.stage("groupby + pivot month x segment") as s:
+    rfm_agg = rfm.groupby(["rfm_segment", "month_label"], as_index=False).agg(
+        incremental_revenue=("incremental_revenue", "sum")
+    )
 
-matrix = rfm_agg.pivot_table(
-    index="rfm_segment",
-    columns="month_label",
-    values="incremental_revenue",
-    aggfunc="sum",
-    fill_value=0.0
-).reset_index()
+    matrix = rfm_agg.pivot_table(
+        index="rfm_segment",
+        columns="month_label",
+        values="incremental_revenue",
+        aggfunc="sum",
+        fill_value=0.0
+    ).reset_index()
+    s.rows = len(matrix)
 
 st.dataframe(matrix)
 
 # ---- Chart 3: Trend for overall Top 5 segments (across all months) ----
 st.subheader("Trend: Overall Top 5 RFM Segments Over Time")
-top5 = (
-    rfm.groupby("rfm_segment", as_index=False)["incremental_revenue"].sum()
-       .sort_values("incremental_revenue", ascending=False)
-       .head(5)["rfm_segment"]
-       .tolist()
-)
+with prof.stage("groupby top 5 segments") as s:
+    top5 = (
+        rfm.groupby("rfm_segment", as_index=False)["incremental_revenue"].sum()
+           .sort_values("incremental_revenue", ascending=False)
+           .head(5)["rfm_segment"]
+           .tolist()
+    )
 
-rfm_top = rfm_agg[rfm_agg["rfm_segment"].isin(top5)].copy()
+    rfm_top = rfm_agg[rfm_agg["rfm_segment"].isin(top5)].copy()
+    s.rows = len(rfm_top)
 
-fig2 = px.line(
-    rfm_top,
-    x="month_label",
-    y="incremental_revenue",
-    color="rfm_segment",
-    title="Incremental Revenue Trend (Overall Top 5 RFM Segments)"
-)
-fig2.update_xaxes(type="category", title="Month")
-st.plotly_chart(fig2, use_container_width=True)
+with prof.stage("fig: top 5 segment trend", kind=KIND_FIGURE):
+    fig2 = px.line(
+        rfm_top,
+        x="month_label",
+        y="incremental_revenue",
+        color="rfm_segment",
+        title="Incremental Revenue Trend (Overall Top 5 RFM Segments)"
+    )
+    fig2.update_xaxes(type="category", title="Month")
+prof.plotly_chart(fig2, "top 5 segment trend", use_container_width=True)
 
 # ---- Detail table (selected month) ----
 st.subheader("Detail Table (Selected Month)")
 cols = ["rfm_segment", "customers", "incremental_revenue", "incremental_transactions", "avg_delta_aov"]
 cols = [c for c in cols if c in m.columns]
-st.dataframe(m[cols])
+st.dataframe(m[cols].rename(columns={"customers": customers_label}))
+if customers_approx:
+    st.caption(customers_note)
 
 # ---- Download ----
 st.subheader("Download data")
-st.download_button(
-    "Download agg_incrementality_rfm.csv",
-    data=rfm.to_csv(index=False),
-    file_name="agg_incrementality_rfm.csv"
-)
+render_download("agg_incrementality_rfm.csv", folder, prof=prof)
 
 # ---- Debug / audit ----
 with st.expander("Debug / Data audit", expanded=False):
     st.write("Selected month_id_norm:", sel_month)
+    st.write("Gold cache ready:", is_cache_ready(folder))
     st.write("Rows in raw rfm:", len(rfm))
     st.write("Rows in rfm_month:", len(rfm_month))
     st.write("Rows in m (aggregated):", len(m))
@@ -177,3 +207,4 @@ with st.expander("Debug / Data audit", expanded=False):
     st.write("Total negative contributions:", total_rev_neg)
     st.write("Top segment / revenue:", top_seg, top_rev)
     st.dataframe(m.head(10))
+    render_profile(prof)
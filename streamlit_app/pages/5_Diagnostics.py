@@ -1,27 +1,105 @@
 import streamlit as st
 import plotly.express as px
+import pandas as pd
 
 from utils.data import (
     get_default_export_folder,
     load_csv_folder,
+    load_json_folder,
     ensure_month_fields,
     sort_month
 )
+from utils.customer_index import get_customer_index, customer_history, segment_transitions
+from utils.downloads import render_download
+from utils.warmup import start_background_warmup, is_cache_ready
+from utils.query import duckdb_available, resolve_dataset, dataset_source, distinct_values, filter_rows, run_query
 from utils.narrative import render_narrative, narrative_diagnostics
+from utils.profiling import (
+    get_page_profiler,
+    render_profile,
+    load_profile_history,
+    summarize_profile_history,
+    KIND_IO,
+    KIND_TRANSFORM,
+    KIND_FIGURE
+)
 
 st.title("Diagnostics (Analyst Only)")
 
+prof = get_page_profiler("5_Diagnostics")
+
 folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
 
-fact = load_csv_folder(folder, "fact_customer_month_incrementality.csv")
-fact = ensure_month_fields(fact, "month_id")
-fact = sort_month(fact)
+# With DuckDB installed, the month filter is pushed down to the export file scan and
+# only the selected month is materialized in pandas; otherwise the full fact is loaded.
+use_sql = duckdb_available() and resolve_dataset(folder, "fact_customer_month_incrementality") is not None
+if not use_sql:
+    # pandas path: the aggregates load in the background while this page parses the fact
+    start_background_warmup(folder)
+
+st.subheader("Data Quality Gate (Validation Checklist)")
+
+# Written next to the Gold exports by 02_gold/11_validate_data_quality.py (local: run_pipeline.py)
+with prof.stage("load data_quality_report.json", kind=KIND_IO) as s:
+    dq = load_json_folder(folder, "data_quality_report.json")
+    s.rows = len(dq["checks"]) if dq else 0
+
+if dq is None:
+    st.info("No data_quality_report.json in the export folder. Run databricks/02_gold/11_validate_data_quality.py "
+            "(or the validate stage of databricks/run_pipeline.py) to produce it.")
+else:
+    q1, q2, q3, q4 = st.columns(4)
+    q1.metric("Gate status", dq["status"].upper())
+    q2.metric("Passed", dq["summary"]["pass"])
+    q3.metric("Warnings", dq["summary"]["warn"])
+    q4.metric("Failed", dq["summary"]["fail"])
+    st.caption(f"Validated at {dq['created_at']} (report v{dq['report_version']}).")
+
+    checks = pd.DataFrame(dq["checks"])
+    checks["details"] = checks["details"].map(lambda d: "" if d is None else str(d))
+    show_passed = st.checkbox("Show passed checks", value=False)
+    view = checks if show_passed else checks[checks["status"] != "pass"]
+    if view.empty:
+        st.success("All data-quality checks passed.")
+    else:
+        st.dataframe(view[["section", "section_name", "check_id", "table", "status", "value", "threshold",
+                           "description", "details"]])
+
+    sens = dq.get("sensitivity")
+    if sens:
+        st.write("Sensitivity: total incremental revenue by PRE (rows) x POST (columns) window days")
+        grid = pd.DataFrame(sens["grid"]).pivot(index="pre_days", columns="post_days", values="incremental_revenue")
+        st.dataframe(grid.round(2))
+
+if use_sql:
+    fact_src, fact_ver = dataset_source(folder, "fact_customer_month_incrementality")
+    with prof.stage("duckdb: distinct months", kind=KIND_IO) as s:
+        months = sorted(str(v) for v in distinct_values(fact_src, "month_id", version=fact_ver) if v is not None)
+        fact_rows = int(run_query(f"SELECT COUNT(*) AS n FROM {fact_src}", version=fact_ver)["n"].iloc[0])
+        s.rows = fact_rows
+else:
+    with prof.stage("load fact_customer_month_incrementality.csv", kind=KIND_IO) as s:
+        fact = load_csv_folder(folder, "fact_customer_month_incrementality.csv")
+        s.rows = len(fact)
+
+    with prof.stage("month fields + sort"):
+        fact = ensure_month_fields(fact, "month_id")
+        fact = sort_month(fact)
+
+    months = [m for m in fact["month_id_norm"].unique().tolist() if m != "Unknown"]
+    fact_rows = len(fact)
 
-months = [m for m in fact["month_id_norm"].unique().tolist() if m != "Unknown"]
 months = sorted(months)
 sel_month = st.selectbox("Select month", months, index=(len(months)-1) if len(months) else 0)
 
-m = fact[fact["month_id_norm"] == sel_month].copy()
+with prof.stage("filter fact to month", kind=KIND_IO if use_sql else KIND_TRANSFORM) as s:
+    if use_sql:
+        month_value = int(sel_month) if str(sel_month).isdigit() else sel_month
+        m = filter_rows(fact_src, {"month_id": [month_value]}, version=fact_ver)
+        m = ensure_month_fields(m, "month_id")
+    else:
+        m = fact[fact["month_id_norm"] == sel_month].copy()
+    s.rows = len(m)
 
 st.subheader("Coverage & Sanity Checks")
 
@@ -50,23 +128,28 @@ render_narrative(n, expanded=True)
 
 st.subheader("Distribution: Incremental Revenue")
 if "incremental_revenue" in m.columns and len(m):
-    fig1 = px.histogram(m, x="incremental_revenue", nbins=60, title="Incremental Revenue Distribution")
-    st.plotly_chart(fig1, use_container_width=True)
+    with prof.stage("fig: incremental revenue histogram", kind=KIND_FIGURE):
+        fig1 = px.histogram(m, x="incremental_revenue", nbins=60, title="Incremental Revenue Distribution")
+    prof.plotly_chart(fig1, "incremental revenue histogram", use_container_width=True)
 
 st.subheader("PRE vs POST Revenue per Day (Box proxy)")
 needed = ["pre_rev_per_day", "post_rev_per_day"]
 if all(c in m.columns for c in needed) and len(m):
-    df_melt = m[needed].copy()
-    df_melt["row_id"] = range(len(df_melt))
-    df_melt = df_melt.melt(id_vars=["row_id"], var_name="period", value_name="rev_per_day")
-    fig2 = px.box(df_melt, x="period", y="rev_per_day", points="all", title="PRE vs POST Revenue per Day (Box)")
-    fig2.update_xaxes(type="category")
-    st.plotly_chart(fig2, use_container_width=True)
+    with prof.stage("melt pre/post per day") as s:
+        df_melt = m[needed].copy()
+        df_melt["row_id"] = range(len(df_melt))
+        df_melt = df_melt.melt(id_vars=["row_id"], var_name="period", value_name="rev_per_day")
+        s.rows = len(df_melt)
+    with prof.stage("fig: pre vs post box", kind=KIND_FIGURE):
+        fig2 = px.box(df_melt, x="period", y="rev_per_day", points="all", title="PRE vs POST Revenue per Day (Box)")
+        fig2.update_xaxes(type="category")
+    prof.plotly_chart(fig2, "pre vs post box", use_container_width=True)
 
 st.subheader("Top Outliers (Selected Month)")
 if "incremental_revenue" in m.columns and "customer_id" in m.columns and len(m):
-    top_pos = m.sort_values("incremental_revenue", ascending=False).head(20)
-    top_neg = m.sort_values("incremental_revenue", ascending=True).head(20)
+    with prof.stage("sort outliers"):
+        top_pos = m.sort_values("incremental_revenue", ascending=False).head(20)
+        top_neg = m.sort_values("incremental_revenue", ascending=True).head(20)
 
     st.write("Top 20 positive incremental revenue rows")
     st.dataframe(top_pos[["customer_id", "month_label", "incremental_revenue", "pre_revenue", "post_revenue"]])
@@ -74,9 +157,77 @@ if "incremental_revenue" in m.columns and "customer_id" in m.columns and len(m):
     st.write("Top 20 negative incremental revenue rows")
     st.dataframe(top_neg[["customer_id", "month_label", "incremental_revenue", "pre_revenue", "post_revenue"]])
 
+st.subheader("Customer Drill-down (All Months)")
+outlier_ids = []
+if "customer_id" in m.columns and len(m) and "incremental_revenue" in m.columns:
+    outlier_ids = pd.concat([top_pos["customer_id"], top_neg["customer_id"]]).astype(int).unique().tolist()
+
+d1, d2 = st.columns(2)
+picked = d1.selectbox("Outlier customer", ["(none)"] + [str(c) for c in outlier_ids])
+typed = d2.text_input("...or any customer_id", value="")
+drill_id = typed.strip() or (picked if picked != "(none)" else "")
+
+if drill_id:
+    if not drill_id.isdigit():
+        st.warning("customer_id must be an integer.")
+    else:
+        with prof.stage("customer index (load/build)", kind=KIND_IO) as s:
+            with st.spinner("Loading customer index (built once per export version) ..."):
+                cidx = get_customer_index(folder)
+            s.rows = cidx.n_rows if cidx is not None else 0
+        if cidx is None:
+            st.info("No fact export found, so no customer index can be built.")
+        else:
+            with prof.stage("customer lookup") as s:
+                cust_hist = customer_history(cidx, int(drill_id))
+                s.rows = len(cust_hist)
+            if cust_hist.empty:
+                st.info(f"Customer {drill_id} has no customer-month rows in the fact export.")
+            else:
+                st.dataframe(cust_hist)
+                trans = segment_transitions(cust_hist)
+                if len(trans):
+                    st.write("RFM segment transitions")
+                    st.dataframe(trans)
+                hist_plot = cust_hist.assign(month_id=cust_hist["month_id"].astype(str))
+                fig_c = px.bar(
+                    hist_plot,
+                    x="month_id",
+                    y="incremental_revenue",
+                    color="rfm_segment" if "rfm_segment" in hist_plot.columns else None,
+                    title=f"Customer {drill_id}: Incremental Revenue by Month"
+                )
+                fig_c.update_xaxes(type="category", title="Month")
+                prof.plotly_chart(fig_c, "customer drill-down", use_container_width=True)
+
 st.subheader("Download data")
-st.download_button(
-    "Download fact_customer_month_incrementality.csv",
-    data=fact.to_csv(index=False),
-    file_name="fact_customer_month_incrementality.csv"
-)
+render_download("fact_customer_month_incrementality.csv", folder, prof=prof)
+
+st.subheader("Render Performance (All Pages, Across Reruns)")
+profile_hist = load_profile_history()
+summary = summarize_profile_history(profile_hist)
+if summary.empty:
+    st.caption("No render profiles recorded yet. Open a few pages, then come back.")
+else:
+    pages = ["All"] + sorted(summary["page"].unique().tolist())
+    sel_page = st.selectbox("Page", pages, key="profile_page")
+    view = summary if sel_page == "All" else summary[summary["page"] == sel_page]
+    st.dataframe(view)
+    fig3 = px.bar(
+        view.head(15),
+        x="p95_ms",
+        y="stage",
+        color="kind",
+        orientation="h",
+        title="Slowest stages by p95 (ms)"
+    )
+    st.plotly_chart(fig3, use_container_width=True)
+    st.caption(f"{len(profile_hist):,} stage records from {profile_hist['run_id'].nunique():,} reruns.")
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Gold cache ready:", is_cache_ready(folder))
+    st.write("Query backend:", "DuckDB (pushdown)" if use_sql else "pandas (full load)")
+    st.write("Rows in fact:", fact_rows)
+    st.write("Rows in selected month:", len(m))
+    render_profile(prof)
@@ -0,0 +1,137 @@
+import streamlit as st
+import plotly.express as px
+
+from utils.data import get_default_export_folder
+from utils.query import (
+    AGG_FUNCS,
+    duckdb_available,
+    fact_with_rfm_source,
+    describe_source,
+    distinct_values,
+    slice_query,
+    run_readonly_sql
+)
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
+
+st.title("Slice Builder (Analyst Only)")
+st.caption(
+    "Ad-hoc cuts over fact_customer_month_incrementality, queried in place with DuckDB "
+    "(Parquet preferred, CSV otherwise). Only the grouped result is loaded into memory."
+)
+
+prof = get_page_profiler("7_Slice_Builder")
+
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
+
+if not duckdb_available():
+    st.error(
+        "The slice builder needs DuckDB.\n\n"
+        "To fix:\n"
+        "- `pip install duckdb` (it is listed in streamlit_app/requirements.txt), then rerun."
+    )
+    st.stop()
+
+try:
+    src, version = fact_with_rfm_source(folder)
+except FileNotFoundError as e:
+    st.error(str(e))
+    st.stop()
+
+with prof.stage("duckdb: describe", kind=KIND_IO):
+    schema = describe_source(src, version=version)
+
+NUMERIC_TYPES = ("DOUBLE", "FLOAT", "DECIMAL", "BIGINT", "INTEGER", "SMALLINT", "TINYINT", "HUGEINT")
+all_cols = schema["column_name"].tolist()
+numeric_cols = [
+    c for c, t in zip(schema["column_name"], schema["column_type"])
+    if str(t).upper().startswith(NUMERIC_TYPES) and c not in ("customer_id",)
+]
+default_dims = [c for c in ["month_id", "rfm_segment"] if c in all_cols]
+dim_candidates = [
+    c for c in all_cols
+    if c in ("month_id", "month_key_yyyymm", "is_active", "is_high_value", "rfm_segment", "rfm_code",
+             "r_score", "f_score", "m_score", "anchor_exposure_date")
+    or c not in numeric_cols
+]
+
+# ---- Slice definition ----
+c1, c2 = st.columns(2)
+group_by = c1.multiselect("Group by", dim_candidates, default=default_dims)
+metric_cols = c2.multiselect(
+    "Metrics (columns)",
+    numeric_cols,
+    default=[c for c in ["incremental_revenue", "incremental_transactions", "delta_aov"] if c in numeric_cols]
+)
+agg = c2.selectbox("Aggregation", list(AGG_FUNCS.keys()), index=0)
+include_counts = c1.checkbox("Add customer-month rows and distinct customers", value=True)
+
+st.markdown("**Filters**")
+filters: dict[str, list] = {}
+f1, f2, f3 = st.columns(3)
+with prof.stage("duckdb: filter values", kind=KIND_IO):
+    if "month_id" in all_cols:
+        filters["month_id"] = f1.multiselect("month_id", distinct_values(src, "month_id", version=version))
+    if "is_active" in all_cols:
+        filters["is_active"] = f2.multiselect("is_active", distinct_values(src, "is_active", version=version))
+    if "is_high_value" in all_cols:
+        filters["is_high_value"] = f3.multiselect("is_high_value", distinct_values(src, "is_high_value", version=version))
+    if "rfm_segment" in all_cols:
+        filters["rfm_segment"] = st.multiselect("rfm_segment", distinct_values(src, "rfm_segment", version=version))
+
+metrics = [(agg, c) for c in metric_cols]
+if include_counts:
+    metrics = [("count", "*"), ("count distinct", "customer_id")] + metrics
+
+limit = st.number_input("Row limit", min_value=10, max_value=100000, value=1000, step=10)
+
+with prof.stage("duckdb: slice query", kind=KIND_IO) as s:
+    result = slice_query(src, group_by, metrics, filters=filters, limit=int(limit), version=version)
+    s.rows = len(result)
+
+st.subheader("Result")
+st.dataframe(result)
+
+# ---- Quick chart ----
+value_cols = [c for c in result.columns if c not in group_by]
+if group_by and value_cols and len(result):
+    y = st.selectbox("Chart metric", value_cols, index=len(value_cols) - 1)
+    color = group_by[1] if len(group_by) > 1 else None
+    plot_df = result.copy()
+    for c in group_by:
+        plot_df[c] = plot_df[c].astype(str)
+    with prof.stage("fig: slice chart", kind=KIND_FIGURE):
+        fig = px.bar(plot_df, x=group_by[0], y=y, color=color, barmode="group", title=f"{y} by {', '.join(group_by)}")
+        fig.update_xaxes(type="category")
+    prof.plotly_chart(fig, "slice chart", use_container_width=True)
+
+st.download_button(
+    "Download slice as CSV",
+    data=result.to_csv(index=False),
+    file_name="slice_fact_customer_month_incrementality.csv"
+)
+
+# ---- Free-form SQL ----
+with st.expander("Free-form SQL (read-only)", expanded=False):
+    st.caption("Table `fact` = fact_customer_month_incrementality (+ RFM columns when dim_customer_month_rfm is exported).")
+    sql = st.text_area(
+        "SQL",
+        value=(
+            "SELECT month_id, rfm_segment, COUNT(*) AS rows, SUM(incremental_revenue) AS incremental_revenue\n"
+            "FROM fact\nGROUP BY 1, 2\nORDER BY 1, 4 DESC"
+        ),
+        height=150
+    )
+    if st.button("Run SQL"):
+        try:
+            with prof.stage("duckdb: free-form SQL", kind=KIND_IO) as s:
+                out = run_readonly_sql(sql, folder)
+                s.rows = len(out)
+            st.dataframe(out)
+        except Exception as e:
+            st.error(f"Query failed: {e}")
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Source:", src)
+    st.dataframe(schema[["column_name", "column_type"]])
+    render_profile(prof)
@@ -0,0 +1,126 @@
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+
+from utils.data import (
+    get_default_export_folder,
+    load_csv_folder,
+    ensure_month_fields,
+    sort_month
+)
+from utils.downloads import render_download
+from utils.warmup import start_background_warmup, is_cache_ready
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
+
+st.title("Campaign & Channel Attribution")
+st.caption(
+    "Every exposure gets its own 28-day PRE / 7-day POST window. "
+    "POST days shared by several exposures of the same customer are split equally between them."
+)
+
+prof = get_page_profiler("8_Campaign_Attribution")
+
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
+start_background_warmup(folder)
+
+with prof.stage("load agg_incrementality_campaign_channel.csv", kind=KIND_IO) as s:
+    # the cached frame is shared across sessions; columns are normalized in place below
+    df = load_csv_folder(folder, "agg_incrementality_campaign_channel.csv", required=False).copy()
+    s.rows = len(df)
+
+if df.empty:
+    st.error(
+        "Missing data file: agg_incrementality_campaign_channel.csv\n\n"
+        "To fix:\n"
+        "- Run databricks/02_gold/09_exposure_attribution.py and re-export Gold CSVs, or\n"
+        "- Set the sidebar 'Gold export folder' to the folder that contains the CSV."
+    )
+    st.stop()
+
+for col in ["exposures", "customers", "effective_post_days", "attributed_post_revenue",
+            "incremental_revenue", "incremental_transactions", "share_overlapping"]:
+    if col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+df["campaign_name"] = df["campaign_name"].fillna("Unknown").astype(str)
+df["message_channel"] = df["message_channel"].fillna("Unknown").astype(str)
+df = ensure_month_fields(df, "month_id")
+df = sort_month(df)
+
+months = sorted([m for m in df["month_id_norm"].unique().tolist() if m != "Unknown"])
+if not months:
+    st.error("No valid months found in data. Check 'month_id' values in the CSV.")
+    st.stop()
+
+month_options = ["All months"] + months
+sel_month = st.selectbox("Select month", month_options, index=len(month_options) - 1)
+m = df if sel_month == "All months" else df[df["month_id_norm"] == sel_month]
+
+with prof.stage("groupby campaign x channel") as s:
+    by_cc = m.groupby(["campaign_name", "message_channel"], as_index=False).agg(
+        exposures=("exposures", "sum"),
+        incremental_revenue=("incremental_revenue", "sum"),
+        incremental_transactions=("incremental_transactions", "sum"),
+    )
+    by_cc["incremental_revenue_per_exposure"] = (
+        by_cc["incremental_revenue"] / by_cc["exposures"].where(by_cc["exposures"] > 0)
+    )
+    s.rows = len(by_cc)
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Exposures", f"{by_cc['exposures'].sum():,.0f}")
+c2.metric("Incremental Revenue", f"{by_cc['incremental_revenue'].sum():,.0f}")
+c3.metric("Incremental Transactions", f"{by_cc['incremental_transactions'].sum():,.0f}")
+
+st.subheader("Incremental Revenue by Campaign and Channel")
+with prof.stage("fig: revenue by campaign x channel", kind=KIND_FIGURE):
+    fig1 = px.bar(
+        by_cc,
+        x="campaign_name",
+        y="incremental_revenue",
+        color="message_channel",
+        barmode="group",
+        title="Incremental Revenue by Campaign (grouped by channel)"
+    )
+    fig1.update_xaxes(type="category", title="Campaign")
+prof.plotly_chart(fig1, "revenue by campaign x channel", use_container_width=True)
+
+st.subheader("Incremental Revenue per Exposure")
+with prof.stage("fig: revenue per exposure", kind=KIND_FIGURE):
+    fig2 = px.bar(
+        by_cc,
+        x="campaign_name",
+        y="incremental_revenue_per_exposure",
+        color="message_channel",
+        barmode="group",
+        title="Efficiency: Incremental Revenue per Exposure"
+    )
+    fig2.update_xaxes(type="category", title="Campaign")
+prof.plotly_chart(fig2, "revenue per exposure", use_container_width=True)
+
+st.subheader("Trend: Incremental Revenue by Campaign")
+with prof.stage("fig: campaign trend", kind=KIND_FIGURE):
+    trend = df.groupby(["month_id_norm", "month_label", "campaign_name"], as_index=False)["incremental_revenue"].sum()
+    fig3 = px.line(
+        trend,
+        x="month_label",
+        y="incremental_revenue",
+        color="campaign_name",
+        title="Incremental Revenue Trend by Campaign"
+    )
+    fig3.update_xaxes(type="category", title="Month")
+prof.plotly_chart(fig3, "campaign trend", use_container_width=True)
+
+st.subheader("Detail Table")
+st.dataframe(by_cc.sort_values("incremental_revenue", ascending=False))
+
+st.subheader("Download data")
+render_download("agg_incrementality_campaign_channel.csv", folder, prof=prof)
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Gold cache ready:", is_cache_ready(folder))
+    st.write("Rows in df:", len(df))
+    st.write("Rows in by_cc:", len(by_cc))
+    st.dataframe(m.head(10))
+    render_profile(prof)
@@ -0,0 +1,115 @@
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+
+from utils.data import (
+    get_default_export_folder,
+    load_csv_folder,
+    ensure_month_fields,
+    sort_month
+)
+from utils.downloads import render_download
+from utils.warmup import start_background_warmup, is_cache_ready
+from utils.narrative import render_narrative, narrative_contact_pressure
+from utils.profiling import get_page_profiler, render_profile, KIND_IO, KIND_FIGURE
+
+BAND_ORDER = ["Low", "Medium", "High"]
+
+st.title("Contact Pressure")
+st.caption(
+    "Exposures received in the trailing 7 / 30 / 90 days at the anchor exposure. "
+    "High = 2+ in 7 days or 4+ in 30 days; Medium = 2+ in 30 days or 3+ in 90 days; Low = otherwise."
+)
+
+prof = get_page_profiler("9_Contact_Pressure")
+
+folder = st.sidebar.text_input("Gold export folder", value=get_default_export_folder())
+start_background_warmup(folder)
+
+with prof.stage("load agg_incrementality_contact_pressure.csv", kind=KIND_IO) as s:
+    # the cached frame is shared across sessions; columns are normalized in place below
+    df = load_csv_folder(folder, "agg_incrementality_contact_pressure.csv", required=False).copy()
+    s.rows = len(df)
+
+if df.empty:
+    st.error(
+        "Missing data file: agg_incrementality_contact_pressure.csv\n\n"
+        "To fix:\n"
+        "- Re-run 05_gold_incrementality.sql and re-export Gold CSVs, or\n"
+        "- Set the sidebar 'Gold export folder' to the folder that contains the CSV."
+    )
+    st.stop()
+
+for col in ["customers", "avg_exposures_30d", "incremental_revenue", "incremental_transactions",
+            "avg_delta_aov", "seasonal_adj_incremental_revenue"]:
+    if col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+df["contact_pressure_band"] = df["contact_pressure_band"].fillna("Unknown").astype(str)
+df = ensure_month_fields(df, "month_id")
+df = sort_month(df)
+
+months = sorted([m for m in df["month_id_norm"].unique().tolist() if m != "Unknown"])
+if not months:
+    st.error("No valid months found in data. Check 'month_id' values in the CSV.")
+    st.stop()
+
+sel_month = st.selectbox("Select month", months, index=len(months) - 1)
+
+with prof.stage("per-band metrics") as s:
+    m = df[df["month_id_norm"] == sel_month].copy()
+    m["incremental_revenue_per_customer"] = m["incremental_revenue"] / m["customers"].where(m["customers"] > 0)
+    band_rank = {b: i for i, b in enumerate(BAND_ORDER)}
+    m["_order"] = m["contact_pressure_band"].map(band_rank).fillna(len(BAND_ORDER))
+    m = m.sort_values("_order").drop(columns="_order")
+    s.rows = len(m)
+
+cols = st.columns(max(len(m), 1))
+for c, (_, row) in zip(cols, m.iterrows()):
+    c.metric(f"{row['contact_pressure_band']} pressure",
+             f"{row['incremental_revenue']:,.0f}",
+             help=f"{row['customers']:,.0f} customers, avg {row['avg_exposures_30d']:.1f} exposures in 30 days")
+
+n = narrative_contact_pressure(
+    rev_by_band=dict(zip(m["contact_pressure_band"], m["incremental_revenue"])),
+    customers_by_band=dict(zip(m["contact_pressure_band"], m["customers"])),
+)
+render_narrative(n, expanded=True)
+
+st.subheader("Incremental Revenue per Customer by Pressure Band (Selected Month)")
+with prof.stage("fig: revenue per customer by band", kind=KIND_FIGURE):
+    fig1 = px.bar(
+        m,
+        x="contact_pressure_band",
+        y="incremental_revenue_per_customer",
+        category_orders={"contact_pressure_band": BAND_ORDER},
+        title="Incremental Revenue per Customer by Contact Pressure"
+    )
+    fig1.update_xaxes(type="category", title="Contact pressure band")
+prof.plotly_chart(fig1, "revenue per customer by band", use_container_width=True)
+
+st.subheader("Trend: Incremental Revenue by Pressure Band")
+with prof.stage("fig: band trend", kind=KIND_FIGURE):
+    fig2 = px.line(
+        df,
+        x="month_label",
+        y="incremental_revenue",
+        color="contact_pressure_band",
+        category_orders={"contact_pressure_band": BAND_ORDER},
+        title="Incremental Revenue Trend by Contact Pressure"
+    )
+    fig2.update_xaxes(type="category", title="Month")
+prof.plotly_chart(fig2, "band trend", use_container_width=True)
+
+st.subheader("Detail Table")
+st.dataframe(m)
+
+st.subheader("Download data")
+render_download("agg_incrementality_contact_pressure.csv", folder, prof=prof)
+
+with st.expander("Debug / Data audit", expanded=False):
+    st.write("Folder input:", folder)
+    st.write("Gold cache ready:", is_cache_ready(folder))
+    st.write("Rows in df:", len(df))
+    st.dataframe(df.head(10))
+    render_profile(prof)
@@ -0,0 +1,37 @@
+# streamlit_app/tests/test_data_cache.py
+# Shared export frame cache (utils/data.read_csv_cached): one version per file, bounded by bytes.
+# Run: python -m pytest -q streamlit_app/tests
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import data  # noqa: E402
+
+
+def test_new_version_replaces_cached_frame(tmp_path):
+    data.clear_frame_cache()
+    path = tmp_path / "agg_incrementality_month.csv"
+    pd.DataFrame({"month_id": [202501], "incremental_revenue": [1.0]}).to_csv(path, index=False)
+    first = data.read_csv_cached(path)
+    assert data.read_csv_cached(path) is first
+
+    pd.DataFrame({"month_id": [202501, 202502], "incremental_revenue": [1.0, 2.0]}).to_csv(path, index=False)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    second = data.read_csv_cached(path)
+    assert len(second) == 2
+    assert data._FRAME_CACHE.stats()["entries"] == 1
+
+
+def test_frame_above_byte_cap_is_not_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, "_FRAME_CACHE", data.FrameCache(max_entries=8, max_bytes=1_000))
+    path = tmp_path / "fact_customer_month_incrementality.csv"
+    pd.DataFrame({"customer_id": range(5_000)}).to_csv(path, index=False)
+    assert len(data.read_csv_cached(path)) == 5_000
+    assert not data.is_cached(path)
+
+
+def test_warmup_skips_customer_grain_exports():
+    assert "fact_customer_month_incrementality.csv" not in data.WARMUP_FILES
+    assert "dim_customer_month_rfm.csv" not in data.WARMUP_FILES
@@ -0,0 +1,64 @@
+# streamlit_app/tests/test_engine_dag.py
+# crm_engine.dag.DagRunner: unchanged stages are skipped; input or output fingerprint changes rerun them.
+# Run: python -m pytest -q streamlit_app/tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils.engine  # noqa: E402,F401  (crm_engine on sys.path)
+from crm_engine.dag import RAN, SKIPPED, Dag, DagRunner, Stage  # noqa: E402
+
+
+def _pipeline(tmp_path):
+    fingerprints = {"file:raw.csv": "raw-v1"}
+    calls = []
+
+    def write(name, resource, value):
+        def run():
+            calls.append(name)
+            fingerprints[resource] = value
+        return run
+
+    dag = Dag()
+    dag.add(Stage("silver", write("silver", "table:silver", "s1"), inputs=["file:raw.csv"], outputs=["table:silver"],
+                  code="SELECT * FROM raw"))
+    dag.add(Stage("gold", write("gold", "table:gold", "g1"), inputs=["table:silver"], outputs=["table:gold"],
+                  code="SELECT COUNT(*) FROM silver"))
+
+    def runner():
+        return DagRunner(dag, fingerprints.get, str(tmp_path / "state.json"), max_workers=2, log=None)
+
+    def statuses():
+        calls.clear()
+        return {r.name: r.status for r in runner().run()}
+
+    return fingerprints, calls, statuses
+
+
+def test_second_run_skips_everything(tmp_path):
+    _, calls, statuses = _pipeline(tmp_path)
+    assert statuses() == {"silver": RAN, "gold": RAN}
+    assert statuses() == {"silver": SKIPPED, "gold": SKIPPED}
+    assert calls == []
+
+
+def test_input_change_reruns_only_affected_stages(tmp_path):
+    fingerprints, calls, statuses = _pipeline(tmp_path)
+    statuses()
+
+    # new raw file, but silver rewrites identical content -> gold's inputs are unchanged
+    fingerprints["file:raw.csv"] = "raw-v2"
+    assert statuses() == {"silver": RAN, "gold": SKIPPED}
+    assert calls == ["silver"]
+
+
+def test_output_change_or_loss_reruns_producer(tmp_path):
+    fingerprints, calls, statuses = _pipeline(tmp_path)
+    statuses()
+
+    fingerprints["table:gold"] = "edited elsewhere"
+    assert statuses() == {"silver": SKIPPED, "gold": RAN}
+
+    del fingerprints["table:gold"]
+    assert statuses() == {"silver": SKIPPED, "gold": RAN}
+    assert calls == ["gold"]
@@ -0,0 +1,117 @@
+# streamlit_app/tests/test_engine_estimators.py
+# crm_engine estimators on tiny in-memory data: bootstrap seeding, kNN matching, POST-window attribution.
+# Run: python -m pytest -q streamlit_app/tests
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils.engine  # noqa: E402,F401  (crm_engine on sys.path)
+from crm_engine import attribution, bootstrap, matching  # noqa: E402
+
+
+# =======================
+# Bootstrap
+# =======================
+def _bootstrap_input(n=1_000, n_groups=4, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, n_groups, n), rng.gamma(2.0, 10.0, size=(n, 2))
+
+
+def test_bootstrap_is_deterministic_per_chunk_seed():
+    codes, X = _bootstrap_input()
+    args = dict(n_groups=4, n_replicates=50, chunk_rows=300, replicate_block=20, seed=7, workers=1)
+    a = bootstrap.poisson_bootstrap_grouped_sums(codes, X, **args)
+    assert a.shape == (4, 2, 50)
+    np.testing.assert_array_equal(a, bootstrap.poisson_bootstrap_grouped_sums(codes, X, **args))
+    assert not np.array_equal(a, bootstrap.poisson_bootstrap_grouped_sums(codes, X, **{**args, "seed": 8}))
+
+
+def test_bootstrap_does_not_depend_on_workers_or_streaming():
+    codes, X = _bootstrap_input()
+    one = bootstrap.poisson_bootstrap_grouped_sums(codes, X, 4, n_replicates=30, chunk_rows=250, seed=3, workers=1)
+    pool = bootstrap.poisson_bootstrap_grouped_sums(codes, X, 4, n_replicates=30, chunk_rows=250, seed=3, workers=2)
+    np.testing.assert_allclose(one, pool)
+
+    chunks = ((codes[i:i + 250], X[i:i + 250]) for i in range(0, len(codes), 250))
+    streamed = bootstrap.poisson_bootstrap_chunks(chunks, 4, 2, n_replicates=30, seed=3, workers=1)
+    np.testing.assert_allclose(one, streamed)
+
+    # chunk i draws from SeedSequence(seed, spawn_key=(i,)), whatever else is in the stream
+    first = bootstrap._chunk_replicate_sums((codes[:250], X[:250], 4, 30, bootstrap.DEFAULT_REPLICATE_BLOCK,
+                                             bootstrap._chunk_seed(3, 0)))
+    only_first = bootstrap.poisson_bootstrap_chunks([(codes[:250], X[:250])], 4, 2, n_replicates=30, seed=3, workers=1)
+    np.testing.assert_allclose(first, only_first)
+
+
+# =======================
+# kNN matching
+# =======================
+def _stratum_frame(n, month_id, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "month_id": month_id,
+        "is_active": 1,
+        "is_high_value": 0,
+        "anchor_week": 1,
+        "value_score": rng.integers(1, 6, n),
+        "activity_score": rng.integers(1, 6, n),
+        "pre_rev_per_day": rng.gamma(2.0, 5.0, n),
+        "pre_txn_per_day": rng.gamma(1.0, 0.2, n),
+    })
+
+
+def test_knn_matches_brute_force_on_tiny_strata():
+    k = 3
+    exposed = pd.concat([_stratum_frame(12, 202501, 1), _stratum_frame(9, 202502, 2)], ignore_index=True)
+    controls = pd.concat([_stratum_frame(k, 202501, 3), _stratum_frame(k, 202502, 4)], ignore_index=True)
+
+    idx, dist = matching.match_controls(exposed, controls, k=k, bin_width=None)
+
+    z_e, z_c = matching._standardize(exposed, controls)
+    same = exposed["month_id"].to_numpy()[:, None] == controls["month_id"].to_numpy()[None, :]
+    full = np.sqrt(((z_e[:, None, :] - z_c[None, :, :]) ** 2).sum(axis=2))
+    full[~same] = np.inf
+    expected = np.argsort(full, axis=1, kind="stable")[:, :k]
+
+    for i in range(len(exposed)):
+        assert set(idx[i]) == set(expected[i])
+    np.testing.assert_allclose(dist, np.take_along_axis(full, expected, axis=1))
+
+
+# =======================
+# Attribution
+# =======================
+def test_attribution_splits_post_revenue_by_cover():
+    days = pd.date_range("2025-01-01", "2025-03-31", freq="D")
+    rng = np.random.default_rng(5)
+    daily_tx = pd.DataFrame({
+        "customer_id": np.repeat([1, 2], len(days)),
+        "transaction_date": np.tile(days, 2),
+        "revenue": rng.gamma(2.0, 10.0, 2 * len(days)),
+        "txn_cnt": rng.integers(0, 3, 2 * len(days)),
+    })
+    exposures = pd.DataFrame({
+        "exposure_id": [10, 11, 12, 20],
+        "customer_id": [1, 1, 1, 2],
+        "exposure_date": pd.to_datetime(["2025-02-01", "2025-02-04", "2025-02-20", "2025-02-10"]),
+    })
+
+    out = attribution.attribute_exposures(exposures, daily_tx)
+
+    for cust, grp in exposures.groupby("customer_id"):
+        covered = set()
+        for d in grp["exposure_date"]:
+            covered.update(pd.date_range(d, periods=attribution.POST_DAYS, freq="D"))
+        tx = daily_tx[(daily_tx["customer_id"] == cust) & daily_tx["transaction_date"].isin(covered)]
+        rows = out[out["customer_id"] == cust]
+        assert np.isclose(rows["attributed_post_revenue"].sum(), tx["revenue"].sum())
+        assert np.isclose(rows["attributed_post_txn_cnt"].sum(), tx["txn_cnt"].sum())
+        assert np.isclose(rows["effective_post_days"].sum(), len(covered))
+
+    by_id = out.set_index("exposure_id")
+    assert by_id.loc[[10, 11], "concurrent_exposures"].tolist() == [2, 2]
+    assert by_id.loc[[12, 20], "concurrent_exposures"].tolist() == [1, 1]
+    assert by_id.loc[20, "effective_post_days"] == attribution.POST_DAYS
@@ -0,0 +1,81 @@
+# streamlit_app/tests/test_engine_sketches.py
+# Serialized per-row sketches: quantile error bound, exact / HyperLogLog customer-set unions, v1 decode.
+# Run: python -m pytest -q streamlit_app/tests
+import base64
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import sketches  # noqa: E402
+from utils.customer_sets import any_hll, decode_customer_set, union_count  # noqa: E402
+from crm_engine import customer_sets  # noqa: E402
+from crm_engine.sketches import DEFAULT_ALPHA, grouped_sketches  # noqa: E402
+
+
+# =======================
+# Quantile sketches
+# =======================
+def test_sketch_quantiles_within_alpha():
+    rng = np.random.default_rng(11)
+    values = np.concatenate([rng.lognormal(3.0, 1.5, 20_000), -rng.lognormal(1.0, 1.0, 2_000), np.zeros(500)])
+    codes = rng.integers(0, 2, len(values))
+    encoded = grouped_sketches(codes, values, 3)
+    assert encoded[2] is None
+
+    def check(sk, vals):
+        assert sk.count == len(vals)
+        assert np.isclose(sk.sum, vals.sum())
+        assert (sk.min, sk.max) == (vals.min(), vals.max())
+        ordered = np.sort(vals)
+        for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+            exact = ordered[int(q * (len(vals) - 1))]
+            assert abs(sk.quantile(q) - exact) <= DEFAULT_ALPHA * abs(exact) + 1e-9
+
+    for g in (0, 1):
+        check(sketches.decode_sketch(encoded[g]), values[codes == g])
+    check(sketches.merge_encoded(encoded + [float("nan")]), values)
+
+
+def test_sketch_v1_decode_and_unknown_version():
+    encoded = grouped_sketches(np.zeros(3, dtype=np.int64), np.array([1.0, 2.0, 4.0]), 1)[0]
+    raw = zlib.decompress(base64.b64decode(encoded))
+    assert raw[0] == 1
+    sk = sketches.decode_sketch(encoded)
+    assert (sk.count, sk.zero_count, sk.min, sk.max, sk.sum) == (3, 0, 1.0, 4.0, 7.0)
+
+    bumped = base64.b64encode(zlib.compress(bytes([99]) + raw[1:])).decode("ascii")
+    with pytest.raises(ValueError, match="Unsupported sketch version"):
+        sketches.decode_sketch(bumped)
+
+
+# =======================
+# Customer sets
+# =======================
+def test_customer_set_v1_round_trip():
+    ids = np.array([3, 7, 7, 2 ** 33, 12, 3])
+    encoded = customer_sets.grouped_customer_sets(np.zeros(len(ids), dtype=np.int64), ids, 1)[0]
+    version, decoded = decode_customer_set(encoded)
+    assert version == customer_sets.SET_VERSION
+    assert decoded.tolist() == [3, 7, 12, 2 ** 33]
+
+
+def test_union_count_exact_and_hll():
+    rng = np.random.default_rng(2)
+    a = np.unique(rng.integers(0, 50_000, 800))
+    b = np.unique(rng.integers(0, 50_000, 900))
+    enc_a, enc_b = (customer_sets.encode_customer_set(x) for x in (a, b))
+    assert union_count([enc_a, enc_b, None]) == len(np.union1d(a, b))
+    assert not any_hll([enc_a, enc_b])
+
+    big = np.unique(rng.integers(0, 10 ** 9, 60_000))
+    enc_big = customer_sets.encode_customer_set(big, exact_max=1_000)
+    assert decode_customer_set(enc_big)[0] == customer_sets.HLL_VERSION
+    assert any_hll([enc_a, enc_big])
+    # HLL at precision 14 has ~0.8% standard error
+    assert abs(union_count([enc_big]) - len(big)) <= 0.03 * len(big)
+    mixed = len(np.union1d(np.union1d(a, b), big))
+    assert abs(union_count([enc_a, enc_big, enc_b]) - mixed) <= 0.03 * mixed
@@ -0,0 +1,66 @@
+# streamlit_app/tests/test_query_sandbox.py
+# Free-form analyst SQL (utils/query.run_readonly_sql) must not reach files outside the export folder.
+# Run: python -m pytest -q streamlit_app/tests
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import query  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not query.duckdb_available(), reason="DuckDB is not installed")
+
+
+@pytest.fixture
+def export_folder(tmp_path):
+    exports = tmp_path / "gold_exports"
+    exports.mkdir()
+    pd.DataFrame({
+        "customer_id": [1, 2, 3],
+        "month_id": [202501, 202501, 202502],
+        "incremental_revenue": [10.0, -2.5, 4.0],
+    }).to_csv(exports / "fact_customer_month_incrementality.csv", index=False)
+    (tmp_path / "secret.csv").write_text("token\nabc\n")
+    return exports
+
+
+def test_fact_is_queryable(export_folder):
+    out = query.run_readonly_sql("SELECT month_id, SUM(incremental_revenue) AS r FROM fact GROUP BY 1 ORDER BY 1",
+                                 str(export_folder))
+    assert out["r"].tolist() == [7.5, 4.0]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM read_csv('{outside}')",
+    "SELECT * FROM read_csv_auto('{export}/../secret.csv')",
+    "SELECT * FROM glob('{root}/*')",
+    "WITH x AS (SELECT * FROM read_text('{outside}')) SELECT * FROM x",
+])
+def test_outside_paths_are_rejected(export_folder, sql):
+    root = export_folder.parent
+    sql = sql.format(outside=root / "secret.csv", export=export_folder, root=root)
+    with pytest.raises(query.duckdb.Error):
+        query.run_readonly_sql(sql, str(export_folder))
+
+
+def test_configuration_is_locked(export_folder):
+    cursor, _ = query._sandbox_cursor(str(export_folder))
+    with pytest.raises(query.duckdb.Error):
+        cursor.execute("SET enable_external_access = true")
+
+
+def test_non_select_is_rejected(export_folder):
+    with pytest.raises(ValueError):
+        query.run_readonly_sql("COPY (SELECT 1) TO 'x.csv'", str(export_folder))
+
+
+def test_result_cache_is_bounded_by_bytes():
+    cache = query.FrameCache(max_entries=100, max_bytes=10_000)
+    small = pd.DataFrame({"x": range(100)})
+    for i in range(20):
+        cache.put(("k", i), small)
+    assert cache.stats()["bytes"] <= 10_000
+    cache.put(("big",), pd.DataFrame({"x": range(10_000)}))
+    assert cache.get(("big",)) is None
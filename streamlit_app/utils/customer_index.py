@@ -0,0 +1,217 @@
+# streamlit_app/utils/customer_index.py
+from __future__ import annotations
+
+import hashlib
+import json
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.ipc as ipc
+
+from utils.data import dataset_version, resolve_export_path
+
+FACT_FILE = "fact_customer_month_incrementality.csv"
+RFM_FILE = "dim_customer_month_rfm.csv"
+
+# Persisted next to the export: customer-sorted copy (Arrow IPC, memory-mappable) + row-range index
+SORTED_SUFFIX = ".by_customer.arrow"
+INDEX_SUFFIX = ".by_customer.idx.npz"
+
+RFM_COLUMNS = ["r_score", "f_score", "m_score", "rfm_code", "rfm_segment"]
+
+
+@dataclass
+class CustomerIndex:
+    """
+    customer_id -> [start, start + count) row range in the customer-sorted Arrow file.
+    """
+    customer_ids: np.ndarray
+    starts: np.ndarray
+    counts: np.ndarray
+    table: pa.Table          # memory-mapped; slicing is zero-copy
+    source_version: str
+    sorted_path: str
+
+    @property
+    def n_customers(self) -> int:
+        return int(len(self.customer_ids))
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.table.num_rows)
+
+    def row_range(self, customer_id: int) -> Optional[tuple[int, int]]:
+        i = int(np.searchsorted(self.customer_ids, customer_id))
+        if i >= len(self.customer_ids) or self.customer_ids[i] != customer_id:
+            return None
+        return int(self.starts[i]), int(self.counts[i])
+
+    def lookup(self, customer_id: int) -> pd.DataFrame:
+        """
+        All customer-month rows for one customer (binary search + zero-copy slice).
+        """
+        rng = self.row_range(customer_id)
+        if rng is None:
+            return pd.DataFrame(columns=self.table.column_names)
+        start, count = rng
+        return self.table.slice(start, count).to_pandas()
+
+
+_LOADED: dict[str, CustomerIndex] = {}
+_LOCK = threading.Lock()
+
+
+def _artifact_dir(fact_path: Path) -> Path:
+    """
+    Prefer the export folder itself; fall back to a temp dir if it is read-only. The fallback is
+    one sub-folder per resolved export folder, so exports of different folders (markets) that share
+    a file name do not overwrite each other's index.
+    """
+    folder = fact_path.parent
+    probe = folder / ".customer_index_write_test"
+    try:
+        probe.touch()
+        probe.unlink()
+        return folder
+    except OSError:
+        folder_hash = hashlib.sha256(str(folder.resolve()).encode("utf-8")).hexdigest()[:16]
+        fallback = Path(tempfile.gettempdir()) / "crm_customer_index" / folder_hash
+        fallback.mkdir(parents=True, exist_ok=True)
+        return fallback
+
+
+def _artifact_paths(fact_path: Path) -> tuple[Path, Path]:
+    base = _artifact_dir(fact_path) / fact_path.stem
+    return Path(str(base) + SORTED_SUFFIX), Path(str(base) + INDEX_SUFFIX)
+
+
+def _source_version(fact_path: Path, rfm_path: Optional[Path]) -> str:
+    v = dataset_version(fact_path)
+    if rfm_path is not None:
+        v += "|" + dataset_version(rfm_path)
+    return v
+
+
+def build_customer_index(fact_path: Path, rfm_path: Optional[Path] = None) -> tuple[Path, Path]:
+    """
+    One-off build: read the fact export with Arrow, attach RFM code/segment per customer-month
+    (when dim_customer_month_rfm is exported), sort by (customer_id, month_id), and persist:
+    - <fact>.by_customer.arrow   : sorted rows (Arrow IPC, uncompressed so it can be memory-mapped)
+    - <fact>.by_customer.idx.npz : unique customer_ids + start offsets + row counts + source version
+    """
+    table = pacsv.read_csv(str(fact_path))
+
+    if rfm_path is not None:
+        rfm = pacsv.read_csv(str(rfm_path))
+        keep = ["customer_id", "month_id"] + [c for c in RFM_COLUMNS if c in rfm.column_names]
+        rfm = rfm.select(keep)
+        drop = [c for c in keep[2:] if c in table.column_names]
+        if drop:
+            table = table.drop_columns(drop)
+        table = table.join(rfm, keys=["customer_id", "month_id"], join_type="left outer")
+
+    table = table.sort_by([("customer_id", "ascending"), ("month_id", "ascending")])
+
+    ids = table.column("customer_id").to_numpy(zero_copy_only=False)
+    if len(ids):
+        change = np.flatnonzero(np.diff(ids)) + 1
+        starts = np.concatenate([[0], change]).astype(np.int64)
+        counts = np.diff(np.concatenate([starts, [len(ids)]])).astype(np.int64)
+        uniq = ids[starts]
+    else:
+        starts = counts = uniq = np.array([], dtype=np.int64)
+
+    sorted_path, index_path = _artifact_paths(fact_path)
+    tmp_sorted = sorted_path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp_sorted), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=1_000_000)
+    tmp_sorted.replace(sorted_path)
+
+    meta = json.dumps({"source_version": _source_version(fact_path, rfm_path), "rows": int(table.num_rows)})
+    tmp_index = index_path.with_name(index_path.name + ".tmp.npz")
+    np.savez(tmp_index, customer_ids=uniq, starts=starts, counts=counts, meta=np.array(meta))
+    tmp_index.replace(index_path)
+    return sorted_path, index_path
+
+
+def _read_index(sorted_path: Path, index_path: Path) -> Optional[CustomerIndex]:
+    if not (sorted_path.exists() and index_path.exists()):
+        return None
+    with np.load(index_path, allow_pickle=False) as z:
+        meta = json.loads(str(z["meta"]))
+        ids, starts, counts = z["customer_ids"], z["starts"], z["counts"]
+    table = ipc.open_file(pa.memory_map(str(sorted_path), "r")).read_all()
+    return CustomerIndex(ids, starts, counts, table, meta["source_version"], str(sorted_path))
+
+
+def get_customer_index(folder: str, build_if_missing: bool = True) -> Optional[CustomerIndex]:
+    """
+    Returns the (cached) index for the fact export in `folder`.
+    Rebuilds when the persisted index is missing or was built from a different export version.
+    Returns None when there is no fact export, or the index is missing and build_if_missing=False.
+    """
+    fact_path = resolve_export_path(folder, FACT_FILE)
+    if fact_path is None:
+        return None
+    rfm_path = resolve_export_path(folder, RFM_FILE)
+    version = _source_version(fact_path, rfm_path)
+
+    with _LOCK:
+        idx = _LOADED.get(version)
+        if idx is not None:
+            return idx
+
+        sorted_path, index_path = _artifact_paths(fact_path)
+        idx = _read_index(sorted_path, index_path)
+        if idx is None or idx.source_version != version:
+            if not build_if_missing:
+                return None
+            build_customer_index(fact_path, rfm_path)
+            idx = _read_index(sorted_path, index_path)
+
+        _LOADED[version] = idx
+        return idx
+
+
+def customer_history(idx: CustomerIndex, customer_id: int) -> pd.DataFrame:
+    """
+    Customer-month rows for the drill-down view, ordered by month, with the most useful columns first.
+    """
+    df = idx.lookup(int(customer_id))
+    if "anchor_exposure_date" in df.columns and "pre_start" not in df.columns and len(df):
+        # Windows as defined in 04_silver_transforms.sql (28-day PRE, 7-day POST incl. anchor day)
+        anchor = pd.to_datetime(df["anchor_exposure_date"])
+        df["pre_start"] = (anchor - pd.Timedelta(days=28)).dt.date
+        df["pre_end"] = (anchor - pd.Timedelta(days=1)).dt.date
+        df["post_start"] = anchor.dt.date
+        df["post_end"] = (anchor + pd.Timedelta(days=6)).dt.date
+    front = [
+        "customer_id", "month_id", "anchor_exposure_date",
+        "pre_start", "pre_end", "post_start", "post_end",
+        "rfm_code", "rfm_segment", "is_active", "is_high_value",
+        "pre_revenue", "post_revenue", "pre_txn_cnt", "post_txn_cnt",
+        "incremental_revenue", "incremental_transactions", "delta_aov",
+    ]
+    cols = [c for c in front if c in df.columns] + [c for c in df.columns if c not in front]
+    return df[cols]
+
+
+def segment_transitions(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Months where the customer's RFM segment changed (useful to explain swings in lift).
+    """
+    if history.empty or "rfm_segment" not in history.columns:
+        return pd.DataFrame(columns=["month_id", "from_segment", "to_segment"])
+    seg = history[["month_id", "rfm_segment"]].copy()
+    seg["rfm_segment"] = seg["rfm_segment"].fillna("Unknown")
+    seg["from_segment"] = seg["rfm_segment"].shift(1)
+    out = seg[seg["from_segment"].notna() & (seg["from_segment"] != seg["rfm_segment"])]
+    return out.rename(columns={"rfm_segment": "to_segment"})[["month_id", "from_segment", "to_segment"]]
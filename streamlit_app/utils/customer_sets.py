@@ -0,0 +1,16 @@
+# streamlit_app/utils/customer_sets.py
+#
+# Per-row customer sets of the Gold aggregates (exact ids or HyperLogLog sketches). The format, its
+# writer and its readers live in databricks/crm_engine/customer_sets.py; the pages use the readers.
+from __future__ import annotations
+
+import utils.engine  # noqa: F401  (crm_engine on sys.path)
+from crm_engine.customer_sets import (  # noqa: F401
+    EXACT_MAX_IDS,
+    SET_COLUMN,
+    any_hll,
+    decode_customer_set,
+    distinct_customers_by,
+    has_customer_sets,
+    union_count,
+)
@@ -1,9 +1,103 @@
 # streamlit_app/utils/data.py
 from __future__ import annotations
 
+import json
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Callable, Optional
+
 import pandas as pd
 
+# Gold export files the app knows about
+GOLD_EXPORT_FILES = [
+    "agg_incrementality_month.csv",
+    "agg_incrementality_active_value.csv",
+    "agg_incrementality_rfm.csv",
+    "fact_customer_month_incrementality.csv",
+    "dim_customer_month_rfm.csv",
+    "agg_incrementality_campaign_channel.csv",
+    "agg_incrementality_contact_pressure.csv",
+    "agg_response_decay.csv",
+]
+
+# Small aggregate exports warmed together at startup (utils/warmup.py). The customer-grain fact and
+# RFM dim are scanned in place by DuckDB (utils/query.py) or loaded by the page that needs them.
+WARMUP_FILES = [f for f in GOLD_EXPORT_FILES if f.startswith("agg_")]
+
+# Process-wide frame cache shared by all sessions/pages, bounded like the query result cache:
+# a frame above FRAME_CACHE_MAX_BYTES (a large fact) is parsed per read instead of pinned in memory
+FRAME_CACHE_MAX_ENTRIES = 32
+FRAME_CACHE_MAX_BYTES = 512 * 2 ** 20
+_FRAME_LOCKS: dict[str, threading.Lock] = {}
+_FRAME_LOCKS_GUARD = threading.Lock()
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class FrameCache:
+    """
+    Thread-safe LRU of DataFrames, bounded by entry count and total frame bytes (same policy as
+    gold_service.ResultCache). A frame larger than max_bytes is not cached. Used for the export
+    frames below and the query results of utils/query.py.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            self._items.move_to_end(key)
+            return hit[0]
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        size = frame_bytes(df)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (df, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def discard(self, match: Callable[[tuple], bool]) -> None:
+        """
+        Drops every entry whose key satisfies `match`.
+        """
+        with self._lock:
+            for key in [k for k in self._items if match(k)]:
+                self._bytes -= self._items.pop(key)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes}
+
+
+# (resolved path, dataset_version) -> DataFrame
+_FRAME_CACHE = FrameCache(FRAME_CACHE_MAX_ENTRIES, FRAME_CACHE_MAX_BYTES)
+
 
 def get_repo_root() -> Path:
     """
@@ -58,23 +152,74 @@ def _candidate_folders(user_folder: str | None) -> list[Path]:
     return uniq
 
 
-def load_csv_folder(folder: str, filename: str, required: bool = True) -> pd.DataFrame:
+def resolve_export_path(folder: str | None, filename: str) -> Path | None:
     """
-    Loads a CSV from the provided folder with robust fallback paths.
-
-    - If required=True: raises FileNotFoundError with a detailed message.
-    - If required=False: returns empty DataFrame if not found.
+    Returns the first existing path for filename across the candidate folders,
+    or None if the file cannot be found anywhere.
     """
-    candidates = _candidate_folders(folder)
-
-    tried_paths = []
-    for base in candidates:
+    for base in _candidate_folders(folder):
         path = base / filename
-        tried_paths.append(str(path))
         if path.exists() and path.is_file():
-            return pd.read_csv(path)
+            return path
+    return None
+
+
+def dataset_version(path: Path | str) -> str:
+    """
+    Cheap version key for an exported file (path + mtime + size).
+    Changes whenever the export is rewritten, so it is safe to key caches on it.
+    """
+    p = Path(path)
+    st_ = p.stat()
+    return f"{p.resolve()}:{st_.st_mtime_ns}:{st_.st_size}"
 
-    msg = (
+
+def _path_lock(key: str) -> threading.Lock:
+    with _FRAME_LOCKS_GUARD:
+        lock = _FRAME_LOCKS.get(key)
+        if lock is None:
+            lock = _FRAME_LOCKS[key] = threading.Lock()
+        return lock
+
+
+def read_csv_cached(path: Path | str) -> pd.DataFrame:
+    """
+    Reads a CSV through the shared process-wide cache.
+
+    The cache is keyed by resolved path + dataset_version; a new version drops the older
+    frames of the file, and the cache is an LRU bounded by bytes (FRAME_CACHE_MAX_BYTES).
+    Concurrent callers for the same file wait for the in-flight read instead of
+    parsing it twice. Returns the cached frame itself, shared by every session: treat it
+    as read-only and .copy() before assigning columns or mutating in place.
+    """
+    path_key = str(Path(path).resolve())
+    key = (path_key, dataset_version(path))
+    with _path_lock(path_key):
+        df = _FRAME_CACHE.get(key)
+        if df is None:
+            _FRAME_CACHE.discard(lambda k: k[0] == path_key)   # older versions of this file
+            df = pd.read_csv(path)
+            _FRAME_CACHE.put(key, df)
+    return df
+
+
+def is_cached(path: Path | str) -> bool:
+    return (str(Path(path).resolve()), dataset_version(path)) in _FRAME_CACHE
+
+
+def clear_frame_cache() -> None:
+    """
+    Drops every cached frame (cold-load benchmarks; the app itself never needs this).
+    """
+    _FRAME_CACHE.clear()
+
+
+def missing_file_message(folder: str | None, filename: str) -> str:
+    """
+    User-facing message for an export that cannot be found (lists every location tried).
+    """
+    tried_paths = [str(base / filename) for base in _candidate_folders(folder)]
+    return (
         f"Missing required file: '{filename}'.\n\n"
         f"Tried these locations:\n- " + "\n- ".join(tried_paths) + "\n\n"
         f"Fix options:\n"
@@ -83,12 +228,38 @@ def load_csv_folder(folder: str, filename: str, required: bool = True) -> pd.Dat
         f"3) Put CSVs under repo 'data/gold_exports' for Streamlit Cloud.\n"
     )
 
+
+def load_csv_folder(folder: str, filename: str, required: bool = True) -> pd.DataFrame:
+    """
+    Loads a CSV from the provided folder with robust fallback paths.
+    Reads go through the shared frame cache (see read_csv_cached): the result is shared
+    and must be copied before it is mutated.
+
+    - If required=True: raises FileNotFoundError with a detailed message.
+    - If required=False: returns empty DataFrame if not found.
+    """
+    path = resolve_export_path(folder, filename)
+    if path is not None:
+        return read_csv_cached(path)
+
     if required:
-        raise FileNotFoundError(msg)
+        raise FileNotFoundError(missing_file_message(folder, filename))
 
     return pd.DataFrame()
 
 
+def load_json_folder(folder: str, filename: str) -> dict | None:
+    """
+    Loads a JSON export (e.g. data_quality_report.json) with the same fallback paths as the CSVs.
+    Returns None if the file cannot be found.
+    """
+    path = resolve_export_path(folder, filename)
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
 def ensure_month_fields(df: pd.DataFrame, month_col: str) -> pd.DataFrame:
     """
     Adds normalized month fields used for sorting and selection:
@@ -0,0 +1,134 @@
+# streamlit_app/utils/downloads.py
+from __future__ import annotations
+
+import gzip
+import io
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils.data import dataset_version, resolve_export_path
+from utils.profiling import KIND_SERIALIZE
+
+# Converted payloads of exports up to this size are cached per version + format; larger exports
+# (the customer-grain fact) are rebuilt per download, and plain CSV is always streamed from disk
+DOWNLOAD_CACHE_MAX_BYTES = 32 * 2 ** 20
+
+# label -> (file suffix, mime type)
+DOWNLOAD_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def _frame_to_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == "Parquet":
+        buf = io.BytesIO()
+        df.to_parquet(buf, index=False)
+        return buf.getvalue()
+    csv_bytes = df.to_csv(index=False).encode("utf-8")
+    if fmt == "CSV (gzip)":
+        return gzip.compress(csv_bytes, compresslevel=6)
+    return csv_bytes
+
+
+def _build_file_payload(path: str, fmt: str) -> bytes:
+    if fmt == "CSV (gzip)":
+        return gzip.compress(Path(path).read_bytes(), compresslevel=6)
+    return _frame_to_bytes(pd.read_csv(path), fmt)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _file_payload(path: str, version: str, fmt: str) -> bytes:
+    """
+    Converted payload (gzip / Parquet) of an exported file up to DOWNLOAD_CACHE_MAX_BYTES.
+    `version` is only part of the cache key (changes when the export is rewritten).
+    """
+    return _build_file_payload(path, fmt)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _frame_payload(_df: pd.DataFrame, version: str, fmt: str) -> bytes:
+    """
+    Payload built from an in-memory (transformed) DataFrame.
+    `_df` is not hashed by Streamlit; `version` identifies the content.
+    """
+    return _frame_to_bytes(_df, fmt)
+
+
+@contextmanager
+def _maybe_stage(prof, name: str):
+    if prof is None:
+        yield None
+    else:
+        with prof.stage(name, kind=KIND_SERIALIZE) as s:
+            yield s
+
+
+def render_download(filename: str,
+                    folder: str,
+                    df: pd.DataFrame | None = None,
+                    version: str | None = None,
+                    key: str | None = None,
+                    prof=None) -> None:
+    """
+    Lazy download widget for a Gold dataset.
+
+    - df=None: serves the exported file from disk; plain CSV is streamed from an open file (never
+      cached), converted formats are cached only below DOWNLOAD_CACHE_MAX_BYTES.
+    - df given: serves the transformed frame; pass a `version` that changes with its content
+      (falls back to a row hash of the frame, which is still far cheaper than to_csv).
+
+    Nothing is serialized until the user asks for the download; payloads are cached per
+    dataset version + format, so reruns after the first click are free.
+    If a PageProfiler is passed, payload preparation is recorded as a serialize stage.
+    """
+    key = key or filename
+    stem = filename[:-4] if filename.endswith(".csv") else filename
+
+    path = resolve_export_path(folder, filename) if df is None else None
+    if df is None and path is None:
+        st.caption(f"{filename} not found in the export folder; nothing to download.")
+        return
+
+    c1, c2 = st.columns([2, 1])
+    fmt = c1.selectbox(
+        f"Format for {filename}",
+        list(DOWNLOAD_FORMATS.keys()),
+        key=f"dl_fmt_{key}",
+    )
+    ready_key = f"dl_ready_{key}_{fmt}"
+    if c2.button("Prepare download", key=f"dl_prep_{key}_{fmt}"):
+        st.session_state[ready_key] = True
+
+    if not st.session_state.get(ready_key, False):
+        return
+
+    suffix, mime = DOWNLOAD_FORMATS[fmt]
+    payload = None   # bytes, or None when the CSV export is streamed from `path`
+    with st.spinner(f"Preparing {stem}{suffix} ..."), _maybe_stage(prof, f"download: {stem}{suffix}") as s:
+        if df is None:
+            if fmt == "CSV":
+                size = path.stat().st_size
+            elif path.stat().st_size <= DOWNLOAD_CACHE_MAX_BYTES:
+                payload = _file_payload(str(path), dataset_version(path), fmt)
+            else:
+                payload = _build_file_payload(str(path), fmt)
+        else:
+            if version is None:
+                version = str(int(pd.util.hash_pandas_object(df, index=False).sum()))
+            payload = _frame_payload(df, version, fmt)
+        if payload is not None:
+            size = len(payload)
+        if s is not None:
+            s.payload_bytes = size
+
+    label = f"Download {stem}{suffix} ({size / 1024:,.0f} KB)"
+    if payload is not None:
+        st.download_button(label, data=payload, file_name=f"{stem}{suffix}", mime=mime, key=f"dl_btn_{key}_{fmt}")
+        return
+    with open(path, "rb") as f:
+        st.download_button(label, data=f, file_name=f"{stem}{suffix}", mime=mime, key=f"dl_btn_{key}_{fmt}")
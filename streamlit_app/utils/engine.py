@@ -0,0 +1,14 @@
+# streamlit_app/utils/engine.py
+#
+# Makes databricks/crm_engine importable from the app (the repo is deployed as a whole), for the
+# export-side code the pages share with the pipeline: the executive snapshot builder and the
+# customer-set format. Import it before any crm_engine import.
+from __future__ import annotations
+
+import sys
+
+from utils.data import get_repo_root
+
+ENGINE_DIR = str(get_repo_root() / "databricks")
+if ENGINE_DIR not in sys.path:
+    sys.path.append(ENGINE_DIR)   # appended: app modules keep precedence
@@ -204,3 +204,44 @@ def narrative_diagnostics(rows: int, customers: int,
         "These diagnostics are row-based; if the fact table is not unique by (customer_id, month_id), counts may be inflated."
     )
     return Narrative(headline, bullets, recommendation, caveat)
+
+# ---------------------------
+# Page 9: Contact Pressure
+# ---------------------------
+def narrative_contact_pressure(rev_by_band: dict[str, float],
+                               customers_by_band: dict[str, float]) -> Narrative:
+    rev = {b: _safe_float(v) for b, v in rev_by_band.items()}
+    cust = {b: _safe_float(v) for b, v in customers_by_band.items()}
+    per_cust = {b: (rev[b] / cust[b]) if cust.get(b) else None for b in rev}
+
+    ranked = sorted([b for b in per_cust if per_cust[b] is not None], key=lambda b: per_cust[b], reverse=True)
+    best = ranked[0] if ranked else "N/A"
+    worst = ranked[-1] if ranked else "N/A"
+
+    headline = (
+        f"Highest incremental revenue per customer at **{best}** pressure "
+        f"({_fmt_num(per_cust.get(best), 2)}); lowest at **{worst}** ({_fmt_num(per_cust.get(worst), 2)})."
+    )
+
+    bullets = [
+        f"{b}: {_fmt_num(rev[b])} incremental revenue across {_fmt_num(cust.get(b, 0.0))} customers "
+        f"({_fmt_num(per_cust[b], 2) if per_cust[b] is not None else 'N/A'} per customer)."
+        for b in ["Low", "Medium", "High"] if b in rev
+    ]
+
+    if "High" in per_cust and "Low" in per_cust and per_cust["High"] is not None and per_cust["Low"] is not None \
+            and per_cust["High"] < per_cust["Low"]:
+        recommendation = (
+            "Lift per customer falls as contact pressure rises: cap exposures per customer "
+            "(e.g., at the Medium band thresholds) and redirect volume to low-pressure customers."
+        )
+    else:
+        recommendation = (
+            "No clear fatigue signal yet: keep current contact limits and re-check this split monthly."
+        )
+
+    caveat = (
+        "Heavily contacted customers are often selected for higher propensity, so band differences mix "
+        "targeting bias with fatigue; compare within Active / Value segments before changing limits."
+    )
+    return Narrative(headline, bullets, recommendation, caveat)
@@ -0,0 +1,193 @@
+# streamlit_app/utils/profiling.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+# Set CRM_PROFILE_LOG=/path/to/render_profile.jsonl to append every stage record to disk.
+PROFILE_LOG_ENV = "CRM_PROFILE_LOG"
+
+# Stage kinds used across pages (free text is allowed, these are the conventions)
+KIND_IO = "io"
+KIND_TRANSFORM = "transform"
+KIND_FIGURE = "figure"
+KIND_RENDER = "render"
+KIND_SERIALIZE = "serialize"
+
+# Process-wide history so p50/p95 survive reruns and page switches
+_HISTORY: deque = deque(maxlen=5000)
+_HISTORY_LOCK = threading.Lock()
+
+
+@dataclass
+class StageRecord:
+    page: str
+    run_id: str
+    stage: str
+    kind: str
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    payload_bytes: Optional[int] = None
+    ts: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    # unique per record: a stage name may repeat within one run (e.g. several charts)
+    record_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+
+class PageProfiler:
+    """
+    Collects stage timings for one page render (one Streamlit rerun).
+
+    Usage:
+        prof = PageProfiler("1_Summary")
+        with prof.stage("load agg_month", kind=KIND_IO) as s:
+            df = load_csv_folder(...)
+            s.rows = len(df)
+    """
+
+    def __init__(self, page: str, measure_payloads: bool = False, log_path: Optional[str] = None):
+        self.page = page
+        self.run_id = f"{time.time_ns():x}"
+        self.measure_payloads = measure_payloads
+        self.log_path = log_path if log_path is not None else os.environ.get(PROFILE_LOG_ENV)
+        self.records: list[StageRecord] = []
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, kind: str = KIND_TRANSFORM,
+              rows: Optional[int] = None) -> Iterator[StageRecord]:
+        rec = StageRecord(page=self.page, run_id=self.run_id, stage=name, kind=kind, rows=rows)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec.seconds = time.perf_counter() - t0
+            self._record(rec)
+
+    def plotly_chart(self, fig, name: str, **kwargs) -> None:
+        """
+        st.plotly_chart wrapped in a render stage.
+        Payload size is only measured when enabled (it costs one extra JSON serialization).
+        """
+        import streamlit as st
+
+        with self.stage(f"chart: {name}", kind=KIND_RENDER) as s:
+            s.rows = _trace_points(fig)
+            if self.measure_payloads:
+                s.payload_bytes = len(fig.to_json())
+            st.plotly_chart(fig, **kwargs)
+
+    def _record(self, rec: StageRecord) -> None:
+        self.records.append(rec)
+        with _HISTORY_LOCK:
+            _HISTORY.append(rec)
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(asdict(rec)) + "\n")
+            except OSError:
+                # Profiling must never break a page
+                pass
+
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([asdict(r) for r in self.records])
+
+
+def _trace_points(fig) -> int:
+    n = 0
+    for tr in fig.data:
+        x = getattr(tr, "x", None)
+        if x is not None:
+            n += len(x)
+    return n
+
+
+def get_page_profiler(page: str) -> PageProfiler:
+    """
+    New profiler for the current rerun. Payload measurement follows the
+    'Measure chart payload sizes' checkbox rendered by render_profile.
+    """
+    import streamlit as st
+    return PageProfiler(page, measure_payloads=bool(st.session_state.get("profile_payloads", False)))
+
+
+def render_profile(prof: PageProfiler) -> None:
+    """
+    Renders this rerun's stage timings. Call inside the page's 'Debug / Data audit' expander.
+    """
+    import streamlit as st
+
+    st.markdown("**Render profile (this rerun)**")
+    df = prof.to_frame()
+    if df.empty:
+        st.caption("No stages recorded.")
+    else:
+        df["ms"] = (df["seconds"] * 1000).round(1)
+        st.dataframe(df[["stage", "kind", "ms", "rows", "payload_bytes"]])
+        by_kind = df.groupby("kind", as_index=False)["ms"].sum().sort_values("ms", ascending=False)
+        st.write("Time by stage kind (ms):", dict(zip(by_kind["kind"], by_kind["ms"])))
+    st.write("Page elapsed until profile render (ms):", round(prof.total_seconds() * 1000, 1))
+    st.checkbox("Measure chart payload sizes (next rerun)", key="profile_payloads")
+    if prof.log_path:
+        st.caption(f"Appending stage records to {prof.log_path}")
+
+
+def load_profile_history(log_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Stage records from this process plus the JSONL log (if configured).
+    Records present in both are de-duplicated on record_id (log lines written before
+    record_id existed are kept as they are).
+    """
+    with _HISTORY_LOCK:
+        rows = [asdict(r) for r in _HISTORY]
+
+    log_path = log_path if log_path is not None else os.environ.get(PROFILE_LOG_ENV)
+    if log_path and Path(log_path).exists():
+        with open(log_path, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    if "record_id" not in df.columns:
+        return df
+    legacy = df["record_id"].isna()
+    return pd.concat([df[legacy], df[~legacy].drop_duplicates(subset=["record_id"], keep="first")],
+                     ignore_index=True)
+
+
+def summarize_profile_history(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    p50/p95 (ms) per page x stage across reruns.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["page", "stage", "kind", "runs", "p50_ms", "p95_ms", "max_ms", "avg_rows"])
+
+    g = df.assign(ms=df["seconds"] * 1000).groupby(["page", "stage", "kind"])
+    out = g.agg(
+        runs=("ms", "size"),
+        p50_ms=("ms", lambda s: s.quantile(0.50)),
+        p95_ms=("ms", lambda s: s.quantile(0.95)),
+        max_ms=("ms", "max"),
+        avg_rows=("rows", "mean"),
+    ).reset_index()
+    return out.sort_values("p95_ms", ascending=False).round(1)
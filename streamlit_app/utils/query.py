@@ -0,0 +1,265 @@
+# streamlit_app/utils/query.py
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from utils.data import FrameCache, dataset_version, resolve_export_path
+
+# Optional dependency: the app falls back to pandas when DuckDB is not installed.
+try:
+    import duckdb  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    duckdb = None
+
+# Aggregations exposed to the slice builder (label -> SQL function)
+AGG_FUNCS = {
+    "sum": "SUM",
+    "avg": "AVG",
+    "min": "MIN",
+    "max": "MAX",
+    "median": "MEDIAN",
+    "count": "COUNT",
+    "count distinct": "COUNT(DISTINCT",  # closed in _metric_sql
+}
+
+# Query results kept per process, bounded by entry count and total frame bytes
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_MAX_BYTES = 128 * 2 ** 20
+
+# Analyst SQL databases kept open (one per fact export version)
+MAX_SANDBOXES = 4
+
+_CONN = None
+_CONN_LOCK = threading.Lock()
+_SANDBOXES: OrderedDict[str, object] = OrderedDict()
+
+
+def duckdb_available() -> bool:
+    return duckdb is not None
+
+
+def _cursor():
+    """
+    One in-process DuckDB database per process; each query gets its own cursor
+    (cursors are safe to use from different Streamlit script threads).
+    """
+    global _CONN
+    if duckdb is None:
+        raise RuntimeError("DuckDB is not installed. `pip install duckdb` to enable the SQL backend.")
+    with _CONN_LOCK:
+        if _CONN is None:
+            _CONN = duckdb.connect(database=":memory:")
+        return _CONN.cursor()
+
+
+def quote_ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def resolve_dataset(folder: str, name: str) -> Optional[Path]:
+    """
+    Finds a Gold export by table name, preferring Parquet over CSV.
+    `name` is the table name without extension (e.g. 'fact_customer_month_incrementality').
+    """
+    for ext in (".parquet", ".csv"):
+        path = resolve_export_path(folder, name + ext)
+        if path is not None:
+            return path
+    return None
+
+
+def source_sql(path: Path | str) -> str:
+    """
+    Table expression that scans the file in place.
+    """
+    p = str(path)
+    if p.endswith(".parquet"):
+        return f"read_parquet({_quote_literal(p)})"
+    return f"read_csv_auto({_quote_literal(p)}, header=true)"
+
+
+def dataset_source(folder: str, name: str) -> tuple[str, str]:
+    """
+    (table expression, version) for a Gold export; raises FileNotFoundError if missing.
+    """
+    path = resolve_dataset(folder, name)
+    if path is None:
+        raise FileNotFoundError(f"No Parquet/CSV export named '{name}' found for folder '{folder}'.")
+    return source_sql(path), dataset_version(path)
+
+
+_RESULTS = FrameCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES)
+
+
+def _run_cached(cursor_fn, key: tuple, sql: str, params: list) -> pd.DataFrame:
+    hit = _RESULTS.get(key)
+    if hit is None:
+        hit = cursor_fn().execute(sql, params).df()
+        _RESULTS.put(key, hit)
+    return hit
+
+
+def run_query(sql: str, params: Optional[list] = None, version: str = "") -> pd.DataFrame:
+    """
+    Executes SQL in-process and returns only the (small) result as pandas.
+    Results are cached per (sql, params, version) in a byte-bounded LRU; a copy is returned.
+    `version` only participates in the cache key (changes when an export is rewritten).
+    """
+    params = list(params or [])
+    return _run_cached(_cursor, ("query", sql, tuple(params), version), sql, params).copy()
+
+
+def fact_with_rfm_source(folder: str) -> tuple[str, str]:
+    """
+    fact_customer_month_incrementality, LEFT JOINed to dim_customer_month_rfm when that
+    export exists, so RFM code/segment are available as slice dimensions.
+    """
+    fact_src, fact_ver = dataset_source(folder, "fact_customer_month_incrementality")
+    rfm_path = resolve_dataset(folder, "dim_customer_month_rfm")
+    if rfm_path is None:
+        return f"(SELECT * FROM {fact_src})", fact_ver
+    sql = (
+        f"(SELECT f.*, r.r_score, r.f_score, r.m_score, r.rfm_code, "
+        f"COALESCE(r.rfm_segment, 'Unknown') AS rfm_segment "
+        f"FROM {fact_src} f "
+        f"LEFT JOIN {source_sql(rfm_path)} r "
+        f"ON r.customer_id = f.customer_id AND r.month_id = f.month_id)"
+    )
+    return sql, f"{fact_ver}|{dataset_version(rfm_path)}"
+
+
+def describe_source(src: str, version: str = "") -> pd.DataFrame:
+    """
+    Column names and DuckDB types of a table expression (no data is read beyond the schema/sample).
+    """
+    return run_query(f"DESCRIBE SELECT * FROM {src}", version=version)
+
+
+def distinct_values(src: str, column: str, version: str = "", limit: int = 500) -> list:
+    sql = f"SELECT DISTINCT {quote_ident(column)} AS v FROM {src} ORDER BY 1 LIMIT {int(limit)}"
+    return run_query(sql, version=version)["v"].tolist()
+
+
+def _metric_sql(agg: str, column: str) -> str:
+    fn = AGG_FUNCS[agg]
+    if agg == "count distinct":
+        return f"{fn} {quote_ident(column)})"
+    if agg == "count" and column == "*":
+        return "COUNT(*)"
+    return f"{fn}({quote_ident(column)})"
+
+
+def slice_query(src: str,
+                group_by: list[str],
+                metrics: list[tuple[str, str]],
+                filters: Optional[dict[str, list]] = None,
+                order_by: Optional[str] = None,
+                descending: bool = True,
+                limit: Optional[int] = None,
+                version: str = "") -> pd.DataFrame:
+    """
+    Filtered + grouped result straight from the export files.
+
+    - group_by: dimension columns
+    - metrics: [(agg, column)], agg in AGG_FUNCS; output column is '<agg>_<column>'
+    - filters: {column: [allowed values]} (values are bound as parameters)
+    """
+    if not metrics:
+        metrics = [("count", "*")]
+
+    select_parts = [quote_ident(c) for c in group_by]
+    metric_names = []
+    for agg, col in metrics:
+        alias = f"{agg.replace(' ', '_')}_{'rows' if col == '*' else col}"
+        metric_names.append(alias)
+        select_parts.append(f"{_metric_sql(agg, col)} AS {quote_ident(alias)}")
+
+    where_parts: list[str] = []
+    params: list = []
+    for col, values in (filters or {}).items():
+        if not values:
+            continue
+        where_parts.append(f"{quote_ident(col)} IN ({', '.join('?' for _ in values)})")
+        params.extend(values)
+
+    sql = f"SELECT {', '.join(select_parts)} FROM {src}"
+    if where_parts:
+        sql += " WHERE " + " AND ".join(where_parts)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(quote_ident(c) for c in group_by)
+
+    order_col = order_by or (metric_names[0] if metric_names else None)
+    if order_col:
+        sql += f" ORDER BY {quote_ident(order_col)} {'DESC' if descending else 'ASC'}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    return run_query(sql, params, version=version)
+
+
+def filter_rows(src: str, filters: dict[str, list], version: str = "") -> pd.DataFrame:
+    """
+    Row-level filter pushed down to the file scan (e.g. one month of the fact table).
+    """
+    where_parts, params = [], []
+    for col, values in filters.items():
+        where_parts.append(f"{quote_ident(col)} IN ({', '.join('?' for _ in values)})")
+        params.extend(values)
+    sql = f"SELECT * FROM {src}"
+    if where_parts:
+        sql += " WHERE " + " AND ".join(where_parts)
+    return run_query(sql, params, version=version)
+
+
+def _sandbox_cursor(folder: str):
+    """
+    Cursor on a separate in-process database for analyst SQL: the view `fact` is registered
+    first, then file access is limited to the export folders it reads and the configuration is
+    locked, so table functions (read_csv, glob, ...) cannot reach the rest of the filesystem.
+    Returns (cursor, version).
+    """
+    if duckdb is None:
+        raise RuntimeError("DuckDB is not installed. `pip install duckdb` to enable the SQL backend.")
+    src, version = fact_with_rfm_source(folder)
+    with _CONN_LOCK:
+        conn = _SANDBOXES.get(version)
+        if conn is None:
+            paths = [resolve_dataset(folder, "fact_customer_month_incrementality"),
+                     resolve_dataset(folder, "dim_customer_month_rfm")]
+            dirs = sorted({str(p.resolve().parent) + os.sep for p in paths if p is not None})
+            conn = duckdb.connect(database=":memory:")
+            conn.execute(f"CREATE VIEW fact AS SELECT * FROM {src}")
+            conn.execute(f"SET allowed_directories = [{', '.join(_quote_literal(d) for d in dirs)}]")
+            conn.execute("SET enable_external_access = false")
+            conn.execute("SET lock_configuration = true")
+            _SANDBOXES[version] = conn
+            while len(_SANDBOXES) > MAX_SANDBOXES:
+                _, old = _SANDBOXES.popitem(last=False)
+                old.close()
+        else:
+            _SANDBOXES.move_to_end(version)
+        return conn.cursor(), version
+
+
+def run_readonly_sql(sql: str, folder: str) -> pd.DataFrame:
+    """
+    Free-form analyst SQL. Only SELECT/WITH statements are allowed; the table
+    `fact` is bound to fact_customer_month_incrementality (+ RFM when available).
+    Runs in a sandbox database that can only read the export folders of `fact`.
+    """
+    stripped = sql.strip().rstrip(";").strip()
+    head = stripped.split(None, 1)[0].upper() if stripped else ""
+    if head not in ("SELECT", "WITH") or ";" in stripped:
+        raise ValueError("Only a single SELECT/WITH statement is allowed.")
+    cursor, version = _sandbox_cursor(folder)
+    return _run_cached(lambda: cursor, ("sandbox", stripped, version), stripped, []).copy()
@@ -0,0 +1,139 @@
+# streamlit_app/utils/sketches.py
+from __future__ import annotations
+
+import base64
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Format written by databricks/crm_engine/sketches.py (v1):
+#   zlib(header "<BdQQddd" + positive store + negative store), base64-encoded
+#   store = "<iI" (first bucket index, n) + n x uint32 counts
+_HEADER = struct.Struct("<BdQQddd")
+_STORE = struct.Struct("<iI")
+SUPPORTED_VERSIONS = {1}
+
+
+@dataclass
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (log buckets). Merging adds bucket counts.
+    """
+    alpha: float
+    count: int
+    zero_count: int
+    min: float
+    max: float
+    sum: float
+    pos_offset: int
+    pos_counts: np.ndarray
+    neg_offset: int
+    neg_counts: np.ndarray
+
+    @property
+    def gamma(self) -> float:
+        return (1.0 + self.alpha) / (1.0 - self.alpha)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else float("nan")
+
+    def _bucket_values(self, offset: int, n: int) -> np.ndarray:
+        g = self.gamma
+        return 2.0 * np.power(g, np.arange(offset, offset + n, dtype=np.float64)) / (g + 1.0)
+
+    def points(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (representative value, count) per non-empty bucket, in ascending value order.
+        """
+        neg_v = -self._bucket_values(self.neg_offset, len(self.neg_counts))[::-1]
+        neg_c = self.neg_counts[::-1]
+        pos_v = self._bucket_values(self.pos_offset, len(self.pos_counts))
+        values = np.concatenate([neg_v, [0.0], pos_v])
+        counts = np.concatenate([neg_c, [self.zero_count], self.pos_counts]).astype(np.float64)
+        keep = counts > 0
+        return np.clip(values[keep], self.min, self.max), counts[keep]
+
+    def quantiles(self, qs: Iterable[float]) -> list[float]:
+        if self.count == 0:
+            return [float("nan") for _ in qs]
+        values, counts = self.points()
+        cum = np.cumsum(counts)
+        out = []
+        for q in qs:
+            rank = min(max(q, 0.0), 1.0) * (self.count - 1)
+            out.append(float(values[int(np.searchsorted(cum, rank, side="right"))]))
+        return out
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def histogram(self, n_bins: int = 40,
+                  value_range: Optional[tuple[float, float]] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Equal-width histogram (edges, counts) rebuilt from bucket counts; `value_range` trims tails.
+        """
+        values, counts = self.points()
+        lo, hi = value_range if value_range is not None else (self.min, self.max)
+        if not (math.isfinite(lo) and math.isfinite(hi)) or hi <= lo:
+            hi = lo + 1.0
+        counts_h, edges = np.histogram(values, bins=n_bins, range=(lo, hi), weights=counts)
+        return edges, counts_h
+
+
+def _merge_store(o1: int, c1: np.ndarray, o2: int, c2: np.ndarray) -> tuple[int, np.ndarray]:
+    if len(c1) == 0:
+        return o2, c2.copy()
+    if len(c2) == 0:
+        return o1, c1.copy()
+    lo = min(o1, o2)
+    hi = max(o1 + len(c1), o2 + len(c2))
+    out = np.zeros(hi - lo, dtype=np.uint64)
+    out[o1 - lo:o1 - lo + len(c1)] += c1
+    out[o2 - lo:o2 - lo + len(c2)] += c2
+    return lo, out
+
+
+def merge(a: QuantileSketch, b: QuantileSketch) -> QuantileSketch:
+    if abs(a.alpha - b.alpha) > 1e-12:
+        raise ValueError(f"Cannot merge sketches with different accuracy ({a.alpha} vs {b.alpha}).")
+    po, pc = _merge_store(a.pos_offset, a.pos_counts, b.pos_offset, b.pos_counts)
+    no, nc = _merge_store(a.neg_offset, a.neg_counts, b.neg_offset, b.neg_counts)
+    return QuantileSketch(a.alpha, a.count + b.count, a.zero_count + b.zero_count,
+                          min(a.min, b.min), max(a.max, b.max), a.sum + b.sum, po, pc, no, nc)
+
+
+@lru_cache(maxsize=4096)
+def decode_sketch(encoded: str) -> QuantileSketch:
+    raw = zlib.decompress(base64.b64decode(encoded))
+    version, alpha, count, zero_count, vmin, vmax, vsum = _HEADER.unpack_from(raw, 0)
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported sketch version: {version}")
+    pos = _HEADER.size
+    stores = []
+    for _ in range(2):
+        offset, n = _STORE.unpack_from(raw, pos)
+        pos += _STORE.size
+        counts = np.frombuffer(raw, dtype="<u4", count=n, offset=pos).astype(np.uint64)
+        pos += 4 * n
+        stores.append((offset, counts))
+    (po, pc), (no, nc) = stores
+    return QuantileSketch(alpha, count, zero_count, vmin, vmax, vsum, po, pc, no, nc)
+
+
+def merge_encoded(encoded: Iterable) -> Optional[QuantileSketch]:
+    """
+    Merges serialized sketches (NaN / empty entries are skipped). None when nothing to merge.
+    """
+    out: Optional[QuantileSketch] = None
+    for e in encoded:
+        if not isinstance(e, str) or not e:
+            continue
+        s = decode_sketch(e)
+        out = s if out is None else merge(out, s)
+    return out
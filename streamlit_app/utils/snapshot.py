@@ -0,0 +1,65 @@
+# streamlit_app/utils/snapshot.py
+#
+# Executive snapshot for pages 1-3 (KPI cards, chart series, segments, narrative inputs per month).
+# The export stage writes executive_snapshot.json with databricks/crm_engine/snapshot.py; the pages
+# render from it without loading the CSVs, only downloads read the files.
+#
+# The snapshot records the sha256 of its source files. When it is missing, from an older format or
+# out of date with the CSVs next to it, get_snapshot() builds it in-process with the same builder.
+from __future__ import annotations
+
+import json
+import threading
+from functools import lru_cache
+
+import utils.engine  # noqa: F401  (crm_engine on sys.path)
+from crm_engine.snapshot import SNAPSHOT_FILE, SOURCE_FILES, build_snapshot, file_sha256, snapshot_is_current
+from utils.data import dataset_version, missing_file_message, resolve_export_path
+
+SOURCE_EXPORT = "export"      # read from executive_snapshot.json
+SOURCE_COMPUTED = "computed"  # built in-process from the CSVs (snapshot missing or stale)
+
+# Process-wide: source + snapshot versions -> (snapshot, source)
+_SNAPSHOT_CACHE: dict[tuple, tuple[dict, str]] = {}
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+def fmt_kpi(x: float | None, decimals: int = 0) -> str:
+    """
+    KPI card text for a snapshot value (None -> "N/A").
+    """
+    return "N/A" if x is None else f"{x:,.{decimals}f}"
+
+
+@lru_cache(maxsize=64)
+def _sha256_at(version: str, path: str) -> str:
+    # `version` (path + mtime + size) is only the cache key
+    return file_sha256(path)
+
+
+def get_snapshot(folder: str) -> tuple[dict, str]:
+    """
+    (snapshot, source): the exported snapshot when it matches the CSVs, else one built from them.
+    Cached per file versions, so reruns only stat the files.
+    """
+    paths = {name: resolve_export_path(folder, name) for name in SOURCE_FILES}
+    snap_path = resolve_export_path(folder, SNAPSHOT_FILE)
+    key = (str(folder),) + tuple(dataset_version(p) if p else None for p in [*paths.values(), snap_path])
+    with _SNAPSHOT_LOCK:
+        hit = _SNAPSHOT_CACHE.get(key)
+        if hit is None:
+            snapshot = None
+            if snap_path is not None:
+                with open(snap_path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                if not snapshot_is_current(snapshot, paths, sha256=lambda p: _sha256_at(dataset_version(p), str(p))):
+                    snapshot = None
+            if snapshot is not None:
+                hit = (snapshot, SOURCE_EXPORT)
+            else:
+                built = build_snapshot(folder, paths, missing_message=lambda name: missing_file_message(folder, name))
+                hit = (built, SOURCE_COMPUTED)
+            for old in [k for k in _SNAPSHOT_CACHE if k[0] == key[0]]:   # keep one entry per folder
+                del _SNAPSHOT_CACHE[old]
+            _SNAPSHOT_CACHE[key] = hit
+    return hit
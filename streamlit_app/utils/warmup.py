@@ -0,0 +1,90 @@
+# streamlit_app/utils/warmup.py
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from utils.data import WARMUP_FILES, read_csv_cached, resolve_export_path
+
+
+@dataclass
+class WarmupResult:
+    filename: str
+    path: Optional[str]
+    rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+# Readiness per resolved export folder (process-wide, shared by all sessions)
+_READY: dict[str, bool] = {}
+_RUNNING: dict[str, threading.Thread] = {}
+_STATE_LOCK = threading.Lock()
+
+
+def _folder_key(folder: str) -> str:
+    return str(Path(folder).resolve())
+
+
+def is_cache_ready(folder: str) -> bool:
+    """
+    True once every warm-up export (data.WARMUP_FILES) found for `folder` is in the shared cache.
+    """
+    return _READY.get(_folder_key(folder), False)
+
+
+def _load_one(folder: str, filename: str) -> WarmupResult:
+    path = resolve_export_path(folder, filename)
+    if path is None:
+        return WarmupResult(filename=filename, path=None, error="not found")
+    t0 = time.perf_counter()
+    try:
+        df = read_csv_cached(path)
+        return WarmupResult(filename, str(path), rows=len(df), seconds=time.perf_counter() - t0)
+    except Exception as e:  # a broken file must not block the other loads
+        return WarmupResult(filename, str(path), seconds=time.perf_counter() - t0, error=str(e))
+
+
+def warm_gold_cache(folder: str,
+                    files: Optional[list[str]] = None,
+                    max_workers: Optional[int] = None,
+                    on_progress: Optional[Callable[[int, int, WarmupResult], None]] = None) -> list[WarmupResult]:
+    """
+    Loads the aggregate exports (data.WARMUP_FILES) in parallel (thread pool) into the shared frame cache.
+
+    Wall time is bounded by the slowest single file instead of the sum of all loads.
+    Missing files are reported, not raised. `on_progress(done, total, result)` is called
+    from the calling thread as each load completes.
+    """
+    files = list(files or WARMUP_FILES)
+    results: list[WarmupResult] = []
+    with ThreadPoolExecutor(max_workers=max_workers or len(files), thread_name_prefix="gold-warmup") as pool:
+        futures = [pool.submit(_load_one, folder, f) for f in files]
+        for i, fut in enumerate(as_completed(futures), start=1):
+            res = fut.result()
+            results.append(res)
+            if on_progress is not None:
+                on_progress(i, len(files), res)
+
+    with _STATE_LOCK:
+        _READY[_folder_key(folder)] = all(r.error in (None, "not found") for r in results)
+    return results
+
+
+def start_background_warmup(folder: str) -> None:
+    """
+    Non-blocking warm-up for pages opened directly (without visiting app.py first).
+    Idempotent: does nothing if the folder is ready or a warm-up is already running.
+    A page's own load of a file that is in flight waits for it instead of re-reading.
+    """
+    key = _folder_key(folder)
+    with _STATE_LOCK:
+        if _READY.get(key) or (key in _RUNNING and _RUNNING[key].is_alive()):
+            return
+        t = threading.Thread(target=warm_gold_cache, args=(folder,), name="gold-warmup", daemon=True)
+        _RUNNING[key] = t
+        t.start()